@@ -0,0 +1,65 @@
+"""
+Configuração do Gunicorn, usada pela imagem Docker para servir a aplicação em produção.
+
+Uso:
+    gunicorn -c gunicorn.conf.py
+
+Por padrão cada worker é um processo gthread servindo setup.wsgi:application com WEB_THREADS threads, e
+cada thread mantém a sua conexão com o banco aberta entre as requisições (DB_CONN_MAX_AGE, padrão 60).
+Com WEB_WORKER_CLASS=uvicorn.workers.UvicornWorker cada worker tem um event loop do Uvicorn servindo
+setup.asgi:application (as views assíncronas); nesse modo as conexões são fechadas a cada requisição,
+então use junto o PgBouncer (DB_POOLER, ver pgbouncer/pgbouncer.ini). Os valores podem ser ajustados
+pelas variáveis de ambiente abaixo.
+"""
+import multiprocessing
+import os
+import shutil
+
+bind = os.environ.get('WEB_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_WORKERS', multiprocessing.cpu_count()))
+worker_class = os.environ.get('WEB_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('WEB_THREADS', 4))
+
+# Workers do Uvicorn servem a aplicação ASGI; os workers sync e gthread do Gunicorn, a WSGI.
+wsgi_app = os.environ.get(
+    'WEB_APP',
+    'setup.wsgi:application' if worker_class in ('sync', 'gthread') else 'setup.asgi:application',
+)
+
+# Carrega a aplicação antes de criar os workers, para que erros de configuração derrubem o
+# servidor na subida e os workers compartilhem a memória das importações.
+preload_app = os.environ.get('WEB_PRELOAD', 'True').lower() in ('true', '1')
+
+# Conexões keep-alive e tempo máximo de uma requisição.
+keepalive = int(os.environ.get('WEB_KEEPALIVE', 5))
+timeout = int(os.environ.get('WEB_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30))
+
+# Reinicia cada worker depois de um número de requisições, com uma variação aleatória para que
+# não reiniciem todos ao mesmo tempo.
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.environ.get('WEB_MAX_REQUESTS_JITTER', 1000))
+
+accesslog = os.environ.get('WEB_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('WEB_LOG_LEVEL', 'info')
+
+
+# Diretório onde os workers gravam as métricas do Prometheus, somadas em /metrics (ver petstore/metricas.py).
+# É preparado aqui, antes de a aplicação ser importada (preload_app), descartando as métricas de uma execução anterior.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/petstore-metricas')
+shutil.rmtree(os.environ['PROMETHEUS_MULTIPROC_DIR'], ignore_errors=True)
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+
+def child_exit(server, worker):
+    # Remove os medidores "ao vivo" (requisições em andamento, conexões abertas) do worker que saiu.
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def post_fork(server, worker):
+    # Com preload_app as conexões abertas no processo principal durante a importação não
+    # podem ser usadas pelos workers, cada um abre as suas.
+    from django.db import connections
+    connections.close_all()
@@ -0,0 +1,199 @@
+from datetime import datetime, timedelta
+
+from django.db import IntegrityError, connections, router, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .disponibilidade import invalidar_ocupacao
+from .cache import invalidar_objetos
+from .models import Veterinario, Consulta, nova_versao, repetir_falha_de_serializacao, suporta_update_returning
+
+CAMPOS_EXPEDIENTE = ('id_veterinario', 'inicio_expediente', 'fim_expediente', 'duracao_consulta')
+
+
+class HorarioInvalido(ValueError):
+    """Erro lançado quando o horário pedido não é o início de um horário da agenda do veterinário."""
+
+
+class HorarioOcupado(Exception):
+    """Erro lançado quando o veterinário já tem uma consulta que se sobrepõe ao horário pedido."""
+
+
+def ler_horario(valor):
+    """
+    Converte a data enviada na requisição (ISO 8601) para um datetime com fuso horário.
+    Datas sem fuso são interpretadas no fuso configurado em TIME_ZONE.
+    """
+    try:
+        horario = parse_datetime(valor) if isinstance(valor, str) else None
+    except ValueError:
+        horario = None
+    if horario is None:
+        raise HorarioInvalido("Será aceito apenas datas: Ano, mês, dia, com horas e minutos.")
+    if timezone.is_naive(horario):
+        horario = timezone.make_aware(horario)
+    return horario
+
+
+def validar_horario(expediente, inicio):
+    """
+    Verifica se "inicio" é o começo de um horário da agenda do veterinário: dentro do expediente,
+    com a consulta inteira terminando até o fim dele, e a um múltiplo da duração da consulta
+    a partir do início do expediente.
+
+    Args:
+        expediente (dict): inicio_expediente, fim_expediente e duracao_consulta do veterinário.
+        inicio (datetime): Início da consulta, com fuso horário.
+
+    Raises:
+        HorarioInvalido: Se o horário não for um horário da agenda.
+    """
+    local = timezone.localtime(inicio)
+    duracao = timedelta(minutes=expediente['duracao_consulta'])
+    abertura = datetime.combine(local.date(), expediente['inicio_expediente'], tzinfo=local.tzinfo)
+    fechamento = datetime.combine(local.date(), expediente['fim_expediente'], tzinfo=local.tzinfo)
+    local = local.replace(tzinfo=None)
+    abertura, fechamento = abertura.replace(tzinfo=None), fechamento.replace(tzinfo=None)
+
+    if local < abertura or local + duracao > fechamento:
+        raise HorarioInvalido(
+            f"O horário deve estar dentro do expediente do veterinário, das "
+            f"{expediente['inicio_expediente']:%H:%M} às {expediente['fim_expediente']:%H:%M}."
+        )
+    if (local - abertura) % duracao:
+        raise HorarioInvalido(
+            f"As consultas deste veterinário começam a cada {expediente['duracao_consulta']} minutos "
+            f"a partir das {expediente['inicio_expediente']:%H:%M}."
+        )
+
+
+def _reservar(expediente, inicio, id_consulta=None):
+    """
+    Verifica o horário, que não pode ter passado, e se ele está livre. Deve ser chamada com a linha do veterinário travada,
+    para que duas reservas do mesmo veterinário não façam a verificação ao mesmo tempo.
+    """
+    validar_horario(expediente, inicio)
+    if inicio <= timezone.now():
+        raise HorarioInvalido("Só é possível marcar consultas em horários que ainda não passaram.")
+    duracao = timedelta(minutes=expediente['duracao_consulta'])
+    # Também encontra consultas antigas fora do alinhamento atual (ex.: marcadas antes de uma
+    # mudança na duração da consulta), que a restrição única não pegaria.
+    sobrepostas = Consulta.objects.filter(
+        veterinario=expediente['id_veterinario'],
+        data_consulta__gt=inicio - duracao,
+        data_consulta__lt=inicio + duracao,
+    )
+    if id_consulta is not None:
+        sobrepostas = sobrepostas.exclude(id_consulta=id_consulta)
+    if sobrepostas.exists():
+        raise HorarioOcupado("O veterinário já tem uma consulta neste horário.")
+
+
+def marcar_consulta(id_veterinario, pet, inicio):
+    """
+    Cria uma consulta no horário pedido, se ele estiver livre na agenda do veterinário.
+
+    As reservas de um mesmo veterinário são feitas uma de cada vez, com a linha do veterinário
+    travada (SELECT ... FOR UPDATE) até o fim da transação; reservas de veterinários diferentes
+    não esperam umas pelas outras. A restrição única de (veterinario, data_consulta) garante
+    o resultado mesmo em bancos sem travas por linha.
+
+    Args:
+        id_veterinario (int): Id do veterinário.
+        pet (Pet): Pet da consulta.
+        inicio (datetime): Início da consulta, com fuso horário.
+
+    Returns:
+        Consulta: A consulta criada.
+
+    Raises:
+        Veterinario.DoesNotExist: Se o veterinário não existir.
+        HorarioInvalido: Se o horário já tiver passado ou não for um horário da agenda.
+        HorarioOcupado: Se o veterinário já tiver consulta no horário.
+    """
+    try:
+        with transaction.atomic():
+            expediente = Veterinario.objects.select_for_update().values(*CAMPOS_EXPEDIENTE).get(id_veterinario=id_veterinario)
+            _reservar(expediente, inicio)
+            return Consulta.objects.create(data_consulta=inicio, veterinario_id=id_veterinario, pet=pet)
+    except IntegrityError:
+        raise HorarioOcupado("O veterinário já tem uma consulta neste horário.")
+
+
+def remarcar_consulta(id_consulta, inicio):
+    """
+    Muda o horário de uma consulta, se o novo horário estiver livre na agenda do veterinário.
+    Só o horário é alterado: realizada continua como estava.
+
+    Returns:
+        dict: data_consulta e realizada da consulta atualizada, ou None se ela não existir.
+
+    Raises:
+        HorarioInvalido: Se o horário já tiver passado ou não for um horário da agenda.
+        HorarioOcupado: Se o veterinário já tiver outra consulta no horário.
+    """
+    try:
+        with transaction.atomic():
+            # Busca o veterinário pela consulta e trava só a linha dele (of=self), não a da consulta.
+            expediente = (
+                Veterinario.objects.select_for_update(of=('self',))
+                .filter(consulta__id_consulta=id_consulta)
+                .values(*CAMPOS_EXPEDIENTE, 'consulta__data_consulta', 'consulta__realizada').first()
+            )
+            if expediente is None:
+                return None
+            _reservar(expediente, inicio, id_consulta)
+            Consulta.objects.filter(id_consulta=id_consulta).update(data_consulta=inicio, **nova_versao())
+            consulta = {'data_consulta': inicio, 'realizada': expediente['consulta__realizada']}
+            # O update não dispara os sinais: libera o horário antigo e ocupa o novo no índice de horários livres.
+            invalidar_ocupacao(expediente['id_veterinario'], (expediente['consulta__data_consulta'], inicio))
+    except IntegrityError:
+        raise HorarioOcupado("O veterinário já tem uma consulta neste horário.")
+    return consulta
+
+
+def concluir_consultas_passadas(lote, agora=None):
+    """
+    Marca como realizadas as consultas pendentes cujo horário já passou, em um único comando:
+    UPDATE ... WHERE id_consulta IN (SELECT ... ORDER BY data_consulta LIMIT lote FOR UPDATE SKIP LOCKED)
+    RETURNING id_consulta. O SELECT percorre o índice parcial consulta_pendente_data_idx na ordem do horário
+    e pula as consultas travadas por outra transação (que ficam para o próximo lote), então todas as
+    linhas escolhidas são alteradas. Em bancos sem RETURNING, os ids são lidos antes, na mesma transação.
+
+    Args:
+        lote (int): Máximo de consultas alteradas.
+        agora (datetime): Horário de referência. Por padrão, agora.
+
+    Returns:
+        int: Quantidade de consultas marcadas como realizadas. Menos que "lote" indica que o SELECT não achou
+        mais pendentes (ou só achou consultas travadas).
+    """
+    banco = router.db_for_write(Consulta)
+    conexao = connections[banco]
+    pendentes = Consulta.objects.using(banco).filter(realizada=False, data_consulta__lte=agora or timezone.now())
+    pendentes = pendentes.order_by('data_consulta').select_for_update(skip_locked=True).values('id_consulta')[:lote]
+
+    def concluir():
+        with transaction.atomic(using=banco, savepoint=False):
+            if suporta_update_returning(conexao):
+                opts, nome = Consulta._meta, conexao.ops.quote_name
+                selecao, parametros = pendentes.query.sql_with_params()
+                with conexao.cursor() as cursor:
+                    cursor.execute(
+                        f'UPDATE {nome(opts.db_table)} SET {nome("realizada")} = %s, {nome("atualizado_em")} = %s, '
+                        f'{nome("versao")} = {nome("versao")} + 1 WHERE {nome("id_consulta")} IN ({selecao}) '
+                        f'RETURNING {nome("id_consulta")}',
+                        [
+                            opts.get_field('realizada').get_db_prep_save(True, conexao),
+                            opts.get_field('atualizado_em').get_db_prep_save(timezone.now(), conexao),
+                            *parametros,
+                        ],
+                    )
+                    pks = [pk for pk, in cursor.fetchall()]
+            else:
+                pks = [linha['id_consulta'] for linha in pendentes]
+                Consulta._base_manager.using(banco).filter(id_consulta__in=pks).update(realizada=True, **nova_versao())
+            invalidar_objetos(Consulta, pks)
+        return len(pks)
+
+    return repetir_falha_de_serializacao(concluir, banco)
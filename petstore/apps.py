@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class PetstoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'petstore'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import signals  # noqa: F401
+        from .instrumentacao import instalar_medidor_sql
+        from .metricas import registrar_conexao
+        connection_created.connect(instalar_medidor_sql)
+        connection_created.connect(registrar_conexao)
@@ -0,0 +1,110 @@
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from .instrumentacao import registrar_cache
+from .replicas import banco_de_leitura
+
+
+def chave_objeto(modelo, pk):
+    """
+    Monta a chave de cache de um objeto a partir do modelo e da chave primária.
+
+    Args:
+        modelo (Model): Classe do modelo (Usuario, Pet, Veterinario ou Consulta).
+        pk (int): Chave primária do objeto.
+
+    Returns:
+        str: Chave no formato "petstore.pet:42".
+    """
+    return f"{modelo._meta.label_lower}:{pk}"
+
+
+# Valor guardado no lugar de um objeto alterado há pouco (ver invalidar_objetos).
+LAPIDE = 'petstore:alterado'
+
+
+def objeto_do_cache(valor):
+    """Objeto lido do cache de objetos, ou None se a chave não existir ou tiver uma lápide."""
+    return None if valor == LAPIDE else valor
+
+
+def tempo_da_lapide():
+    """Segundos que a lápide fica no cache: CACHE_LAPIDE_TIMEOUT, ou mais que o atraso máximo das réplicas."""
+    if settings.REPLICAS_BANCOS:
+        return max(settings.CACHE_LAPIDE_TIMEOUT, math.ceil(settings.REPLICAS_ATRASO_MAXIMO) + 1)
+    return settings.CACHE_LAPIDE_TIMEOUT
+
+
+def campos_objeto(modelo):
+    """
+    Retorna os nomes dos campos concretos do modelo, na ordem em que são declarados.
+    Chaves estrangeiras aparecem pelo nome do campo (ex.: 'dono_do_pet'), como em .values().
+    """
+    return tuple(campo.name for campo in modelo._meta.concrete_fields)
+
+
+def buscar_objeto(modelo, pk):
+    """
+    Retorna os dados de um objeto a partir do cache, consultando o banco apenas em caso de falta.
+
+    Objetos inexistentes não são guardados no cache, para que um objeto criado depois
+    seja encontrado imediatamente, e nem objetos com lápide (ver invalidar_objetos).
+
+    Args:
+        modelo (Model): Classe do modelo.
+        pk (int): Chave primária do objeto.
+
+    Returns:
+        dict: Campos do objeto, ou None caso ele não exista.
+    """
+    chave = chave_objeto(modelo, pk)
+    valor = cache.get(chave)
+    objeto = objeto_do_cache(valor)
+    registrar_cache(objeto is not None)
+    if objeto is None:
+        objeto = _ler_do_banco(modelo, pk, valor).first()
+        # Com a lápide o objeto não é guardado; sem ela, cache.add não sobrescreve uma lápide gravada enquanto
+        # o objeto era lido do banco.
+        if objeto is not None and valor is None:
+            cache.add(chave, objeto, settings.CACHE_OBJETOS_TIMEOUT)
+    return objeto
+
+
+async def abuscar_objeto(modelo, pk):
+    """Versão assíncrona de buscar_objeto, usada pelas views de views_async.py."""
+    chave = chave_objeto(modelo, pk)
+    valor = await cache.aget(chave)
+    objeto = objeto_do_cache(valor)
+    registrar_cache(objeto is not None)
+    if objeto is None:
+        objeto = await _ler_do_banco(modelo, pk, valor).afirst()
+        if objeto is not None and valor is None:
+            await cache.aadd(chave, objeto, settings.CACHE_OBJETOS_TIMEOUT)
+    return objeto
+
+
+def _ler_do_banco(modelo, pk, valor):
+    # Numa requisição que lê de uma réplica, um objeto com lápide (alterado há menos de REPLICAS_ATRASO_MAXIMO
+    # segundos) é lido do primário: a réplica ainda pode ter a versão antiga.
+    banco = DEFAULT_DB_ALIAS if valor == LAPIDE and banco_de_leitura() else None
+    return modelo.objects.using(banco).filter(pk=pk).values(*campos_objeto(modelo))
+
+
+def invalidar_objetos(modelo, pks):
+    """
+    Remove objetos do cache. A remoção é feita na hora e, quando a transação atual é confirmada, o objeto dá
+    lugar a uma lápide por tempo_da_lapide() segundos. Uma leitura concorrente que leu do banco a versão
+    antiga antes do commit não consegue guardá-la depois dele: buscar_objeto só grava com cache.add, que
+    não sobrescreve a lápide. Enquanto ela existe, as leituras vão ao banco.
+
+    Args:
+        modelo (Model): Classe do modelo.
+        pks (Iterable[int]): Chaves primárias dos objetos alterados.
+    """
+    chaves = [chave_objeto(modelo, pk) for pk in pks]
+    if chaves:
+        cache.delete_many(chaves)
+        transaction.on_commit(lambda: cache.set_many(dict.fromkeys(chaves, LAPIDE), tempo_da_lapide()))
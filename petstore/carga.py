@@ -0,0 +1,380 @@
+import http.client
+import itertools
+import json
+import os
+import random
+import shutil
+import sys
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, time as dt_time, timedelta
+from urllib.parse import quote, urlsplit
+
+from django.conf import settings
+from django.utils import timezone
+
+# Uma rota do teste de carga. caminho e corpo podem ser funções que recebem o contexto da requisição
+# ({'n': número da requisição na execução, 'aleatorio': random.Random do cliente, 'id': id retirado de "consome"}).
+# "cria" é o nome da reserva onde entram os ids criados pela resposta; "consome" é a reserva de onde
+# sai o id usado pela requisição. Quando a reserva do cliente está vazia, ela é abastecida antes por
+# uma rota que "cria" nela (ver criadoras), sem entrar na medição.
+Rota = namedtuple('Rota', ['nome', 'metodo', 'caminho', 'corpo', 'cria', 'consome'], defaults=(None, None))
+
+SERVIDORES = ('runserver', 'gunicorn-asgi', 'gunicorn-gthread')
+
+
+def percentil(valores, p):
+    """Retorna o percentil p (0 a 100) de uma lista já ordenada, pelo método do vizinho mais próximo."""
+    if not valores:
+        return None
+    indice = max(0, min(len(valores) - 1, round(p / 100 * len(valores)) - 1))
+    return valores[indice]
+
+
+def rotas_padrao(usuario, pet, veterinario, consulta):
+    """
+    Rotas usadas no teste de carga: as leituras por id e uma atualização de pet que reenvia
+    os mesmos dados, para que o teste possa ser repetido sem alterar o banco.
+
+    Args:
+        usuario (dict), pet (dict), veterinario (dict), consulta (dict): Objetos existentes no banco.
+    """
+    corpo_pet = {campo: pet[campo] for campo in ('nome', 'especie', 'idade', 'dono_do_pet')}
+    return [
+        Rota('info_usuario', 'GET', f"/info/{usuario['id_usuario']}", None),
+        Rota('retorna_pet', 'GET', f"/infopet/{pet['id_pet']}", None),
+        Rota('retorna_veterinario', 'GET', f"/buscarvet/{veterinario['id_veterinario']}", None),
+        Rota('retorna_consulta', 'GET', f"/retornaconsulta/{consulta['id_consulta']}", None),
+        Rota('atualiza_pet', 'PUT', f"/atualizarpet/{pet['id_pet']}", corpo_pet),
+    ]
+
+
+def _ids_criados(dados):
+    """Ids dos objetos criados, lidos da resposta de uma rota de cadastro (individual ou em lote)."""
+    if isinstance(dados, list):
+        return [item['pk'] for item in dados]
+    if isinstance(dados, dict):
+        if 'criados' in dados:
+            return [criado['id'] for criado in dados['criados']]
+        if 'id' in dados:
+            return [dados['id']]
+    return []
+
+
+def _enviar(conexao, prefixo, rota, contexto):
+    """Envia a requisição da rota e retorna (status, corpo), com status None se a conexão falhar."""
+    caminho = rota.caminho(contexto) if callable(rota.caminho) else rota.caminho
+    corpo = rota.corpo(contexto) if callable(rota.corpo) else rota.corpo
+    # Corpos em bytes (arquivos CSV) vão como estão; os demais, em JSON.
+    tipo = 'text/csv' if isinstance(corpo, bytes) else 'application/json'
+    if corpo is not None and not isinstance(corpo, bytes):
+        corpo = json.dumps(corpo)
+    try:
+        conexao.request(rota.metodo, prefixo + caminho, body=corpo, headers={'Content-Type': tipo})
+        resposta = conexao.getresponse()
+        return resposta.status, resposta.read()
+    except (OSError, http.client.HTTPException):
+        conexao.close()
+        return None, b''
+
+
+def _guardar_criados(rota, status, conteudo, reservas, criados):
+    if rota.cria is None or status is None or status >= 300:
+        return
+    try:
+        ids = _ids_criados(json.loads(conteudo))
+    except ValueError:
+        return
+    reservas.setdefault(rota.cria, []).extend(ids)
+    criados.setdefault(rota.cria, []).extend(ids)
+
+
+def criadoras(rotas):
+    """Rota usada para abastecer cada reserva: a primeira da lista que cria nela."""
+    por_reserva = {}
+    for rota in rotas:
+        if rota.cria is not None:
+            por_reserva.setdefault(rota.cria, rota)
+    return por_reserva
+
+
+def _trabalhador(url, rotas, criadoras, deslocamento, fim, inicio_medicao, resultados, trava, contador):
+    partes = urlsplit(url)
+    prefixo = partes.path.rstrip('/')
+    conexao = http.client.HTTPConnection(partes.hostname, partes.port or 80, timeout=30)
+    aleatorio = random.Random(deslocamento)
+    latencias, erros, respostas, reservas, criados, i = {}, {}, {}, {}, {}, deslocamento
+    while time.perf_counter() < fim:
+        rota = rotas[i % len(rotas)]
+        i += 1
+        contexto = {'n': next(contador), 'aleatorio': aleatorio}
+        if rota.consome is not None:
+            if not reservas.get(rota.consome):
+                criadora = criadoras[rota.consome]
+                status, conteudo = _enviar(conexao, prefixo, criadora, {'n': next(contador), 'aleatorio': aleatorio})
+                _guardar_criados(criadora, status, conteudo, reservas, criados)
+            if not reservas.get(rota.consome):
+                erros[rota.nome] = erros.get(rota.nome, 0) + 1
+                continue
+            contexto['id'] = reservas[rota.consome].pop()
+        agora = time.perf_counter()
+        status, conteudo = _enviar(conexao, prefixo, rota, contexto)
+        _guardar_criados(rota, status, conteudo, reservas, criados)
+        if agora < inicio_medicao:
+            continue
+        latencias.setdefault(rota.nome, []).append(time.perf_counter() - agora)
+        contagem = respostas.setdefault(rota.nome, {})
+        contagem[status] = contagem.get(status, 0) + 1
+        if status is None or status >= 500:
+            erros[rota.nome] = erros.get(rota.nome, 0) + 1
+    conexao.close()
+    with trava:
+        for nome, valores in latencias.items():
+            resultados['latencias'].setdefault(nome, []).extend(valores)
+        for nome, quantidade in erros.items():
+            resultados['erros'][nome] = resultados['erros'].get(nome, 0) + quantidade
+        for nome, contagem in respostas.items():
+            for status, quantidade in contagem.items():
+                total = resultados['respostas'].setdefault(nome, {})
+                total[status] = total.get(status, 0) + quantidade
+        for reserva, ids in criados.items():
+            resultados['criados'].setdefault(reserva, []).extend(ids)
+
+
+def resumir(latencias, erros, duracao):
+    """Calcula requisições, erros, req/s e os percentis p50/p95/p99 (em ms) de uma lista de latências."""
+    latencias = sorted(latencias)
+    return {
+        'requisicoes': len(latencias),
+        'erros': erros,
+        'req_s': len(latencias) / duracao if duracao else 0.0,
+        **{f'p{p}_ms': (percentil(latencias, p) or 0.0) * 1000 for p in (50, 95, 99)},
+    }
+
+
+def executar_carga(url, rotas, concorrencia=16, duracao=10.0, aquecimento=2.0, abastecimento=None):
+    """
+    Envia requisições para o servidor em url durante "duracao" segundos, com "concorrencia"
+    clientes simultâneos. Cada cliente mantém a sua conexão aberta (keep-alive) e percorre as
+    rotas em sequência, começando de uma rota diferente dos demais.
+
+    As requisições feitas durante o aquecimento não entram na medição. Respostas 5xx e falhas
+    de conexão contam como erro; respostas 4xx são medidas normalmente e aparecem na contagem
+    de respostas por status de cada rota (a falha de conexão aparece como status "None").
+
+    Args:
+        url (str): Endereço base do servidor, ex.: http://127.0.0.1:8000.
+        rotas (list[Rota]): Rotas a serem chamadas.
+        concorrencia (int): Quantidade de clientes simultâneos.
+        duracao (float): Tempo de medição, em segundos.
+        aquecimento (float): Tempo antes da medição, em segundos.
+        abastecimento (dict): {reserva: Rota} que abastece as reservas consumidas. Por padrão, criadoras(rotas).
+
+    Returns:
+        dict: {'total': resumo, 'rotas': {nome: resumo}, 'criados': {reserva: [ids]}}, onde cada
+        resumo tem requisicoes, erros, req_s, p50_ms, p95_ms e p99_ms, e o resumo de cada rota
+        também tem "status", a contagem de respostas por status. "criados" tem os ids de todos os
+        objetos criados pelas rotas com "cria", inclusive no aquecimento, para a limpeza no final.
+    """
+    resultados = {'latencias': {}, 'erros': {}, 'respostas': {}, 'criados': {}}
+    trava = threading.Lock()
+    contador = itertools.count()
+    abastecimento = criadoras(rotas) if abastecimento is None else abastecimento
+    inicio_medicao = time.perf_counter() + aquecimento
+    fim = inicio_medicao + duracao
+    clientes = [
+        threading.Thread(target=_trabalhador, args=(url, rotas, abastecimento, i, fim, inicio_medicao, resultados, trava, contador))
+        for i in range(concorrencia)
+    ]
+    for cliente in clientes:
+        cliente.start()
+    for cliente in clientes:
+        cliente.join()
+
+    todas = [latencia for valores in resultados['latencias'].values() for latencia in valores]
+    return {
+        'total': resumir(todas, sum(resultados['erros'].values()), duracao),
+        'rotas': {
+            rota.nome: {
+                **resumir(resultados['latencias'].get(rota.nome, []), resultados['erros'].get(rota.nome, 0), duracao),
+                'status': {str(status): quantidade for status, quantidade in sorted(
+                    resultados['respostas'].get(rota.nome, {}).items(), key=lambda item: str(item[0]))},
+            }
+            for rota in rotas
+        },
+        'criados': resultados['criados'],
+    }
+
+
+def horario_da_agenda(expediente, dia, indice):
+    """
+    Horário de índice "indice" na agenda de um veterinário a partir de "dia", em ISO 8601.
+    Índices diferentes dão horários diferentes, então requisições com números diferentes nunca disputam o mesmo horário.
+
+    Args:
+        expediente (tuple): (inicio, duracao, horarios): início do expediente e duração da consulta em minutos
+            e quantidade de horários por dia.
+    """
+    inicio, duracao, horarios = expediente
+    dias, horario = divmod(indice, horarios)
+    meia_noite = datetime.combine(dia + timedelta(days=dias), dt_time.min, tzinfo=timezone.get_current_timezone())
+    return (meia_noite + timedelta(minutes=inicio + horario * duracao)).isoformat()
+
+
+def rotas_completas(objetos, amostras, prefixo, primeiro_dia, tamanho_lote=10):
+    """
+    Uma rota de carga para cada rota nomeada de setup/urls.py (ver benchmark_rotas).
+    As rotas de lote vêm antes das de cadastro individual para serem as criadoras das reservas:
+    cada requisição de abastecimento cria tamanho_lote objetos.
+
+    As leituras sorteiam ids do conjunto de dados; as atualizações reenviam os dados dos objetos do
+    próprio benchmark; os cadastros criam objetos com e-mails únicos, que são consumidos pelas rotas
+    de exclusão; e as consultas são marcadas e remarcadas em horários que nenhuma outra requisição usa,
+    então nenhuma requisição deveria receber 409.
+
+    Args:
+        objetos (dict): Objetos criados para o benchmark: usuario, pet, veterinario e consulta (dicts).
+        amostras (dict): Listas de ids do banco ('usuario', 'pet', 'veterinario', 'consulta'),
+            'especialidades' e 'agendas', com o (id, (inicio, duracao, horarios)) de veterinários.
+        prefixo (str): Prefixo dos e-mails criados, diferente a cada execução.
+        primeiro_dia (date): Primeiro dia usado para marcar consultas; os dias seguintes são usados conforme a necessidade.
+        tamanho_lote (int): Registros por requisição nas rotas de cadastro em lote.
+    """
+    usuario, pet, vet, consulta = (objetos[nome] for nome in ('usuario', 'pet', 'veterinario', 'consulta'))
+    senha = '@Benchmark123'
+    expediente_vet = objetos['expediente']
+    # Numeração única entre todas as execuções de carga feitas com estas rotas (contexto['n'] recomeça a cada uma).
+    numeros = itertools.count()
+
+    def sortear(nome):
+        return lambda contexto: contexto['aleatorio'].choice(amostras[nome])
+
+    def email(tipo):
+        return f"{tipo}{prefixo}n{next(numeros)}@petstore.com"
+
+    def lote(registro):
+        return lambda contexto: [registro(contexto) for _ in range(tamanho_lote)]
+
+    def marcar(contexto):
+        id_veterinario, expediente = contexto['aleatorio'].choice(amostras['agendas'])
+        return {'veterinario': id_veterinario, 'pet': pet['id_pet'],
+                'data_consulta': horario_da_agenda(expediente, primeiro_dia, next(numeros))}
+
+    novo_usuario = lambda contexto: {'nome': 'Benchmark', 'email': email('usuario'), 'senha': senha}
+    novo_pet = lambda contexto: {'nome': 'Benchmark', 'especie': 'Canina', 'idade': 3, 'dono_do_pet': usuario['id_usuario']}
+    # Os pets importados são do usuário do benchmark e saem em cascata quando ele é apagado.
+    csv_pets = lambda contexto: ('nome,especie,idade,dono_do_pet\n' + f"Benchmark,Canina,3,{usuario['id_usuario']}\n" * tamanho_lote).encode()
+    novo_vet = lambda contexto: {'nome': 'Benchmark', 'especialidade': vet['especialidade'], 'email': email('vet'), 'senha': senha}
+    return [
+        Rota('criar_usuarios_lote', 'POST', '/novousuario/lote', lote(novo_usuario), cria='usuario'),
+        Rota('criar_usuario', 'POST', '/novousuario', novo_usuario, cria='usuario'),
+        Rota('info_usuario', 'GET', lambda c: f"/info/{sortear('usuario')(c)}", None),
+        Rota('atualiza_usuario', 'PUT', f"/atualizar/{usuario['id_usuario']}",
+             {'nome': usuario['nome'], 'email': usuario['email'], 'senha': senha}),
+        Rota('deleta_usuario', 'DELETE', lambda c: f"/deletar/{c['id']}", None, consome='usuario'),
+        Rota('criar_pets_lote', 'POST', '/novopet/lote', lote(novo_pet), cria='pet'),
+        Rota('criar_pet', 'POST', '/novopet', novo_pet, cria='pet'),
+        Rota('retorna_pet', 'GET', lambda c: f"/infopet/{sortear('pet')(c)}", None),
+        Rota('atualiza_pet', 'PUT', f"/atualizarpet/{pet['id_pet']}",
+             {campo: pet[campo] for campo in ('nome', 'especie', 'idade', 'dono_do_pet')}),
+        Rota('deleta_pet', 'DELETE', lambda c: f"/deletarpet/{c['id']}", None, consome='pet'),
+        Rota('cadastra_veterinarios_lote', 'POST', '/novovet/lote', lote(novo_vet), cria='veterinario'),
+        Rota('cadastra_veterinario', 'POST', '/novovet', novo_vet, cria='veterinario'),
+        Rota('retorna_veterinario', 'GET', lambda c: f"/buscarvet/{sortear('veterinario')(c)}", None),
+        Rota('atualiza_vet', 'PUT', f"/atualizarvet/{vet['id_veterinario']}",
+             {'nome': vet['nome'], 'especialidade': vet['especialidade'], 'email': vet['email'], 'senha': senha}),
+        Rota('deleta_vet', 'DELETE', lambda c: f"/deletarvet/{c['id']}", None, consome='veterinario'),
+        Rota('marca_consulta', 'POST', f"/criarconsulta/{usuario['id_usuario']}", marcar, cria='consulta'),
+        Rota('retorna_consulta', 'GET', lambda c: f"/retornaconsulta/{sortear('consulta')(c)}", None),
+        # A consulta do benchmark alterna entre dois horários da agenda do veterinário do benchmark.
+        Rota('define_data_consulta', 'PUT', f"/definirdataconsulta/{consulta['id_consulta']}",
+             lambda c: {'data_consulta': horario_da_agenda(expediente_vet, primeiro_dia, c['n'] % 2)}),
+        Rota('realiza_consulta', 'PUT', f"/realizadaconsulta/{consulta['id_consulta']}",
+             lambda c: {'realizada': c['n'] % 2 == 0}),
+        Rota('deletar_consulta', 'DELETE', lambda c: f"/deletarconsulta/{c['id']}", None, consome='consulta'),
+        Rota('lista_pets', 'GET', lambda c: f"/listarpets?limite=50&apos={sortear('pet')(c)}", None),
+        Rota('lista_veterinarios', 'GET', lambda c: f"/listarvets?limite=50&apos={sortear('veterinario')(c)}", None),
+        Rota('lista_consultas', 'GET', lambda c: f"/listarconsultas?limite=50&veterinario={sortear('veterinario')(c)}", None),
+        Rota('importa_csv', 'POST', '/importar/pets', csv_pets),
+        Rota('exporta_consultas', 'GET', lambda c: f"/exportarconsultas?veterinario={sortear('veterinario')(c)}", None),
+        Rota('proximo_horario', 'GET', lambda c: f"/proximohorario?especialidade={quote(sortear('especialidades')(c))}", None),
+        Rota('schema-swagger-ui', 'GET', '/swagger/?format=openapi', None),
+        Rota('metricas', 'GET', '/metrics', None),
+    ]
+
+
+METRICAS_LATENCIA = ('p50_ms', 'p95_ms', 'p99_ms')
+
+
+def comparar(base, atual, limite=0.2, tolerancia_ms=1.0):
+    """
+    Compara o resultado de uma execução com a linha de base e retorna as regressões.
+
+    Uma latência regrediu quando passou de (1 + limite) vezes a da base por mais de tolerancia_ms,
+    para que variações de décimos de milissegundo em rotas rápidas não sejam apontadas. A vazão
+    regrediu quando caiu abaixo de (1 - limite) vezes a da base, e os erros quando a base não tinha
+    nenhum. Rotas que não estão nas duas execuções são ignoradas.
+
+    Args:
+        base (dict), atual (dict): Resultados de executar_carga.
+
+    Returns:
+        list[str]: Descrição de cada regressão, vazia se não houver nenhuma.
+    """
+    regressoes = []
+    pares = [('total', base['total'], atual['total'])] if 'total' in base and 'total' in atual else []
+    pares += [(nome, resumo, atual['rotas'][nome]) for nome, resumo in base['rotas'].items() if nome in atual['rotas']]
+    for nome, anterior, novo in pares:
+        if not anterior['requisicoes']:
+            continue
+        for metrica in METRICAS_LATENCIA:
+            if novo[metrica] > anterior[metrica] * (1 + limite) and novo[metrica] - anterior[metrica] > tolerancia_ms:
+                regressoes.append(f"{nome}: {metrica} {anterior[metrica]:.2f} -> {novo[metrica]:.2f}")
+        if novo['req_s'] < anterior['req_s'] * (1 - limite):
+            regressoes.append(f"{nome}: req/s {anterior['req_s']:.1f} -> {novo['req_s']:.1f}")
+        if novo['erros'] and not anterior['erros']:
+            regressoes.append(f"{nome}: {novo['erros']} erro(s), a base não tinha nenhum")
+    return regressoes
+
+
+def comando_servidor(nome, porta, workers, threads):
+    """
+    Comando e variáveis de ambiente para subir um dos SERVIDORES em 127.0.0.1:porta.
+
+    Returns:
+        tuple: (comando, ambiente), ou None se o Gunicorn não estiver instalado.
+    """
+    # A medição faz muitas requisições do mesmo cliente, que o limite de requisições recusaria.
+    if nome == 'runserver':
+        return [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'runserver', '--noreload', f'127.0.0.1:{porta}'], {'LIMITES_ATIVOS': 'False'}
+    gunicorn = shutil.which('gunicorn')
+    if gunicorn is None:
+        return None
+    ambiente = {
+        'LIMITES_ATIVOS': 'False',
+        'WEB_BIND': f'127.0.0.1:{porta}',
+        'WEB_WORKERS': str(workers),
+        'WEB_ACCESS_LOG': os.devnull,
+    }
+    if nome == 'gunicorn-gthread':
+        ambiente.update(WEB_WORKER_CLASS='gthread', WEB_THREADS=str(threads))
+    else:
+        ambiente['WEB_WORKER_CLASS'] = 'uvicorn.workers.UvicornWorker'
+    return [gunicorn, '-c', str(settings.BASE_DIR / 'gunicorn.conf.py')], ambiente
+
+
+def aguardar_resposta(porta, caminho, limite):
+    """Espera o servidor responder a uma requisição e retorna o tempo gasto, ou None se passar do limite."""
+    inicio = time.perf_counter()
+    while time.perf_counter() - inicio < limite:
+        conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=1)
+        try:
+            conexao.request('GET', caminho)
+            conexao.getresponse().read()
+            return time.perf_counter() - inicio
+        except (OSError, http.client.HTTPException):
+            time.sleep(0.05)
+        finally:
+            conexao.close()
+    return None
@@ -0,0 +1,198 @@
+"""
+GET condicional nas rotas de leitura por id (ETag, Last-Modified e respostas 304).
+
+A representação de um objeto muda só quando a sua versão (Versionado.versao) muda, então o ETag é a
+versão e o Last-Modified é o atualizado_em. A consulta mostra também os nomes do veterinário e do pet,
+então o ETag dela junta as versões dos três objetos.
+
+Quando o pedido traz If-None-Match ou If-Modified-Since, as versões vêm do cache de objetos ou, numa
+falta, de uma consulta que lê só as colunas de versão; se o cliente já tem a versão atual, a resposta
+é um 304, sem buscar o objeto inteiro nem gerar o JSON.
+
+Nas rotas de atualização o If-Match faz o contrário: o UPDATE só altera a linha se a versão ainda for
+a que o cliente leu (versao IN (...) na própria condição do UPDATE, uma comparação-e-troca). Se outra
+edição chegou antes, nada é gravado e a resposta é um 412, sem travar a linha entre a leitura e a escrita.
+"""
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, parse_etags, patch_cache_control
+from django.utils.http import http_date
+
+from .cache import chave_objeto, objeto_do_cache
+from .instrumentacao import registrar_cache
+from .models import Consulta, Pet, Veterinario
+from .respostas import JsonResponse
+
+CAMPOS_VERSAO = ('versao', 'atualizado_em')
+
+
+def versao(objeto):
+    """(versao, atualizado_em) de um objeto lido do cache ou com .values()."""
+    return objeto['versao'], objeto['atualizado_em']
+
+
+def sem_versao(objeto):
+    """Os campos de um objeto lido com .values() sem os de CAMPOS_VERSAO, que vão só nos cabeçalhos."""
+    return {campo: valor for campo, valor in objeto.items() if campo not in CAMPOS_VERSAO}
+
+
+def validadores(versoes):
+    """ETag forte e Last-Modified (timestamp em segundos) de uma representação feita dos objetos com estas versões."""
+    etag = '"' + '.'.join(str(numero) for numero, _ in versoes) + '"'
+    return etag, int(max(atualizado_em for _, atualizado_em in versoes).timestamp())
+
+
+def condicional(request):
+    """Indica se o pedido traz alguma condição que pode ser respondida com 304."""
+    return 'HTTP_IF_NONE_MATCH' in request.META or 'HTTP_IF_MODIFIED_SINCE' in request.META
+
+
+def com_validadores(response, versoes):
+    """
+    Acrescenta à resposta os cabeçalhos ETag e Last-Modified. Cache-Control: no-cache faz o cliente
+    revalidar a cada uso, em vez de reaproveitar a resposta por uma validade estimada.
+    """
+    etag, ultima_alteracao = validadores(versoes)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(ultima_alteracao)
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def _resposta(request, versoes):
+    if versoes is None:
+        return None
+    etag, ultima_alteracao = validadores(versoes)
+    response = get_conditional_response(request, etag=etag, last_modified=ultima_alteracao)
+    return com_validadores(response, versoes) if response is not None else None
+
+
+def _versoes_objeto(objeto, modelo, pk):
+    registrar_cache(objeto is not None)
+    if objeto is not None:
+        return [versao(objeto)]
+    encontrada = modelo.objects.filter(pk=pk).values_list(*CAMPOS_VERSAO).first()
+    return [encontrada] if encontrada is not None else None
+
+
+def nao_modificado(request, modelo, pk):
+    """
+    Resposta 304 se o cliente já tem a versão atual do objeto, ou None: o pedido não é condicional,
+    o objeto mudou ou não existe (a view segue e responde 200 ou 404).
+    """
+    if not condicional(request):
+        return None
+    return _resposta(request, _versoes_objeto(objeto_do_cache(cache.get(chave_objeto(modelo, pk))), modelo, pk))
+
+
+async def anao_modificado(request, modelo, pk):
+    """Versão assíncrona de nao_modificado."""
+    if not condicional(request):
+        return None
+    objeto = objeto_do_cache(await cache.aget(chave_objeto(modelo, pk)))
+    if objeto is None:
+        registrar_cache(False)
+        encontrada = await modelo.objects.filter(pk=pk).values_list(*CAMPOS_VERSAO).afirst()
+        return _resposta(request, [encontrada] if encontrada is not None else None)
+    return _resposta(request, _versoes_objeto(objeto, modelo, pk))
+
+
+def _versoes_relacionadas(consulta, objetos):
+    """Versões da consulta, do veterinário e do pet, se os três estiverem no cache."""
+    vet = objeto_do_cache(objetos.get(chave_objeto(Veterinario, consulta['veterinario'])))
+    pet = objeto_do_cache(objetos.get(chave_objeto(Pet, consulta['pet'])))
+    if vet is None or pet is None:
+        return None
+    return [versao(consulta), versao(vet), versao(pet)]
+
+
+def _consulta_das_versoes():
+    return Consulta.objects.values_list(
+        *CAMPOS_VERSAO, *(f'veterinario__{campo}' for campo in CAMPOS_VERSAO), *(f'pet__{campo}' for campo in CAMPOS_VERSAO),
+    )
+
+
+def _em_pares(linha):
+    return [linha[indice:indice + 2] for indice in range(0, len(linha), 2)] if linha is not None else None
+
+
+def consulta_nao_modificada(request, id_consulta):
+    """nao_modificado da consulta, cujo ETag junta as versões da consulta, do veterinário e do pet."""
+    if not condicional(request):
+        return None
+    consulta = objeto_do_cache(cache.get(chave_objeto(Consulta, id_consulta)))
+    versoes = None
+    if consulta is not None:
+        versoes = _versoes_relacionadas(consulta, cache.get_many([
+            chave_objeto(Veterinario, consulta['veterinario']), chave_objeto(Pet, consulta['pet']),
+        ]))
+    registrar_cache(versoes is not None)
+    if versoes is None:
+        versoes = _em_pares(_consulta_das_versoes().filter(pk=id_consulta).first())
+    return _resposta(request, versoes)
+
+
+async def aconsulta_nao_modificada(request, id_consulta):
+    """Versão assíncrona de consulta_nao_modificada."""
+    if not condicional(request):
+        return None
+    consulta = objeto_do_cache(await cache.aget(chave_objeto(Consulta, id_consulta)))
+    versoes = None
+    if consulta is not None:
+        versoes = _versoes_relacionadas(consulta, await cache.aget_many([
+            chave_objeto(Veterinario, consulta['veterinario']), chave_objeto(Pet, consulta['pet']),
+        ]))
+    registrar_cache(versoes is not None)
+    if versoes is None:
+        versoes = _em_pares(await _consulta_das_versoes().filter(pk=id_consulta).afirst())
+    return _resposta(request, versoes)
+
+
+def versoes_esperadas(request):
+    """
+    Versões aceitas pelo If-Match do pedido, ou None se ele não tiver If-Match (ou tiver If-Match: *).
+
+    Vale o primeiro número de cada ETag, então o ETag de retornaconsulta (consulta.veterinário.pet)
+    também serve para atualizar a consulta. ETags fracos (W/"...") nunca passam na comparação forte
+    do If-Match e ETags que não vieram desta API não correspondem a nenhuma versão.
+    """
+    valor = request.headers.get('If-Match')
+    if valor is None:
+        return None
+    etags = parse_etags(valor)
+    if etags == ['*']:
+        return None
+    numeros = (etag.strip('"').split('.')[0] for etag in etags if etag.startswith('"'))
+    return [int(numero) for numero in numeros if numero.isdigit()]
+
+
+def exigir_versao(request, queryset):
+    """Restringe o queryset às versões do If-Match, o que faz da gravação uma comparação-e-troca."""
+    versoes = versoes_esperadas(request)
+    return queryset if versoes is None else queryset.filter(versao__in=versoes)
+
+
+def _conflito(atual):
+    if atual is None:
+        return None
+    response = JsonResponse({
+        'status': 'erro',
+        'mensagem': 'O objeto foi alterado por outra requisição. Busque a versão atual e tente de novo.',
+    }, status=412)
+    return com_validadores(response, [atual])
+
+
+def conflito(request, modelo, pk):
+    """
+    Resposta 412 quando um UPDATE condicionado ao If-Match não alterou nada porque o objeto existe em
+    outra versão, com o ETag atual. None se o pedido não tinha If-Match ou o objeto não existe (404).
+    """
+    if versoes_esperadas(request) is None:
+        return None
+    return _conflito(modelo.objects.filter(pk=pk).values_list(*CAMPOS_VERSAO).first())
+
+
+async def aconflito(request, modelo, pk):
+    """Versão assíncrona de conflito."""
+    if versoes_esperadas(request) is None:
+        return None
+    return _conflito(await modelo.objects.filter(pk=pk).values_list(*CAMPOS_VERSAO).afirst())
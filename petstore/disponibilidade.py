@@ -0,0 +1,218 @@
+"""
+Índice de horários livres usado na busca do próximo horário disponível por especialidade.
+
+O índice fica no cache e tem duas partes:
+
+- o diretório de veterinários: para cada especialidade, o id e o expediente dos veterinários;
+- a ocupação de uma especialidade num dia: para cada veterinário, um inteiro em que o bit i indica
+  que o i-ésimo horário da agenda (inicio_expediente + i * duracao_consulta) está ocupado.
+
+Com as duas partes no cache, a busca não consulta o banco: cada dia procurado custa uma leitura
+do cache e uma passada pelos veterinários da especialidade, procurando o primeiro bit livre de cada um.
+
+Quando uma consulta é marcada, remarcada ou deletada, apenas a ocupação daquela especialidade naquele
+dia (e do dia antigo, se a consulta mudou de dia) é removida do cache e é refeita com uma consulta ao
+banco na próxima busca. Como no cache de objetos (invalidar_objetos), no commit a chave recebe uma
+lápide, e uma busca só guarda a ocupação com cache.add numa chave vazia: uma ocupação lida antes do
+commit não sobrescreve a lápide. A chave leva a versão do diretório com que a ocupação foi montada,
+então criar, alterar ou deletar veterinários invalida todas as ocupações de uma vez.
+
+O índice é só uma indicação: a reserva continua sendo verificada pela agenda (agenda.py).
+"""
+import uuid
+from datetime import datetime, time, timedelta
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .cache import LAPIDE, buscar_objeto, tempo_da_lapide
+from .instrumentacao import registrar_cache
+from .models import Veterinario, Consulta
+
+CHAVE_DIRETORIO = 'petstore.agenda:veterinarios'
+
+
+def chave_ocupacao(especialidade, dia, versao):
+    """
+    Chave de cache da ocupação de uma especialidade num dia, montada com a versão "versao" do diretório,
+    no formato "petstore.agenda:Cardiologista:2030-01-10:<versao>".
+    """
+    return f"petstore.agenda:{quote(especialidade)}:{dia.isoformat()}:{versao}"
+
+
+def _dia(horario):
+    """Dia (no fuso de TIME_ZONE) de um horário, que pode ser a string atribuída a um modelo antes do save()."""
+    if isinstance(horario, str):
+        horario = parse_datetime(horario)
+    if timezone.is_naive(horario):
+        horario = timezone.make_aware(horario)
+    return timezone.localdate(horario)
+
+
+def _minutos(horario):
+    return horario.hour * 60 + horario.minute
+
+
+def diretorio():
+    """
+    Retorna o diretório de veterinários, lido do cache:
+    {'versao': str, 'especialidades': {especialidade: ((id, inicio, duracao, mascara), ...)}, 'especialidade': {id: especialidade}}.
+
+    O início do expediente e a duração ficam em minutos e a máscara tem um bit para cada horário do dia,
+    para que a busca trabalhe só com inteiros.
+    """
+    veterinarios = cache.get(CHAVE_DIRETORIO)
+    registrar_cache(veterinarios is not None)
+    if veterinarios is None:
+        especialidades = {}
+        linhas = Veterinario.objects.order_by('id_veterinario').values_list(
+            'especialidade', 'id_veterinario', 'inicio_expediente', 'fim_expediente', 'duracao_consulta',
+        )
+        for especialidade, id_veterinario, inicio, fim, duracao in linhas:
+            horarios = (_minutos(fim) - _minutos(inicio)) // duracao
+            especialidades.setdefault(especialidade, []).append((id_veterinario, _minutos(inicio), duracao, (1 << horarios) - 1))
+        veterinarios = {
+            'versao': uuid.uuid4().hex,
+            'especialidades': {especialidade: tuple(vets) for especialidade, vets in especialidades.items()},
+            'especialidade': {vet[0]: especialidade for especialidade, vets in especialidades.items() for vet in vets},
+        }
+        cache.set(CHAVE_DIRETORIO, veterinarios, settings.CACHE_OBJETOS_TIMEOUT)
+    return veterinarios
+
+
+def invalidar_diretorio():
+    """Remove o diretório de veterinários do cache, após criar, alterar ou deletar veterinários."""
+    cache.delete(CHAVE_DIRETORIO)
+    transaction.on_commit(lambda: cache.delete(CHAVE_DIRETORIO))
+
+
+def invalidar_ocupacao(id_veterinario, horarios):
+    """
+    Remove do cache a ocupação dos dias afetados por consultas marcadas, remarcadas ou deletadas.
+
+    A especialidade do veterinário vem do diretório em cache. Sem o diretório não há o que remover:
+    o próximo diretório terá outra versão e as ocupações antigas serão descartadas.
+
+    Args:
+        id_veterinario (int): Id do veterinário.
+        horarios (Iterable[datetime]): Horários (antigos e novos) das consultas alteradas. None é ignorado.
+    """
+    dias = {_dia(horario) for horario in horarios if horario is not None}
+    if not dias:
+        return
+
+    veterinarios = cache.get(CHAVE_DIRETORIO)
+    especialidade = veterinarios and veterinarios['especialidade'].get(id_veterinario)
+    if especialidade is None:
+        return
+    chaves = [chave_ocupacao(especialidade, dia, veterinarios['versao']) for dia in dias]
+    cache.delete_many(chaves)
+    transaction.on_commit(lambda: cache.set_many(dict.fromkeys(chaves, LAPIDE), tempo_da_lapide()))
+
+
+def _calcular_ocupacao(veterinarios, dia, fuso):
+    """Monta a ocupação do dia dos veterinários com uma única consulta ao banco."""
+    meia_noite = datetime.combine(dia, time.min, tzinfo=fuso)
+    expedientes = {vet[0]: vet for vet in veterinarios}
+    linhas = Consulta.objects.filter(
+        veterinario__in=list(expedientes),
+        data_consulta__gte=meia_noite,
+        data_consulta__lt=meia_noite + timedelta(days=1),
+    ).values_list('veterinario', 'data_consulta')
+
+    ocupacao = dict.fromkeys(expedientes, 0)
+    for id_veterinario, data_consulta in linhas:
+        _, inicio, duracao, mascara = expedientes[id_veterinario]
+        deslocamento = (data_consulta - meia_noite) / timedelta(minutes=1) - inicio
+        # Uma consulta fora do alinhamento (marcada antes de uma mudança no expediente) ocupa
+        # os dois horários com que se sobrepõe.
+        primeiro = int(deslocamento // duracao)
+        ultimo = primeiro if not deslocamento % duracao else primeiro + 1
+        for indice in range(max(primeiro, 0), ultimo + 1):
+            ocupacao[id_veterinario] |= 1 << indice
+        ocupacao[id_veterinario] &= mascara
+    return ocupacao
+
+
+def ocupacao_do_dia(especialidade, veterinarios, versao, dia, fuso):
+    """
+    Retorna a ocupação do dia dos veterinários de uma especialidade, lida do cache ou refeita do banco.
+    A ocupação refeita não é guardada se a chave tiver uma lápide (ver invalidar_ocupacao).
+
+    Returns:
+        dict: {id: inteiro com um bit por horário ocupado}.
+    """
+    chave = chave_ocupacao(especialidade, dia, versao)
+    valor = cache.get(chave)
+    registrar_cache(valor is not None and valor != LAPIDE)
+    if valor is not None and valor != LAPIDE:
+        return valor
+    ocupacao = _calcular_ocupacao(veterinarios, dia, fuso)
+    if valor is None:
+        cache.add(chave, ocupacao, settings.CACHE_OBJETOS_TIMEOUT)
+    return ocupacao
+
+
+def proximo_horario(especialidade, a_partir_de=None, dias=None):
+    """
+    Procura o primeiro horário livre entre os veterinários de uma especialidade.
+
+    Args:
+        especialidade (str): Especialidade dos veterinários, como gravada no cadastro.
+        a_partir_de (datetime): Horário mínimo, com fuso. Por padrão, agora.
+        dias (int): Dias procurados a partir de a_partir_de. Por padrão, AGENDA_DIAS_BUSCA.
+
+    Returns:
+        tuple: (id_veterinario, horário) do horário livre mais cedo, com empate decidido pelo menor id,
+        ou None se não houver horário livre no período.
+    """
+    veterinarios = diretorio()
+    grupo = veterinarios['especialidades'].get(especialidade)
+    if not grupo:
+        return None
+    fuso = timezone.get_current_timezone()
+    a_partir_de = (a_partir_de or timezone.now()).astimezone(fuso)
+    primeiro_dia = a_partir_de.date()
+    # Minutos do dia a partir dos quais os horários ainda não começaram (arredondando para cima).
+    agora = -((a_partir_de - datetime.combine(primeiro_dia, time.min, tzinfo=fuso)) // -timedelta(minutes=1))
+
+    for numero in range(dias or settings.AGENDA_DIAS_BUSCA):
+        dia = primeiro_dia + timedelta(days=numero)
+        ocupacao = ocupacao_do_dia(especialidade, grupo, veterinarios['versao'], dia, fuso)
+        melhor = None
+        for id_veterinario, inicio, duracao, mascara in grupo:
+            livres = ~ocupacao.get(id_veterinario, 0) & mascara
+            if numero == 0 and agora > inicio:
+                livres &= -1 << -((inicio - agora) // duracao)
+            if livres:
+                minuto = inicio + ((livres & -livres).bit_length() - 1) * duracao
+                if melhor is None or (minuto, id_veterinario) < melhor:
+                    melhor = (minuto, id_veterinario)
+        if melhor is not None:
+            return melhor[1], datetime.combine(dia, time.min, tzinfo=fuso) + timedelta(minutes=melhor[0])
+    return None
+
+
+def proximo_veterinario_livre(especialidade, a_partir_de=None):
+    """
+    Procura o primeiro horário livre (proximo_horario) e lê o veterinário dele do cache de objetos.
+
+    Um veterinário apagado depois de o diretório ter sido lido não é encontrado: o diretório é removido
+    e a busca é refeita uma vez, com o diretório lido de novo do banco.
+
+    Returns:
+        tuple: (veterinário, como em buscar_objeto, horário), ou None se não houver horário livre.
+    """
+    for tentativa in range(2):
+        encontrado = proximo_horario(especialidade, a_partir_de)
+        if encontrado is None:
+            return None
+        vet = buscar_objeto(Veterinario, encontrado[0])
+        if vet is not None:
+            return vet, encontrado[1]
+        invalidar_diretorio()
+    return None
@@ -0,0 +1,292 @@
+"""
+Validação declarativa dos corpos JSON das requisições.
+
+Cada rota declara um Esquema com os seus campos (tipo e regras) e o esquema é compilado uma única vez, na
+importação do módulo, numa tupla de funções de verificação; validar um registro é só chamar essas funções.
+As regras de texto usam conjuntos (str.isdisjoint, feito em C) e expressões regulares compiladas em vez de
+percorrer a string caractere a caractere, e um e-mail válido passa por uma única expressão regular: as
+regras uma a uma só são avaliadas para achar a mensagem de um e-mail inválido.
+
+Esquema.validar_lote valida milhares de registros numa chamada, nos cadastros em lote.
+"""
+import json
+import re
+
+from .models import Usuario, Pet, Veterinario
+
+# Regras de validar_email e validar_senha. importacao.py usa as mesmas em SQL.
+CARACTERES_PROIBIDOS_EMAIL = "&='-+,<>~!$%^*}{?¨|/'\\][;"
+PADRAO_EMAIL = r'^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z.-]{3,}$'
+ESPECIAIS_SENHA = '!@#$%&*-+()<>|\\=-'
+MAIUSCULAS_SENHA = 'ABCDEFGHIKLMNOPQRSTUVWXYZÇ'
+
+_PROIBIDOS_EMAIL = frozenset(CARACTERES_PROIBIDOS_EMAIL)
+_PADRAO_EMAIL = re.compile(PADRAO_EMAIL)
+# Aceita exatamente os e-mails que passam em todas as regras de validar_email: PADRAO_EMAIL sem os
+# caracteres proibidos, sem ".." e com ao menos 3 caracteres antes do @ (o tamanho é verificado à parte).
+# Como em re.match com $, uma quebra de linha no final é aceita.
+_EMAIL_VALIDO = re.compile(r'(?!.*\.\.)[a-zA-Z0-9_.]{3,}@[a-zA-Z0-9]+\.[a-zA-Z.]{3,}\n?\Z')
+_ESPECIAIS_SENHA = frozenset(ESPECIAIS_SENHA)
+_MAIUSCULAS_SENHA = frozenset(MAIUSCULAS_SENHA)
+_MINUSCULAS_SENHA = frozenset(MAIUSCULAS_SENHA.lower())
+
+
+def validar_email(email):
+    """
+    Valida o formato de um endereço de e-mail de acordo com regras específicas:
+    - Não pode conter caracteres especiais não permitidos.
+    - Não pode conter espaços ou dois pontos consecutivos.
+    - O domínio deve conter pelo menos um ponto.
+    - O comprimento máximo é de 64 caracteres.
+    - A parte local antes do "@" deve ter pelo menos 3 caracteres.
+
+    Args:
+        email (str): O endereço de e-mail a ser validado.
+
+    Returns:
+        str: Mensagem de erro se o e-mail não for válido, caso contrário, retorna None.
+    """
+    if len(email) <= 64 and _EMAIL_VALIDO.match(email):
+        return None
+    if not _PROIBIDOS_EMAIL.isdisjoint(email):
+        return "Caractere nao permitido na composicao do email."
+    if ".." in email:
+        return "Um email nao pode ter dois pontos consecutivos em sua composicao."
+    if " " in email:
+        return "Espacos vazios nao sao permitidos na composicao do email."
+    arroba = email.find("@")
+    if arroba < 0:
+        return "@ é obrigatorio no email."
+    if arroba < 3:
+        return "O numero de caracteres deve ser no minimo que 3 antes do @."
+    if len(email) > 64:
+        return "O email deve ter no maximo 64 caracteres."
+    if "." not in email[arroba + 1:]:
+        return "Domínio inválido na composicao do email. Ele deve conter pelo menos 1 ponto."
+    return "Padrão de email incorreto."
+
+
+def validar_senha(senha):
+    """
+    Valida a senha fornecida de acordo com os seguintes critérios:
+    - Deve ter pelo menos 7 caracteres e no máximo 200.
+    - Deve conter pelo menos um caractere especial, uma letra maiúscula e uma letra minúscula.
+
+    Args:
+        senha (str): A senha a ser validada.
+
+    Returns:
+        str: Mensagem de erro se a senha não for válida, caso contrário, retorna None.
+    """
+    if len(senha) <= 6:
+        return "Sua senha deve conter no mínimo 7 caracteres."
+    if len(senha) > 200:
+        return "Sua senha deve conter no máximo 200 caracteres."
+    if _ESPECIAIS_SENHA.isdisjoint(senha) or _MAIUSCULAS_SENHA.isdisjoint(senha) or _MINUSCULAS_SENHA.isdisjoint(senha):
+        return "Sua senha deve conter caracteres especiais, maiúsculas e minúsculas."
+    return None
+
+
+class DadosInvalidos(ValueError):
+    """Erro lançado quando o corpo da requisição não passa no esquema. A mensagem é a do primeiro erro encontrado."""
+
+
+class Campo:
+    """
+    Campo de um esquema.
+
+    Args:
+        mensagem (str): Erro quando o campo falta, é null ou tem outro tipo. Por padrão, uma mensagem com o nome do campo.
+        obrigatorio (bool): Se False, o campo pode faltar ou ser null.
+        regras (Iterable): Funções valor -> mensagem de erro ou None, aplicadas em ordem depois do tipo.
+    """
+    tipos = ()
+    mensagem_padrao = "O campo {nome} é obrigatório."
+
+    def __init__(self, mensagem=None, obrigatorio=True, regras=()):
+        self.mensagem = mensagem
+        self.obrigatorio = obrigatorio
+        self.regras = tuple(regras)
+
+    def regras_do_campo(self, nome):
+        """Regras aplicadas depois do tipo. As subclasses acrescentam as que dependem do nome do campo."""
+        return self.regras
+
+    def compilar(self, nome):
+        """
+        Verificações do campo com as configurações já resolvidas.
+
+        Returns:
+            tuple: (função valor -> mensagem de erro ou None que confere presença e tipo, regras do campo).
+        """
+        tipos, obrigatorio = self.tipos, self.obrigatorio
+        mensagem = self.mensagem or self.mensagem_padrao.format(nome=nome)
+
+        def verificar_tipo(valor):
+            if valor is None:
+                return mensagem if obrigatorio else None
+            # type() e não isinstance(): True não é aceito como inteiro.
+            return mensagem if type(valor) not in tipos else None
+        return verificar_tipo, self.regras_do_campo(nome)
+
+
+class Texto(Campo):
+    """Campo de texto. max_length limita o tamanho, como o do campo do modelo."""
+    tipos = (str,)
+    mensagem_padrao = "O campo {nome} deve ser preenchido com texto."
+
+    def __init__(self, mensagem=None, obrigatorio=True, regras=(), max_length=None):
+        super().__init__(mensagem, obrigatorio, regras)
+        self.max_length = max_length
+
+    def regras_do_campo(self, nome):
+        if self.max_length is None:
+            return self.regras
+        maximo, erro = self.max_length, f"O campo {nome} deve ter no máximo {self.max_length} caracteres."
+        return (lambda valor: erro if len(valor) > maximo else None, *self.regras)
+
+
+class Inteiro(Campo):
+    """Campo inteiro. Com minimo, valores menores são recusados com mensagem_minimo."""
+    tipos = (int,)
+    mensagem_padrao = "O campo {nome} deve ser um número inteiro."
+
+    def __init__(self, mensagem=None, obrigatorio=True, minimo=None, mensagem_minimo=None):
+        super().__init__(mensagem, obrigatorio)
+        self.minimo = minimo
+        self.mensagem_minimo = mensagem_minimo
+
+    def regras_do_campo(self, nome):
+        if self.minimo is None:
+            return self.regras
+        minimo, erro = self.minimo, self.mensagem_minimo or f"O campo {nome} deve ser no mínimo {self.minimo}."
+        return (lambda valor: erro if valor < minimo else None, *self.regras)
+
+
+class Booleano(Campo):
+    tipos = (bool,)
+    mensagem_padrao = "O campo {nome} deve ser true ou false."
+
+
+class Email(Texto):
+    def __init__(self, mensagem=None, obrigatorio=True):
+        super().__init__(mensagem, obrigatorio, (validar_email,))
+
+
+class Senha(Texto):
+    def __init__(self, mensagem=None, obrigatorio=True):
+        super().__init__(mensagem, obrigatorio, (validar_senha,))
+
+
+class Esquema:
+    """
+    Campos esperados num objeto JSON, compilados na criação do esquema.
+
+    Como na importação de CSV, primeiro são conferidos presença e tipo de todos os campos e só depois as
+    regras, na ordem em que os campos são declarados.
+
+    Args:
+        **campos (Campo): Campos do objeto.
+    """
+    mensagem_objeto = "O corpo da requisição deve ser um objeto JSON."
+
+    def __init__(self, **campos):
+        self.campos = tuple(campos)
+        compilados = [(nome, *campo.compilar(nome)) for nome, campo in campos.items()]
+        self._tipos = tuple((nome, verificar_tipo) for nome, verificar_tipo, _ in compilados)
+        self._regras = tuple((nome, regra) for nome, _, regras in compilados for regra in regras)
+
+    def validar(self, dados):
+        """Mensagem do primeiro erro de um dict, ou None se ele for válido."""
+        if type(dados) is not dict:
+            return self.mensagem_objeto
+        for nome, verificar_tipo in self._tipos:
+            erro = verificar_tipo(dados.get(nome))
+            if erro:
+                return erro
+        for nome, regra in self._regras:
+            valor = dados.get(nome)
+            if valor is not None:
+                erro = regra(valor)
+                if erro:
+                    return erro
+        return None
+
+    def ler(self, request):
+        """
+        Lê o corpo JSON da requisição e o valida.
+
+        Returns:
+            dict: Os campos do esquema; os opcionais ausentes ficam com None.
+
+        Raises:
+            DadosInvalidos: Se o corpo não for JSON ou não passar no esquema.
+        """
+        try:
+            dados = json.loads(request.body)
+        except ValueError:
+            raise DadosInvalidos("O corpo da requisição não é um JSON válido.")
+        erro = self.validar(dados)
+        if erro:
+            raise DadosInvalidos(erro)
+        return {nome: dados.get(nome) for nome in self.campos}
+
+    def validar_lote(self, registros, erros):
+        """
+        Valida os registros de um lote numa única chamada, com as verificações já compiladas.
+
+        Args:
+            registros (list): Lista de (indice, dict), como a de lotes.ler_registros.
+            erros (list): Lista onde os erros dos registros inválidos são acrescentados.
+
+        Returns:
+            list: Os (indice, dict) válidos, na ordem do lote.
+        """
+        validar = self.validar
+        validos = []
+        for indice, registro in registros:
+            erro = validar(registro)
+            if erro:
+                erros.append({'indice': indice, 'erro': erro})
+            else:
+                validos.append((indice, registro))
+        return validos
+
+
+def _tamanho(modelo, campo):
+    return modelo._meta.get_field(campo).max_length
+
+
+def _cadastro(modelo, *campos_texto):
+    """
+    Esquema de usuário ou veterinário. Um campo ausente ou que não seja texto tem a mesma mensagem para
+    todos os campos e as regras seguem a ordem da importação de CSV: e-mail, senha e tamanho dos textos.
+    """
+    mensagem = f"Os campos {', '.join((*campos_texto, 'email', 'senha'))} devem ser preenchidos com texto."
+    return Esquema(
+        email=Email(mensagem),
+        senha=Senha(mensagem),
+        **{campo: Texto(mensagem, max_length=_tamanho(modelo, campo)) for campo in campos_texto},
+    )
+
+
+ESQUEMA_USUARIO = _cadastro(Usuario, 'nome')
+ESQUEMA_VETERINARIO = _cadastro(Veterinario, 'nome', 'especialidade')
+ESQUEMA_PET = Esquema(
+    nome=Texto("O nome e especie precisam ser inseridos corretamente.", max_length=_tamanho(Pet, 'nome')),
+    especie=Texto("O nome e especie precisam ser inseridos corretamente.", max_length=_tamanho(Pet, 'especie')),
+    idade=Inteiro("Idade precisa ser um número inteiro.", minimo=0,
+                  mensagem_minimo="O campo idade não pode ser preenchido com inteiros negativos."),
+    dono_do_pet=Inteiro("O campo dono_do_pet deve ser o id de um usuário."),
+)
+ESQUEMA_MARCA_CONSULTA = Esquema(
+    pet=Inteiro("O campo pet deve ser o id de um pet."),
+    veterinario=Inteiro("O campo veterinario deve ser o id de um veterinário."),
+    data_consulta=Texto("Será aceito apenas datas: Ano, mês, dia, com horas e minutos.", obrigatorio=False),
+)
+ESQUEMA_DATA_CONSULTA = Esquema(
+    data_consulta=Texto("Será aceito apenas datas: Ano, mês, dia, com horas e minutos."),
+)
+ESQUEMA_REALIZADA = Esquema(
+    realizada=Booleano("Esse tipo não é aceito no campo: realizada."),
+)
@@ -0,0 +1,176 @@
+"""
+Exportação de consultas em CSV ou NDJSON, enviada em streaming.
+
+As linhas são lidas do banco em blocos de EXPORTACAO_LOTE: no PostgreSQL com um cursor no servidor
+(QuerySet.iterator), então a memória usada não depende do tamanho da tabela. Com
+DISABLE_SERVER_SIDE_CURSORS (DB_POOLER, já que o PgBouncer em modo transaction não mantém cursores
+entre transações) o psycopg2 traria o resultado inteiro para a memória, então os blocos são lidos por
+keyset (id_consulta > último id lido), uma consulta por bloco.
+
+Cada bloco vira um pedaço da resposta, comprimido com gzip na hora quando o cliente aceita.
+"""
+import csv
+import io
+import itertools
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+
+from .models import Consulta
+from .respostas import renderizar
+
+CAMPOS = (
+    'id_consulta', 'data_consulta', 'realizada',
+    'veterinario', 'veterinario__nome', 'veterinario__especialidade',
+    'pet', 'pet__nome', 'pet__especie',
+    'pet__dono_do_pet', 'pet__dono_do_pet__nome',
+)
+# Nomes das colunas no CSV e das chaves no NDJSON.
+COLUNAS = (
+    'id_consulta', 'data_consulta', 'realizada',
+    'id_veterinario', 'veterinario', 'especialidade',
+    'id_pet', 'pet', 'especie',
+    'id_dono', 'dono',
+)
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def consultas_para_exportar(veterinario=None, data_inicio=None, data_fim=None):
+    """Consultas filtradas, com os nomes do veterinário, do pet e do dono, em ordem de id."""
+    filtros = {
+        'veterinario': veterinario,
+        'data_consulta__gte': data_inicio,
+        'data_consulta__lt': data_fim,
+    }
+    return (
+        Consulta.objects.filter(**{campo: valor for campo, valor in filtros.items() if valor is not None})
+        .order_by('id_consulta').values_list(*CAMPOS)
+    )
+
+
+def _por_keyset(queryset):
+    """Indica se os blocos devem ser lidos por keyset, por não haver cursores no servidor."""
+    conexao = connections[queryset.db]
+    return conexao.vendor == 'postgresql' and bool(conexao.settings_dict.get('DISABLE_SERVER_SIDE_CURSORS'))
+
+
+def _proximo_bloco(linhas, lote):
+    return list(itertools.islice(linhas, lote))
+
+
+def blocos(queryset, lote):
+    """Lê as linhas do queryset (ordenado por id_consulta) em listas de até "lote" linhas."""
+    if _por_keyset(queryset):
+        ultimo = None
+        while True:
+            bloco = list((queryset if ultimo is None else queryset.filter(id_consulta__gt=ultimo))[:lote])
+            if not bloco:
+                return
+            yield bloco
+            ultimo = bloco[-1][0]
+    linhas = queryset.iterator(chunk_size=lote)
+    while bloco := _proximo_bloco(linhas, lote):
+        yield bloco
+
+
+async def ablocos(queryset, lote):
+    """
+    Versão assíncrona de blocos. Cada bloco é lido em sync_to_async, sempre na mesma thread, que mantém
+    o cursor aberto. (QuerySet.aiterator não serve: no Django 4.2 ele executa o SQL de um values_list
+    fora dessa thread.)
+    """
+    if _por_keyset(queryset):
+        ultimo = None
+        while True:
+            pagina = queryset if ultimo is None else queryset.filter(id_consulta__gt=ultimo)
+            bloco = await sync_to_async(list)(pagina[:lote])
+            if not bloco:
+                return
+            yield bloco
+            ultimo = bloco[-1][0]
+    linhas = queryset.iterator(chunk_size=lote)
+    while bloco := await sync_to_async(_proximo_bloco)(linhas, lote):
+        yield bloco
+
+
+def _csv(linhas):
+    saida = io.StringIO()
+    csv.writer(saida).writerows(linhas)
+    return saida.getvalue().encode()
+
+
+def _linhas_csv(bloco):
+    for id_consulta, data, realizada, *resto in bloco:
+        yield (id_consulta, data.isoformat() if data else '', 'true' if realizada else 'false', *resto)
+
+
+def _ndjson(linhas):
+    return b''.join(renderizar(dict(zip(COLUNAS, linha))) + b'\n' for linha in linhas)
+
+
+def cabecalho(formato):
+    """Primeiro pedaço da exportação: a linha de cabeçalho no CSV, nada no NDJSON."""
+    return _csv([COLUNAS]) if formato == 'csv' else b''
+
+
+def formatar(bloco, formato):
+    """Texto de um bloco de linhas no formato pedido."""
+    return _csv(_linhas_csv(bloco)) if formato == 'csv' else _ndjson(bloco)
+
+
+class _Compressor:
+    """Comprime os pedaços da resposta em gzip à medida que são gerados. Sem gzip, devolve-os como estão."""
+    def __init__(self, gzip):
+        self.compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if gzip else None
+
+    def parte(self, dados):
+        return self.compressor.compress(dados) if self.compressor else dados
+
+    def fim(self):
+        return self.compressor.flush() if self.compressor else b''
+
+
+def gerar(queryset, formato, gzip, lote):
+    compressor = _Compressor(gzip)
+    yield compressor.parte(cabecalho(formato))
+    for bloco in blocos(queryset, lote):
+        if parte := compressor.parte(formatar(bloco, formato)):
+            yield parte
+    yield compressor.fim()
+
+
+async def agerar(queryset, formato, gzip, lote):
+    compressor = _Compressor(gzip)
+    yield compressor.parte(cabecalho(formato))
+    async for bloco in ablocos(queryset, lote):
+        if parte := compressor.parte(formatar(bloco, formato)):
+            yield parte
+    yield compressor.fim()
+
+
+def aceita_gzip(request):
+    return 'gzip' in request.headers.get('Accept-Encoding', '')
+
+
+def resposta_exportacao(request, queryset, formato, assincrona=False):
+    """
+    StreamingHttpResponse com a exportação. Sob ASGI use assincrona=True: o Django carregaria na
+    memória um iterador síncrono inteiro antes de enviá-lo.
+    """
+    gzip = aceita_gzip(request)
+    gerador = agerar if assincrona else gerar
+    response = StreamingHttpResponse(
+        gerador(queryset, formato, gzip, settings.EXPORTACAO_LOTE), content_type=FORMATOS[formato],
+    )
+    response['Content-Disposition'] = f'attachment; filename="consultas.{formato}"'
+    if gzip:
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, PBKDF2PasswordHasher, ScryptPasswordHasher
+
+# Hashers com parâmetros de custo lidos das configurações (SENHA_* em setup/settings.py).
+# O nome do algoritmo é o mesmo do hasher original do Django e os parâmetros ficam gravados
+# no próprio hash, então senhas geradas com outros parâmetros continuam sendo verificadas.
+
+
+class Argon2Configuravel(Argon2PasswordHasher):
+    time_cost = settings.SENHA_ARGON2_TEMPO
+    memory_cost = settings.SENHA_ARGON2_MEMORIA
+    parallelism = settings.SENHA_ARGON2_PARALELISMO
+
+
+class ScryptConfiguravel(ScryptPasswordHasher):
+    work_factor = settings.SENHA_SCRYPT_N
+    block_size = settings.SENHA_SCRYPT_R
+    parallelism = settings.SENHA_SCRYPT_P
+
+
+class PBKDF2Configuravel(PBKDF2PasswordHasher):
+    iterations = settings.SENHA_PBKDF2_ITERACOES
+
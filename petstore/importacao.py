@@ -0,0 +1,358 @@
+"""
+Importação de usuários, veterinários e pets a partir de arquivos CSV.
+
+Cada arquivo é carregado numa tabela temporária de preparação (importacao_<tipo>): no PostgreSQL com
+COPY ... FROM STDIN, lendo o arquivo aos poucos, e nos outros bancos com INSERTs em lotes. A validação
+é feita por comandos UPDATE sobre a tabela inteira, que gravam na coluna "erro" de cada linha a mesma
+mensagem que validar_email, validar_senha e os cadastros em lote dão hoje. As linhas sem erro são
+copiadas para as tabelas da aplicação com INSERT ... SELECT, tudo na mesma transação: ou o arquivo é
+importado inteiro (menos as linhas recusadas) ou nada muda.
+
+O hash das senhas continua sendo calculado em Python, no pool de processos (gerar_hashes), e é o que
+limita a vazão dos arquivos de usuários e veterinários. Os pets são importados na velocidade do banco.
+"""
+import csv
+
+from django.conf import settings
+from django.db import DataError, connection, transaction
+
+from .disponibilidade import invalidar_diretorio
+from .esquemas import CARACTERES_PROIBIDOS_EMAIL, ESPECIAIS_SENHA, MAIUSCULAS_SENHA, PADRAO_EMAIL
+from .models import Usuario, Pet, Veterinario
+from .sementes import campos_com_padrao, copiar_de_stdin, copiar_linhas
+from .senhas import gerar_hashes
+
+# Colunas aceitas no cabeçalho de cada tipo de arquivo, na ordem em que os tipos são importados:
+# os pets podem ser de donos importados no mesmo comando. O dono do pet é o id (dono_do_pet) ou o
+# e-mail (email_dono) de um usuário; os demais campos são obrigatórios.
+COLUNAS = {
+    'usuarios': ('nome', 'email', 'senha'),
+    'veterinarios': ('nome', 'especialidade', 'email', 'senha'),
+    'pets': ('nome', 'especie', 'idade', 'dono_do_pet', 'email_dono'),
+}
+COLUNAS_DONO = ('dono_do_pet', 'email_dono')
+
+
+
+class ArquivoInvalido(ValueError):
+    """Erro lançado quando um arquivo não pode ser importado como um todo (cabeçalho, codificação ou formato do CSV)."""
+
+
+def _classe(caracteres):
+    """Classe de expressão regular com os caracteres, escapados com barra invertida."""
+    return '[' + ''.join('\\' + caractere if caractere in '\\]^-[' else caractere for caractere in dict.fromkeys(caracteres)) + ']'
+
+
+def _casa(coluna, padrao):
+    """Condição SQL "a coluna casa com a expressão regular" e o seu parâmetro."""
+    return f"{coluna} {connection.operators['regex'] % '%s'}", [padrao]
+
+
+def _nao_casa(coluna, padrao):
+    condicao, parametros = _casa(coluna, padrao)
+    return f"NOT ({condicao})", parametros
+
+
+def _vazio_ou(condicao_parametros, coluna):
+    condicao, parametros = condicao_parametros
+    return f"COALESCE({coluna}, '') = '' OR {condicao}", parametros
+
+
+def _preenchido_e(condicao_parametros, coluna):
+    condicao, parametros = condicao_parametros
+    return f"COALESCE({coluna}, '') <> '' AND {condicao}", parametros
+
+
+def _vazio(*colunas):
+    return ' OR '.join(f"COALESCE({coluna}, '') = ''" for coluna in colunas), []
+
+
+def _maior_que(coluna, tamanho):
+    return f"LENGTH({coluna}) > %s", [tamanho]
+
+
+# As regras de validar_email e validar_senha (esquemas.py) em expressões regulares que o PostgreSQL
+# (operador ~) e o Python (REGEXP do SQLite) interpretam do mesmo jeito.
+def regras_email(coluna='email'):
+    """Regras de validar_email, na mesma ordem: (condição SQL, parâmetros, mensagem)."""
+    return [
+        (*_casa(coluna, _classe(CARACTERES_PROIBIDOS_EMAIL)), "Caractere nao permitido na composicao do email."),
+        (*_casa(coluna, r'\.\.'), "Um email nao pode ter dois pontos consecutivos em sua composicao."),
+        (*_casa(coluna, ' '), "Espacos vazios nao sao permitidos na composicao do email."),
+        (*_nao_casa(coluna, '@'), "@ é obrigatorio no email."),
+        (*_casa(coluna, '^[^@]{0,2}@'), "O numero de caracteres deve ser no minimo que 3 antes do @."),
+        (*_maior_que(coluna, 64), "O email deve ter no maximo 64 caracteres."),
+        (*_casa(coluna, '^[^@]*@[^.]*$'), "Domínio inválido na composicao do email. Ele deve conter pelo menos 1 ponto."),
+        (*_nao_casa(coluna, PADRAO_EMAIL), "Padrão de email incorreto."),
+    ]
+
+
+def regras_senha(coluna='senha'):
+    """Regras de validar_senha, na mesma ordem: (condição SQL, parâmetros, mensagem)."""
+    especial, maiuscula = _nao_casa(coluna, _classe(ESPECIAIS_SENHA)), _nao_casa(coluna, _classe(MAIUSCULAS_SENHA))
+    minuscula = _nao_casa(coluna, _classe(MAIUSCULAS_SENHA.lower()))
+    return [
+        (f"LENGTH({coluna}) <= 6", [], "Sua senha deve conter no mínimo 7 caracteres."),
+        (*_maior_que(coluna, 200), "Sua senha deve conter no máximo 200 caracteres."),
+        (' OR '.join((especial[0], maiuscula[0], minuscula[0])), especial[1] + maiuscula[1] + minuscula[1],
+         "Sua senha deve conter caracteres especiais, maiúsculas e minúsculas."),
+    ]
+
+
+def _regras_tamanho(modelo, colunas):
+    """O texto das colunas cabe no campo de mesmo nome do modelo."""
+    regras = []
+    for coluna in colunas:
+        tamanho = modelo._meta.get_field(coluna).max_length
+        regras.append((*_maior_que(coluna, tamanho), f"O campo {coluna} deve ter no máximo {tamanho} caracteres."))
+    return regras
+
+
+def _regras_cadastro(modelo, campos_texto):
+    campos = (*campos_texto, 'email', 'senha')
+    return [
+        (*_vazio(*campos), f"Os campos {', '.join(campos)} devem ser preenchidos com texto."),
+        *regras_email(),
+        *regras_senha(),
+        *_regras_tamanho(modelo, campos_texto),
+    ]
+
+
+def _regras_pets():
+    return [
+        (*_vazio('nome', 'especie'), "O nome e especie precisam ser inseridos corretamente."),
+        (*_vazio_ou(_nao_casa('idade', '^-?[0-9]{1,9}$'), 'idade'), "Idade precisa ser um número inteiro."),
+        (*_casa('idade', '^-0*[1-9]'), "O campo idade não pode ser preenchido com inteiros negativos."),
+        ("COALESCE(dono_do_pet, '') = '' AND COALESCE(email_dono, '') = ''", [], "Informe o dono do pet em dono_do_pet (id) ou email_dono."),
+        (*_preenchido_e(_nao_casa('dono_do_pet', '^[0-9]{1,18}$'), 'dono_do_pet'), "O campo dono_do_pet deve ser o id de um usuário."),
+        *_regras_tamanho(Pet, ('nome', 'especie')),
+    ]
+
+
+def ler_cabecalho(arquivo, tipo):
+    """
+    Lê a primeira linha do arquivo e retorna as colunas, na ordem em que aparecem.
+
+    Raises:
+        ArquivoInvalido: Se o cabeçalho estiver vazio, não estiver em UTF-8, tiver colunas desconhecidas
+            ou repetidas ou faltar alguma coluna obrigatória.
+    """
+    try:
+        linha = arquivo.readline().decode('utf-8-sig')
+    except UnicodeDecodeError:
+        raise ArquivoInvalido(f"O arquivo de {tipo} deve estar em UTF-8.")
+    colunas = [coluna.strip() for coluna in next(csv.reader([linha]), [])]
+    if not any(colunas):
+        raise ArquivoInvalido(f"O arquivo de {tipo} está vazio ou não tem cabeçalho.")
+
+    desconhecidas = [coluna for coluna in colunas if coluna not in COLUNAS[tipo]]
+    if desconhecidas:
+        raise ArquivoInvalido(f"Colunas desconhecidas no arquivo de {tipo}: {', '.join(desconhecidas)}.")
+    if len(set(colunas)) != len(colunas):
+        raise ArquivoInvalido(f"Colunas repetidas no arquivo de {tipo}.")
+    obrigatorias = [coluna for coluna in COLUNAS[tipo] if coluna not in COLUNAS_DONO]
+    faltando = [coluna for coluna in obrigatorias if coluna not in colunas]
+    if tipo == 'pets' and not set(COLUNAS_DONO) & set(colunas):
+        faltando.append(' ou '.join(COLUNAS_DONO))
+    if faltando:
+        raise ArquivoInvalido(f"Faltam colunas no arquivo de {tipo}: {', '.join(faltando)}.")
+    return colunas
+
+
+def _criar_tabela(cursor, tabela, colunas):
+    """Cria a tabela temporária com a coluna linha (posição do registro no arquivo), as colunas de texto e erro."""
+    if connection.vendor == 'postgresql':
+        linha = 'linha bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY'
+    else:
+        linha = 'linha integer PRIMARY KEY'
+    cursor.execute(f"CREATE TEMPORARY TABLE {tabela} ({linha}, {', '.join(f'{coluna} text' for coluna in colunas)}, erro text)")
+
+
+def _inserir_em_lotes(cursor, tabela, colunas, linhas, lote):
+    comando = f"INSERT INTO {tabela} ({', '.join(colunas)}) VALUES ({', '.join(['%s'] * len(colunas))})"
+    bloco = []
+    for linha in linhas:
+        bloco.append(linha)
+        if len(bloco) == lote:
+            cursor.executemany(comando, bloco)
+            bloco = []
+    if bloco:
+        cursor.executemany(comando, bloco)
+
+
+def _registros(arquivo, tipo, quantidade):
+    """Registros do CSV lido linha a linha, com a posição de cada um; recusa registros com outra quantidade de campos."""
+    try:
+        leitor = csv.reader(linha.decode('utf-8') for linha in iter(arquivo.readline, b''))
+        posicao = 0
+        for registro in leitor:
+            if not registro:
+                continue
+            posicao += 1
+            if len(registro) != quantidade:
+                raise ArquivoInvalido(f"Linha {leitor.line_num + 1} do arquivo de {tipo}: esperados {quantidade} campos, encontrados {len(registro)}.")
+            yield (posicao, *registro)
+    except UnicodeDecodeError:
+        raise ArquivoInvalido(f"O arquivo de {tipo} deve estar em UTF-8.")
+    except csv.Error as erro:
+        raise ArquivoInvalido(f"O arquivo de {tipo} não é um CSV válido: {erro}.")
+
+
+def _carregar(cursor, tabela, tipo, colunas, arquivo, lote):
+    """Copia os registros do arquivo (depois do cabeçalho) para a tabela de preparação."""
+    if connection.vendor == 'postgresql':
+        comando = f"COPY {tabela} ({', '.join(colunas)}) FROM STDIN WITH (FORMAT csv, ENCODING 'UTF8')"
+        try:
+            copiar_de_stdin(cursor, comando, arquivo)
+        except DataError as erro:
+            raise ArquivoInvalido(f"O arquivo de {tipo} não é um CSV válido: {erro}")
+    else:
+        _inserir_em_lotes(cursor, tabela, ('linha', *colunas), _registros(arquivo, tipo, len(colunas)), lote)
+
+
+def _validar(cursor, tabela, regras):
+    """Grava em erro, num único UPDATE, a mensagem da primeira regra que cada linha ainda sem erro descumpre."""
+    casos = ' '.join(f"WHEN {condicao} THEN %s" for condicao, _, _ in regras)
+    parametros = [parametro for _, parametros, mensagem in regras for parametro in (*parametros, mensagem)]
+    cursor.execute(f"UPDATE {tabela} SET erro = CASE {casos} END WHERE erro IS NULL", parametros)
+
+
+def _recusar_emails_repetidos(cursor, tabela, modelo, mensagem_cadastrado):
+    """Recusa os e-mails repetidos no próprio arquivo (fica a primeira ocorrência) e os já cadastrados no modelo."""
+    cursor.execute(f"CREATE INDEX {tabela}_email ON {tabela} (UPPER(email))")
+    cursor.execute(
+        f"UPDATE {tabela} SET erro = %s WHERE erro IS NULL AND EXISTS ("
+        f"SELECT 1 FROM {tabela} anterior WHERE anterior.erro IS NULL AND UPPER(anterior.email) = UPPER({tabela}.email) "
+        f"AND anterior.linha < {tabela}.linha)",
+        ["E-mail repetido no arquivo."],
+    )
+    cadastrados = connection.ops.quote_name(modelo._meta.db_table)
+    cursor.execute(
+        f"UPDATE {tabela} SET erro = %s WHERE erro IS NULL AND EXISTS ("
+        f"SELECT 1 FROM {cadastrados} cadastrado WHERE UPPER(cadastrado.email) = UPPER({tabela}.email))",
+        [mensagem_cadastrado],
+    )
+
+
+def _calcular_senhas(cursor, tabela, lote):
+    """
+    Calcula o hash das senhas das linhas válidas, em blocos de "lote" linhas, e grava os hashes na
+    tabela <tabela>_senhas (linha, senha).
+    """
+    senhas = f'{tabela}_senhas'
+    cursor.execute(f"CREATE TEMPORARY TABLE {senhas} (linha bigint PRIMARY KEY, senha text)")
+    ultima = 0
+    while True:
+        cursor.execute(f"SELECT linha, senha FROM {tabela} WHERE erro IS NULL AND linha > %s ORDER BY linha LIMIT %s", [ultima, lote])
+        bloco = cursor.fetchall()
+        if not bloco:
+            return senhas
+        hashes = zip((linha for linha, _ in bloco), gerar_hashes(senha for _, senha in bloco))
+        if connection.vendor == 'postgresql':
+            copiar_linhas(cursor, senhas, ('linha', 'senha'), hashes)
+        else:
+            _inserir_em_lotes(cursor, senhas, ('linha', 'senha'), hashes, lote)
+        ultima = bloco[-1][0]
+
+
+def _copiar_validas(cursor, modelo, nomes, selecao, origem, ordem):
+    """
+    Copia para a tabela do modelo as linhas válidas da preparação com INSERT ... SELECT. "selecao" tem as
+    expressões dos campos em "nomes"; os demais campos com valor padrão recebem o padrão.
+    """
+    padroes = campos_com_padrao(modelo, nomes)
+    colunas = ', '.join(connection.ops.quote_name(modelo._meta.get_field(nome).column) for nome in (*nomes, *(campo.name for campo in padroes)))
+    # No PostgreSQL um parâmetro sem tipo na lista do SELECT vira text; o tipo da coluna vem no cast.
+    # (No SQLite um CAST trocaria a hora por um número.)
+    parametro = '%s::{}' if connection.vendor == 'postgresql' else '%s'
+    selecao = ', '.join((*selecao, *(parametro.format(campo.db_type(connection)) for campo in padroes)))
+    cursor.execute(
+        f"INSERT INTO {connection.ops.quote_name(modelo._meta.db_table)} ({colunas}) SELECT {selecao} FROM {origem} ORDER BY {ordem}",
+        [campo.get_db_prep_value(campo.get_default(), connection) for campo in padroes],
+    )
+    return cursor.rowcount
+
+
+def _importar_cadastros(cursor, tabela, modelo, campos_texto, mensagem_cadastrado, lote):
+    """Valida e copia usuários ou veterinários."""
+    _validar(cursor, tabela, _regras_cadastro(modelo, campos_texto))
+    _recusar_emails_repetidos(cursor, tabela, modelo, mensagem_cadastrado)
+    senhas = _calcular_senhas(cursor, tabela, lote)
+    nomes = (*campos_texto, 'email')
+    return _copiar_validas(
+        cursor, modelo, (*nomes, 'senha'), [f'{tabela}.{nome}' for nome in nomes] + [f'{senhas}.senha'],
+        f"{tabela} JOIN {senhas} ON {senhas}.linha = {tabela}.linha WHERE {tabela}.erro IS NULL", f'{tabela}.linha',
+    )
+
+
+def _importar_pets(cursor, tabela):
+    _validar(cursor, tabela, _regras_pets())
+    usuarios = connection.ops.quote_name(Usuario._meta.db_table)
+    id_usuario = connection.ops.quote_name(Usuario._meta.pk.column)
+    cursor.execute(f"ALTER TABLE {tabela} ADD COLUMN id_dono bigint")
+    cursor.execute(
+        f"UPDATE {tabela} SET id_dono = CASE WHEN COALESCE(dono_do_pet, '') <> '' "
+        f"THEN (SELECT usuario.{id_usuario} FROM {usuarios} usuario WHERE usuario.{id_usuario} = CAST({tabela}.dono_do_pet AS bigint)) "
+        f"ELSE (SELECT MIN(usuario.{id_usuario}) FROM {usuarios} usuario WHERE UPPER(usuario.email) = UPPER({tabela}.email_dono)) END "
+        f"WHERE erro IS NULL"
+    )
+    cursor.execute(
+        f"UPDATE {tabela} SET erro = CASE WHEN COALESCE(dono_do_pet, '') <> '' THEN %s ELSE %s END "
+        f"WHERE erro IS NULL AND id_dono IS NULL",
+        ["Nenhum usuário com este id foi encontrado.", "Nenhum usuário com este e-mail foi encontrado."],
+    )
+    return _copiar_validas(
+        cursor, Pet, ('nome', 'especie', 'idade', 'dono_do_pet'), ['nome', 'especie', 'CAST(idade AS integer)', 'id_dono'],
+        f"{tabela} WHERE erro IS NULL", 'linha',
+    )
+
+
+def importar(arquivos, lote=None):
+    """
+    Importa arquivos CSV de usuários, veterinários e pets numa única transação.
+
+    Args:
+        arquivos (dict): {tipo: arquivo}, com tipo em COLUNAS e arquivos binários abertos para leitura
+            (qualquer objeto com readline() e read(tamanho), como um arquivo ou a própria requisição).
+        lote (int): Linhas por bloco de hash de senhas e por INSERT fora do PostgreSQL. Padrão: IMPORTACAO_LOTE.
+
+    Returns:
+        dict: {'importados': {tipo: linhas}, 'rejeitados': [{'arquivo', 'linha', 'erro'}]}, com a linha
+        contada a partir do cabeçalho (o primeiro registro é a linha 2).
+
+    Raises:
+        ArquivoInvalido: Se algum arquivo não puder ser lido; nesse caso nada é importado.
+    """
+    desconhecidos = set(arquivos) - set(COLUNAS)
+    if desconhecidos:
+        raise ArquivoInvalido(f"Tipos de arquivo desconhecidos: {', '.join(sorted(desconhecidos))}.")
+    lote = lote or settings.IMPORTACAO_LOTE
+    importados, rejeitados = {}, []
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        for tipo in COLUNAS:
+            if tipo not in arquivos:
+                continue
+            colunas = ler_cabecalho(arquivos[tipo], tipo)
+            tabela = f'importacao_{tipo}'
+            _criar_tabela(cursor, tabela, COLUNAS[tipo])
+            _carregar(cursor, tabela, tipo, colunas, arquivos[tipo], lote)
+
+            if tipo == 'usuarios':
+                importados[tipo] = _importar_cadastros(cursor, tabela, Usuario, ('nome',), 'Usuário já existe.', lote)
+            elif tipo == 'veterinarios':
+                importados[tipo] = _importar_cadastros(cursor, tabela, Veterinario, ('nome', 'especialidade'), 'Este veterinário já existe.', lote)
+            else:
+                importados[tipo] = _importar_pets(cursor, tabela)
+
+            cursor.execute(f"SELECT linha, erro FROM {tabela} WHERE erro IS NOT NULL ORDER BY linha")
+            rejeitados.extend({'arquivo': tipo, 'linha': linha + 1, 'erro': erro} for linha, erro in cursor.fetchall())
+            # As tabelas temporárias vivem até o fim da conexão; se a transação for desfeita, a criação delas também é.
+            cursor.execute(f"DROP TABLE {tabela}")
+            if tipo != 'pets':
+                cursor.execute(f"DROP TABLE {tabela}_senhas")
+
+    if importados.get('veterinarios'):
+        invalidar_diretorio()
+    return {'importados': importados, 'rejeitados': rejeitados}
+
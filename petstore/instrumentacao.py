@@ -0,0 +1,162 @@
+"""
+Medição do tempo gasto em cada requisição, por etapa.
+
+O InstrumentacaoMiddleware escolhe uma amostra das requisições (INSTRUMENTACAO_AMOSTRAGEM) e, para cada
+uma, registra a rota (o name de setup/urls.py), o tempo total, a quantidade e o tempo das consultas SQL,
+os acertos e faltas do cache de objetos e o tempo gasto no hash de senhas e na geração do JSON.
+O resultado vai no cabeçalho Server-Timing da resposta e num registro de log em JSON.
+
+A medição da requisição fica numa ContextVar, que acompanha a requisição também nas threads usadas
+por sync_to_async. Fora da amostra a ContextVar fica vazia e as funções de medição só verificam isso.
+"""
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .metricas import CACHE_ACERTOS, CACHE_FALTAS
+
+logger = logging.getLogger('petstore.instrumentacao')
+
+_medicao_atual = ContextVar('medicao_atual', default=None)
+
+
+class Medicao:
+    """Tempos e contadores de uma requisição. Os tempos ficam em segundos."""
+    __slots__ = ('inicio', 'consultas_sql', 'tempos', 'cache_acertos', 'cache_faltas')
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.consultas_sql = 0
+        self.tempos = {'sql': 0.0, 'hash': 0.0, 'json': 0.0}
+        self.cache_acertos = 0
+        self.cache_faltas = 0
+
+
+def medir_sql(execute, sql, params, many, context):
+    """Execute wrapper instalado em todas as conexões (ver instalar_medidor_sql) que soma o tempo de cada comando SQL."""
+    medicao = _medicao_atual.get()
+    if medicao is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicao.tempos['sql'] += time.perf_counter() - inicio
+        medicao.consultas_sql += 1
+
+
+def instalar_medidor_sql(sender, connection, **kwargs):
+    """Recebe o sinal connection_created e instala medir_sql na conexão, uma única vez."""
+    if medir_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(medir_sql)
+
+
+@contextmanager
+def medir(etapa):
+    """Soma ao tempo da etapa ('hash' ou 'json') o tempo gasto dentro do bloco."""
+    medicao = _medicao_atual.get()
+    if medicao is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        medicao.tempos[etapa] += time.perf_counter() - inicio
+
+
+def registrar_cache(acerto):
+    """
+    Conta um acerto (True) ou uma falta (False) numa leitura do cache, nas métricas de /metrics
+    (todas as requisições) e na medição da requisição, se ela estiver na amostra.
+    """
+    (CACHE_ACERTOS if acerto else CACHE_FALTAS).inc()
+    medicao = _medicao_atual.get()
+    if medicao is not None:
+        if acerto:
+            medicao.cache_acertos += 1
+        else:
+            medicao.cache_faltas += 1
+
+
+def resumo(request, response, medicao):
+    """Dados da medição de uma requisição, com os tempos em milissegundos."""
+    correspondencia = getattr(request, 'resolver_match', None)
+    return {
+        'view': correspondencia.url_name if correspondencia else None,
+        'metodo': request.method,
+        'status': response.status_code,
+        'total_ms': round((time.perf_counter() - medicao.inicio) * 1000, 3),
+        'sql_consultas': medicao.consultas_sql,
+        **{f'{etapa}_ms': round(tempo * 1000, 3) for etapa, tempo in medicao.tempos.items()},
+        'cache_acertos': medicao.cache_acertos,
+        'cache_faltas': medicao.cache_faltas,
+    }
+
+
+def server_timing(dados):
+    """Monta o valor do cabeçalho Server-Timing a partir do resumo da requisição."""
+    metricas = [
+        f'total;dur={dados["total_ms"]};desc="{dados["view"] or "-"}"',
+        f'sql;dur={dados["sql_ms"]};desc="{dados["sql_consultas"]} consultas"',
+        f'cache;desc="acertos={dados["cache_acertos"]} faltas={dados["cache_faltas"]}"',
+        f'hash;dur={dados["hash_ms"]}',
+        f'json;dur={dados["json_ms"]}',
+    ]
+    return ', '.join(metricas)
+
+
+class InstrumentacaoMiddleware:
+    """
+    Middleware que mede uma amostra das requisições e publica o resultado no cabeçalho
+    Server-Timing e no logger "petstore.instrumentacao". Funciona sob WSGI e ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+
+    def amostrar(self):
+        taxa = settings.INSTRUMENTACAO_AMOSTRAGEM
+        return taxa >= 1 or (taxa > 0 and random.random() < taxa)
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        if not self.amostrar():
+            return self.get_response(request)
+        medicao = Medicao()
+        token = _medicao_atual.set(medicao)
+        try:
+            response = self.get_response(request)
+        finally:
+            _medicao_atual.reset(token)
+        return self.publicar(request, response, medicao)
+
+    async def __acall__(self, request):
+        if not self.amostrar():
+            return await self.get_response(request)
+        medicao = Medicao()
+        token = _medicao_atual.set(medicao)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _medicao_atual.reset(token)
+        return self.publicar(request, response, medicao)
+
+    def publicar(self, request, response, medicao):
+        dados = resumo(request, response, medicao)
+        response['Server-Timing'] = server_timing(dados)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(dados), extra={'instrumentacao': dados})
+        return response
@@ -0,0 +1,266 @@
+"""
+Limite de requisições por cliente e por rota, com baldes de fichas (token bucket) no cache compartilhado.
+
+Cada rota de LIMITES_REQUISICOES (o name de setup/urls.py) tem uma capacidade, a rajada aceita, e uma
+reposição em fichas por segundo. Cada requisição gasta uma ficha do balde do par (cliente, rota); sem
+ficha, a resposta é 429 com Retry-After. O cliente é o endereço IP (ver identificar_cliente).
+
+Com o Redis (REDIS_URL) o balde é reposto e gasto por um script Lua, numa única ida ao servidor e de forma
+atômica para todos os workers e containers; o relógio é o do Redis, então o dos workers não importa. Com o
+cache em memória o balde é de cada processo e uma trava faz o mesmo papel. Se o Redis falhar (conexão ou
+tempo esgotado), a falha é registrada e o worker usa um balde próprio, em memória, até o Redis voltar: o
+limite continua valendo por worker em vez de derrubar as rotas limitadas com um erro 500.
+
+Duas verificações locais, no próprio worker, evitam a ida ao cache:
+- um cliente recusado continua recusado no worker até o Retry-After, sem consultar o cache de novo;
+- com "reserva" maior que 1 na regra da rota, o worker tira até esse número de fichas de uma vez e gasta
+  as que sobraram nas requisições seguintes do mesmo cliente (as que não forem usadas em
+  VALIDADE_RESERVA segundos são descartadas). O limite fica um pouco menos exato entre os workers.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+from .metricas import LIMITE_FALHAS, LIMITE_RECUSADAS
+from .respostas import JsonResponse
+
+VALIDADE_RESERVA = 1.0
+# Entradas locais acima das quais as vencidas são descartadas.
+MAXIMO_LOCAL = 10000
+
+SCRIPT_BALDE = """
+local capacidade = tonumber(ARGV[1])
+local por_segundo = tonumber(ARGV[2])
+local pedidas = tonumber(ARGV[3])
+local relogio = redis.call('TIME')
+local agora = tonumber(relogio[1]) + tonumber(relogio[2]) / 1000000
+local balde = redis.call('HMGET', KEYS[1], 'fichas', 'momento')
+local fichas = tonumber(balde[1]) or capacidade
+local momento = tonumber(balde[2]) or agora
+fichas = math.min(capacidade, fichas + math.max(0, agora - momento) * por_segundo)
+local concedidas = math.min(pedidas, math.floor(fichas))
+fichas = fichas - concedidas
+redis.call('HSET', KEYS[1], 'fichas', tostring(fichas), 'momento', tostring(agora))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacidade - fichas) / por_segundo * 1000) + 1000)
+local espera = 0
+if concedidas == 0 then espera = (1 - fichas) / por_segundo end
+return {concedidas, tostring(espera)}
+"""
+SHA_SCRIPT_BALDE = hashlib.sha1(SCRIPT_BALDE.encode()).hexdigest()
+
+logger = logging.getLogger('petstore.limites')
+
+_trava = threading.Lock()
+_trava_balde = threading.Lock()  # Balde no cache em memória, que é do processo
+_recusados = {}  # chave -> instante (time.monotonic) até o qual o cliente continua recusado
+_reservas = {}  # chave -> [fichas, instante até o qual valem]
+_clientes_redis = {}  # REDIS_URL -> redis.Redis, com o seu pool de conexões
+_baldes_locais = {}  # chave -> (fichas, momento), usados enquanto o Redis falha
+
+
+def repor_e_gastar(balde, agora, capacidade, por_segundo, pedidas):
+    """
+    Repõe as fichas do balde pelo tempo passado e tira até "pedidas" fichas. Mesmo cálculo do SCRIPT_BALDE.
+
+    Args:
+        balde (tuple): (fichas, momento) gravados na última vez, ou None para um balde cheio.
+        agora (float): Instante atual, em segundos.
+
+    Returns:
+        tuple: (balde atualizado, fichas concedidas, segundos até haver uma ficha se nenhuma foi concedida).
+    """
+    fichas, momento = balde if balde is not None else (capacidade, agora)
+    fichas = min(capacidade, fichas + max(0.0, agora - momento) * por_segundo)
+    concedidas = min(pedidas, math.floor(fichas))
+    fichas -= concedidas
+    espera = (1 - fichas) / por_segundo if not concedidas else 0.0
+    return (fichas, agora), concedidas, espera
+
+
+def balde_da_requisicao(request):
+    """(rota, chave do balde, regra) da requisição. A regra é None se a rota não tiver limite."""
+    correspondencia = getattr(request, 'resolver_match', None)
+    if not settings.LIMITES_ATIVOS or correspondencia is None:
+        return None, None, None
+    regra = settings.LIMITES_REQUISICOES.get(correspondencia.url_name)
+    if regra is None:
+        return None, None, None
+    return correspondencia.url_name, f'limite:{correspondencia.url_name}:{identificar_cliente(request)}', regra
+
+
+def identificar_cliente(request):
+    """
+    Endereço IP do cliente. Atrás de um proxy, LIMITES_CABECALHO_IP (ex.: X-Forwarded-For) indica o
+    cabeçalho em que o proxy acrescenta o endereço; vale o último, o único que o cliente não escolhe.
+    """
+    if settings.LIMITES_CABECALHO_IP:
+        encaminhado = request.headers.get(settings.LIMITES_CABECALHO_IP)
+        if encaminhado:
+            return encaminhado.rsplit(',', 1)[-1].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _descartar_vencidos(agora):
+    for chave in [chave for chave, ate in _recusados.items() if ate <= agora]:
+        del _recusados[chave]
+    for chave in [chave for chave, (_, validade) in _reservas.items() if validade <= agora]:
+        del _reservas[chave]
+
+
+def verificar_localmente(chave):
+    """
+    Decide sem consultar o cache, se possível: segundos de espera para um cliente recusado há pouco,
+    0 quando o worker tem uma ficha reservada para ele, ou None quando é preciso consultar o cache.
+    """
+    agora = time.monotonic()
+    with _trava:
+        ate = _recusados.get(chave)
+        if ate is not None:
+            if ate > agora:
+                return ate - agora
+            del _recusados[chave]
+        reserva = _reservas.get(chave)
+        if reserva is not None:
+            if reserva[1] > agora:
+                reserva[0] -= 1
+                if not reserva[0]:
+                    del _reservas[chave]
+                return 0
+            del _reservas[chave]
+    return None
+
+
+def cliente_redis():
+    """Cliente do Redis de REDIS_URL, criado uma vez por processo (e por URL, que os testes trocam)."""
+    cliente = _clientes_redis.get(settings.REDIS_URL)
+    if cliente is None:
+        import redis
+
+        cliente = redis.Redis.from_url(settings.REDIS_URL, **settings.REDIS_OPCOES)
+        cliente = _clientes_redis.setdefault(settings.REDIS_URL, cliente)
+    return cliente
+
+
+def _gastar_no_redis(cache, chave, capacidade, por_segundo, pedidas):
+    from redis.exceptions import NoScriptError
+
+    chave = cache.make_key(chave)
+    cliente = cliente_redis()
+    argumentos = (1, chave, capacidade, por_segundo, pedidas)
+    try:
+        concedidas, espera = cliente.evalsha(SHA_SCRIPT_BALDE, *argumentos)
+    except NoScriptError:
+        concedidas, espera = cliente.eval(SCRIPT_BALDE, *argumentos)
+    return int(concedidas), float(espera)
+
+
+def _gastar_no_cache(cache, chave, capacidade, por_segundo, pedidas):
+    with _trava_balde:
+        balde, concedidas, espera = repor_e_gastar(cache.get(chave), time.time(), capacidade, por_segundo, pedidas)
+        cache.set(chave, balde, math.ceil((capacidade - balde[0]) / por_segundo) + 1)
+    return concedidas, espera
+
+
+def _gastar_localmente(chave, capacidade, por_segundo, pedidas):
+    with _trava_balde:
+        if len(_baldes_locais) > MAXIMO_LOCAL:
+            _baldes_locais.clear()
+        _baldes_locais[chave], concedidas, espera = repor_e_gastar(
+            _baldes_locais.get(chave), time.monotonic(), capacidade, por_segundo, pedidas,
+        )
+    return concedidas, espera
+
+
+def consultar_cache(chave, regra):
+    """
+    Gasta fichas do balde compartilhado e guarda localmente a recusa ou as fichas reservadas.
+
+    Returns:
+        float: 0 se a requisição pode seguir, ou os segundos até haver uma ficha.
+    """
+    argumentos = (chave, regra['capacidade'], regra['por_segundo'], regra.get('reserva', 1))
+    if settings.REDIS_URL:
+        from redis.exceptions import RedisError
+
+        try:
+            concedidas, espera = _gastar_no_redis(caches['default'], *argumentos)
+        except RedisError as erro:
+            LIMITE_FALHAS.inc()
+            logger.warning("Redis indisponível para o limite de requisições, usando o balde do worker: %s", erro)
+            concedidas, espera = _gastar_localmente(*argumentos)
+    else:
+        concedidas, espera = _gastar_no_cache(caches['default'], *argumentos)
+    agora = time.monotonic()
+    with _trava:
+        if len(_recusados) + len(_reservas) > MAXIMO_LOCAL:
+            _descartar_vencidos(agora)
+        if not concedidas:
+            _recusados[chave] = agora + espera
+        elif concedidas > 1:
+            _reservas[chave] = [concedidas - 1, agora + VALIDADE_RESERVA]
+    return espera if not concedidas else 0
+
+
+def limpar_local():
+    """Esquece as recusas e reservas do worker (usado nos testes)."""
+    with _trava:
+        _recusados.clear()
+        _reservas.clear()
+    with _trava_balde:
+        _baldes_locais.clear()
+
+
+def recusar(rota, espera, origem):
+    LIMITE_RECUSADAS.labels(rota, origem).inc()
+    segundos = max(1, math.ceil(espera))
+    response = JsonResponse({
+        'status': 'erro',
+        'mensagem': f'Muitas requisições. Tente de novo em {segundos} s.',
+    }, status=429)
+    response['Retry-After'] = str(segundos)
+    return response
+
+
+class LimiteMiddleware:
+    """
+    Middleware que aplica LIMITES_REQUISICOES antes de chamar a view, quando a rota já é conhecida.
+    Funciona sob WSGI e ASGI; sob ASGI só a ida ao cache passa por sync_to_async.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        rota, chave, regra = balde_da_requisicao(request)
+        if regra is None:
+            return None
+        espera = verificar_localmente(chave)
+        if espera is not None:
+            return recusar(rota, espera, 'local') if espera else None
+        espera = consultar_cache(chave, regra)
+        return recusar(rota, espera, 'cache') if espera else None
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        rota, chave, regra = balde_da_requisicao(request)
+        if regra is None:
+            return None
+        espera = verificar_localmente(chave)
+        if espera is not None:
+            return recusar(rota, espera, 'local') if espera else None
+        espera = await sync_to_async(consultar_cache)(chave, regra)
+        return recusar(rota, espera, 'cache') if espera else None
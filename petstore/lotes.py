@@ -0,0 +1,106 @@
+import json
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from .respostas import JsonResponse
+
+TIPOS_NDJSON = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+
+class CorpoInvalido(ValueError):
+    """Erro lançado quando o corpo da requisição não é um lote válido como um todo."""
+
+
+def ler_registros(request):
+    """
+    Lê os registros de um lote enviado como array JSON ou como NDJSON (um objeto JSON por linha).
+
+    O NDJSON é lido linha a linha direto do corpo da requisição, sem montar uma única string
+    com o lote inteiro. Linhas que não são JSON válido viram erros apenas daquele registro.
+
+    Args:
+        request (HttpRequest): Requisição com o lote no corpo.
+
+    Returns:
+        tuple: (registros, erros), onde registros é uma lista de (indice, dict) e erros é uma
+        lista de {'indice': ..., 'erro': ...}. O índice é a posição do registro no lote, a partir de 0.
+    """
+    maximo = settings.LOTE_MAXIMO_REGISTROS
+    registros, erros = [], []
+
+    if request.content_type in TIPOS_NDJSON:
+        linhas = (linha for linha in iter(request.readline, b'') if linha.strip())
+        for indice, linha in enumerate(linhas):
+            if indice >= maximo:
+                raise CorpoInvalido(f"O lote deve ter no máximo {maximo} registros.")
+            try:
+                registros.append((indice, json.loads(linha)))
+            except ValueError:
+                erros.append({'indice': indice, 'erro': "Linha não é um JSON válido."})
+    else:
+        try:
+            corpo = json.loads(request.body)
+        except ValueError:
+            raise CorpoInvalido("O corpo da requisição não é um JSON válido.")
+        if not isinstance(corpo, list):
+            raise CorpoInvalido("O corpo da requisição deve ser um array JSON.")
+        if len(corpo) > maximo:
+            raise CorpoInvalido(f"O lote deve ter no máximo {maximo} registros.")
+        registros = list(enumerate(corpo))
+
+    validos = []
+    for indice, registro in registros:
+        if isinstance(registro, dict):
+            validos.append((indice, registro))
+        else:
+            erros.append({'indice': indice, 'erro': "Cada registro deve ser um objeto JSON."})
+    return validos, erros
+
+
+def inserir_em_lotes(modelo, objetos, erros):
+    """
+    Insere objetos com bulk_create em blocos de LOTE_TAMANHO_BULK_CREATE linhas.
+
+    Se um bloco violar uma restrição do banco (ex.: um e-mail cadastrado por outra requisição
+    depois da validação), apenas esse bloco é refeito linha a linha, para que o erro fique
+    no registro culpado sem desfazer o resto do lote.
+
+    Args:
+        modelo (Model): Classe do modelo.
+        objetos (list): Lista de (indice, instância ainda não salva).
+        erros (list): Lista de erros do lote, onde os erros de inserção são acrescentados.
+
+    Returns:
+        list: Lista de {'indice': ..., 'id': ...} dos objetos criados.
+    """
+    tamanho = settings.LOTE_TAMANHO_BULK_CREATE
+    criados = []
+    for inicio in range(0, len(objetos), tamanho):
+        bloco = objetos[inicio:inicio + tamanho]
+        try:
+            with transaction.atomic():
+                modelo.objects.bulk_create([objeto for _, objeto in bloco])
+        except IntegrityError:
+            for indice, objeto in bloco:
+                objeto.pk = None
+                try:
+                    with transaction.atomic():
+                        objeto.save(force_insert=True)
+                except IntegrityError:
+                    erros.append({'indice': indice, 'erro': "O registro viola uma restrição do banco (ex.: e-mail já cadastrado)."})
+                    continue
+                criados.append({'indice': indice, 'id': objeto.pk})
+        else:
+            criados.extend({'indice': indice, 'id': objeto.pk} for indice, objeto in bloco)
+    return criados
+
+
+def resposta_lote(criados, erros):
+    """
+    Monta a resposta de um lote: 201 se ao menos um registro foi criado, 400 caso contrário.
+    Os erros são ordenados pela posição do registro no lote.
+    """
+    erros = sorted(erros, key=lambda erro: erro['indice'])
+    status = 201 if criados else 400
+    return JsonResponse({'criados': criados, 'erros': erros}, status=status)
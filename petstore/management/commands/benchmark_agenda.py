@@ -0,0 +1,103 @@
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Count
+from django.utils import timezone
+
+from petstore.agenda import marcar_consulta, HorarioOcupado
+from petstore.carga import resumir
+from petstore.models import Usuario, Pet, Veterinario, Consulta
+
+
+class Command(BaseCommand):
+    help = (
+        "Várias threads tentam marcar consultas ao mesmo tempo nos mesmos horários de um veterinário. "
+        "Mede latência e vazão das reservas e confere que nenhum horário foi reservado duas vezes. "
+        "Os dados criados são apagados no final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16, help="Threads reservando ao mesmo tempo.")
+        parser.add_argument('--horarios', type=int, default=8, help="Horários disputados por rodada.")
+        parser.add_argument('--rodadas', type=int, default=20, help="Rodadas, cada uma num dia diferente da agenda.")
+        parser.add_argument('--semente', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite' and options['threads'] > 1:
+            self.stdout.write("Aviso: o SQLite serializa as escritas; os conflitos de trava aparecem como erros.")
+        sufixo = time.time_ns()
+        usuario = Usuario.objects.create(nome='Benchmark agenda', email=f'agenda{sufixo}@petstore.com', senha='!')
+        vet = Veterinario.objects.create(nome='Benchmark agenda', especialidade='Clínico geral',
+                                         email=f'agenda{sufixo}@petstore.com', senha='!')
+        try:
+            pet = Pet.objects.create(nome='Benchmark', especie='Canina', idade=1, dono_do_pet=usuario)
+            self.executar(vet, pet, options)
+        finally:
+            Consulta.objects.filter(veterinario=vet).delete()
+            vet.delete()
+            usuario.delete()
+
+    def executar(self, vet, pet, options):
+        duracao = timedelta(minutes=vet.duracao_consulta)
+        amanha = timezone.localdate() + timedelta(days=1)
+        resultados = {'reservadas': 0, 'ocupadas': 0, 'erros': 0, 'latencias': []}
+        trava = threading.Lock()
+
+        def trabalhador(horarios, semente):
+            aleatorio = random.Random(semente)
+            horarios = list(horarios)
+            aleatorio.shuffle(horarios)
+            contagem, latencias = {'reservadas': 0, 'ocupadas': 0, 'erros': 0}, []
+            try:
+                for inicio in horarios:
+                    antes = time.perf_counter()
+                    try:
+                        marcar_consulta(vet.id_veterinario, pet, inicio)
+                        contagem['reservadas'] += 1
+                    except HorarioOcupado:
+                        contagem['ocupadas'] += 1
+                    except Exception:
+                        contagem['erros'] += 1
+                    latencias.append(time.perf_counter() - antes)
+            finally:
+                connections.close_all()
+            with trava:
+                for chave, valor in contagem.items():
+                    resultados[chave] += valor
+                resultados['latencias'].extend(latencias)
+
+        inicio_total = time.perf_counter()
+        for rodada in range(options['rodadas']):
+            abertura = timezone.make_aware(datetime.combine(amanha + timedelta(days=rodada), vet.inicio_expediente))
+            horarios = [abertura + i * duracao for i in range(options['horarios'])]
+            threads = [
+                threading.Thread(target=trabalhador, args=(horarios, options['semente'] + rodada * options['threads'] + i))
+                for i in range(options['threads'])
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        decorrido = time.perf_counter() - inicio_total
+
+        duplicados = (
+            Consulta.objects.filter(veterinario=vet).values('data_consulta')
+            .annotate(total=Count('id_consulta')).filter(total__gt=1).count()
+        )
+        esperado = options['rodadas'] * options['horarios']
+        total = resumir(resultados['latencias'], resultados['erros'], decorrido)
+        self.stdout.write(
+            f"tentativas {total['requisicoes']}  reservadas {resultados['reservadas']}/{esperado}  "
+            f"ocupadas {resultados['ocupadas']}  erros {resultados['erros']}"
+        )
+        self.stdout.write(
+            f"{total['req_s']:.1f} reservas/s  p50 {total['p50_ms']:.2f} ms  "
+            f"p95 {total['p95_ms']:.2f} ms  p99 {total['p99_ms']:.2f} ms"
+        )
+        if duplicados:
+            raise CommandError(f"{duplicados} horário(s) reservados mais de uma vez.")
+        self.stdout.write(self.style.SUCCESS("Nenhum horário foi reservado duas vezes."))
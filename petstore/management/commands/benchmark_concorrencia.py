@@ -0,0 +1,110 @@
+import random
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.db.models import Sum
+
+from petstore.carga import resumir
+from petstore.models import Usuario, Pet, nova_versao
+
+MODOS = ('otimista', 'pessimista')
+
+
+class Command(BaseCommand):
+    help = (
+        "Várias threads editam ao mesmo tempo os mesmos pets (leitura, pausa e escrita da idade + 1), "
+        "com controle otimista (UPDATE condicionado à versão lida, repetido em caso de conflito, como o If-Match "
+        "das rotas de atualização) ou pessimista (SELECT ... FOR UPDATE até a escrita). Mede a vazão e a latência "
+        "das edições de cada modo e confere que nenhuma edição foi perdida. Os dados criados são apagados no final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modos', nargs='*', choices=MODOS, default=list(MODOS))
+        parser.add_argument('--threads', type=int, default=16, help="Threads editando ao mesmo tempo.")
+        parser.add_argument('--objetos', type=int, default=4, help="Pets disputados pelas threads.")
+        parser.add_argument('--edicoes', type=int, default=50, help="Edições concluídas por thread.")
+        parser.add_argument('--pausa', type=float, default=2.0,
+                            help="Milissegundos entre a leitura e a escrita (o trabalho da aplicação na edição).")
+        parser.add_argument('--semente', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite' and options['threads'] > 1:
+            self.stdout.write("Aviso: o SQLite serializa as escritas e ignora FOR UPDATE; os conflitos de trava aparecem como erros.")
+        sufixo = time.time_ns()
+        usuario = Usuario.objects.create(nome='Benchmark concorrência', email=f'concorrencia{sufixo}@petstore.com', senha='!')
+        try:
+            pets = [
+                Pet.objects.create(nome=f'Benchmark {i}', especie='Canina', idade=0, dono_do_pet=usuario).pk
+                for i in range(options['objetos'])
+            ]
+            perdidas = sum(self.executar(modo, pets, options) for modo in options['modos'])
+        finally:
+            usuario.delete()
+        if perdidas:
+            raise CommandError(f"{perdidas} edição(ões) perdida(s).")
+        self.stdout.write(self.style.SUCCESS("Nenhuma edição foi perdida."))
+
+    def editar_otimista(self, pk, pausa):
+        """Lê a idade e a versão e grava só se a versão não mudou. Retorna quantos conflitos houve até gravar."""
+        conflitos = 0
+        while True:
+            idade, versao = Pet.objects.filter(pk=pk).values_list('idade', 'versao').get()
+            time.sleep(pausa)
+            if Pet.objects.filter(pk=pk, versao=versao).update(idade=idade + 1, **nova_versao()):
+                return conflitos
+            conflitos += 1
+
+    def editar_pessimista(self, pk, pausa):
+        """Trava a linha na leitura e só a solta depois da escrita."""
+        with transaction.atomic():
+            idade = Pet.objects.select_for_update().filter(pk=pk).values_list('idade', flat=True).get()
+            time.sleep(pausa)
+            Pet.objects.filter(pk=pk).update(idade=idade + 1, **nova_versao())
+        return 0
+
+    def executar(self, modo, pets, options):
+        """Executa as edições de um modo e retorna quantas foram perdidas."""
+        editar = self.editar_otimista if modo == 'otimista' else self.editar_pessimista
+        pausa = options['pausa'] / 1000
+        inicial = Pet.objects.filter(pk__in=pets).aggregate(total=Sum('idade'))['total']
+        resultados = {'concluidas': 0, 'conflitos': 0, 'erros': 0, 'latencias': []}
+        trava = threading.Lock()
+
+        def trabalhador(semente):
+            aleatorio = random.Random(semente)
+            contagem, latencias = {'concluidas': 0, 'conflitos': 0, 'erros': 0}, []
+            try:
+                for _ in range(options['edicoes']):
+                    antes = time.perf_counter()
+                    try:
+                        contagem['conflitos'] += editar(aleatorio.choice(pets), pausa)
+                        contagem['concluidas'] += 1
+                    except Exception:
+                        contagem['erros'] += 1
+                    latencias.append(time.perf_counter() - antes)
+            finally:
+                connections.close_all()
+            with trava:
+                for chave, valor in contagem.items():
+                    resultados[chave] += valor
+                resultados['latencias'].extend(latencias)
+
+        threads = [threading.Thread(target=trabalhador, args=(options['semente'] + i,)) for i in range(options['threads'])]
+        inicio = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        decorrido = time.perf_counter() - inicio
+
+        final = Pet.objects.filter(pk__in=pets).aggregate(total=Sum('idade'))['total']
+        perdidas = inicial + resultados['concluidas'] - final
+        total = resumir(resultados['latencias'], resultados['erros'], decorrido)
+        self.stdout.write(
+            f"{modo:<10} {resultados['concluidas'] / decorrido:>8.1f} edições/s  p50 {total['p50_ms']:.2f} ms  "
+            f"p95 {total['p95_ms']:.2f} ms  p99 {total['p99_ms']:.2f} ms  concluídas {resultados['concluidas']}  "
+            f"conflitos {resultados['conflitos']}  erros {resultados['erros']}  perdidas {perdidas}"
+        )
+        return perdidas
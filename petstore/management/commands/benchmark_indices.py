@@ -0,0 +1,99 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from petstore.models import Usuario, Pet, Veterinario, Consulta
+from petstore.sementes import semear
+
+# Índices das chaves estrangeiras que existiam antes da migração 0007 e foram substituídos pelos compostos.
+INDICES_ANTIGOS = [
+    (Pet, models.Index(fields=['dono_do_pet'], name='bench_pet_dono_idx')),
+    (Consulta, models.Index(fields=['veterinario'], name='bench_consulta_vet_idx')),
+    (Consulta, models.Index(fields=['pet'], name='bench_consulta_pet_idx')),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Popula o banco com dados sintéticos e mostra o plano e o tempo das consultas usadas pelas views "
+        "com os índices atuais e com os índices antigos. Tudo roda numa transação desfeita no final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=20000)
+        parser.add_argument('--veterinarios', type=int, default=200)
+        parser.add_argument('--consultas', type=int, default=200000)
+        parser.add_argument('--repeticoes', type=int, default=50, help="Execuções de cada consulta para medir o tempo médio.")
+        parser.add_argument('--semente', type=int, default=42)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            inicio = time.perf_counter()
+            criados = semear(usuarios=options['usuarios'], veterinarios=options['veterinarios'],
+                             consultas=options['consultas'], semente=options['semente'])
+            self.stdout.write(f"Dados criados em {time.perf_counter() - inicio:.1f}s: {criados}")
+            self.analisar()
+
+            consultas = self.consultas()
+            depois = self.medir(consultas, options['repeticoes'])
+            self.trocar_indices(antigos=True)
+            antes = self.medir(consultas, options['repeticoes'])
+
+            for nome in consultas:
+                self.stdout.write(self.style.MIGRATE_HEADING(f"\n== {nome}"))
+                self.stdout.write(f"-- antes ({antes[nome][1] * 1000:.3f} ms)\n{antes[nome][0]}")
+                self.stdout.write(f"-- depois ({depois[nome][1] * 1000:.3f} ms)\n{depois[nome][0]}")
+
+            transaction.set_rollback(True)
+
+    def consultas(self):
+        """Consultas equivalentes às feitas pelas views, com valores tirados dos dados criados."""
+        usuario = Usuario.objects.order_by('-pk').first()
+        vet = Veterinario.objects.order_by('-pk').first()
+        pet = Pet.objects.order_by('-pk').first()
+        consulta = Consulta.objects.order_by('-pk').first()
+        hoje = timezone.now()
+        return {
+            'novousuario: e-mail repetido': Usuario.objects.filter(email__iexact=usuario.email.upper()),
+            'novovet: e-mail repetido': Veterinario.objects.filter(email__iexact=vet.email.upper()),
+            'retornaconsulta: leitura por id': Consulta.objects.filter(pk=consulta.pk).values('id_consulta', 'data_consulta', 'realizada', 'veterinario', 'pet'),
+            'agenda do veterinário no mês': Consulta.objects.filter(veterinario=vet, data_consulta__gte=hoje, data_consulta__lt=hoje + timedelta(days=30)).order_by('data_consulta'),
+            'consultas pendentes do pet': Consulta.objects.filter(pet=pet, realizada=False),
+            'listarpets: pets do dono': Pet.objects.filter(dono_do_pet=usuario, id_pet__gt=0).order_by('id_pet')[:50],
+        }
+
+    def medir(self, consultas, repeticoes):
+        resultados = {}
+        for nome, queryset in consultas.items():
+            plano = queryset.explain()
+            inicio = time.perf_counter()
+            for _ in range(repeticoes):
+                list(queryset.all())
+            resultados[nome] = (plano, (time.perf_counter() - inicio) / repeticoes)
+        return resultados
+
+    def trocar_indices(self, antigos):
+        """Remove os índices atuais e recria os antigos, com DDL executado dentro da transação."""
+        editor = connection.schema_editor()
+        with connection.cursor() as cursor:
+            for modelo in (Usuario, Pet, Veterinario, Consulta):
+                for indice in modelo._meta.indexes:
+                    cursor.execute(str(indice.remove_sql(modelo, editor)))
+                # A restrição única de (veterinario, data_consulta) da migração 0008 também serve de índice.
+                # No SQLite ela faz parte da definição da tabela e não pode ser removida.
+                if connection.vendor != 'sqlite':
+                    for restricao in modelo._meta.constraints:
+                        if isinstance(restricao, models.UniqueConstraint):
+                            cursor.execute(str(restricao.remove_sql(modelo, editor)))
+            for modelo, indice in INDICES_ANTIGOS:
+                cursor.execute(str(indice.create_sql(modelo, editor)))
+        self.analisar()
+
+    def analisar(self):
+        """Atualiza as estatísticas do planejador depois de inserir ou trocar os índices."""
+        if connection.vendor in ('postgresql', 'sqlite'):
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
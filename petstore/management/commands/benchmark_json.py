@@ -0,0 +1,67 @@
+import json
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django import http
+from django.core import serializers
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from petstore.models import Usuario, Pet, Veterinario, Consulta
+from petstore.respostas import JsonResponse, PROJECAO_CONSULTA, RENDERIZADORES, orjson
+
+
+def _medir(funcao, minimo=0.2):
+    """Executa a função repetidamente por pelo menos "minimo" segundos e retorna o tempo médio por execução."""
+    execucoes, inicio = 0, time.perf_counter()
+    while True:
+        funcao()
+        execucoes += 1
+        decorrido = time.perf_counter() - inicio
+        if decorrido >= minimo:
+            return decorrido / execucoes
+
+
+def _consultas(quantidade):
+    """Consultas em memória (sem banco), com o veterinário e o pet já associados."""
+    usuario = Usuario(id_usuario=1, nome='Usuario', email='usuario@petstore.com', senha='hash')
+    pet = Pet(id_pet=1, nome='Pet', especie='Canina', idade=3, dono_do_pet=usuario)
+    vet = Veterinario(id_veterinario=1, nome='Veterinario', especialidade='Cardiologista', email='vet@petstore.com', senha='hash')
+    data = datetime(2024, 9, 30, 10, 0, tzinfo=dt_timezone.utc)
+    return [Consulta(id_consulta=i, data_consulta=data, veterinario=vet, pet=pet, realizada=True) for i in range(1, quantidade + 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara o custo por objeto de gerar uma resposta JSON com serializers.serialize + JsonResponse "
+        "(caminho antigo) e com as projeções de petstore/respostas.py em cada renderizador."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanhos', nargs='*', type=int, default=[1, 100, 10000], help="Objetos por resposta.")
+        parser.add_argument('--minimo', type=float, default=0.5, help="Segundos mínimos de medição por caso.")
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write("orjson não está instalado: o renderizador 'orjson' usa a biblioteca padrão.")
+
+        def antigo(objetos):
+            return http.JsonResponse(json.loads(serializers.serialize('json', objetos)), safe=False)
+
+        def projecao(objetos):
+            return JsonResponse(PROJECAO_CONSULTA.lista(objetos), safe=False)
+
+        casos = [('serializers', antigo, 'json')]
+        casos += [(f'projecao+{nome}', projecao, nome) for nome in RENDERIZADORES]
+
+        self.stdout.write(f"{'caso':<18} {'objetos':>8} {'µs/resposta':>12} {'µs/objeto':>10} {'x antigo':>9}")
+        for tamanho in options['tamanhos']:
+            objetos = _consultas(tamanho)
+            base = None
+            for nome, caso, renderizador in casos:
+                with override_settings(RENDERIZADOR_JSON=renderizador):
+                    duracao = _medir(lambda: caso(objetos), options['minimo'])
+                base = base or duracao
+                self.stdout.write(
+                    f"{nome:<18} {tamanho:>8} {duracao * 1e6:>12.1f} {duracao * 1e6 / tamanho:>10.2f} {base / duracao:>9.1f}"
+                )
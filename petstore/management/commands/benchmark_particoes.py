@@ -0,0 +1,178 @@
+import json
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from petstore import particoes
+
+SIMPLES = 'bench_consulta_simples'
+PARTICIONADA = 'bench_consulta_particionada'
+
+# Colunas de petstore_consulta. As chaves estrangeiras ficam de fora: o benchmark não cria pets nem veterinários.
+COLUNAS = (
+    "id_consulta bigint NOT NULL, data_consulta timestamptz, veterinario_id bigint NOT NULL, pet_id bigint NOT NULL, "
+    "realizada boolean NOT NULL, versao integer NOT NULL, atualizado_em timestamptz NOT NULL"
+)
+# Os índices e a restrição única do modelo Consulta.
+INDICES = (
+    "CREATE UNIQUE INDEX {tabela}_vet_horario ON {tabela} (veterinario_id, data_consulta)",
+    "CREATE INDEX {tabela}_pet_realizada ON {tabela} (pet_id, realizada)",
+    "CREATE INDEX {tabela}_cobertura ON {tabela} (id_consulta) INCLUDE (data_consulta, realizada, veterinario_id, pet_id)",
+    "CREATE INDEX {tabela}_pendente_data ON {tabela} (data_consulta) WHERE NOT realizada",
+)
+# Linhas geradas por generate_series: horários espalhados pelo período, um a cada "passo" (então um veterinário
+# nunca tem dois no mesmo horário), 1% sem data e realizadas as que já passaram.
+GERAR = f"""
+INSERT INTO {SIMPLES}
+SELECT g, data, 1 + g %% %s, 1 + (g * 7919) %% %s, COALESCE(data < now(), false), 1, COALESCE(data, now())
+FROM (
+    SELECT g, CASE WHEN g %% 100 = 0 THEN NULL ELSE %s + (g - 1) * %s END AS data FROM generate_series(1, %s) AS g
+) AS linhas
+"""
+
+
+def _cronometrar(cursor, sql, parametros=()):
+    inicio = time.perf_counter()
+    cursor.execute(sql, parametros)
+    return time.perf_counter() - inicio
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara a tabela de consultas simples e particionada por mês (petstore/particoes.py) com dezenas de "
+        "milhões de linhas geradas no próprio PostgreSQL: consultas por intervalo de datas e por id, o vacuum "
+        "depois de alterar um mês e a remoção do mês mais antigo (DELETE contra DROP da partição). As tabelas do "
+        "benchmark são criadas ao lado das da aplicação e apagadas no final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--linhas', type=int, default=20_000_000)
+        parser.add_argument('--meses', type=int, default=36, help="Meses cobertos pelas consultas, terminando dois meses à frente.")
+        parser.add_argument('--veterinarios', type=int, default=5000)
+        parser.add_argument('--pets', type=int, default=2_000_000)
+        parser.add_argument('--repeticoes', type=int, default=20, help="Execuções de cada consulta para medir o tempo médio.")
+        parser.add_argument('--manter', action='store_true', help="Não apaga as tabelas do benchmark no final.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("O benchmark de partições precisa do PostgreSQL.")
+        primeiro = particoes.somar_meses(particoes.mes_de(timezone.localdate()), 3 - options['meses'])
+        meses = [particoes.somar_meses(primeiro, i) for i in range(options['meses'])]
+
+        with connection.cursor() as cursor:
+            self.apagar(cursor)
+            try:
+                self.criar(cursor, meses, options)
+                self.consultas(cursor, meses, options['repeticoes'])
+                self.vacuum(cursor, meses[-4])
+                self.remocao(cursor, meses[0])
+            finally:
+                if not options['manter']:
+                    self.apagar(cursor)
+
+    def apagar(self, cursor):
+        cursor.execute(f"DROP TABLE IF EXISTS {SIMPLES}, {PARTICIONADA}")
+
+    def criar(self, cursor, meses, options):
+        """Gera as linhas na tabela simples, copia para a particionada e cria os índices nas duas."""
+        inicio, fim = particoes.limites(meses[0])[0], particoes.limites(meses[-1])[1]
+        cursor.execute(f"CREATE TABLE {SIMPLES} ({COLUNAS})")
+        cursor.execute(f"CREATE TABLE {PARTICIONADA} ({COLUNAS}) PARTITION BY RANGE (data_consulta)")
+        particoes.criar_padrao(cursor, PARTICIONADA)
+        for mes in meses:
+            particoes.criar_particao(cursor, mes, PARTICIONADA)
+
+        duracao = _cronometrar(cursor, GERAR, [
+            options['veterinarios'], options['pets'], inicio, (fim - inicio) / options['linhas'], options['linhas'],
+        ])
+        self.stdout.write(f"{options['linhas']} linhas geradas em {duracao:.1f}s, de {inicio:%Y-%m} a {meses[-1]:%Y-%m}.")
+        duracao = _cronometrar(cursor, f"INSERT INTO {PARTICIONADA} SELECT * FROM {SIMPLES}")
+        self.stdout.write(f"Cópia para a tabela particionada ({len(meses)} partições e a padrão) em {duracao:.1f}s.")
+
+        # A particionada já tem a chave primária em cada partição (particoes.criar_particao).
+        chaves = {SIMPLES: [f"ALTER TABLE {SIMPLES} ADD PRIMARY KEY (id_consulta)"], PARTICIONADA: []}
+        for tabela in (SIMPLES, PARTICIONADA):
+            duracao = sum(_cronometrar(cursor, sql) for sql in [*chaves[tabela], *(indice.format(tabela=tabela) for indice in INDICES)])
+            # Deixa as páginas visíveis para todos, como numa tabela já limpa pelo autovacuum.
+            duracao_vacuum = _cronometrar(cursor, f"VACUUM ANALYZE {tabela}")
+            self.stdout.write(f"{tabela}: índices em {duracao:.1f}s, VACUUM ANALYZE em {duracao_vacuum:.1f}s.")
+
+    def consultas(self, cursor, meses, repeticoes):
+        """Tempo médio e páginas lidas (EXPLAIN ANALYZE BUFFERS) de consultas como as das views."""
+        mes = meses[len(meses) // 2]
+        inicio, fim = particoes.limites(mes)
+        cursor.execute(f"SELECT id_consulta, veterinario_id FROM {SIMPLES} WHERE data_consulta >= %s LIMIT 1", [inicio])
+        id_consulta, veterinario = cursor.fetchone()
+        casos = {
+            f'contagem do mês ({mes:%Y-%m})': (
+                "SELECT count(*), count(*) FILTER (WHERE realizada) FROM {tabela} "
+                "WHERE data_consulta >= %s AND data_consulta < %s", [inicio, fim],
+            ),
+            'exportação de uma semana': (
+                "SELECT id_consulta, data_consulta, realizada, veterinario_id, pet_id FROM {tabela} "
+                "WHERE data_consulta >= %s AND data_consulta < %s ORDER BY id_consulta LIMIT 2000",
+                [inicio, inicio + timedelta(days=7)],
+            ),
+            'agenda do veterinário no mês': (
+                "SELECT data_consulta FROM {tabela} WHERE veterinario_id = %s AND data_consulta >= %s "
+                "AND data_consulta < %s ORDER BY data_consulta", [veterinario, inicio, fim],
+            ),
+            'leitura por id (sem a data)': (
+                "SELECT data_consulta, realizada, veterinario_id, pet_id FROM {tabela} WHERE id_consulta = %s", [id_consulta],
+            ),
+        }
+        self.stdout.write(self.style.MIGRATE_HEADING("\n== Consultas"))
+        self.stdout.write(f"{'consulta':<34} {'simples ms':>11} {'blocos':>9} {'partic. ms':>11} {'blocos':>9}")
+        for nome, (sql, parametros) in casos.items():
+            simples = self.medir(cursor, sql.format(tabela=SIMPLES), parametros, repeticoes)
+            particionada = self.medir(cursor, sql.format(tabela=PARTICIONADA), parametros, repeticoes)
+            self.stdout.write(
+                f"{nome:<34} {simples[0] * 1000:>11.3f} {simples[1]:>9} {particionada[0] * 1000:>11.3f} {particionada[1]:>9}"
+            )
+
+    def medir(self, cursor, sql, parametros, repeticoes):
+        """Tempo médio da consulta, em segundos, e blocos lidos (do cache ou do disco) por uma execução."""
+        cursor.execute('EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + sql, parametros)
+        plano = cursor.fetchone()[0]
+        plano = (json.loads(plano) if isinstance(plano, str) else plano)[0]['Plan']
+        blocos = plano['Shared Hit Blocks'] + plano['Shared Read Blocks']
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            cursor.execute(sql, parametros)
+            cursor.fetchall()
+        return (time.perf_counter() - inicio) / repeticoes, blocos
+
+    def vacuum(self, cursor, mes):
+        """
+        Altera todas as consultas de um mês recente e mede o VACUUM que limpa as versões antigas: a tabela simples
+        inteira (os índices são percorridos por completo) contra só a partição do mês, que é o que o autovacuum faz.
+        """
+        inicio, fim = particoes.limites(mes)
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n== VACUUM depois de alterar as consultas de {mes:%Y-%m}"))
+        for tabela, limpa in ((SIMPLES, SIMPLES), (PARTICIONADA, particoes.nome_particao(mes, PARTICIONADA))):
+            duracao_update = _cronometrar(
+                cursor, f"UPDATE {tabela} SET versao = versao + 1 WHERE data_consulta >= %s AND data_consulta < %s", [inicio, fim],
+            )
+            alteradas = cursor.rowcount
+            cursor.execute("SELECT pg_total_relation_size(%s)", [limpa])
+            tamanho = cursor.fetchone()[0]
+            duracao = _cronometrar(cursor, f"VACUUM {limpa}")
+            self.stdout.write(
+                f"{tabela}: UPDATE de {alteradas} linhas em {duracao_update:.1f}s, VACUUM de {limpa} "
+                f"({tamanho / 2 ** 20:.0f} MB com índices) em {duracao:.2f}s."
+            )
+
+    def remocao(self, cursor, mes):
+        """Remove as consultas do mês mais antigo: DELETE e VACUUM na simples, DETACH e DROP da partição."""
+        inicio, fim = particoes.limites(mes)
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n== Remoção das consultas de {mes:%Y-%m}"))
+        duracao = _cronometrar(cursor, f"DELETE FROM {SIMPLES} WHERE data_consulta >= %s AND data_consulta < %s", [inicio, fim])
+        removidas = cursor.rowcount
+        duracao_vacuum = _cronometrar(cursor, f"VACUUM {SIMPLES}")
+        self.stdout.write(f"{SIMPLES}: DELETE de {removidas} linhas em {duracao:.1f}s e VACUUM em {duracao_vacuum:.1f}s.")
+        inicio_remocao = time.perf_counter()
+        particoes.remover_particao(cursor, mes, PARTICIONADA)
+        self.stdout.write(f"{PARTICIONADA}: DETACH e DROP da partição em {time.perf_counter() - inicio_remocao:.3f}s.")
@@ -0,0 +1,204 @@
+import json
+import os
+import random
+import subprocess
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.urls import URLPattern, get_resolver
+from django.utils import timezone
+
+from petstore.carga import SERVIDORES, aguardar_resposta, comando_servidor, comparar, criadoras, executar_carga, rotas_completas
+from petstore.models import Usuario, Pet, Veterinario, Consulta
+from petstore.sementes import semear
+
+MODELOS = {'usuario': Usuario, 'pet': Pet, 'veterinario': Veterinario, 'consulta': Consulta}
+
+
+def _minutos(horario):
+    return horario.hour * 60 + horario.minute
+
+
+def _expediente(inicio, fim, duracao):
+    return _minutos(inicio), duracao, (_minutos(fim) - _minutos(inicio)) // duracao
+
+
+def rotas_nomeadas():
+    """Nomes de todas as rotas nomeadas de setup/urls.py."""
+    return {padrao.name for padrao in get_resolver().url_patterns if isinstance(padrao, URLPattern) and padrao.name}
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede latência (p50/p95/p99) e req/s de cada rota de setup/urls.py num servidor local, "
+        "grava o resultado em JSON e compara com uma linha de base gravada antes, falhando quando alguma "
+        "rota regride além do limite. Os objetos criados pela medição são apagados no final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help="Mede um servidor já em execução, que use o mesmo banco, em vez de subir um.")
+        parser.add_argument('--servidor', choices=SERVIDORES, default='gunicorn-asgi', help="Servidor que o comando sobe.")
+        parser.add_argument('--porta', type=int, default=8600, help="Porta do servidor que o comando sobe.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Workers do Gunicorn.")
+        parser.add_argument('--threads', type=int, default=8, help="Threads por worker gthread.")
+        parser.add_argument('--concorrencia', type=int, default=8, help="Clientes simultâneos.")
+        parser.add_argument('--duracao', type=float, default=5.0, help="Segundos de medição de cada rota.")
+        parser.add_argument('--aquecimento', type=float, default=1.0, help="Segundos antes da medição de cada rota.")
+        parser.add_argument('--rotas', nargs='*', help="Mede só estas rotas (name de setup/urls.py).")
+        parser.add_argument('--semear', action='store_true', help="Cria o conjunto de dados se o banco não tiver consultas.")
+        parser.add_argument('--usuarios', type=int, default=5000)
+        parser.add_argument('--pets-por-usuario', type=int, default=3)
+        parser.add_argument('--veterinarios', type=int, default=100)
+        parser.add_argument('--consultas', type=int, default=50000)
+        parser.add_argument('--semente', type=int, default=42)
+        parser.add_argument('--saida', help="Arquivo JSON onde o resultado é gravado (a linha de base, na primeira execução).")
+        parser.add_argument('--base', help="Arquivo JSON de uma execução anterior usado na comparação.")
+        parser.add_argument('--limite', type=float, default=0.2, help="Variação relativa aceita antes de apontar regressão.")
+        parser.add_argument('--tolerancia-ms', type=float, default=1.0, help="Aumento de latência, em ms, sempre aceito.")
+        parser.add_argument('--limite-subida', type=float, default=60.0, help="Segundos máximos de espera pela subida.")
+
+    def handle(self, *args, **options):
+        base = None
+        if options['base']:
+            with open(options['base'], encoding='utf-8') as arquivo:
+                base = json.load(arquivo)
+
+        if options['semear'] and not Consulta.objects.exists():
+            inicio = time.perf_counter()
+            semeados = semear(usuarios=options['usuarios'], pets_por_usuario=options['pets_por_usuario'],
+                             veterinarios=options['veterinarios'], consultas=options['consultas'], semente=options['semente'])
+            self.stdout.write(f"Dados criados em {time.perf_counter() - inicio:.1f}s: {semeados}")
+        dados = {nome: modelo.objects.count() for nome, modelo in MODELOS.items()}
+        if not all(dados.values()):
+            raise CommandError("O banco precisa ter ao menos um usuário, pet, veterinário e consulta. Use --semear.")
+        amostras = self.amostras(options['semente'])
+        if connection.vendor == 'sqlite' and options['concorrencia'] > 1:
+            self.stdout.write("Aviso: o SQLite serializa as escritas; nas rotas que gravam, os conflitos de trava aparecem como respostas 400.")
+
+        prefixo = str(time.time_ns())
+        objetos = self.criar_objetos(prefixo)
+        rotas = rotas_completas(objetos, amostras, prefixo, timezone.localdate() + timedelta(days=730))
+        abastecimento = criadoras(rotas)
+        if options['rotas']:
+            desconhecidas = set(options['rotas']) - {rota.nome for rota in rotas}
+            if desconhecidas:
+                raise CommandError(f"Rotas desconhecidas: {', '.join(sorted(desconhecidas))}.")
+            rotas = [rota for rota in rotas if rota.nome in options['rotas']]
+        else:
+            sem_carga = rotas_nomeadas() - {rota.nome for rota in rotas}
+            if sem_carga:
+                self.stdout.write(f"Aviso: rotas sem medição: {', '.join(sorted(sem_carga))}.")
+
+        # Cada rota é medida sozinha, com toda a concorrência, para que o custo de uma rota lenta
+        # (como os cadastros, dominados pelo hash de senha) não apareça na latência das outras.
+        resultados, criados = {}, {}
+        try:
+            with self.servidor(options) as url:
+                for rota in rotas:
+                    resultado = executar_carga(url, [rota], options['concorrencia'], options['duracao'],
+                                               options['aquecimento'], abastecimento)
+                    resultados[rota.nome] = resultado['rotas'][rota.nome]
+                    for reserva, ids in resultado['criados'].items():
+                        criados.setdefault(reserva, []).extend(ids)
+        finally:
+            self.apagar(objetos, criados)
+
+        resultado = {
+            'data': timezone.now().isoformat(),
+            'banco': connection.vendor,
+            'servidor': 'externo' if options['url'] else options['servidor'],
+            'concorrencia': options['concorrencia'],
+            'duracao': options['duracao'],
+            'dados': dados,
+            'rotas': resultados,
+        }
+        self.imprimir(resultado)
+        if options['saida']:
+            with open(options['saida'], 'w', encoding='utf-8') as arquivo:
+                json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Resultado gravado em {options['saida']}.")
+
+        if base is not None:
+            self.verificar(base, resultado, options)
+
+    def amostras(self, semente, quantidade=10000):
+        """
+        Ids do conjunto de dados sorteados pelas leituras, escolhidos antes de criar os objetos do benchmark.
+        A mesma semente no mesmo conjunto de dados escolhe os mesmos ids.
+        """
+        aleatorio = random.Random(semente)
+        amostras = {}
+        for nome, modelo in MODELOS.items():
+            ids = list(modelo.objects.order_by('pk').values_list('pk', flat=True))
+            amostras[nome] = aleatorio.sample(ids, min(len(ids), quantidade))
+        vets = list(Veterinario.objects.order_by('pk').values_list(
+            'id_veterinario', 'especialidade', 'inicio_expediente', 'fim_expediente', 'duracao_consulta',
+        ))
+        amostras['especialidades'] = sorted({especialidade for _, especialidade, *_ in vets})
+        agendas = [(id_veterinario, _expediente(*expediente)) for id_veterinario, _, *expediente in vets]
+        amostras['agendas'] = [agenda for agenda in agendas if agenda[1][2] > 0]
+        return amostras
+
+    def criar_objetos(self, prefixo):
+        """Usuário, pet, veterinário e consulta usados pelas rotas de atualização."""
+        usuario = Usuario.objects.create(nome='Benchmark', email=f'usuario{prefixo}@petstore.com', senha='!')
+        vet = Veterinario.objects.create(nome='Benchmark', especialidade='Clínico geral', email=f'vet{prefixo}@petstore.com', senha='!')
+        pet = Pet.objects.create(nome='Benchmark', especie='Canina', idade=3, dono_do_pet=usuario)
+        consulta = Consulta.objects.create(veterinario=vet, pet=pet)
+        return {
+            'usuario': {'id_usuario': usuario.pk, 'nome': usuario.nome, 'email': usuario.email},
+            'pet': {'id_pet': pet.pk, 'nome': pet.nome, 'especie': pet.especie, 'idade': pet.idade, 'dono_do_pet': usuario.pk},
+            'veterinario': {'id_veterinario': vet.pk, 'nome': vet.nome, 'especialidade': vet.especialidade, 'email': vet.email},
+            'consulta': {'id_consulta': consulta.pk},
+            'expediente': _expediente(vet.inicio_expediente, vet.fim_expediente, vet.duracao_consulta),
+        }
+
+    def apagar(self, objetos, criados):
+        """Apaga os objetos do benchmark e os criados durante a medição; pets e consultas saem em cascata."""
+        Usuario.objects.filter(pk__in=[objetos['usuario']['id_usuario'], *criados.get('usuario', [])]).delete()
+        Veterinario.objects.filter(pk__in=[objetos['veterinario']['id_veterinario'], *criados.get('veterinario', [])]).delete()
+        Pet.objects.filter(pk__in=criados.get('pet', [])).delete()
+        Consulta.objects.filter(pk__in=criados.get('consulta', [])).delete()
+
+    @contextmanager
+    def servidor(self, options):
+        if options['url']:
+            yield options['url']
+            return
+        servidor = comando_servidor(options['servidor'], options['porta'], options['workers'], options['threads'])
+        if servidor is None:
+            raise CommandError("Gunicorn não está instalado. Use --servidor runserver ou --url.")
+        comando, ambiente = servidor
+        processo = subprocess.Popen(
+            comando, cwd=settings.BASE_DIR, env={**os.environ, **ambiente},
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            if aguardar_resposta(options['porta'], '/metrics', options['limite_subida']) is None:
+                raise CommandError(f"O servidor não respondeu em {options['limite_subida']:.0f} s.")
+            yield f"http://127.0.0.1:{options['porta']}"
+        finally:
+            processo.terminate()
+            processo.wait()
+
+    def imprimir(self, resultado):
+        self.stdout.write(f"{'rota':<28} {'req':>7} {'erros':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  status")
+        for rota, resumo in resultado['rotas'].items():
+            status = ' '.join(f"{codigo}:{quantidade}" for codigo, quantidade in resumo.get('status', {}).items())
+            self.stdout.write(
+                f"{rota:<28} {resumo['requisicoes']:>7} {resumo['erros']:>6} {resumo['req_s']:>8.1f} "
+                f"{resumo['p50_ms']:>8.2f} {resumo['p95_ms']:>8.2f} {resumo['p99_ms']:>8.2f}  {status}"
+            )
+
+    def verificar(self, base, resultado, options):
+        for campo in ('banco', 'servidor', 'concorrencia', 'dados'):
+            if base.get(campo) != resultado[campo]:
+                self.stdout.write(f"Aviso: {campo} diferente da base ({base.get(campo)} -> {resultado[campo]}); a comparação pode não ser justa.")
+        regressoes = comparar(base, resultado, options['limite'], options['tolerancia_ms'])
+        if regressoes:
+            raise CommandError("Regressões em relação à base:\n" + "\n".join(regressoes))
+        self.stdout.write(self.style.SUCCESS(f"Nenhuma regressão acima de {options['limite']:.0%} em relação à base."))
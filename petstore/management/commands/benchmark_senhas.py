@@ -0,0 +1,58 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+from petstore.senhas import _inicializar_processo
+
+
+def _calcular_hashes(algoritmo, quantidade):
+    hasher = get_hasher(algoritmo)
+    salt = hasher.salt()
+    inicio = time.perf_counter()
+    for i in range(quantidade):
+        hasher.encode(f'@Senha{i}', salt)
+    return time.perf_counter() - inicio
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede quantos hashes de senha por segundo cada algoritmo configurado calcula, "
+        "num único núcleo e distribuído num pool de processos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hashes', type=int, default=20, help="Hashes calculados por processo.")
+        parser.add_argument('--processos', type=int, default=os.cpu_count(), help="Tamanho do pool na medição paralela.")
+        parser.add_argument('--algoritmos', nargs='*', default=list(settings.HASHERS_DISPONIVEIS))
+
+    def handle(self, *args, **options):
+        quantidade, processos = options['hashes'], options['processos']
+        self.stdout.write(f"{'algoritmo':<10} {'ms/hash':>9} {'hash/s (1 núcleo)':>18} {f'hash/s ({processos} proc.)':>18} {'hash/s/núcleo':>14}")
+
+        for nome in options['algoritmos']:
+            algoritmo = import_string(settings.HASHERS_DISPONIVEIS[nome]).algorithm
+            try:
+                duracao = _calcular_hashes(algoritmo, quantidade)
+            except ValueError as e:
+                self.stdout.write(f"{nome:<10} indisponível: {e}")
+                continue
+
+            with ProcessPoolExecutor(max_workers=processos, mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=_inicializar_processo) as pool:
+                # Aquece os processos (importação do Django) antes de medir.
+                list(pool.map(_calcular_hashes, [algoritmo] * processos, [1] * processos))
+                inicio = time.perf_counter()
+                list(pool.map(_calcular_hashes, [algoritmo] * processos, [quantidade] * processos))
+                paralelo = quantidade * processos / (time.perf_counter() - inicio)
+
+            self.stdout.write(
+                f"{nome:<10} {duracao / quantidade * 1000:>9.1f} {quantidade / duracao:>18.1f} "
+                f"{paralelo:>18.1f} {paralelo / processos:>14.1f}"
+            )
+
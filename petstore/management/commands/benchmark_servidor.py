@@ -0,0 +1,63 @@
+import os
+import subprocess
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from petstore.cache import campos_objeto
+from petstore.carga import SERVIDORES, aguardar_resposta, comando_servidor, executar_carga, rotas_padrao
+from petstore.models import Usuario, Pet, Veterinario, Consulta
+from petstore.sementes import semear
+
+
+class Command(BaseCommand):
+    help = (
+        "Sobe cada servidor (runserver e Gunicorn com workers ASGI ou gthread) numa porta local, mede "
+        "o tempo até a primeira resposta e a vazão com o mesmo teste de carga do teste_carga."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servidores', nargs='*', choices=SERVIDORES, default=list(SERVIDORES))
+        parser.add_argument('--porta', type=int, default=8500, help="Primeira porta usada; cada servidor usa a seguinte.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Workers do Gunicorn.")
+        parser.add_argument('--threads', type=int, default=8, help="Threads por worker gthread.")
+        parser.add_argument('--concorrencia', type=int, default=16, help="Clientes simultâneos.")
+        parser.add_argument('--duracao', type=float, default=10.0, help="Segundos de medição por servidor.")
+        parser.add_argument('--aquecimento', type=float, default=2.0, help="Segundos antes da medição.")
+        parser.add_argument('--limite-subida', type=float, default=60.0, help="Segundos máximos de espera pela subida.")
+        parser.add_argument('--semear', action='store_true', help="Cria dados sintéticos se o banco estiver vazio.")
+
+    def handle(self, *args, **options):
+        if options['semear'] and not Consulta.objects.exists():
+            semear(usuarios=100, veterinarios=10, consultas=1000)
+        objetos = [modelo.objects.values(*campos_objeto(modelo)).first() for modelo in (Usuario, Pet, Veterinario, Consulta)]
+        if None in objetos:
+            raise CommandError("O banco precisa ter ao menos um usuário, pet, veterinário e consulta. Use --semear.")
+        rotas = rotas_padrao(*objetos)
+
+        self.stdout.write(f"{'servidor':<18} {'subida s':>9} {'req/s':>9} {'erros':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for i, nome in enumerate(options['servidores']):
+            porta = options['porta'] + i
+            servidor = comando_servidor(nome, porta, options['workers'], options['threads'])
+            if servidor is None:
+                raise CommandError("Gunicorn não está instalado.")
+            comando, ambiente = servidor
+            processo = subprocess.Popen(
+                comando, cwd=settings.BASE_DIR, env={**os.environ, **ambiente},
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            try:
+                subida = aguardar_resposta(porta, rotas[0].caminho, options['limite_subida'])
+                if subida is None:
+                    self.stdout.write(f"{nome:<18} não respondeu em {options['limite_subida']:.0f} s")
+                    continue
+                total = executar_carga(
+                    f'http://127.0.0.1:{porta}', rotas, options['concorrencia'], options['duracao'], options['aquecimento'],
+                )['total']
+            finally:
+                processo.terminate()
+                processo.wait()
+            self.stdout.write(
+                f"{nome:<18} {subida:>9.2f} {total['req_s']:>9.1f} {total['erros']:>6} "
+                f"{total['p50_ms']:>8.2f} {total['p95_ms']:>8.2f} {total['p99_ms']:>8.2f}"
+            )
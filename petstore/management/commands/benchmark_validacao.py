@@ -0,0 +1,158 @@
+import random
+import re
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from petstore.esquemas import ESQUEMA_USUARIO
+from petstore.views import validar_cadastros_em_lote
+
+
+def validar_senha_antiga(senha):
+    """validar_senha como era em views.py, antes de esquemas.py."""
+    especiais = '!@#$%&*-+()<>|\\=-'
+    minusculas = 'ABCDEFGHIKLMNOPQRSTUVWXYZÇ'.lower()
+    maiusculas = 'ABCDEFGHIKLMNOPQRSTUVWXYZÇ'
+
+    flag_especial = any(caracter in especiais for caracter in senha)
+    flag_maiuscula = any(caracter in maiusculas for caracter in senha)
+    flag_minuscula = any(caracter in minusculas for caracter in senha)
+
+    if len(senha) <= 6:
+        return "Sua senha deve conter no mínimo 7 caracteres."
+    elif len(senha) > 200:
+        return "Sua senha deve conter no máximo 200 caracteres."
+
+    if not flag_especial or not flag_maiuscula or not flag_minuscula:
+        return "Sua senha deve conter caracteres especiais, maiúsculas e minúsculas."
+
+    return None
+
+
+def validar_email_antigo(email):
+    """validar_email como era em views.py, antes de esquemas.py."""
+    caracteres_na0_permitidos = set("&='-+,<>~!$%^*}{?¨|/'\\][;")
+
+    if any(caractere in caracteres_na0_permitidos for caractere in email):
+        return "Caractere nao permitido na composicao do email."
+    elif ".." in email:
+        return "Um email nao pode ter dois pontos consecutivos em sua composicao."
+    elif " " in email:
+        return "Espacos vazios nao sao permitidos na composicao do email."
+    elif "@" not in email:
+        return "@ é obrigatorio no email."
+
+    local, _, dominio = email.partition("@")
+    if len(local) < 3:
+        return "O numero de caracteres deve ser no minimo que 3 antes do @."
+    if len(email) > 64:
+        return "O email deve ter no maximo 64 caracteres."
+    if "." not in dominio:
+        return "Domínio inválido na composicao do email. Ele deve conter pelo menos 1 ponto."
+
+    regex_email = r'^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z-.]{3,}$'
+    if not re.match(regex_email, email):
+        return "Padrão de email incorreto."
+    return None
+
+
+def validar_lote_antigo(registros, erros, campos_texto=('nome',)):
+    """Laço de validar_cadastros_em_lote como era em views.py, antes de esquemas.py."""
+    campos = (*campos_texto, 'email', 'senha')
+    emails_no_lote = set()
+    validos = []
+    for indice, registro in registros:
+        if any(not isinstance(registro.get(campo), str) for campo in campos):
+            erro = f"Os campos {', '.join(campos)} devem ser preenchidos com texto."
+        else:
+            erro = validar_email_antigo(registro['email']) or validar_senha_antiga(registro['senha'])
+            if not erro and registro['email'].upper() in emails_no_lote:
+                erro = "E-mail repetido no lote."
+        if erro:
+            erros.append({'indice': indice, 'erro': erro})
+        else:
+            emails_no_lote.add(registro['email'].upper())
+            validos.append((indice, registro))
+    return validos
+
+
+def gerar_registros(quantidade, invalidos, semente):
+    """Cadastros de usuário; a fração "invalidos" tem um erro de e-mail, senha, tipo ou e-mail repetido."""
+    aleatorio = random.Random(semente)
+    defeitos = (
+        lambda r: r.update(email=r['email'].replace('@', '')),
+        lambda r: r.update(email='ab' + r['email'][r['email'].index('@'):]),
+        lambda r: r.update(email=r['email'].replace('.com', '.c')),
+        lambda r: r.update(email=r['email'].replace('@', '!@')),
+        lambda r: r.update(senha='curta'),
+        lambda r: r.update(senha=r['senha'].lower()),
+        lambda r: r.update(senha=12345678),
+        lambda r: r.update(email='usuario0@petstore.com'),
+    )
+    registros = []
+    for i in range(quantidade):
+        registro = {'nome': f'Usuario {i}', 'email': f'usuario{i}@petstore.com', 'senha': f'@Senha{i:06d}x'}
+        if i and aleatorio.random() < invalidos:
+            aleatorio.choice(defeitos)(registro)
+        registros.append((i, registro))
+    return registros
+
+
+def _medir(funcao, minimo):
+    """Executa a função repetidamente por pelo menos "minimo" segundos e retorna o tempo médio por execução."""
+    execucoes, inicio = 0, time.perf_counter()
+    while True:
+        funcao()
+        execucoes += 1
+        decorrido = time.perf_counter() - inicio
+        if decorrido >= minimo:
+            return decorrido / execucoes
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara o custo por registro da validação de cadastros de usuário com as funções antigas de views.py "
+        "(laços caractere a caractere) e com os esquemas compilados de petstore/esquemas.py, num registro por vez "
+        "(o que cada requisição faz) e em lotes (validar_lote). Confere também que os erros são os mesmos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanhos', nargs='*', type=int, default=[1000, 10000], help="Registros por lote.")
+        parser.add_argument('--invalidos', type=float, default=0.2, help="Fração de registros com algum erro.")
+        parser.add_argument('--minimo', type=float, default=0.5, help="Segundos mínimos de medição por caso.")
+        parser.add_argument('--semente', type=int, default=42)
+
+    def handle(self, *args, **options):
+        def um_antigo(registros):
+            for _, registro in registros:
+                if any(not isinstance(registro.get(campo), str) for campo in ('nome', 'email', 'senha')):
+                    continue
+                validar_email_antigo(registro['email']) or validar_senha_antiga(registro['senha'])
+
+        def um_esquema(registros):
+            validar = ESQUEMA_USUARIO.validar
+            for _, registro in registros:
+                validar(registro)
+
+        casos = (
+            ('registro', um_antigo, um_esquema),
+            ('lote', lambda registros: validar_lote_antigo(registros, []),
+             lambda registros: validar_cadastros_em_lote(registros, [], ESQUEMA_USUARIO)),
+        )
+
+        self.stdout.write(f"{'modo':<9} {'registros':>9} {'antigo µs/reg':>14} {'esquema µs/reg':>15} {'x antigo':>9}")
+        for tamanho in options['tamanhos']:
+            registros = gerar_registros(tamanho, options['invalidos'], options['semente'])
+            erros_antigos, erros_novos = [], []
+            validar_lote_antigo(registros, erros_antigos)
+            validar_cadastros_em_lote(registros, erros_novos, ESQUEMA_USUARIO)
+            # A resposta do lote ordena os erros pela posição (lotes.resposta_lote).
+            if sorted(erros_antigos, key=lambda erro: erro['indice']) != sorted(erros_novos, key=lambda erro: erro['indice']):
+                raise CommandError(f"Os esquemas deram erros diferentes das funções antigas num lote de {tamanho} registros.")
+            for modo, antigo, esquema in casos:
+                duracao_antiga = _medir(lambda: antigo(registros), options['minimo'])
+                duracao = _medir(lambda: esquema(registros), options['minimo'])
+                self.stdout.write(
+                    f"{modo:<9} {tamanho:>9} {duracao_antiga * 1e6 / tamanho:>14.3f} {duracao * 1e6 / tamanho:>15.3f} "
+                    f"{duracao_antiga / duracao:>9.1f}"
+                )
@@ -0,0 +1,49 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from petstore.agenda import concluir_consultas_passadas
+
+
+class Command(BaseCommand):
+    help = (
+        "Marca como realizadas as consultas cujo horário já passou, em lotes de um UPDATE cada. "
+        "Pode ser agendado (cron) ou rodar continuamente como worker com --intervalo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=settings.CONCLUSAO_LOTE, help="Consultas por UPDATE.")
+        parser.add_argument('--pausa', type=float, default=settings.CONCLUSAO_PAUSA, help="Segundos de espera entre os lotes.")
+        parser.add_argument('--tempo-maximo', type=float, default=None, help="Para a execução depois deste tempo em segundos.")
+        parser.add_argument(
+            '--intervalo', type=float, default=None,
+            help="Roda como worker: repete a conclusão a cada INTERVALO segundos, até ser interrompido.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            inicio = time.monotonic()
+            total, lotes = self.concluir(options)
+            self.stdout.write(f"{total} consultas marcadas como realizadas em {lotes} lote(s), {time.monotonic() - inicio:.2f}s.")
+            if options['intervalo'] is None:
+                return
+            time.sleep(options['intervalo'])
+            close_old_connections()
+
+    def concluir(self, options):
+        """Roda lotes até acabarem as consultas passadas ou o tempo máximo, com uma pausa entre eles."""
+        # O horário de referência é fixo durante a execução, assim ela termina mesmo com consultas passando a cada minuto.
+        agora = timezone.now()
+        limite = time.monotonic() + options['tempo_maximo'] if options['tempo_maximo'] else None
+        total = lotes = 0
+        while True:
+            alteradas = concluir_consultas_passadas(options['lote'], agora)
+            total += alteradas
+            lotes += 1
+            # Um lote menor que --lote significa que o SELECT dele não achou mais consultas pendentes livres.
+            if alteradas < options['lote'] or (limite is not None and time.monotonic() >= limite):
+                return total, lotes
+            time.sleep(options['pausa'])
@@ -0,0 +1,41 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from petstore.sementes import gerar_em_volume
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera milhões de usuários, pets, veterinários e consultas sintéticos e determinísticos para benchmarks "
+        "e planejamento de capacidade. No PostgreSQL as linhas são enviadas com COPY; nos outros bancos, com bulk_create."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=1000000)
+        parser.add_argument('--pets-por-usuario', type=float, default=1.8, help="Média de pets por usuário.")
+        parser.add_argument('--veterinarios', type=int, default=5000)
+        parser.add_argument('--consultas', type=int, default=5000000)
+        parser.add_argument('--semente', type=int, default=42)
+        parser.add_argument('--inicio', type=date.fromisoformat, default=None,
+                            help="Dia da primeira consulta (AAAA-MM-DD). Por padrão, 80%% das consultas ficam no passado.")
+        parser.add_argument('--sem-copy', action='store_true', help="Usa bulk_create mesmo no PostgreSQL, para comparar.")
+        parser.add_argument('--lote', type=int, default=10000, help="Linhas por bulk_create.")
+
+    def handle(self, *args, **options):
+        usar_copy = connection.vendor == 'postgresql' and not options['sem_copy']
+        self.stdout.write(f"Gravando com {'COPY' if usar_copy else 'bulk_create'} ({connection.vendor}).")
+
+        def ao_gravar(tabela, linhas, segundos):
+            self.stdout.write(f"{tabela:<22} {linhas:>10} linhas em {segundos:>7.1f}s  {linhas / max(segundos, 1e-9):>10.0f} linhas/s")
+
+        inicio = time.perf_counter()
+        resultado = gerar_em_volume(
+            usuarios=options['usuarios'], pets_por_usuario=options['pets_por_usuario'],
+            veterinarios=options['veterinarios'], consultas=options['consultas'], semente=options['semente'],
+            inicio=options['inicio'], usar_copy=usar_copy, lote=options['lote'], ao_gravar=ao_gravar,
+        )
+        total, decorrido = sum(linhas for linhas, _ in resultado.values()), time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(f"{total} linhas em {decorrido:.1f}s ({total / decorrido:.0f} linhas/s)."))
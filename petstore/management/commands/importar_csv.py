@@ -0,0 +1,53 @@
+import csv
+import time
+from contextlib import ExitStack
+
+from django.core.management.base import BaseCommand, CommandError
+
+from petstore.importacao import COLUNAS, ArquivoInvalido, importar
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa usuários, veterinários e pets de arquivos CSV com cabeçalho, numa única transação. "
+        "Os arquivos são carregados em tabelas temporárias (com COPY no PostgreSQL), validados com SQL "
+        "e copiados para as tabelas da aplicação; as linhas recusadas são listadas com o erro de cada uma."
+    )
+
+    def add_arguments(self, parser):
+        for tipo, colunas in COLUNAS.items():
+            parser.add_argument(f'--{tipo}', metavar='ARQUIVO', help=f"CSV com as colunas {', '.join(colunas)}.")
+        parser.add_argument('--lote', type=int, help="Senhas por bloco de hash e linhas por INSERT fora do PostgreSQL. Padrão: IMPORTACAO_LOTE.")
+        parser.add_argument('--rejeitados', metavar='ARQUIVO', help="Grava as linhas recusadas (arquivo, linha, erro) neste CSV.")
+
+    def handle(self, *args, **options):
+        caminhos = {tipo: options[tipo] for tipo in COLUNAS if options[tipo]}
+        if not caminhos:
+            raise CommandError(f"Informe ao menos um arquivo: {', '.join(f'--{tipo}' for tipo in COLUNAS)}.")
+
+        inicio = time.perf_counter()
+        try:
+            with ExitStack() as pilha:
+                arquivos = {tipo: pilha.enter_context(open(caminho, 'rb')) for tipo, caminho in caminhos.items()}
+                resultado = importar(arquivos, options['lote'])
+        except (ArquivoInvalido, OSError) as erro:
+            raise CommandError(f"Nada foi importado: {erro}")
+        decorrido = time.perf_counter() - inicio
+
+        rejeitados = resultado['rejeitados']
+        for tipo, linhas in resultado['importados'].items():
+            recusadas = sum(1 for rejeitado in rejeitados if rejeitado['arquivo'] == tipo)
+            self.stdout.write(f"{tipo:<13} {linhas:>10} importados {recusadas:>8} recusados")
+        for rejeitado in rejeitados[:20]:
+            self.stdout.write(f"  {rejeitado['arquivo']}, linha {rejeitado['linha']}: {rejeitado['erro']}")
+        if len(rejeitados) > 20:
+            self.stdout.write(f"  ... e mais {len(rejeitados) - 20} linhas recusadas.")
+        if options['rejeitados']:
+            with open(options['rejeitados'], 'w', newline='', encoding='utf-8') as arquivo:
+                escritor = csv.DictWriter(arquivo, fieldnames=('arquivo', 'linha', 'erro'))
+                escritor.writeheader()
+                escritor.writerows(rejeitados)
+            self.stdout.write(f"Linhas recusadas gravadas em {options['rejeitados']}.")
+
+        total = sum(resultado['importados'].values()) + len(rejeitados)
+        self.stdout.write(self.style.SUCCESS(f"{total} linhas lidas em {decorrido:.1f}s ({total / max(decorrido, 1e-9):.0f} linhas/s)."))
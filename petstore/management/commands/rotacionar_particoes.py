@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from petstore import particoes
+
+
+class Command(BaseCommand):
+    help = (
+        "Cria as partições mensais da tabela de consultas para o mês atual e os próximos, move para elas as "
+        "consultas que estavam na partição padrão e, com --reter, apaga os meses mais antigos. Agende-o no cron "
+        "(uma vez por dia basta); só funciona no PostgreSQL, depois da migração 0011."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--meses-a-frente', type=int, default=settings.PARTICOES_MESES_A_FRENTE,
+            help="Meses depois do atual que já devem ter partição.",
+        )
+        parser.add_argument(
+            '--reter', type=int, default=settings.PARTICOES_RETENCAO_MESES,
+            help="Meses antes do atual mantidos; as partições mais antigas são apagadas com as consultas. 0 mantém todas.",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("A tabela de consultas só é particionada no PostgreSQL.")
+        with transaction.atomic(), connection.cursor() as cursor:
+            if not particoes.particionada(cursor):
+                raise CommandError("A tabela de consultas não é particionada. Rode python manage.py migrate.")
+            criadas, removidas = particoes.rotacionar(cursor, options['meses_a_frente'], options['reter'])
+        for nome, movidas in criadas:
+            self.stdout.write(f"Partição {nome} criada ({movidas} consultas movidas da partição padrão).")
+        for nome in removidas:
+            self.stdout.write(f"Partição {nome} removida.")
+        if not criadas and not removidas:
+            self.stdout.write("Nenhuma partição a criar ou remover.")
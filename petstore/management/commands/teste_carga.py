@@ -0,0 +1,59 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from petstore.cache import campos_objeto
+from petstore.carga import executar_carga, rotas_padrao
+from petstore.models import Usuario, Pet, Veterinario, Consulta
+from petstore.sementes import semear
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede latência (p50/p95/p99) e requisições por segundo de servidores já em execução, "
+        "por exemplo o WSGI síncrono e o ASGI com as views assíncronas. Os servidores devem usar "
+        "o mesmo banco que este comando."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--alvo', action='append', metavar='NOME=URL',
+            help="Servidor a ser medido, ex.: --alvo wsgi=http://127.0.0.1:8000 --alvo asgi=http://127.0.0.1:8001.",
+        )
+        parser.add_argument('--concorrencia', type=int, default=16, help="Clientes simultâneos.")
+        parser.add_argument('--duracao', type=float, default=10.0, help="Segundos de medição por servidor.")
+        parser.add_argument('--aquecimento', type=float, default=2.0, help="Segundos antes da medição.")
+        parser.add_argument('--semear', action='store_true', help="Cria dados sintéticos se o banco estiver vazio.")
+        parser.add_argument('--json', action='store_true', help="Imprime o resultado em JSON.")
+
+    def handle(self, *args, **options):
+        alvos = {}
+        for alvo in options['alvo'] or ['local=http://127.0.0.1:8000']:
+            nome, separador, url = alvo.partition('=')
+            if not separador or not url:
+                raise CommandError(f"Alvo inválido: {alvo}. Use NOME=URL.")
+            alvos[nome] = url
+
+        if options['semear'] and not Consulta.objects.exists():
+            semear(usuarios=100, veterinarios=10, consultas=1000)
+        objetos = [modelo.objects.values(*campos_objeto(modelo)).first() for modelo in (Usuario, Pet, Veterinario, Consulta)]
+        if None in objetos:
+            raise CommandError("O banco precisa ter ao menos um usuário, pet, veterinário e consulta. Use --semear.")
+        rotas = rotas_padrao(*objetos)
+
+        resultados = {
+            nome: executar_carga(url, rotas, options['concorrencia'], options['duracao'], options['aquecimento'])
+            for nome, url in alvos.items()
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(resultados, indent=2))
+            return
+
+        self.stdout.write(f"{'servidor':<10} {'rota':<20} {'req':>8} {'erros':>6} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for nome, resultado in resultados.items():
+            for rota, resumo in [*resultado['rotas'].items(), ('total', resultado['total'])]:
+                self.stdout.write(
+                    f"{nome:<10} {rota:<20} {resumo['requisicoes']:>8} {resumo['erros']:>6} {resumo['req_s']:>9.1f} "
+                    f"{resumo['p50_ms']:>8.2f} {resumo['p95_ms']:>8.2f} {resumo['p99_ms']:>8.2f}"
+                )
@@ -0,0 +1,132 @@
+"""
+Métricas da aplicação no formato do Prometheus, publicadas em /metrics.
+
+As métricas de requisições usam como rótulo o name da rota em setup/urls.py (ex.: retorna_pet).
+Requisições que não correspondem a nenhuma rota ficam com a rota "desconhecida".
+
+Com a variável de ambiente PROMETHEUS_MULTIPROC_DIR (definida pelo gunicorn.conf.py), cada worker grava
+as suas métricas em arquivos nesse diretório e /metrics soma os arquivos de todos os workers, então
+qualquer worker que atenda a coleta responde pelo contêiner inteiro.
+"""
+import os
+import time
+import weakref
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.http import HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+)
+
+DURACAO_REQUISICAO = Histogram(
+    'petstore_requisicao_duracao_segundos', "Duração das requisições, por rota e método.",
+    ['rota', 'metodo'],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+RESPOSTAS = Counter(
+    'petstore_respostas', "Respostas enviadas, por rota, método e status.",
+    ['rota', 'metodo', 'status'],
+)
+EM_ANDAMENTO = Gauge(
+    'petstore_requisicoes_em_andamento', "Requisições sendo atendidas no momento.",
+    multiprocess_mode='livesum',
+)
+CACHE = Counter(
+    'petstore_cache_leituras', "Leituras do cache de objetos e do índice de horários livres, por resultado.",
+    ['resultado'],
+)
+CACHE_ACERTOS = CACHE.labels('acerto')
+CACHE_FALTAS = CACHE.labels('falta')
+LIMITE_RECUSADAS = Counter(
+    'petstore_limite_recusadas', "Requisições recusadas pelo limite de requisições, por rota e por onde a recusa foi decidida (local ou cache).",
+    ['rota', 'origem'],
+)
+LIMITE_FALHAS = Counter(
+    'petstore_limite_falhas_redis', "Verificações do limite de requisições em que o Redis falhou e o balde local do worker foi usado.",
+)
+LEITURAS = Counter(
+    'petstore_leituras', "Requisições das rotas de leitura em réplica (REPLICAS_ROTAS), pelo banco que as atendeu.",
+    ['banco'],
+)
+REPLICA_ATRASO = Gauge(
+    'petstore_replica_atraso_segundos', "Atraso de replicação medido em cada réplica; -1 se ela não respondeu.",
+    ['banco'],
+    multiprocess_mode='max',
+)
+CONEXOES_CRIADAS = Counter(
+    'petstore_db_conexoes_criadas', "Conexões abertas com o banco. Crescendo rápido, CONN_MAX_AGE não está reaproveitando conexões.",
+)
+CONEXOES_ABERTAS = Gauge(
+    'petstore_db_conexoes_abertas', "Conexões com o banco abertas no momento.",
+    multiprocess_mode='livesum',
+)
+
+# Conexões do processo, usadas para calcular CONEXOES_ABERTAS ao fim de cada requisição.
+_conexoes = weakref.WeakSet()
+
+
+def registrar_conexao(sender, connection, **kwargs):
+    """Recebe o sinal connection_created e conta a nova conexão."""
+    _conexoes.add(connection)
+    CONEXOES_CRIADAS.inc()
+
+
+def _atualizar_conexoes_abertas():
+    CONEXOES_ABERTAS.set(sum(1 for conexao in list(_conexoes) if conexao.connection is not None))
+
+
+def registrar_requisicao(request, response, inicio):
+    """Registra a duração e o status de uma requisição já respondida."""
+    correspondencia = getattr(request, 'resolver_match', None)
+    rota = (correspondencia.url_name if correspondencia else None) or 'desconhecida'
+    DURACAO_REQUISICAO.labels(rota, request.method).observe(time.perf_counter() - inicio)
+    RESPOSTAS.labels(rota, request.method, response.status_code).inc()
+    _atualizar_conexoes_abertas()
+
+
+class MetricasMiddleware:
+    """Middleware que alimenta as métricas de requisições. Funciona sob WSGI e ASGI."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        inicio = time.perf_counter()
+        EM_ANDAMENTO.inc()
+        try:
+            response = self.get_response(request)
+        finally:
+            EM_ANDAMENTO.dec()
+        registrar_requisicao(request, response, inicio)
+        return response
+
+    async def __acall__(self, request):
+        inicio = time.perf_counter()
+        EM_ANDAMENTO.inc()
+        try:
+            response = await self.get_response(request)
+        finally:
+            EM_ANDAMENTO.dec()
+        registrar_requisicao(request, response, inicio)
+        return response
+
+
+def registro():
+    """Registro lido por /metrics: o do processo, ou a soma dos arquivos de todos os workers no modo multiprocesso."""
+    if not os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        return REGISTRY
+    registro_multiprocesso = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registro_multiprocesso)
+    return registro_multiprocesso
+
+
+def metricas(request):
+    """View de /metrics, no formato de texto do Prometheus."""
+    return HttpResponse(generate_latest(registro()), content_type=CONTENT_TYPE_LATEST)
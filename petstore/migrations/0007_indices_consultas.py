@@ -0,0 +1,54 @@
+# Generated by Django 4.2.16 on 2026-10-18 10:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('petstore', '0006_alter_veterinario_senha'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='consulta',
+            index=models.Index(fields=['veterinario', 'data_consulta'], name='consulta_vet_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='consulta',
+            index=models.Index(fields=['pet', 'realizada'], name='consulta_pet_realizada_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='consulta',
+            index=models.Index(fields=['id_consulta'], include=('data_consulta', 'realizada', 'veterinario', 'pet'), name='consulta_cobertura_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pet',
+            index=models.Index(fields=['dono_do_pet', 'id_pet'], name='pet_dono_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usuario',
+            index=models.Index(django.db.models.functions.text.Upper('email'), name='usuario_email_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='veterinario',
+            index=models.Index(django.db.models.functions.text.Upper('email'), name='veterinario_email_upper_idx'),
+        ),
+        migrations.AlterField(
+            model_name='consulta',
+            name='pet',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='petstore.pet'),
+        ),
+        migrations.AlterField(
+            model_name='consulta',
+            name='veterinario',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='petstore.veterinario'),
+        ),
+        migrations.AlterField(
+            model_name='pet',
+            name='dono_do_pet',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='petstore.usuario'),
+        ),
+    ]
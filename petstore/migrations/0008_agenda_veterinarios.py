@@ -0,0 +1,46 @@
+# Generated by Django 4.2.16 on 2026-10-18 10:58
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('petstore', '0007_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='veterinario',
+            name='duracao_consulta',
+            field=models.PositiveSmallIntegerField(default=30),
+        ),
+        migrations.AddField(
+            model_name='veterinario',
+            name='fim_expediente',
+            field=models.TimeField(default=datetime.time(19, 0)),
+        ),
+        migrations.AddField(
+            model_name='veterinario',
+            name='inicio_expediente',
+            field=models.TimeField(default=datetime.time(7, 0)),
+        ),
+        migrations.AddConstraint(
+            model_name='consulta',
+            constraint=models.UniqueConstraint(fields=('veterinario', 'data_consulta'), name='consulta_vet_horario_unico'),
+        ),
+        migrations.AddConstraint(
+            model_name='veterinario',
+            constraint=models.CheckConstraint(check=models.Q(('inicio_expediente__lt', models.F('fim_expediente'))), name='veterinario_expediente_valido'),
+        ),
+        migrations.AddConstraint(
+            model_name='veterinario',
+            constraint=models.CheckConstraint(check=models.Q(('duracao_consulta__gt', 0)), name='veterinario_duracao_positiva'),
+        ),
+        # O índice da restrição única substitui o consulta_vet_data_idx, removido só depois de criada.
+        migrations.RemoveIndex(
+            model_name='consulta',
+            name='consulta_vet_data_idx',
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-18 11:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('petstore', '0008_agenda_veterinarios'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='consulta',
+            index=models.Index(condition=models.Q(('realizada', False)), fields=['data_consulta'], name='consulta_pendente_data_idx'),
+        ),
+    ]
@@ -0,0 +1,143 @@
+"""
+Particiona a tabela de consultas por mês de data_consulta no PostgreSQL (ver petstore/particoes.py).
+
+O SQL fica congelado aqui, sem importar petstore.particoes nem ler PARTICOES_MESES_A_FRENTE: mudanças no módulo
+ou nas configurações não alteram o que esta migração faz numa base que ainda não a rodou. Só os limites dos
+meses seguem o TIME_ZONE, porque as partições criadas depois por rotacionar_particoes precisam se encaixar nas
+daqui.
+
+A chave primária da tabela deixa de existir: o PostgreSQL exigiria que ela incluísse data_consulta, que pode ser
+nula. Cada partição tem a sua chave primária (id_consulta), mas nada no banco impede o mesmo id_consulta em duas
+partições; os ids vêm todos da mesma sequência.
+"""
+from datetime import date, datetime
+
+from django.db import migrations
+from django.utils import timezone
+
+TABELA = 'petstore_consulta'
+ANTIGA = 'petstore_consulta_antiga'
+PADRAO = 'petstore_consulta_padrao'
+SEQUENCIA = 'petstore_consulta_id_consulta_seq'
+SEQUENCIA_NOVA = 'petstore_consulta_id_consulta_seq_nova'
+# Meses depois do atual criados pela migração; os seguintes ficam com rotacionar_particoes.
+MESES_A_FRENTE = 3
+
+RELKIND = "SELECT relkind FROM pg_class WHERE oid = to_regclass('petstore_consulta')"
+# Restrições únicas e chaves estrangeiras, recriadas com os mesmos nomes depois da troca da tabela.
+RESTRICOES = (
+    "SELECT 'ALTER TABLE petstore_consulta ADD CONSTRAINT ' || quote_ident(conname) || ' ' || pg_get_constraintdef(oid) "
+    "FROM pg_constraint WHERE conrelid = 'petstore_consulta'::regclass AND contype IN ('u', 'f') ORDER BY conname"
+)
+# Índices que não pertencem a uma restrição. Nas tabelas particionadas a definição vem com ON ONLY, que não
+# criaria os índices das partições.
+INDICES = (
+    "SELECT replace(pg_get_indexdef(indexrelid), ' ON ONLY ', ' ON ') FROM pg_index "
+    "WHERE indrelid = 'petstore_consulta'::regclass AND NOT EXISTS "
+    "(SELECT 1 FROM pg_constraint WHERE conrelid = pg_index.indrelid AND conindid = pg_index.indexrelid) "
+    "ORDER BY indexrelid"
+)
+MESES_COM_CONSULTAS = (
+    "SELECT DISTINCT date_trunc('month', data_consulta AT TIME ZONE %s)::date FROM petstore_consulta_antiga "
+    "WHERE data_consulta IS NOT NULL"
+)
+
+
+def _limites(mes):
+    fuso = timezone.get_default_timezone()
+    ano, indice = divmod(mes.year * 12 + mes.month, 12)
+    return datetime(mes.year, mes.month, 1, tzinfo=fuso), datetime(ano, indice + 1, 1, tzinfo=fuso)
+
+
+def _trocar_tabela(cursor, criar):
+    """Renomeia a tabela, cria a nova com criar(), copia os dados e recria as restrições e os índices."""
+    cursor.execute(RESTRICOES)
+    definicoes = [definicao for definicao, in cursor.fetchall()]
+    cursor.execute(INDICES)
+    definicoes += [definicao for definicao, in cursor.fetchall()]
+    cursor.execute(f"ALTER TABLE {TABELA} RENAME TO {ANTIGA}")
+    criar()
+    cursor.execute(f"INSERT INTO {TABELA} SELECT * FROM {ANTIGA}")
+    cursor.execute(f"DROP TABLE {ANTIGA}")
+    for definicao in definicoes:
+        cursor.execute(definicao)
+    cursor.execute(f"ANALYZE {TABELA}")
+
+
+def particionar(apps, schema_editor):
+    # Só o PostgreSQL tem partições declarativas; nos outros bancos a tabela continua simples.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(RELKIND)
+        if cursor.fetchone() == ('p',):
+            return
+
+        def criar():
+            # Antes da versão 17 uma tabela particionada não aceita coluna identity: id_consulta passa a usar uma
+            # sequência, criada com outro nome porque o da identity só fica livre quando a tabela antiga sai.
+            cursor.execute(f"CREATE SEQUENCE {SEQUENCIA_NOVA}")
+            cursor.execute(
+                f"CREATE TABLE {TABELA} (LIKE {ANTIGA} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+                "PARTITION BY RANGE (data_consulta)"
+            )
+            cursor.execute(f"ALTER TABLE {TABELA} ALTER COLUMN id_consulta SET DEFAULT nextval('{SEQUENCIA_NOVA}')")
+            cursor.execute(f"CREATE TABLE {PADRAO} PARTITION OF {TABELA} DEFAULT")
+            cursor.execute(f"ALTER TABLE {PADRAO} ADD PRIMARY KEY (id_consulta)")
+
+            cursor.execute(MESES_COM_CONSULTAS, [timezone.get_default_timezone_name()])
+            atual = timezone.localdate().replace(day=1)
+            meses = {mes for mes, in cursor.fetchall()}
+            for i in range(MESES_A_FRENTE + 1):
+                ano, indice = divmod(atual.year * 12 + atual.month - 1 + i, 12)
+                meses.add(date(ano, indice + 1, 1))
+            for mes in sorted(meses):
+                nome = f"{TABELA}_p{mes:%Y_%m}"
+                inicio, fim = _limites(mes)
+                cursor.execute(f"CREATE TABLE {nome} (LIKE {TABELA} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+                cursor.execute(f"ALTER TABLE {nome} ADD PRIMARY KEY (id_consulta)")
+                # DDL não aceita parâmetros; as datas vêm de date e não do cliente.
+                cursor.execute(
+                    f"ALTER TABLE {TABELA} ATTACH PARTITION {nome} "
+                    f"FOR VALUES FROM ('{inicio.isoformat()}') TO ('{fim.isoformat()}')"
+                )
+            cursor.execute(
+                f"SELECT setval('{SEQUENCIA_NOVA}', COALESCE(MAX(id_consulta), 0) + 1, false) FROM {ANTIGA}"
+            )
+
+        _trocar_tabela(cursor, criar)
+        cursor.execute(f"ALTER SEQUENCE {SEQUENCIA_NOVA} RENAME TO {SEQUENCIA}")
+        cursor.execute(f"ALTER SEQUENCE {SEQUENCIA} OWNED BY {TABELA}.id_consulta")
+
+
+def desparticionar(apps, schema_editor):
+    """Volta a uma tabela simples, com a chave primária e id_consulta identity como o Django cria."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(RELKIND)
+        if cursor.fetchone() != ('p',):
+            return
+
+        def criar():
+            cursor.execute(f"CREATE TABLE {TABELA} (LIKE {ANTIGA} INCLUDING CONSTRAINTS)")
+
+        _trocar_tabela(cursor, criar)
+        # Falha se o mesmo id_consulta estiver em duas partições, o que a tabela particionada não impedia.
+        cursor.execute(f"ALTER TABLE {TABELA} ADD PRIMARY KEY (id_consulta)")
+        cursor.execute(f"ALTER TABLE {TABELA} ALTER COLUMN id_consulta ADD GENERATED BY DEFAULT AS IDENTITY")
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence('{TABELA}', 'id_consulta'), COALESCE(MAX(id_consulta), 0) + 1, false) "
+            f"FROM {TABELA}"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('petstore', '0010_versao_das_linhas'),
+    ]
+
+    operations = [
+        migrations.RunPython(particionar, desparticionar),
+    ]
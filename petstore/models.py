@@ -1,7 +1,169 @@
-from django.db import models
+from datetime import time
 
+from asgiref.sync import sync_to_async
+from django.db import OperationalError, connections, models, router, transaction
+from django.db.models import Exists, F
+from django.db.models.functions import Upper
+from django.utils import timezone
+from .cache import invalidar_objetos
 
-class Usuario(models.Model):
+
+def suporta_update_returning(conexao):
+    """Indica se o banco aceita UPDATE ... RETURNING (PostgreSQL e SQLite 3.35 ou mais novo)."""
+    if conexao.vendor == 'sqlite':
+        return conexao.Database.sqlite_version_info >= (3, 35)
+    return conexao.vendor == 'postgresql'
+
+
+def falha_de_serializacao(erro):
+    """Se o erro do banco é uma falha de serialização do PostgreSQL (SQLSTATE 40001), que pode ser repetida."""
+    causa = erro.__cause__
+    return (getattr(causa, 'pgcode', None) or getattr(causa, 'sqlstate', None)) == '40001'
+
+
+def repetir_falha_de_serializacao(funcao, using):
+    """
+    Executa funcao() e, fora de uma transação, repete uma vez se ela falhar por serialização.
+
+    Na tabela particionada de consultas (particoes.py), um comando que espera por uma linha que outra
+    transação levou para outra partição (mudando data_consulta) falha em vez de segui-la. Repetido, ele
+    acha a linha na nova partição; dentro de uma transação, ela já foi abortada e o erro sobe.
+    """
+    repetir = not connections[using].in_atomic_block
+    while True:
+        try:
+            return funcao()
+        except OperationalError as erro:
+            if not (repetir and falha_de_serializacao(erro)):
+                raise
+            repetir = False
+
+
+def nova_versao():
+    """Campos que um .update() de modelo versionado grava junto para mudar o ETag das linhas alteradas."""
+    return {'versao': F('versao') + 1, 'atualizado_em': timezone.now()}
+
+
+def gravar_campos(queryset, campos):
+    """
+    Trava a linha do queryset com select_for_update() e grava os campos com save(update_fields=...),
+    numa transação. O save() incrementa a versão e os sinais atualizam o cache.
+
+    Returns:
+        Model: O objeto atualizado, ou None se nenhuma linha passar pelo filtro do queryset.
+    """
+    queryset = queryset.select_for_update()
+
+    def gravar():
+        with transaction.atomic(using=queryset.db):
+            objeto = queryset.first()
+            if objeto is not None:
+                for nome, valor in campos.items():
+                    setattr(objeto, objeto._meta.get_field(nome).attname, valor)
+                objeto.save(update_fields=campos)
+            return objeto
+
+    return repetir_falha_de_serializacao(gravar, queryset.db)
+
+
+def atualizar_retornando(modelo, pk, campos, retorno, versoes=None, exigir=None):
+    """
+    Grava os campos na linha de chave pk e retorna os valores gravados, num único UPDATE ... RETURNING.
+    Usado pelos PUTs de usuário, pet e veterinário; em bancos sem RETURNING, cai para gravar_campos().
+
+    Args:
+        modelo (type): Modelo versionado; a versão e atualizado_em da linha também são atualizados.
+        pk: Chave primária da linha.
+        campos (dict): Valores a serem gravados, como em .update().
+        retorno (Iterable[str]): Campos retornados, como em .values().
+        versoes (Iterable[int]): Se informado, só altera a linha que estiver numa destas versões (If-Match).
+        exigir (tuple): (modelo, pk) de uma linha que precisa existir para a alteração ser feita. As chaves
+            estrangeiras só são verificadas no commit (DEFERRABLE INITIALLY DEFERRED), então é assim que o
+            UPDATE confere a linha referenciada.
+
+    Returns:
+        dict: Os campos pedidos em retorno, ou None se nada foi alterado.
+    """
+    opts = modelo._meta
+    retorno = [opts.get_field(nome) for nome in retorno]
+    banco = router.db_for_write(modelo)
+    conexao = connections[banco]
+    if not suporta_update_returning(conexao):
+        queryset = modelo._default_manager.filter(pk=pk)
+        if versoes is not None:
+            queryset = queryset.filter(versao__in=versoes)
+        if exigir is not None:
+            queryset = queryset.filter(Exists(exigir[0]._default_manager.filter(pk=exigir[1])))
+        objeto = gravar_campos(queryset, campos)
+        return None if objeto is None else {campo.name: getattr(objeto, campo.attname) for campo in retorno}
+
+    nome = conexao.ops.quote_name
+    atribuicoes, parametros = [], []
+    for campo, valor in {**campos, 'atualizado_em': timezone.now()}.items():
+        campo = opts.get_field(campo)
+        atribuicoes.append(f'{nome(campo.column)} = %s')
+        parametros.append(campo.get_db_prep_save(valor, conexao))
+    condicoes = [f'{nome(opts.pk.column)} = %s']
+    parametros.append(opts.pk.get_db_prep_value(pk, conexao))
+    if versoes is not None:
+        versoes = list(versoes) or [None]
+        condicoes.append(f'{nome("versao")} IN ({", ".join(["%s"] * len(versoes))})')
+        parametros.extend(versoes)
+    if exigir is not None:
+        referenciado = exigir[0]._meta
+        condicoes.append(f'EXISTS (SELECT 1 FROM {nome(referenciado.db_table)} WHERE {nome(referenciado.pk.column)} = %s)')
+        parametros.append(referenciado.pk.get_db_prep_value(exigir[1], conexao))
+    colunas = [opts.pk, *(campo for campo in retorno if campo != opts.pk)]
+    sql = (
+        f'UPDATE {nome(opts.db_table)} SET {", ".join(atribuicoes)}, {nome("versao")} = {nome("versao")} + 1 '
+        f'WHERE {" AND ".join(condicoes)} RETURNING {", ".join(nome(campo.column) for campo in colunas)}'
+    )
+    # raw() converte as colunas retornadas como nas consultas do ORM.
+    objetos = list(modelo._default_manager.raw(sql, parametros, using=banco))
+    if not objetos:
+        return None
+    invalidar_objetos(modelo, [objetos[0].pk])
+    return {campo.name: getattr(objetos[0], campo.attname) for campo in retorno}
+
+
+async def aatualizar_retornando(*args, **kwargs):
+    return await sync_to_async(atualizar_retornando)(*args, **kwargs)
+
+
+class CacheQuerySet(models.QuerySet):
+    """
+    QuerySet que remove do cache de objetos as linhas alteradas por .update().
+    save() e delete() são tratados pelos sinais em signals.py.
+    """
+    def update(self, **kwargs):
+        # As linhas do filtro são travadas e o UPDATE altera só elas: uma linha que passasse a atender ao filtro
+        # entre os dois comandos seria alterada sem sair do cache.
+        travadas = self.select_for_update(of=('self',))
+        with transaction.atomic(using=travadas.db, savepoint=False):
+            pks = list(travadas.values_list('pk', flat=True))
+            linhas = self.model._base_manager.using(travadas.db).filter(pk__in=pks).update(**kwargs)
+            invalidar_objetos(self.model, pks)
+        return linhas
+
+
+class Versionado(models.Model):
+    """
+    Modelo com os campos versao e atualizado_em, usados nos cabeçalhos ETag e Last-Modified das
+    leituras (condicional.py). save() incrementa a versão; um .update() grava junto os campos de nova_versao().
+    """
+    class Meta:
+        abstract = True
+
+    def save(self,*args,**kwargs):
+        if not self._state.adding:
+            self.versao += 1
+            self.atualizado_em = timezone.now()
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'],'versao','atualizado_em'}
+        super().save(*args,**kwargs)
+
+
+class Usuario(Versionado):
 
     id_usuario = models.BigAutoField(primary_key=True,null=False,blank=False)
 
@@ -10,8 +172,20 @@ class Usuario(models.Model):
     email = models.CharField(max_length=191,null=False,blank=False,unique=True)
 
     senha = models.CharField(max_length=200,null=False,blank=False)
+
+    versao = models.PositiveIntegerField(null=False,blank=False,default=1)
+
+    atualizado_em = models.DateTimeField(null=False,blank=False,default=timezone.now)
+
+    objects = CacheQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # O cadastro procura e-mails repetidos com email__iexact, que vira UPPER(email) no SQL.
+            models.Index(Upper('email'),name='usuario_email_upper_idx'),
+        ]
    
-class Pet(models.Model):
+class Pet(Versionado):
 
     id_pet = models.BigAutoField(primary_key=True,null=False,blank=False)
 
@@ -21,9 +195,22 @@ class Pet(models.Model):
 
     idade = models.IntegerField(null=False,blank=False)
 
-    dono_do_pet = models.ForeignKey(Usuario,on_delete=models.CASCADE)
+    dono_do_pet = models.ForeignKey(Usuario,on_delete=models.CASCADE,db_index=False)
+
+    versao = models.PositiveIntegerField(null=False,blank=False,default=1)
+
+    atualizado_em = models.DateTimeField(null=False,blank=False,default=timezone.now)
+
+    objects = CacheQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Atende a listagem paginada dos pets de um dono (WHERE dono_do_pet = x AND id_pet > y ORDER BY id_pet).
+            # Substitui o índice simples da chave estrangeira, que é o seu prefixo.
+            models.Index(fields=['dono_do_pet','id_pet'],name='pet_dono_id_idx'),
+        ]
 
-class Veterinario(models.Model):
+class Veterinario(Versionado):
 
     id_veterinario = models.BigAutoField(primary_key=True,null=False,blank=False)
 
@@ -35,16 +222,72 @@ class Veterinario(models.Model):
 
     senha = models.CharField(max_length=200,null=False,blank=False)
 
-    
+    # Expediente e duração de cada consulta, usados pela agenda (agenda.py). Os horários são
+    # no fuso de TIME_ZONE e as consultas começam em múltiplos da duração a partir do início.
+    inicio_expediente = models.TimeField(null=False,blank=False,default=time(7))
 
-class Consulta(models.Model):
+    fim_expediente = models.TimeField(null=False,blank=False,default=time(19))
 
+    duracao_consulta = models.PositiveSmallIntegerField(null=False,blank=False,default=30)  # Minutos
+
+    versao = models.PositiveIntegerField(null=False,blank=False,default=1)
+
+    atualizado_em = models.DateTimeField(null=False,blank=False,default=timezone.now)
+
+    objects = CacheQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(Upper('email'),name='veterinario_email_upper_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(check=models.Q(inicio_expediente__lt=models.F('fim_expediente')),name='veterinario_expediente_valido'),
+            models.CheckConstraint(check=models.Q(duracao_consulta__gt=0),name='veterinario_duracao_positiva'),
+        ]
+
+class Consulta(Versionado):
+
+    # No PostgreSQL a tabela particionada não tem chave primária: cada partição tem a sua em id_consulta e só a
+    # sequência única evita ids repetidos entre partições (particoes.py). Não grave consultas com id_consulta explícito.
     id_consulta = models.BigAutoField(primary_key=True,null=False,blank=False)
 
     data_consulta = models.DateTimeField(null=True,blank=False)
 
-    veterinario = models.ForeignKey(Veterinario,on_delete=models.CASCADE)
+    veterinario = models.ForeignKey(Veterinario,on_delete=models.CASCADE,db_index=False)
+
+    pet = models.ForeignKey(Pet,on_delete=models.CASCADE,db_index=False)
+
+    realizada = models.BooleanField(null=False,blank=False,default=False)
+
+    versao = models.PositiveIntegerField(null=False,blank=False,default=1)
+
+    atualizado_em = models.DateTimeField(null=False,blank=False,default=timezone.now)
+
+    objects = CacheQuerySet.as_manager()
 
-    pet = models.ForeignKey(Pet,on_delete=models.CASCADE)
+    @classmethod
+    def from_db(cls,db,field_names,values):
+        instancia = super().from_db(db,field_names,values)
+        # Veterinário e horário lidos do banco: se o save() mudar a consulta de dia, os sinais liberam
+        # também o dia antigo no índice de horários livres (disponibilidade.py).
+        lidos = dict(zip(field_names,values))
+        instancia.horario_do_banco = (lidos.get('veterinario_id'),lidos.get('data_consulta'))
+        return instancia
 
-    realizada = models.BooleanField(null=False,blank=False,default=False)
\ No newline at end of file
+    class Meta:
+        # No PostgreSQL a tabela é particionada por mês de data_consulta (particoes.py, migração 0011): os índices
+        # e a restrição única abaixo existem em todas as partições.
+        # Os índices compostos começam pelas chaves estrangeiras e substituem os índices simples delas.
+        indexes = [
+            models.Index(fields=['pet','realizada'],name='consulta_pet_realizada_idx'),
+            # Índice de cobertura para a leitura por id (retornaconsulta): permite index-only scan.
+            models.Index(fields=['id_consulta'],include=['data_consulta','realizada','veterinario','pet'],name='consulta_cobertura_idx'),
+            # Só as consultas pendentes, na ordem do horário: atende o comando concluir_consultas sem ler as já realizadas.
+            models.Index(fields=['data_consulta'],condition=models.Q(realizada=False),name='consulta_pendente_data_idx'),
+        ]
+        constraints = [
+            # Um veterinário não pode ter duas consultas no mesmo horário. Como a agenda só aceita
+            # horários alinhados à duração da consulta, horários sobrepostos são horários iguais.
+            # O índice da restrição também atende a agenda do veterinário (WHERE veterinario = x AND data_consulta ...).
+            models.UniqueConstraint(fields=['veterinario','data_consulta'],name='consulta_vet_horario_unico'),
+        ]
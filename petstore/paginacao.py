@@ -0,0 +1,89 @@
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 500
+
+
+class ParametroInvalido(ValueError):
+    """Erro lançado quando um parâmetro da query string não pode ser interpretado."""
+
+
+def ler_inteiro(request, nome, padrao=None, minimo=0):
+    """
+    Lê um parâmetro inteiro da query string.
+
+    Args:
+        request (HttpRequest): Requisição com os parâmetros em request.GET.
+        nome (str): Nome do parâmetro.
+        padrao (int): Valor retornado quando o parâmetro não é informado.
+        minimo (int): Menor valor aceito.
+
+    Returns:
+        int: O valor do parâmetro, ou o padrão.
+    """
+    valor = request.GET.get(nome)
+    if valor in (None, ''):
+        return padrao
+    try:
+        valor = int(valor)
+    except ValueError:
+        raise ParametroInvalido(f"O parâmetro {nome} deve ser um número inteiro.")
+    if valor < minimo:
+        raise ParametroInvalido(f"O parâmetro {nome} deve ser maior ou igual a {minimo}.")
+    return valor
+
+
+def ler_data(request, nome):
+    """
+    Lê uma data no formato ISO 8601 (ex.: 2024-09-30T10:00:00Z) da query string.
+    Datas sem fuso horário são interpretadas no fuso configurado em TIME_ZONE.
+    """
+    valor = request.GET.get(nome)
+    if valor in (None, ''):
+        return None
+    data = parse_datetime(valor)
+    if data is None:
+        raise ParametroInvalido(f"O parâmetro {nome} deve ser uma data no formato ISO 8601.")
+    if timezone.is_naive(data):
+        data = timezone.make_aware(data)
+    return data
+
+
+def ler_booleano(request, nome):
+    """Lê um parâmetro booleano (true/false) da query string."""
+    valor = request.GET.get(nome)
+    if valor in (None, ''):
+        return None
+    if valor.lower() in ('true', '1'):
+        return True
+    if valor.lower() in ('false', '0'):
+        return False
+    raise ParametroInvalido(f"O parâmetro {nome} deve ser true ou false.")
+
+
+def paginar(queryset, request, campos):
+    """
+    Pagina um queryset pela chave primária (keyset), sem OFFSET.
+
+    A página seguinte começa a partir do último id devolvido (parâmetro "apos"), então o banco
+    percorre apenas as linhas da página pedida, não importa o quão longe ela esteja do início.
+
+    Args:
+        queryset (QuerySet): Queryset já filtrado.
+        request (HttpRequest): Requisição com os parâmetros "apos" e "limite".
+        campos (Iterable[str]): Campos devolvidos para cada objeto.
+
+    Returns:
+        dict: {'resultados': [...], 'proximo': id a ser passado em "apos", ou None na última página}.
+    """
+    apos = ler_inteiro(request, 'apos')
+    limite = min(ler_inteiro(request, 'limite', padrao=LIMITE_PADRAO, minimo=1), LIMITE_MAXIMO)
+
+    nome_pk = queryset.model._meta.pk.name
+    if apos is not None:
+        queryset = queryset.filter(pk__gt=apos)
+
+    pagina = list(queryset.order_by(nome_pk).values(*campos)[:limite + 1])
+    proximo = pagina[limite - 1][nome_pk] if len(pagina) > limite else None
+    return {'resultados': pagina[:limite], 'proximo': proximo}
@@ -0,0 +1,216 @@
+"""
+Particionamento mensal da tabela de consultas no PostgreSQL.
+
+A tabela petstore_consulta é particionada por intervalo (RANGE) de data_consulta, com uma partição por mês no
+fuso de TIME_ZONE (petstore_consulta_p2025_01, petstore_consulta_p2025_02...) e a partição padrão
+petstore_consulta_padrao, que recebe as consultas sem data e as de meses que ainda não têm partição. Uma
+consulta com intervalo de datas (agenda do veterinário, listagem e exportação por período, concluir_consultas)
+só lê as partições dos meses pedidos, e o vacuum de cada mês é feito à parte: as consultas antigas, que não
+mudam mais, não são percorridas de novo a cada limpeza, e um mês inteiro sai com DROP TABLE em vez de DELETE.
+
+A migração 0011 converte a tabela (o SQL dela fica congelado na própria migração) e o comando
+rotacionar_particoes cria as partições dos próximos meses, move para a sua partição as consultas que caíram na
+padrão e remove os meses além da retenção. O ORM continua usando a tabela petstore_consulta; um UPDATE de
+data_consulta leva a linha para a partição do novo mês. Nos outros bancos a tabela continua simples.
+
+O PostgreSQL exige que a chave primária de uma tabela particionada inclua a coluna da partição, que aqui pode ser
+nula. Por isso a tabela não tem chave primária e cada partição tem a sua (id_consulta): nada no banco impede o
+mesmo id_consulta em duas partições. Os ids vêm de uma única sequência (nextval() como default, já que antes da
+versão 17 uma tabela particionada não aceita coluna identity), e só um INSERT com id_consulta explícito poderia
+repeti-los.
+"""
+from datetime import date, datetime
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .cache import invalidar_objetos
+from .disponibilidade import invalidar_ocupacao
+from .models import Consulta
+
+TABELA = 'petstore_consulta'
+# Consultas removidas do cache de uma vez ao apagar uma partição.
+LOTE_CACHE = 2000
+
+
+def _nome(nome):
+    return connection.ops.quote_name(nome)
+
+
+def somar_meses(mes, quantidade):
+    """Primeiro dia do mês "quantidade" meses depois de "mes" (antes, se for negativa)."""
+    ano, indice = divmod(mes.year * 12 + mes.month - 1 + quantidade, 12)
+    return date(ano, indice + 1, 1)
+
+
+def mes_de(dia):
+    """Primeiro dia do mês de uma data."""
+    return date(dia.year, dia.month, 1)
+
+
+def nome_particao(mes, tabela=TABELA):
+    return f"{tabela}_p{mes:%Y_%m}"
+
+
+def nome_padrao(tabela=TABELA):
+    return f"{tabela}_padrao"
+
+
+def mes_da_particao(nome, tabela=TABELA):
+    """Mês de uma partição a partir do nome, ou None se ela não for de um mês (a padrão)."""
+    try:
+        return datetime.strptime(nome, f"{tabela}_p%Y_%m").date()
+    except ValueError:
+        return None
+
+
+def limites(mes):
+    """Início do mês e início do mês seguinte, no fuso de TIME_ZONE: o intervalo [início, fim) da partição."""
+    fuso = timezone.get_default_timezone()
+    fim = somar_meses(mes, 1)
+    return datetime(mes.year, mes.month, 1, tzinfo=fuso), datetime(fim.year, fim.month, 1, tzinfo=fuso)
+
+
+def sql_limites(mes):
+    """Cláusula FOR VALUES da partição do mês. DDL não aceita parâmetros, e as datas vêm de date e não do cliente."""
+    inicio, fim = limites(mes)
+    return f"FOR VALUES FROM ('{inicio.isoformat()}') TO ('{fim.isoformat()}')"
+
+
+def particionada(cursor, tabela=TABELA):
+    """Se a tabela já é particionada."""
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [tabela])
+    linha = cursor.fetchone()
+    return linha is not None and linha[0] == 'p'
+
+
+def particoes(cursor, tabela=TABELA):
+    """Nomes das partições da tabela, inclusive a padrão."""
+    cursor.execute(
+        "SELECT filha.relname FROM pg_inherits JOIN pg_class filha ON filha.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = to_regclass(%s) ORDER BY filha.relname",
+        [tabela],
+    )
+    return [nome for nome, in cursor.fetchall()]
+
+
+def meses_com_consultas(cursor, origem):
+    """Meses (no fuso de TIME_ZONE) das consultas com data da tabela ou partição "origem"."""
+    cursor.execute(
+        f"SELECT DISTINCT date_trunc('month', data_consulta AT TIME ZONE %s)::date FROM {_nome(origem)} "
+        "WHERE data_consulta IS NOT NULL",
+        [settings.TIME_ZONE],
+    )
+    return {mes for mes, in cursor.fetchall()}
+
+
+def criar_padrao(cursor, tabela=TABELA):
+    cursor.execute(f"CREATE TABLE {_nome(nome_padrao(tabela))} PARTITION OF {_nome(tabela)} DEFAULT")
+    cursor.execute(f"ALTER TABLE {_nome(nome_padrao(tabela))} ADD PRIMARY KEY (id_consulta)")
+
+
+def criar_particao(cursor, mes, tabela=TABELA):
+    """
+    Cria a partição do mês. As consultas do mês que estavam na partição padrão são movidas para ela antes de
+    ela ser anexada, que é o que o PostgreSQL exige; os índices e as chaves estrangeiras da tabela são criados
+    na partição pelo ATTACH PARTITION.
+
+    Returns:
+        int: Quantidade de consultas movidas da partição padrão.
+    """
+    nome, padrao = _nome(nome_particao(mes, tabela)), _nome(nome_padrao(tabela))
+    inicio, fim = limites(mes)
+    cursor.execute(f"CREATE TABLE {nome} (LIKE {_nome(tabela)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    cursor.execute(
+        f"WITH movidas AS (DELETE FROM {padrao} WHERE data_consulta >= %s AND data_consulta < %s RETURNING *) "
+        f"INSERT INTO {nome} SELECT * FROM movidas",
+        [inicio, fim],
+    )
+    movidas = cursor.rowcount
+    cursor.execute(f"ALTER TABLE {nome} ADD PRIMARY KEY (id_consulta)")
+    cursor.execute(f"ALTER TABLE {_nome(tabela)} ATTACH PARTITION {nome} {sql_limites(mes)}")
+    return movidas
+
+
+def remover_particao(cursor, mes, tabela=TABELA):
+    """Desanexa e apaga a partição do mês, com todas as consultas dele."""
+    nome = _nome(nome_particao(mes, tabela))
+    cursor.execute(f"ALTER TABLE {_nome(tabela)} DETACH PARTITION {nome}")
+    cursor.execute(f"DROP TABLE {nome}")
+
+
+def esquecer_consultas(mes):
+    """
+    Remove do cache de objetos e do índice de horários livres as consultas do mês, antes de a partição dele
+    ser apagada: um DROP TABLE não dispara os sinais que fazem isso nos deletes. Como nas outras
+    invalidações, as lápides são gravadas no commit da transação.
+    """
+    inicio, fim = limites(mes)
+    consultas = Consulta.objects.filter(data_consulta__gte=inicio, data_consulta__lt=fim)
+    linhas = consultas.values_list('id_consulta', 'veterinario', 'data_consulta').iterator(LOTE_CACHE)
+    ids, dias = [], {}
+    for id_consulta, id_veterinario, data_consulta in linhas:
+        ids.append(id_consulta)
+        dias.setdefault(id_veterinario, {})[timezone.localdate(data_consulta)] = data_consulta
+        if len(ids) >= LOTE_CACHE:
+            invalidar_objetos(Consulta, ids)
+            ids = []
+    invalidar_objetos(Consulta, ids)
+    for id_veterinario, horarios in dias.items():
+        invalidar_ocupacao(id_veterinario, horarios.values())
+
+
+def meses_a_criar(existentes, com_consultas, hoje, a_frente, reter=0):
+    """
+    Meses que ainda não têm partição: o atual, os "a_frente" seguintes e os que têm consultas, sem os que
+    seriam removidos pela retenção de "reter" meses (0 mantém todos).
+
+    Args:
+        existentes (Iterable[str]): Nomes das partições atuais.
+        com_consultas (Iterable[date]): Meses com consultas esperando uma partição.
+        hoje (date): Data de referência.
+        a_frente (int): Meses criados depois do atual.
+        reter (int): Meses mantidos antes do atual.
+
+    Returns:
+        list: Primeiros dias dos meses, em ordem.
+    """
+    atual = mes_de(hoje)
+    meses = {somar_meses(atual, i) for i in range(a_frente + 1)} | set(com_consultas)
+    if reter:
+        meses = {mes for mes in meses if mes >= somar_meses(atual, -reter)}
+    existentes = set(existentes)
+    return sorted(mes for mes in meses if nome_particao(mes) not in existentes)
+
+
+def meses_a_remover(existentes, hoje, reter):
+    """Meses das partições anteriores aos "reter" meses antes do atual (nenhum com reter 0)."""
+    if not reter:
+        return []
+    limite = somar_meses(mes_de(hoje), -reter)
+    meses = (mes_da_particao(nome) for nome in existentes)
+    return sorted(mes for mes in meses if mes is not None and mes < limite)
+
+
+def rotacionar(cursor, a_frente, reter=0, hoje=None):
+    """
+    Cria as partições que faltam (meses_a_criar), movendo as consultas da partição padrão, e remove as
+    anteriores à retenção, tirando antes as consultas delas do cache (esquecer_consultas). Deve rodar numa
+    transação.
+
+    Returns:
+        tuple: (lista de (partição criada, consultas movidas), lista de partições removidas).
+    """
+    hoje = hoje or timezone.localdate()
+    existentes = particoes(cursor)
+    criadas = [
+        (nome_particao(mes), criar_particao(cursor, mes))
+        for mes in meses_a_criar(existentes, meses_com_consultas(cursor, nome_padrao()), hoje, a_frente, reter)
+    ]
+    removidas = []
+    for mes in meses_a_remover(existentes, hoje, reter):
+        esquecer_consultas(mes)
+        remover_particao(cursor, mes)
+        removidas.append(nome_particao(mes))
+    return criadas, removidas
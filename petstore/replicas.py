@@ -0,0 +1,228 @@
+"""
+Leitura em réplicas do PostgreSQL, com o primário garantido para quem acabou de escrever.
+
+As rotas de REPLICAS_ROTAS (o name de setup/urls.py), só em GET e HEAD, fazem as suas leituras numa das
+réplicas de REPLICAS_BANCOS (DB_REPLICAS no ambiente), em rodízio; as demais rotas, as escritas e os comandos
+usam o banco "default". A réplica é escolhida pelo ReplicasMiddleware uma vez por requisição e guardada numa
+ContextVar, que o RoteadorReplicas consulta em db_for_read.
+
+Quem escreve (qualquer método que não seja de leitura, com resposta de sucesso) recebe o cookie e o
+cabeçalho REPLICAS_COOKIE / REPLICAS_CABECALHO com o instante até o qual as suas leituras vão ao primário
+(REPLICAS_JANELA segundos). Navegadores devolvem o cookie sozinhos; outros clientes devolvem o cabeçalho.
+Assim um GET logo depois de um PUT nunca vê o dado antigo.
+
+Cada réplica é verificada a cada REPLICAS_INTERVALO segundos: uma réplica fora do ar ou com atraso de
+replicação acima de REPLICAS_ATRASO_MAXIMO segundos sai do rodízio até a próxima verificação. Sem réplica
+saudável, a requisição lê do primário. A conexão com a réplica não é testada a cada requisição: a verificação
+periódica cuida da réplica e o Django, de uma conexão persistente que caiu (CONN_HEALTH_CHECKS).
+"""
+import itertools
+import math
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from .metricas import LEITURAS, REPLICA_ATRASO
+
+METODOS_LEITURA = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+# Atraso de replicação em segundos; 0 se a réplica já aplicou tudo o que recebeu (um primário parado
+# não gera transações, e sem isso o atraso medido pelo último replay só cresceria).
+SQL_ATRASO = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+_trava = threading.Lock()
+_saude = {}  # alias -> [saudável, instante (time.monotonic) da última verificação]
+_rodizio = itertools.count()
+
+
+class Leitura:
+    """Banco de leitura escolhido para a requisição (None é o do roteador padrão, o "default")."""
+    __slots__ = ('banco',)
+
+    def __init__(self):
+        self.banco = None
+
+
+_leitura_atual = ContextVar('leitura_atual', default=None)
+
+
+def banco_de_leitura():
+    """Réplica escolhida para a requisição atual, ou None fora das rotas de leitura."""
+    leitura = _leitura_atual.get()
+    return leitura.banco if leitura is not None else None
+
+
+class RoteadorReplicas:
+    """Roteador de DATABASE_ROUTERS. As escritas e as migrações ficam sempre no primário."""
+
+    def db_for_read(self, model, **hints):
+        return banco_de_leitura()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # As réplicas têm os mesmos dados do primário.
+        bancos = {DEFAULT_DB_ALIAS, *settings.REPLICAS_BANCOS}
+        return obj1._state.db in bancos and obj2._state.db in bancos
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db != DEFAULT_DB_ALIAS and db in settings.REPLICAS_BANCOS:
+            return False
+        return None
+
+
+def medir_atraso(banco):
+    """Atraso de replicação da réplica, em segundos, ou None se ela não responder."""
+    conexao = connections[banco]
+    try:
+        with conexao.cursor() as cursor:
+            cursor.execute(SQL_ATRASO if conexao.vendor == 'postgresql' else 'SELECT 0')
+            return float(cursor.fetchone()[0])
+    except DatabaseError:
+        return None
+
+
+def verificar(banco):
+    """Mede o atraso da réplica e a tira do rodízio ou a devolve a ele."""
+    atraso = medir_atraso(banco)
+    REPLICA_ATRASO.labels(banco).set(-1 if atraso is None else atraso)
+    with _trava:
+        _saude[banco] = [atraso is not None and atraso <= settings.REPLICAS_ATRASO_MAXIMO, time.monotonic()]
+
+
+def verificacoes_vencidas():
+    """
+    Réplicas cuja última verificação passou de REPLICAS_INTERVALO segundos. Elas ficam reservadas para
+    quem chamou, que deve verificá-las: as outras threads seguem com o resultado anterior.
+    """
+    agora = time.monotonic()
+    vencidas = []
+    with _trava:
+        for banco in settings.REPLICAS_BANCOS:
+            estado = _saude.setdefault(banco, [False, -math.inf])
+            if agora - estado[1] >= settings.REPLICAS_INTERVALO:
+                estado[1] = agora
+                vencidas.append(banco)
+    return vencidas
+
+
+def verificar_vencidas():
+    for banco in verificacoes_vencidas():
+        verificar(banco)
+
+
+def proxima_replica():
+    """Próxima réplica saudável do rodízio, ou None se não houver nenhuma."""
+    with _trava:
+        saudaveis = [banco for banco in settings.REPLICAS_BANCOS if _saude.get(banco, (False,))[0]]
+    if not saudaveis:
+        return None
+    return saudaveis[next(_rodizio) % len(saudaveis)]
+
+
+def escolher_replica():
+    """Verifica as réplicas vencidas e retorna a próxima saudável, ou None para ler do primário."""
+    verificar_vencidas()
+    return proxima_replica()
+
+
+def usar(banco):
+    """Grava o banco de leitura da requisição atual."""
+    _leitura_atual.get().banco = banco
+    LEITURAS.labels(banco or DEFAULT_DB_ALIAS).inc()
+
+
+def limpar_saude():
+    """Esquece as verificações das réplicas (usado nos testes)."""
+    with _trava:
+        _saude.clear()
+
+
+def no_primario(request):
+    """Se o cliente escreveu há menos de REPLICAS_JANELA segundos (cookie ou cabeçalho)."""
+    valor = request.COOKIES.get(settings.REPLICAS_COOKIE) or request.headers.get(settings.REPLICAS_CABECALHO)
+    if not valor:
+        return False
+    try:
+        ate = float(valor)
+    except ValueError:
+        return False
+    agora = time.time()
+    # Um prazo mais longo que a janela não foi dado por nós e é ignorado.
+    return agora < ate <= agora + settings.REPLICAS_JANELA + 1
+
+
+def usa_replica(request):
+    """Se a requisição pode ler de uma réplica: rota de leitura, método de leitura e sem escrita recente."""
+    correspondencia = getattr(request, 'resolver_match', None)
+    return (
+        bool(settings.REPLICAS_BANCOS)
+        and request.method in ('GET', 'HEAD')
+        and correspondencia is not None
+        and correspondencia.url_name in settings.REPLICAS_ROTAS
+        and not no_primario(request)
+    )
+
+
+def marcar_escrita(request, response):
+    """Prende ao primário, por REPLICAS_JANELA segundos, as leituras de quem acabou de escrever."""
+    if not settings.REPLICAS_BANCOS or request.method in METODOS_LEITURA or response.status_code >= 400:
+        return response
+    ate = str(math.ceil(time.time() + settings.REPLICAS_JANELA))
+    response.set_cookie(settings.REPLICAS_COOKIE, ate, max_age=math.ceil(settings.REPLICAS_JANELA), httponly=True, samesite='Lax')
+    response[settings.REPLICAS_CABECALHO] = ate
+    return response
+
+
+class ReplicasMiddleware:
+    """
+    Middleware que escolhe o banco de leitura de cada requisição, antes da view, e marca as escritas
+    na resposta. Funciona sob WSGI e ASGI; sob ASGI a escolha, que pode consultar as réplicas, passa por sync_to_async.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        token = _leitura_atual.set(Leitura())
+        try:
+            response = self.get_response(request)
+        finally:
+            _leitura_atual.reset(token)
+        return marcar_escrita(request, response)
+
+    async def __acall__(self, request):
+        token = _leitura_atual.set(Leitura())
+        try:
+            response = await self.get_response(request)
+        finally:
+            _leitura_atual.reset(token)
+        return marcar_escrita(request, response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if usa_replica(request):
+            usar(escolher_replica())
+        return None
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        if usa_replica(request):
+            usar(await sync_to_async(escolher_replica)())
+        return None
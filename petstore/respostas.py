@@ -0,0 +1,114 @@
+import json
+import operator
+
+from django import http
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .instrumentacao import medir
+from .models import Usuario, Pet, Veterinario, Consulta
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - o orjson é opcional
+    orjson = None
+
+_codificador = DjangoJSONEncoder()
+
+
+def renderizar_json(dados):
+    """Gera o JSON com a biblioteca padrão, exatamente como o JsonResponse do Django."""
+    return json.dumps(dados, cls=DjangoJSONEncoder).encode()
+
+
+def renderizar_orjson(dados):
+    """
+    Gera o JSON com o orjson. Datas, decimais e UUIDs são convertidos pelo DjangoJSONEncoder,
+    então o resultado tem os mesmos valores do renderizador padrão. Sem o orjson instalado,
+    usa o renderizador padrão.
+    """
+    if orjson is None:
+        return renderizar_json(dados)
+    return orjson.dumps(dados, default=_codificador.default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+
+
+RENDERIZADORES = {
+    'json': renderizar_json,
+    'orjson': renderizar_orjson,
+}
+
+
+def renderizar(dados):
+    """Gera o JSON de uma resposta com o renderizador escolhido em RENDERIZADOR_JSON."""
+    return RENDERIZADORES[settings.RENDERIZADOR_JSON](dados)
+
+
+class JsonResponse(http.JsonResponse):
+    """
+    JsonResponse do Django com o corpo gerado pelo renderizador configurado em RENDERIZADOR_JSON.
+    Aceita os mesmos argumentos; com um encoder ou json_dumps_params próprios usa o json da biblioteca padrão.
+    """
+    def __init__(self, data, encoder=DjangoJSONEncoder, safe=True, json_dumps_params=None, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError(
+                "In order to allow non-dict objects to be serialized set the "
+                "safe parameter to False."
+            )
+        with medir('json'):
+            if encoder is DjangoJSONEncoder and not json_dumps_params:
+                conteudo = renderizar(data)
+            else:
+                conteudo = json.dumps(data, cls=encoder, **(json_dumps_params or {}))
+        kwargs.setdefault('content_type', 'application/json')
+        http.HttpResponse.__init__(self, content=conteudo, **kwargs)
+
+
+class Projecao:
+    """
+    Campos de um modelo calculados uma única vez, usados para montar as respostas sem
+    passar pelo serializador do Django.
+
+    Args:
+        modelo (Model): Classe do modelo.
+        campos (Iterable[str]): Campos devolvidos por valores(). Por padrão, todos os campos concretos.
+    """
+    def __init__(self, modelo, campos=None):
+        opts = modelo._meta
+        self.modelo = opts.label_lower
+        self.campos = tuple(campos or (campo.name for campo in opts.concrete_fields))
+        self._pegar_valores = operator.itemgetter(*self.campos)
+        # Os campos da projeção com os valores que serializers.serialize('python', ...) usa: as chaves
+        # estrangeiras aparecem pelo id e a chave primária fica fora de "fields".
+        self._atributos = tuple(
+            (campo.name, campo.attname) for campo in map(opts.get_field, self.campos) if campo.serialize
+        )
+
+    def valores(self, dados):
+        """Recorta os campos da projeção de um dict, como os retornados por .values() ou pelo cache."""
+        valores = self._pegar_valores(dados)
+        if len(self.campos) == 1:
+            valores = (valores,)
+        return dict(zip(self.campos, valores))
+
+    def objeto(self, instancia):
+        """
+        Representa uma instância no mesmo formato de serializers.serialize('json', [instancia])[0],
+        com os campos da projeção em "fields".
+        """
+        return {
+            'model': self.modelo,
+            'pk': instancia.pk,
+            'fields': {nome: getattr(instancia, atributo) for nome, atributo in self._atributos},
+        }
+
+    def lista(self, instancias):
+        """Representa várias instâncias no formato de serializers.serialize('json', instancias)."""
+        return [self.objeto(instancia) for instancia in instancias]
+
+
+# Os corpos das leituras têm só os campos que elas sempre devolveram; a versão e atualizado_em vão
+# nos cabeçalhos ETag e Last-Modified (condicional.py) e o expediente, na agenda.
+PROJECAO_USUARIO = Projecao(Usuario, ('id_usuario', 'nome', 'email', 'senha'))
+PROJECAO_PET = Projecao(Pet, ('id_pet', 'nome', 'especie', 'idade', 'dono_do_pet'))
+PROJECAO_VETERINARIO = Projecao(Veterinario, ('id_veterinario', 'nome', 'especialidade', 'email', 'senha'))
+PROJECAO_CONSULTA = Projecao(Consulta, ('id_consulta', 'data_consulta', 'veterinario', 'pet', 'realizada'))
@@ -0,0 +1,324 @@
+import itertools
+import math
+import random
+import time
+from datetime import datetime, time as dt_time, timedelta, timezone as dt_timezone
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .disponibilidade import invalidar_diretorio
+from .models import Usuario, Pet, Veterinario, Consulta
+
+ESPECIES = ('Canina', 'Felina', 'Ave', 'Roedor', 'Réptil')
+ESPECIALIDADES = ('Clínico geral', 'Cardiologista', 'Dermatologista', 'Neurologista', 'Ortopedista', 'Oftalmologista')
+
+# Agenda usada para distribuir as consultas: 16 horários de 30 minutos por dia, das 8h às 16h.
+INICIO_EXPEDIENTE = 8
+HORARIOS_POR_DIA = 16
+DURACAO_HORARIO = timedelta(minutes=30)
+
+
+def gerar_horario(indice, inicio):
+    """
+    Converte o índice sequencial de um horário da agenda de um veterinário em data e hora.
+    Índices diferentes geram horários diferentes, então um veterinário nunca tem duas consultas no mesmo horário.
+    """
+    dia, horario = divmod(indice, HORARIOS_POR_DIA)
+    return inicio + timedelta(days=dia, hours=INICIO_EXPEDIENTE) + horario * DURACAO_HORARIO
+
+
+def semear(usuarios=1000, pets_por_usuario=2, veterinarios=50, consultas=10000, semente=42, lote=5000):
+    """
+    Popula o banco com dados sintéticos determinísticos para benchmarks.
+
+    Todos os usuários e veterinários compartilham um único hash de senha, calculado uma vez,
+    para que a geração não seja dominada pelo make_password. Os e-mails usam o próximo id livre
+    como sufixo, então a função pode ser chamada mais de uma vez no mesmo banco.
+
+    Args:
+        usuarios (int): Quantidade de usuários.
+        pets_por_usuario (int): Média de pets por usuário (cada usuário tem entre 1 e 2x esse valor).
+        veterinarios (int): Quantidade de veterinários.
+        consultas (int): Quantidade de consultas, distribuídas entre os veterinários a partir de um ano atrás.
+        semente (int): Semente do gerador aleatório.
+        lote (int): Tamanho dos lotes do bulk_create.
+
+    Returns:
+        dict: Quantidade de linhas criadas por modelo.
+    """
+    aleatorio = random.Random(semente)
+    senha = make_password('@Semente123')
+    sufixo = (Usuario.objects.order_by('-pk').values_list('pk', flat=True).first() or 0) + 1
+
+    novos_usuarios = Usuario.objects.bulk_create(
+        (Usuario(nome=f'Usuario {i}', email=f'usuario{sufixo + i}@petstore.com', senha=senha) for i in range(usuarios)),
+        batch_size=lote,
+    )
+    novos_vets = Veterinario.objects.bulk_create(
+        (Veterinario(nome=f'Veterinario {i}', especialidade=aleatorio.choice(ESPECIALIDADES),
+                     email=f'veterinario{sufixo + i}@petstore.com', senha=senha) for i in range(veterinarios)),
+        batch_size=lote,
+    )
+    novos_pets = Pet.objects.bulk_create(
+        (Pet(nome=f'Pet {usuario.pk}-{j}', especie=aleatorio.choice(ESPECIES), idade=aleatorio.randint(0, 20), dono_do_pet=usuario)
+         for usuario in novos_usuarios for j in range(aleatorio.randint(1, max(1, 2 * pets_por_usuario - 1)))),
+        batch_size=lote,
+    )
+
+    agora = datetime.now(dt_timezone.utc)
+    inicio = agora.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=365)
+    proximo_horario = [0] * len(novos_vets)
+
+    def gerar_consultas():
+        for i in range(consultas):
+            vet = i % len(novos_vets)
+            # Alguns horários ficam livres, como numa agenda real.
+            proximo_horario[vet] += aleatorio.choice((1, 1, 1, 2))
+            data = gerar_horario(proximo_horario[vet], inicio)
+            yield Consulta(data_consulta=data, veterinario=novos_vets[vet], pet=aleatorio.choice(novos_pets), realizada=data < agora)
+
+    if novos_vets and novos_pets:
+        Consulta.objects.bulk_create(gerar_consultas(), batch_size=lote)
+
+    return {
+        'usuarios': len(novos_usuarios),
+        'pets': len(novos_pets),
+        'veterinarios': len(novos_vets),
+        'consultas': consultas if novos_vets and novos_pets else 0,
+    }
+
+
+# Distribuições usadas por gerar_em_volume.
+PESOS_ESPECIES = {'Canina': 50, 'Felina': 35, 'Ave': 7, 'Roedor': 5, 'Réptil': 3}
+PESOS_ESPECIALIDADES = {
+    'Clínico geral': 40, 'Dermatologista': 15, 'Cardiologista': 12, 'Ortopedista': 12, 'Oftalmologista': 11, 'Neurologista': 10,
+}
+# (início, fim, duração da consulta em minutos): peso.
+PESOS_EXPEDIENTES = {(dt_time(7), dt_time(19), 30): 6, (dt_time(8), dt_time(18), 30): 2, (dt_time(8), dt_time(17), 20): 1, (dt_time(13), dt_time(21), 40): 1}
+# Fator aplicado à ocupação dos veterinários em cada dia da semana (segunda-feira primeiro).
+OCUPACAO_POR_DIA_DA_SEMANA = (1.0, 1.0, 1.0, 1.0, 0.9, 0.5, 0.1)
+# Fração das consultas geradas que ficam no passado (e já estão realizadas).
+FRACAO_PASSADO = 0.8
+
+
+def _geometrica(aleatorio, media):
+    """Inteiro maior ou igual a 1 com distribuição geométrica de média "media": muitos 1, alguns 2, poucos 5."""
+    if media <= 1:
+        return 1
+    return 1 + int(math.log(1.0 - aleatorio.random()) / math.log(1.0 - 1.0 / media))
+
+
+def _sorteio_ponderado(aleatorio, pesos):
+    """Função que sorteia uma chave de "pesos" proporcionalmente ao peso, sem recalcular os acumulados a cada sorteio."""
+    valores, acumulados = list(pesos), list(itertools.accumulate(pesos.values()))
+    return lambda: aleatorio.choices(valores, cum_weights=acumulados)[0]
+
+
+def _linhas_usuarios(primeiro_id, quantidade, senha):
+    for id_usuario in range(primeiro_id, primeiro_id + quantidade):
+        yield (id_usuario, f'Usuario {id_usuario}', f'usuario{id_usuario}@dados.petstore.com', senha)
+
+
+def _linhas_veterinarios(aleatorio, primeiro_id, quantidade, senha, agendas):
+    especialidade, expediente = _sorteio_ponderado(aleatorio, PESOS_ESPECIALIDADES), _sorteio_ponderado(aleatorio, PESOS_EXPEDIENTES)
+    for id_veterinario in range(primeiro_id, primeiro_id + quantidade):
+        inicio, fim, duracao = expediente()
+        horarios = ((fim.hour - inicio.hour) * 60 + fim.minute - inicio.minute) // duracao
+        # Cada veterinário tem a sua taxa de ocupação, em média 45% dos horários.
+        agendas.append((id_veterinario, inicio, duracao, horarios, aleatorio.betavariate(3, 3.7)))
+        yield (id_veterinario, f'Veterinario {id_veterinario}', especialidade(),
+               f'veterinario{id_veterinario}@dados.petstore.com', senha, inicio, fim, duracao)
+
+
+def _linhas_pets(aleatorio, primeiro_id, usuarios, pets_por_usuario, pets):
+    """Pets dos usuários, com a quantidade de cada um sorteada de uma geométrica. Conta os pets gerados em pets[0]."""
+    especie = _sorteio_ponderado(aleatorio, PESOS_ESPECIES)
+    id_pet = primeiro_id
+    for id_usuario in usuarios:
+        for _ in range(_geometrica(aleatorio, pets_por_usuario)):
+            yield (id_pet, f'Pet {id_pet}', especie(), min(int(aleatorio.expovariate(1 / 5)), 25), id_usuario)
+            id_pet += 1
+    pets[0] = id_pet - primeiro_id
+
+
+def _linhas_consultas(aleatorio, primeiro_id, quantidade, agendas, pets, inicio, agora):
+    """
+    Consultas dia a dia a partir de "inicio": cada horário da agenda de cada veterinário é ocupado com
+    probabilidade igual à ocupação do veterinário vezes o fator do dia da semana, até chegar a "quantidade".
+    """
+    fuso = timezone.get_current_timezone()
+    id_consulta, fim = primeiro_id, primeiro_id + quantidade
+    primeiro_pet, total_pets = pets[0], pets[1] - pets[0] + 1
+    for dia in itertools.count():
+        data = inicio + timedelta(days=dia)
+        fator = OCUPACAO_POR_DIA_DA_SEMANA[data.weekday()]
+        meia_noite = datetime.combine(data, dt_time.min, tzinfo=fuso)
+        for id_veterinario, expediente, duracao, horarios, ocupacao in agendas:
+            abertura = meia_noite + timedelta(hours=expediente.hour, minutes=expediente.minute)
+            for horario in range(horarios):
+                if aleatorio.random() >= ocupacao * fator:
+                    continue
+                data_consulta = abertura + timedelta(minutes=horario * duracao)
+                yield (id_consulta, data_consulta, id_veterinario, primeiro_pet + int(aleatorio.random() * total_pets), data_consulta < agora)
+                id_consulta += 1
+                if id_consulta == fim:
+                    return
+
+
+_ESCAPES_COPY = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+_FORMATOS_COPY = {
+    int: str,
+    str: lambda valor: valor.translate(_ESCAPES_COPY),
+    bool: lambda valor: 't' if valor else 'f',
+    type(None): lambda valor: '\\N',
+    datetime: lambda valor: valor.isoformat(' '),
+}
+
+
+def valor_copy(valor):
+    """Representa um valor no formato de texto do COPY do PostgreSQL."""
+    formato = _FORMATOS_COPY.get(type(valor))
+    return formato(valor) if formato is not None else str(valor)
+
+
+class _LeitorCopy:
+    """Arquivo lido pelo COPY ... FROM STDIN: gera o texto das linhas aos poucos, sem montar a tabela inteira na memória."""
+    def __init__(self, linhas):
+        self.linhas = linhas
+
+    def read(self, tamanho=-1):
+        partes, total = [], 0
+        for linha in self.linhas:
+            parte = ('\t'.join(map(valor_copy, linha)) + '\n').encode()
+            partes.append(parte)
+            total += len(parte)
+            if 0 <= tamanho <= total:
+                break
+        return b''.join(partes)
+
+
+def copiar_de_stdin(cursor, comando, arquivo, tamanho=1 << 16):
+    """
+    Executa um COPY ... FROM STDIN lendo os dados de "arquivo" (qualquer objeto com read(tamanho)),
+    aos poucos, com o psycopg2 ou o psycopg 3.
+    """
+    cursor_bruto = cursor.cursor
+    if hasattr(cursor_bruto, 'copy_expert'):
+        cursor_bruto.copy_expert(comando, arquivo, size=tamanho)
+    else:
+        # psycopg 3
+        with cursor_bruto.copy(comando) as copia:
+            while bloco := arquivo.read(tamanho):
+                copia.write(bloco)
+
+
+def copiar_linhas(cursor, tabela, colunas, linhas):
+    """Grava as linhas (tuplas na ordem de "colunas") na tabela com COPY, no formato de texto."""
+    comando = f"COPY {connection.ops.quote_name(tabela)} ({', '.join(map(connection.ops.quote_name, colunas))}) FROM STDIN"
+    copiar_de_stdin(cursor, comando, _LeitorCopy(linhas))
+
+
+def _copiar(modelo, campos, linhas):
+    with connection.cursor() as cursor:
+        copiar_linhas(cursor, modelo._meta.db_table, [campo.column for campo in campos], linhas)
+
+
+def _inserir(modelo, campos, linhas, lote):
+    nomes = [campo.attname for campo in campos]
+    linhas = iter(linhas)
+    while bloco := list(itertools.islice(linhas, lote)):
+        modelo.objects.bulk_create([modelo(**dict(zip(nomes, linha))) for linha in bloco])
+
+
+def campos_com_padrao(modelo, nomes):
+    """
+    Campos do modelo fora de "nomes" que têm valor padrão. Os padrões são do Django, não do banco, então
+    os INSERTs e COPYs feitos fora do ORM precisam preenchê-los.
+    """
+    return [campo for campo in modelo._meta.concrete_fields if campo.name not in nomes and campo.has_default()]
+
+
+def _gravar(modelo, nomes, linhas, usar_copy, lote):
+    """Grava as linhas (tuplas na ordem de "nomes") com COPY ou bulk_create e retorna (linhas gravadas, segundos)."""
+    padroes = campos_com_padrao(modelo, nomes)
+    campos = [modelo._meta.get_field(nome) for nome in nomes] + padroes
+    valores_padrao = tuple(campo.get_default() for campo in padroes)
+    contagem = itertools.count()
+    linhas = (linha + valores_padrao for linha, _ in zip(linhas, contagem))
+    inicio = time.perf_counter()
+    with transaction.atomic():
+        if usar_copy:
+            _copiar(modelo, campos, linhas)
+        else:
+            _inserir(modelo, campos, linhas, lote)
+        # Os ids foram gerados aqui; a sequência da tabela continua depois do maior deles.
+        with connection.cursor() as cursor:
+            for comando in connection.ops.sequence_reset_sql(no_style(), [modelo]):
+                cursor.execute(comando)
+    return next(contagem), time.perf_counter() - inicio
+
+
+def gerar_em_volume(usuarios, pets_por_usuario=1.8, veterinarios=1000, consultas=1000000, semente=42,
+                    inicio=None, usar_copy=None, lote=10000, ao_gravar=None):
+    """
+    Gera milhões de linhas sintéticas e determinísticas: a mesma semente gera os mesmos dados.
+
+    As linhas são geradas sob demanda e gravadas com COPY ... FROM STDIN no PostgreSQL ou com
+    bulk_create nos outros bancos, com ids calculados a partir do maior id de cada tabela, para que as
+    chaves estrangeiras sejam conhecidas sem consultar o banco. Todos os usuários e veterinários
+    compartilham um único hash de senha. Os dados não passam pelos sinais dos modelos, então apenas o
+    diretório de veterinários do índice de horários livres é invalidado no final.
+
+    Distribuições:
+    - pets por usuário: geométrica com média pets_por_usuario (todo usuário tem ao menos um pet);
+    - espécies, especialidades e expedientes: PESOS_ESPECIES, PESOS_ESPECIALIDADES e PESOS_EXPEDIENTES;
+    - consultas por veterinário por dia: cada veterinário tem uma taxa de ocupação própria, ajustada
+      pelo dia da semana (OCUPACAO_POR_DIA_DA_SEMANA); cerca de FRACAO_PASSADO das consultas ficam no passado.
+
+    Args:
+        usuarios (int), veterinarios (int), consultas (int): Quantidade de linhas.
+        pets_por_usuario (float): Média de pets por usuário.
+        semente (int): Semente do gerador aleatório.
+        inicio (date): Dia da primeira consulta. Por padrão, calculado para FRACAO_PASSADO.
+        usar_copy (bool): Usa COPY. Por padrão, só no PostgreSQL.
+        lote (int): Linhas por bulk_create, quando não usa COPY.
+        ao_gravar (callable): Chamada com (nome da tabela, linhas, segundos) após cada tabela.
+
+    Returns:
+        dict: {tabela: (linhas, segundos)}.
+    """
+    aleatorio = random.Random(semente)
+    usar_copy = connection.vendor == 'postgresql' if usar_copy is None else usar_copy
+    senha = make_password('@Semente123')
+    primeiro = {
+        modelo: (modelo.objects.order_by('-pk').values_list('pk', flat=True).first() or 0) + 1
+        for modelo in (Usuario, Pet, Veterinario, Consulta)
+    }
+    resultado = {}
+
+    def gravar(modelo, nomes, linhas):
+        resultado[modelo._meta.db_table] = _gravar(modelo, nomes, linhas, usar_copy, lote)
+        if ao_gravar is not None:
+            ao_gravar(modelo._meta.db_table, *resultado[modelo._meta.db_table])
+
+    gravar(Usuario, ('id_usuario', 'nome', 'email', 'senha'), _linhas_usuarios(primeiro[Usuario], usuarios, senha))
+    agendas = []
+    gravar(Veterinario, ('id_veterinario', 'nome', 'especialidade', 'email', 'senha', 'inicio_expediente', 'fim_expediente', 'duracao_consulta'),
+           _linhas_veterinarios(aleatorio, primeiro[Veterinario], veterinarios, senha, agendas))
+    invalidar_diretorio()
+    pets = [0]
+    gravar(Pet, ('id_pet', 'nome', 'especie', 'idade', 'dono_do_pet'),
+           _linhas_pets(aleatorio, primeiro[Pet], range(primeiro[Usuario], primeiro[Usuario] + usuarios), pets_por_usuario, pets))
+
+    if agendas and pets[0] and consultas:
+        if inicio is None:
+            media_da_semana = sum(OCUPACAO_POR_DIA_DA_SEMANA) / 7
+            por_dia = sum(horarios * ocupacao * media_da_semana for _, _, _, horarios, ocupacao in agendas)
+            inicio = timezone.localdate() - timedelta(days=round(consultas / max(por_dia, 1) * FRACAO_PASSADO))
+        intervalo_pets = (primeiro[Pet], primeiro[Pet] + pets[0] - 1)
+        gravar(Consulta, ('id_consulta', 'data_consulta', 'veterinario', 'pet', 'realizada'),
+               _linhas_consultas(aleatorio, primeiro[Consulta], consultas, agendas, intervalo_pets, inicio, timezone.now()))
+    return resultado
@@ -0,0 +1,126 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+
+from .cache import buscar_objeto, abuscar_objeto
+from .instrumentacao import medir
+
+_pool = None
+_trava = threading.Lock()
+
+
+def _inicializar_processo():
+    """Configura o Django nos processos do pool, que são iniciados do zero (spawn)."""
+    import django
+    django.setup()
+
+
+def pool_de_hash():
+    """
+    Retorna o pool de processos usado para calcular hashes, criado no primeiro uso.
+
+    O pool tem SENHA_PROCESSOS processos, então no máximo essa quantidade de hashes é calculada
+    ao mesmo tempo por worker da aplicação. Com SENHA_PROCESSOS = 0 não há pool e retorna None.
+    """
+    global _pool
+    if settings.SENHA_PROCESSOS <= 0:
+        return None
+    with _trava:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.SENHA_PROCESSOS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_inicializar_processo,
+            )
+    return _pool
+
+
+def gerar_hash(senha):
+    """
+    Calcula o hash de uma senha num processo do pool. A thread da requisição apenas espera o resultado.
+
+    Args:
+        senha (str): Senha em texto puro.
+
+    Returns:
+        str: Hash no formato do Django, com o algoritmo definido em SENHA_HASHER.
+    """
+    pool = pool_de_hash()
+    with medir('hash'):
+        if pool is None:
+            return make_password(senha)
+        return pool.submit(make_password, senha).result()
+
+
+async def agerar_hash(senha):
+    """Versão assíncrona de gerar_hash, que não bloqueia o event loop enquanto o hash é calculado."""
+    pool = pool_de_hash()
+    with medir('hash'):
+        if pool is None:
+            return await sync_to_async(make_password)(senha)
+        return await asyncio.wrap_future(pool.submit(make_password, senha))
+
+
+def gerar_hashes(senhas):
+    """
+    Calcula o hash de várias senhas, distribuídas entre os processos do pool.
+    Usado pelos cadastros em lote, onde o hash é o custo dominante.
+
+    Returns:
+        list: Hashes na mesma ordem das senhas.
+    """
+    senhas = list(senhas)
+    pool = pool_de_hash()
+    with medir('hash'):
+        if pool is None or len(senhas) < 2:
+            return [make_password(senha) for senha in senhas]
+        blocos = max(1, len(senhas) // (settings.SENHA_PROCESSOS * 4))
+        return list(pool.map(make_password, senhas, chunksize=blocos))
+
+
+def _senha_confere(senha, hash_atual):
+    """Se a senha gerou o hash e ele já está no algoritmo e nos parâmetros atuais (senão precisa ser refeito)."""
+    refazer = []
+    return check_password(senha, hash_atual, setter=lambda _: refazer.append(True)) and not refazer
+
+
+def senha_inalterada(modelo, pk, senha):
+    """
+    Indica se a senha enviada é a mesma do hash gravado no objeto, para que o PUT não grave um hash novo.
+
+    A senha é conferida com check_password() no pool de processos, contra o hash atual do objeto; nada
+    derivado da senha fica no cache. Um hash de um algoritmo antigo conta como alterado e é refeito.
+
+    Args:
+        modelo (Model): Usuario ou Veterinario.
+        pk (int): Chave primária do objeto.
+        senha (str): Senha recebida na requisição.
+
+    Returns:
+        bool: True se a senha não mudou e o hash pode ser mantido.
+    """
+    objeto = buscar_objeto(modelo, pk)
+    if objeto is None:
+        return False
+    pool = pool_de_hash()
+    with medir('hash'):
+        if pool is None:
+            return _senha_confere(senha, objeto['senha'])
+        return pool.submit(_senha_confere, senha, objeto['senha']).result()
+
+
+async def asenha_inalterada(modelo, pk, senha):
+    """Versão assíncrona de senha_inalterada."""
+    objeto = await abuscar_objeto(modelo, pk)
+    if objeto is None:
+        return False
+    pool = pool_de_hash()
+    with medir('hash'):
+        if pool is None:
+            return await sync_to_async(_senha_confere)(senha, objeto['senha'])
+        return await asyncio.wrap_future(pool.submit(_senha_confere, senha, objeto['senha']))
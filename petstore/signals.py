@@ -0,0 +1,45 @@
+from django.db.models.signals import post_save,post_delete
+from django.dispatch import receiver
+from .models import Usuario,Pet,Veterinario,Consulta
+from .cache import invalidar_objetos
+from .disponibilidade import invalidar_diretorio,invalidar_ocupacao
+
+
+@receiver(post_save,sender=Usuario)
+@receiver(post_save,sender=Pet)
+@receiver(post_save,sender=Veterinario)
+@receiver(post_save,sender=Consulta)
+@receiver(post_delete,sender=Usuario)
+@receiver(post_delete,sender=Pet)
+@receiver(post_delete,sender=Veterinario)
+@receiver(post_delete,sender=Consulta)
+def invalida_cache_objeto(sender,instance,**kwargs):
+    """
+    Remove do cache o objeto salvo ou deletado. Deleções em cascata (ex.: os pets e as
+    consultas de um usuário deletado) também disparam este sinal para cada objeto removido.
+    Um objeto recém-criado não pode estar no cache, que não guarda objetos inexistentes.
+    """
+    if not kwargs.get('created'):
+        invalidar_objetos(sender,[instance.pk])
+
+
+@receiver(post_save,sender=Veterinario)
+@receiver(post_delete,sender=Veterinario)
+def invalida_diretorio_veterinarios(sender,instance,**kwargs):
+    """Remove o diretório de veterinários usado na busca do próximo horário (disponibilidade.py)."""
+    invalidar_diretorio()
+
+
+@receiver(post_save,sender=Consulta)
+@receiver(post_delete,sender=Consulta)
+def invalida_ocupacao_consulta(sender,instance,**kwargs):
+    """
+    Remove do índice de horários livres o dia da consulta marcada, alterada ou deletada e, se ela
+    mudou de dia ou de veterinário, o dia em que estava quando foi lida do banco.
+    """
+    veterinario,data_consulta = getattr(instance,'horario_do_banco',(None,None))
+    if veterinario not in (None,instance.veterinario_id):
+        invalidar_ocupacao(veterinario,[data_consulta])
+        data_consulta = None
+    invalidar_ocupacao(instance.veterinario_id,[instance.data_consulta,data_consulta])
+    instance.horario_do_banco = (instance.veterinario_id,instance.data_consulta)
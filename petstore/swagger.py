@@ -12,5 +12,8 @@ schema_view = get_schema_view(
         license=openapi.License(name="BSD License"),
     ),
     public=True,
-    permission_classes=[permissions.AllowAny]
+    permission_classes=[permissions.AllowAny],
+    # O esquema sai sempre das rotas síncronas: sob ASGI (setup/urls_async.py) as rotas são as mesmas, mas as
+    # views assíncronas não são APIView e o drf_yasg as deixaria de fora.
+    urlconf='setup.urls',
 )
\ No newline at end of file
@@ -1,11 +1,52 @@
-from django.test import TestCase, Client
+from django.test import TestCase, TransactionTestCase, LiveServerTestCase, Client, AsyncClient, override_settings
 from django.urls import reverse
-from .models import Pet,Consulta,Veterinario, Usuario
+from .models import Pet,Consulta,Veterinario, Usuario, atualizar_retornando
 import json
+import logging
+import os
 from datetime import datetime
 from django.utils import timezone
 import pytz
+import random
+import socketserver
+import threading
+import time
+import unittest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.hashers import make_password,check_password 
+from django.core.cache import cache
+from .cache import chave_objeto
+from .carga import percentil,comparar
+from .agenda import marcar_consulta,validar_horario,concluir_consultas_passadas,HorarioInvalido,HorarioOcupado
+from .respostas import JsonResponse as RespostaJSON, Projecao, RENDERIZADORES
+from django.core import serializers
+from django.core.management import call_command
+from io import StringIO
+from unittest import mock
+import csv
+import gzip
+import hashlib
+import io
+from .exportacao import blocos,consultas_para_exportar
+from .importacao import importar
+from . import limites, particoes, replicas
+
+# Os testes fazem muitas requisições do mesmo cliente; o limite de requisições é ligado só em LimiteRequisicoesTest.
+_sem_limites = override_settings(LIMITES_ATIVOS=False)
+# As requisições medidas não escrevem no stderr; InstrumentacaoTest lê os registros com assertLogs.
+_log_instrumentacao = logging.getLogger('petstore.instrumentacao')
+_nivel_instrumentacao = _log_instrumentacao.level
+
+
+def setUpModule():
+    _sem_limites.enable()
+    _log_instrumentacao.setLevel(logging.WARNING)
+
+
+def tearDownModule():
+    _sem_limites.disable()
+    _log_instrumentacao.setLevel(_nivel_instrumentacao)
 
 
 #3 testes novos para fazer, 1 teste de numero inteiro negativo para create pet, 1 teste anterior para o update e verificar no update se o dono não existe.
@@ -520,14 +561,14 @@ class DefineHorarioConsultaViewTest(TestCase):
         self.consulta = Consulta.objects.create(id_consulta=1,veterinario=self.vet,pet=self.pet,realizada=False)
         self.url = reverse('define_data_consulta',kwargs={'id_consulta':self.consulta.id_consulta})
         self.data = {
-            'data_consulta': '2024-09-30T10:00:00Z'
+            'data_consulta': '2030-09-30T10:00:00Z'
         }
     
     def test_define_data_com_sucesso(self):
         response = self.client.put(self.url,data=json.dumps(self.data),content_type='application/json')
         consulta_atualizada = Consulta.objects.get(id_consulta=self.consulta.id_consulta)
         self.assertEqual(response.status_code,200,"Status diferentes")
-        self.assertEqual(consulta_atualizada.data_consulta.isoformat(),"2024-09-30T10:00:00+00:00","Datas diferentes.")
+        self.assertEqual(consulta_atualizada.data_consulta.isoformat(),"2030-09-30T10:00:00+00:00","Datas diferentes.")
 
     def test_tenta_definir_data_em_consulta_inexistente(self):
         url_falsa = reverse('define_data_consulta',kwargs={'id_consulta':99999})
@@ -555,5 +596,1818 @@ class DefineConsultaComoRealizadaViewTest(TestCase):
         url_falsa = reverse('realiza_consulta',kwargs={'id_consulta':99999})
         response = self.client.put(url_falsa,data=json.dumps(self.data),content_type='application/json')
         self.assertEqual(response.status_code,404,'Consulta foi achada.')
-    
+
+
+class ListPetsViewTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.url = reverse('lista_pets')
+        self.usuario = Usuario.objects.create(nome="Luis Carlos",email='Luis123@gmail.com',senha='123')
+        self.outro_usuario = Usuario.objects.create(nome="Ana",email='Ana123@gmail.com',senha='123')
+        self.pets = [Pet.objects.create(nome=f'Pet {i}',especie='Canina',idade=i,dono_do_pet=self.usuario) for i in range(5)]
+        Pet.objects.create(nome='Rex',especie='Canina',idade=2,dono_do_pet=self.outro_usuario)
+
+    def test_percorre_todas_as_paginas_do_dono(self):
+        ids,apos = [],None
+        while True:
+            parametros = {'dono':self.usuario.id_usuario,'limite':2}
+            if apos is not None:
+                parametros['apos'] = apos
+            response = self.client.get(self.url,parametros)
+            self.assertEqual(response.status_code,200,"Status diferentes.")
+            ids += [pet['id_pet'] for pet in response.json()['resultados']]
+            apos = response.json()['proximo']
+            if apos is None:
+                break
+        self.assertEqual(ids,[pet.id_pet for pet in self.pets],"Pets do dono diferentes.")
+
+    def test_tenta_listar_com_limite_invalido(self):
+        response = self.client.get(self.url,{'limite':'abc'})
+        self.assertEqual(response.status_code,400,"Resultado não esperado: limite inválido foi aceito.")
+
+class ListConsultasViewTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.url = reverse('lista_consultas')
+        self.usuario = Usuario.objects.create(nome="Luis Carlos",email='Luis123@gmail.com',senha='123')
+        self.pet = Pet.objects.create(nome='Susie',especie='Canina',idade=7,dono_do_pet=self.usuario)
+        self.vet = Veterinario.objects.create(nome='Doutor Francisco',especialidade='Cardiologista',email='Francisco123@gmail.com',senha='2321')
+        self.outro_vet = Veterinario.objects.create(nome='Doutora Ana',especialidade='Cardiologista',email='Ana123@gmail.com',senha='2321')
+        self.setembro = Consulta.objects.create(data_consulta='2024-09-30T10:00:00Z',veterinario=self.vet,pet=self.pet,realizada=True)
+        self.outubro = Consulta.objects.create(data_consulta='2024-10-15T10:00:00Z',veterinario=self.vet,pet=self.pet,realizada=False)
+        Consulta.objects.create(data_consulta='2024-10-15T10:00:00Z',veterinario=self.outro_vet,pet=self.pet,realizada=False)
+
+    def test_filtra_por_veterinario_e_periodo(self):
+        response = self.client.get(self.url,{'veterinario':self.vet.id_veterinario,'data_inicio':'2024-10-01T00:00:00Z','data_fim':'2024-11-01T00:00:00Z'})
+        self.assertEqual(response.status_code,200,"Status diferentes.")
+        self.assertEqual([c['id_consulta'] for c in response.json()['resultados']],[self.outubro.id_consulta],"Consultas diferentes.")
+
+    def test_filtra_por_dono_e_realizada(self):
+        response = self.client.get(self.url,{'dono':self.usuario.id_usuario,'realizada':'true'})
+        self.assertEqual([c['id_consulta'] for c in response.json()['resultados']],[self.setembro.id_consulta],"Consultas diferentes.")
+
+    def test_tenta_listar_com_data_invalida(self):
+        response = self.client.get(self.url,{'data_inicio':'ontem'})
+        self.assertEqual(response.status_code,400,"Resultado não esperado: data inválida foi aceita.")
+
+
+class ExportaConsultasViewTest(TestCase):
+    """Exportação em streaming das consultas (exportarconsultas), em CSV ou NDJSON."""
+    def setUp(self):
+        self.client = Client()
+        self.url = reverse('exporta_consultas')
+        self.usuario = Usuario.objects.create(nome="Luis Carlos",email='Luis123@gmail.com',senha='123')
+        self.pet = Pet.objects.create(nome='Susie',especie='Canina',idade=7,dono_do_pet=self.usuario)
+        self.vet = Veterinario.objects.create(nome='Doutor Francisco',especialidade='Cardiologista',email='Francisco123@gmail.com',senha='2321')
+        self.outro_vet = Veterinario.objects.create(nome='Doutora Ana',especialidade='Cardiologista',email='Ana123@gmail.com',senha='2321')
+        self.setembro = Consulta.objects.create(data_consulta='2024-09-30T10:00:00Z',veterinario=self.vet,pet=self.pet,realizada=True)
+        self.outubro = Consulta.objects.create(data_consulta='2024-10-15T10:00:00Z',veterinario=self.vet,pet=self.pet)
+        self.da_outra = Consulta.objects.create(data_consulta='2024-10-15T10:00:00Z',veterinario=self.outro_vet,pet=self.pet)
+
+    def ler_csv(self,response):
+        return list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+    def test_exporta_csv(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code,200,"Status diferentes.")
+        self.assertTrue(response.streaming,"Resposta não é enviada em streaming.")
+        self.assertEqual(response['Content-Type'],'text/csv; charset=utf-8')
+        linhas = self.ler_csv(response)
+        self.assertEqual(linhas[0][:3],['id_consulta','data_consulta','realizada'])
+        self.assertEqual([int(linha[0]) for linha in linhas[1:]],[self.setembro.pk,self.outubro.pk,self.da_outra.pk],"Consultas diferentes.")
+        self.assertEqual(linhas[1][1:],['2024-09-30T10:00:00+00:00','true',str(self.vet.pk),'Doutor Francisco','Cardiologista',
+                                        str(self.pet.pk),'Susie','Canina',str(self.usuario.pk),'Luis Carlos'])
+
+    def test_exporta_ndjson_com_filtros(self):
+        response = self.client.get(self.url,{'formato':'ndjson','veterinario':self.vet.pk,'data_inicio':'2024-10-01T00:00:00Z'})
+        self.assertEqual(response['Content-Type'],'application/x-ndjson')
+        linhas = [json.loads(linha) for linha in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([linha['id_consulta'] for linha in linhas],[self.outubro.pk],"Consultas diferentes.")
+        self.assertEqual((linhas[0]['veterinario'],linhas[0]['pet'],linhas[0]['dono']),('Doutor Francisco','Susie','Luis Carlos'))
+
+    def test_comprime_com_gzip(self):
+        response = self.client.get(self.url,{'formato':'ndjson'},HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'],'gzip')
+        self.assertIn('Accept-Encoding',response['Vary'])
+        linhas = gzip.decompress(b''.join(response.streaming_content)).splitlines()
+        self.assertEqual(len(linhas),3,"Conteúdo comprimido diferente.")
+
+    def test_blocos_limitados_ao_lote(self):
+        consultas = consultas_para_exportar()
+        self.assertEqual([len(bloco) for bloco in blocos(consultas,2)],[2,1])
+        with mock.patch('petstore.exportacao._por_keyset',return_value=True):
+            with self.assertNumQueries(3):
+                por_keyset = list(blocos(consultas,2))
+        self.assertEqual([linha[0] for bloco in por_keyset for linha in bloco],[self.setembro.pk,self.outubro.pk,self.da_outra.pk])
+
+    def test_tenta_exportar_com_parametros_invalidos(self):
+        self.assertEqual(self.client.get(self.url,{'formato':'xml'}).status_code,400,"Resultado não esperado: formato inválido foi aceito.")
+        self.assertEqual(self.client.get(self.url,{'data_fim':'amanhã'}).status_code,400,"Resultado não esperado: data inválida foi aceita.")
+
+    @override_settings(ROOT_URLCONF='setup.urls_async',EXPORTACAO_LOTE=2)
+    async def test_exporta_pela_view_assincrona(self):
+        response = await AsyncClient().get(self.url,{'veterinario':self.vet.pk})
+        self.assertTrue(response.is_async,"Resposta não usa um iterador assíncrono.")
+        conteudo = b''.join([parte async for parte in response.streaming_content]).decode()
+        linhas = list(csv.reader(io.StringIO(conteudo)))
+        self.assertEqual([int(linha[0]) for linha in linhas[1:]],[self.setembro.pk,self.outubro.pk],"Consultas diferentes.")
+
+
+class CreateUsuariosEmLoteViewTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.url = reverse('criar_usuarios_lote')
+        Usuario.objects.create(nome="Luis Carlos",email='Luis123@gmail.com',senha='123')
+
+    def test_cria_lote_e_reporta_erros_por_registro(self):
+        dados = [
+            {'nome':"Ana",'email':"Ana123@gmail.com",'senha':"@Ana12345"},
+            {'nome':"Luis",'email':"luis123@GMAIL.com",'senha':"@Luis12345"},
+            {'nome':"Bia",'email':"Bia123@gmail.com",'senha':"fraca"},
+            {'nome':"Ana de novo",'email':"ANA123@gmail.com",'senha':"@Ana12345"},
+            "não é um objeto",
+        ]
+        response = self.client.post(self.url,data=json.dumps(dados),content_type='application/json')
+        self.assertEqual(response.status_code,201,"Status diferentes.")
+
+        corpo = response.json()
+        self.assertEqual([criado['indice'] for criado in corpo['criados']],[0],"Registros criados diferentes.")
+        self.assertEqual([erro['indice'] for erro in corpo['erros']],[1,2,3,4],"Erros diferentes.")
+        self.assertTrue(Usuario.objects.filter(id_usuario=corpo['criados'][0]['id'],email="Ana123@gmail.com").exists(),"Usuário não foi criado.")
+
+    def test_cria_lote_ndjson(self):
+        linhas = "\n".join(json.dumps({'nome':f"Usuario {i}",'email':f"usuario{i}@gmail.com",'senha':"@Senha12345"}) for i in range(3))
+        response = self.client.post(self.url,data=linhas+"\n{quebrado",content_type='application/x-ndjson')
+        self.assertEqual(response.status_code,201,"Status diferentes.")
+        self.assertEqual(len(response.json()['criados']),3,"Quantidade de usuários criados diferente.")
+        self.assertEqual(response.json()['erros'],[{'indice':3,'erro':"Linha não é um JSON válido."}],"Erros diferentes.")
+
+    def test_tenta_criar_lote_que_nao_e_array(self):
+        response = self.client.post(self.url,data=json.dumps({'nome':"Ana"}),content_type='application/json')
+        self.assertEqual(response.status_code,400,"Resultado não esperado: corpo inválido foi aceito.")
+
+class CreatePetsEmLoteViewTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.url = reverse('criar_pets_lote')
+        self.usuario = Usuario.objects.create(nome="Luis Carlos",email='Luis123@gmail.com',senha='123')
+
+    def test_resolve_donos_com_uma_consulta(self):
+        dados = [{'nome':f"Pet {i}",'especie':"Canina",'idade':i,'dono_do_pet':self.usuario.id_usuario} for i in range(20)]
+        dados.append({'nome':"Sem dono",'especie':"Canina",'idade':1,'dono_do_pet':9999})
+        dados.append({'nome':"Negativo",'especie':"Canina",'idade':-1,'dono_do_pet':self.usuario.id_usuario})
+
+        # Uma consulta para os donos e um INSERT (com o savepoint do bloco).
+        with self.assertNumQueries(4):
+            response = self.client.post(self.url,data=json.dumps(dados),content_type='application/json')
+        self.assertEqual(response.status_code,201,"Status diferentes.")
+        self.assertEqual(len(response.json()['criados']),20,"Quantidade de pets criados diferente.")
+        self.assertEqual([erro['indice'] for erro in response.json()['erros']],[20,21],"Erros diferentes.")
+        self.assertEqual(Pet.objects.filter(dono_do_pet=self.usuario).count(),20,"Pets não foram criados.")
+
+    def test_tenta_criar_lote_sem_registros_validos(self):
+        dados = [{'nome':"Sem dono",'especie':"Canina",'idade':1,'dono_do_pet':9999}]
+        response = self.client.post(self.url,data=json.dumps(dados),content_type='application/json')
+        self.assertEqual(response.status_code,400,"Resultado não esperado: pet sem dono foi aceito.")
+
+
+class HashSenhaTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.data = {
+            'nome':"Luis Carlos",
+            'email':"Luis11@gmail.com",
+            'senha':"@Luis12345"
+        }
+        response = self.client.post(reverse('criar_usuario'),data=json.dumps(self.data),content_type='application/json')
+        self.usuario = Usuario.objects.get(id_usuario=response.json()['id'])
+        self.url = reverse('atualiza_usuario',kwargs={'id_usuario':self.usuario.id_usuario})
+
+    def test_usa_algoritmo_configurado(self):
+        self.assertTrue(self.usuario.senha.startswith('scrypt$'),"Hash gerado com outro algoritmo.")
+
+    def test_nao_refaz_hash_de_senha_inalterada(self):
+        self.data['nome'] = "Luis Macedo"
+        response = self.client.put(self.url,data=json.dumps(self.data),content_type='application/json')
+        usuario_atualizado = Usuario.objects.get(id_usuario=self.usuario.id_usuario)
+
+        self.assertEqual(response.status_code,200,"Status diferentes.")
+        self.assertEqual(usuario_atualizado.nome,"Luis Macedo","nomes diferentes")
+        self.assertEqual(usuario_atualizado.senha,self.usuario.senha,"O hash da senha foi recalculado.")
+
+    def test_refaz_hash_de_senha_alterada(self):
+        self.data['senha'] = "@Luis123456"
+        self.client.put(self.url,data=json.dumps(self.data),content_type='application/json')
+        usuario_atualizado = Usuario.objects.get(id_usuario=self.usuario.id_usuario)
+
+        self.assertNotEqual(usuario_atualizado.senha,self.usuario.senha,"O hash da senha não foi recalculado.")
+        self.assertTrue(check_password("@Luis123456",usuario_atualizado.senha),"senhas diferentes")
+
+    def test_refaz_hash_se_senha_mudou_por_outro_caminho(self):
+        Usuario.objects.filter(id_usuario=self.usuario.id_usuario).update(senha=make_password("@Outra12345"))
+        self.client.put(self.url,data=json.dumps(self.data),content_type='application/json')
+        usuario_atualizado = Usuario.objects.get(id_usuario=self.usuario.id_usuario)
+
+        self.assertTrue(check_password("@Luis12345",usuario_atualizado.senha),"A senha antiga não foi restaurada.")
+
+    def test_refaz_hash_de_senha_inalterada_com_algoritmo_antigo(self):
+        Usuario.objects.filter(id_usuario=self.usuario.id_usuario).update(senha=make_password("@Luis12345",hasher='pbkdf2_sha256'))
+        self.client.put(self.url,data=json.dumps(self.data),content_type='application/json')
+        usuario_atualizado = Usuario.objects.get(id_usuario=self.usuario.id_usuario)
+
+        self.assertTrue(usuario_atualizado.senha.startswith('scrypt$'),"O hash antigo foi mantido.")
+        self.assertTrue(check_password("@Luis12345",usuario_atualizado.senha),"senhas diferentes")
+
+    def test_nada_derivado_da_senha_fica_no_cache(self):
+        self.client.put(self.url,data=json.dumps(self.data),content_type='application/json')
+        chaves = list(getattr(cache,'_cache',{}))
+        self.assertFalse([chave for chave in chaves if ':senha:' in chave],"Verificador da senha guardado no cache.")
+
+
+class CacheObjetosTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.usuario = Usuario.objects.create(nome="Luis Carlos",email='Luis123@gmail.com',senha='123')
+        self.pet = Pet.objects.create(nome='Susie',especie='Canina',idade=7,dono_do_pet=self.usuario)
+        self.vet = Veterinario.objects.create(nome='Doutor Francisco',especialidade='Cardiologista',email='Francisco123@gmail.com',senha='2321')
+        self.consulta = Consulta.objects.create(veterinario=self.vet,pet=self.pet,realizada=False)
+
+    def test_leitura_guarda_objeto_no_cache(self):
+        self.client.get(reverse('retorna_pet',kwargs={'id_pet':self.pet.id_pet}))
+        self.assertIsNotNone(cache.get(chave_objeto(Pet,self.pet.id_pet)),"Pet não foi guardado no cache.")
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('retorna_pet',kwargs={'id_pet':self.pet.id_pet}))
+        self.assertEqual(response.json()['nome'],'Susie',"nomes diferentes.")
+
+    def test_update_invalida_pet_em_cache(self):
+        url = reverse('retorna_pet',kwargs={'id_pet':self.pet.id_pet})
+        self.client.get(url)
+        dados = {'nome':"Jake",'especie':"Canina",'idade':8,'dono_do_pet':self.usuario.id_usuario}
+        self.client.put(reverse('atualiza_pet',kwargs={'id_pet':self.pet.id_pet}),data=json.dumps(dados),content_type='application/json')
+
+        response = self.client.get(url)
+        self.assertEqual(response.json()['nome'],'Jake',"Pet desatualizado retornado do cache.")
+        self.assertEqual(response.json()['idade'],8,"Pet desatualizado retornado do cache.")
+
+    def test_update_invalida_usuario_em_cache(self):
+        url = reverse('info_usuario',kwargs={'id_usuario':self.usuario.id_usuario})
+        self.client.get(url)
+        dados = {'nome':"Luis Macedo",'email':"Luis11@gmail.com",'senha':"@Luis123456"}
+        self.client.put(reverse('atualiza_usuario',kwargs={'id_usuario':self.usuario.id_usuario}),data=json.dumps(dados),content_type='application/json')
+
+        response = self.client.get(url)
+        self.assertEqual(response.json()['nome'],'Luis Macedo',"Usuário desatualizado retornado do cache.")
+
+    def test_update_so_altera_as_linhas_que_tira_do_cache(self):
+        # Um pet que passa a atender ao filtro entre o SELECT dos ids e o UPDATE não é alterado (e nem fica no cache alterado).
+        from django.db.models import QuerySet
+        from .models import CacheQuerySet
+        values_list = QuerySet.values_list
+
+        def novo_pet_no_meio(queryset,*args,**kwargs):
+            ids = list(values_list(queryset,*args,**kwargs))
+            novo_pet_no_meio.pet = Pet.objects.create(nome='Susie',especie='Felina',idade=2,dono_do_pet=self.usuario)
+            return ids
+
+        with mock.patch.object(CacheQuerySet,'values_list',autospec=True,side_effect=novo_pet_no_meio):
+            self.assertEqual(Pet.objects.filter(nome='Susie').update(idade=10),1)
+        self.assertEqual(Pet.objects.get(pk=self.pet.pk).idade,10)
+        self.assertEqual(Pet.objects.get(pk=novo_pet_no_meio.pet.pk).idade,2)
+
+    def test_consulta_reflete_alteracao_do_veterinario(self):
+        url = reverse('retorna_consulta',kwargs={'id_consulta':self.consulta.id_consulta})
+        self.client.get(url)
+        Veterinario.objects.filter(id_veterinario=self.vet.id_veterinario).update(nome='Doutora Ana')
+
+        response = self.client.get(url)
+        self.assertEqual(response.json()['veterinario__nome'],'Doutora Ana',"Nome antigo do veterinário retornado do cache.")
+
+    def test_delete_em_cascata_invalida_cache(self):
+        url = reverse('retorna_consulta',kwargs={'id_consulta':self.consulta.id_consulta})
+        self.client.get(url)
+        self.client.delete(reverse('deleta_usuario',kwargs={'id_usuario':self.usuario.id_usuario}))
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code,404,"Consulta deletada retornada do cache.")
+
+    def test_leitura_anterior_ao_commit_nao_guarda_versao_antiga(self):
+        from . import cache as cache_objetos
+        antigo = Pet.objects.filter(pk=self.pet.pk).values(*cache_objetos.campos_objeto(Pet)).first()
+
+        def ler_e_alterar(modelo,pk,valor):
+            # A leitura termina depois que outra requisição alterou o pet e confirmou a transação.
+            with self.captureOnCommitCallbacks(execute=True):
+                Pet.objects.filter(pk=pk).update(nome='Mel')
+            return mock.Mock(first=mock.Mock(return_value=antigo))
+
+        with mock.patch.object(cache_objetos,'_ler_do_banco',side_effect=ler_e_alterar):
+            self.assertEqual(cache_objetos.buscar_objeto(Pet,self.pet.pk)['nome'],'Susie')
+        self.assertEqual(cache_objetos.buscar_objeto(Pet,self.pet.pk)['nome'],'Mel',"Versão antiga ficou no cache.")
+
+
+class ServidorRedisFalso(socketserver.ThreadingTCPServer):
+    """
+    Servidor em processo que fala o protocolo do Redis (RESP) com os comandos usados pelo
+    backend de cache do Django. Conta acertos e faltas de GET/MGET, o que permite medir a
+    taxa de acerto do cache compartilhado entre vários workers nos testes.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1',0),TratadorRedisFalso)
+        self.dados = {}
+        self.trava = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+        self.scripts = 0
+        self.scripts_carregados = set()
+
+    @property
+    def url(self):
+        return f"redis://127.0.0.1:{self.server_address[1]}/0"
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever,daemon=True).start()
+        return self
+
+    def __exit__(self,*exc):
+        self.shutdown()
+        self.server_close()
+
+    def ler(self,chave):
+        valor,expira_em = self.dados.get(chave,(None,None))
+        if expira_em is not None and expira_em <= time.monotonic():
+            del self.dados[chave]
+            return None
+        return valor
+
+    def executar(self,comando,args):
+        if comando == 'PING':
+            return 'PONG'
+        if comando in ('SELECT','CLIENT'):
+            return 'OK'
+        if comando == 'GET':
+            return self.ler_contando(args[0])
+        if comando == 'MGET':
+            return [self.ler_contando(chave) for chave in args]
+        if comando == 'SET':
+            chave,valor,opcoes = args[0],args[1],[a.decode().upper() for a in args[2:]]
+            if 'NX' in opcoes and self.ler(chave) is not None:
+                return None
+            expira_em = None
+            if 'EX' in opcoes:
+                expira_em = time.monotonic()+int(opcoes[opcoes.index('EX')+1])
+            elif 'PX' in opcoes:
+                expira_em = time.monotonic()+int(opcoes[opcoes.index('PX')+1])/1000
+            self.dados[chave] = (valor,expira_em)
+            return 'OK'
+        if comando == 'DEL':
+            return sum(self.dados.pop(chave,None) is not None for chave in args)
+        if comando == 'EXISTS':
+            return sum(self.ler(chave) is not None for chave in args)
+        if comando in ('EXPIRE','PERSIST'):
+            valor = self.ler(args[0])
+            if valor is None:
+                return 0
+            self.dados[args[0]] = (valor,time.monotonic()+int(args[1]) if comando == 'EXPIRE' else None)
+            return 1
+        if comando in ('INCRBY','DECRBY'):
+            delta = int(args[1]) if comando == 'INCRBY' else -int(args[1])
+            valor = int(self.ler(args[0]) or 0)+delta
+            self.dados[args[0]] = (str(valor).encode(),None)
+            return valor
+        if comando in ('EVAL','EVALSHA'):
+            return self.avaliar(comando,args)
+        if comando == 'FLUSHDB':
+            self.dados.clear()
+            return 'OK'
+        raise ValueError(f"ERR unknown command '{comando}'")
+
+    def avaliar(self,comando,args):
+        """Só o script do balde de limites.py, executado pelo mesmo cálculo em Python."""
+        if comando == 'EVALSHA' and args[0].decode() not in self.scripts_carregados:
+            raise ValueError("NOSCRIPT No matching script.")
+        if comando == 'EVAL':
+            self.scripts_carregados.add(hashlib.sha1(args[0]).hexdigest())
+            self.scripts += 1
+        chave,capacidade,por_segundo,pedidas = args[2],float(args[3]),float(args[4]),int(args[5])
+        balde,concedidas,espera = limites.repor_e_gastar(self.ler(chave),time.time(),capacidade,por_segundo,pedidas)
+        self.dados[chave] = (balde,None)
+        return [concedidas,str(espera).encode()]
+
+    def ler_contando(self,chave):
+        valor = self.ler(chave)
+        if valor is None:
+            self.faltas += 1
+        else:
+            self.acertos += 1
+        return valor
+
+
+class TratadorRedisFalso(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            linha = self.rfile.readline()
+            if not linha:
+                return
+            args = []
+            for _ in range(int(linha[1:])):
+                tamanho = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(tamanho+2)[:-2])
+            try:
+                with self.server.trava:
+                    resposta = self.server.executar(args[0].decode().upper(),args[1:])
+            except ValueError as e:
+                self.wfile.write(f"-{e}\r\n".encode())
+                continue
+            self.wfile.write(self.codificar(resposta))
+
+    def codificar(self,valor):
+        if valor is None:
+            return b"$-1\r\n"
+        if isinstance(valor,int):
+            return b":%d\r\n" % valor
+        if isinstance(valor,str):
+            return f"+{valor}\r\n".encode()
+        if isinstance(valor,list):
+            return b"*%d\r\n" % len(valor)+b"".join(self.codificar(v) for v in valor)
+        return b"$%d\r\n%s\r\n" % (len(valor),valor)
+
+
+def configuracao_redis(url):
+    return {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': url,
+            'KEY_PREFIX': 'petstore-teste',
+            'VERSION': 1,
+        }
+    }
+
+
+try:
+    import redis  # noqa: F401
+except ImportError:
+    redis = None
+
+
+@unittest.skipIf(redis is None,"O pacote redis não está instalado.")
+class CacheCompartilhadoTest(TransactionTestCase):
+    def setUp(self):
+        self.usuario = Usuario.objects.create(nome="Luis Carlos",email='Luis123@gmail.com',senha='123')
+        self.pets = [Pet.objects.create(nome=f'Pet {i}',especie='Canina',idade=i,dono_do_pet=self.usuario) for i in range(5)]
+        self.vet = Veterinario.objects.create(nome='Doutor Francisco',especialidade='Cardiologista',email='Francisco123@gmail.com',senha='2321')
+
+    def test_prefixo_e_versao_separam_as_chaves(self):
+        with ServidorRedisFalso() as servidor, override_settings(CACHES=configuracao_redis(servidor.url)):
+            cache.set('chave','v1')
+            with override_settings(CACHES={'default':{**configuracao_redis(servidor.url)['default'],'VERSION':2}}):
+                self.assertIsNone(cache.get('chave'),"Versão nova leu uma chave da versão antiga.")
+            self.assertEqual(cache.get('chave'),'v1',"Valor não foi lido do servidor.")
+            self.assertIn(b'petstore-teste:1:chave',servidor.dados,"Chave gravada sem prefixo e versão.")
+
+    def test_taxa_de_acerto_entre_workers(self):
+        """
+        Cada thread simula um worker do gunicorn: o Django abre uma conexão de cache por thread,
+        então nenhum worker enxerga o cache em memória dos outros. Com o servidor compartilhado
+        só a primeira leitura de cada objeto deve faltar, independente do número de workers.
+        """
+        workers,leituras_por_worker = 4,3
+        urls = [reverse('retorna_pet',kwargs={'id_pet':pet.id_pet}) for pet in self.pets]
+        urls.append(reverse('retorna_veterinario',kwargs={'id_veterinario':self.vet.id_veterinario}))
+        status = []
+
+        def worker():
+            client = Client()
+            for _ in range(leituras_por_worker):
+                for url in urls:
+                    status.append(client.get(url).status_code)
+            connection.close()
+
+        with ServidorRedisFalso() as servidor, override_settings(CACHES=configuracao_redis(servidor.url)):
+            threads = [threading.Thread(target=worker) for _ in range(workers)]
+            for thread in threads:
+                thread.start()
+                thread.join()
+
+        self.assertEqual(set(status),{200},"Alguma leitura falhou.")
+        self.assertEqual(servidor.faltas,len(urls),"Objetos foram buscados no banco mais de uma vez.")
+        self.assertEqual(servidor.acertos,len(urls)*(workers*leituras_por_worker-1),"Taxa de acerto abaixo do esperado.")
+
+
+class GetCondicionalTest(TestCase):
+    """As rotas de leitura por id mandam ETag e Last-Modified e respondem 304 quando o cliente já tem a versão atual."""
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.usuario = Usuario.objects.create(nome="Luis Carlos",email='Luis123@gmail.com',senha='@Luis12345')
+        self.pet = Pet.objects.create(nome='Susie',especie='Canina',idade=7,dono_do_pet=self.usuario)
+        self.vet = Veterinario.objects.create(nome='Doutor Francisco',especialidade='Cardiologista',email='Francisco123@gmail.com',senha='2321')
+        self.consulta = Consulta.objects.create(data_consulta=timezone.now(),veterinario=self.vet,pet=self.pet)
+        self.url_pet = reverse('retorna_pet',kwargs={'id_pet':self.pet.id_pet})
+
+    def test_responde_304_com_etag_atual(self):
+        urls = [
+            reverse('info_usuario',kwargs={'id_usuario':self.usuario.id_usuario}),
+            self.url_pet,
+            reverse('retorna_veterinario',kwargs={'id_veterinario':self.vet.id_veterinario}),
+            reverse('retorna_consulta',kwargs={'id_consulta':self.consulta.id_consulta}),
+        ]
+        for url in urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code,200,url)
+            self.assertIn('no-cache',response['Cache-Control'],url)
+            etag = response['ETag']
+
+            response = self.client.get(url,HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code,304,url)
+            self.assertEqual(response.content,b'',url)
+            self.assertEqual(response['ETag'],etag,url)
+
+    def test_versao_so_nos_cabecalhos(self):
+        leituras = {
+            reverse('info_usuario',kwargs={'id_usuario':self.usuario.id_usuario}):['id_usuario','nome','email','senha'],
+            self.url_pet:['id_pet','nome','especie','idade','dono_do_pet'],
+            reverse('retorna_veterinario',kwargs={'id_veterinario':self.vet.id_veterinario}):['id_veterinario','nome','especialidade','email','senha'],
+        }
+        for url,campos in leituras.items():
+            for _ in range(2):  # do banco e do cache
+                response = self.client.get(url)
+                self.assertEqual(list(response.json()),campos,url)
+                self.assertEqual(response['ETag'],'"1"',url)
+        response = self.client.put(reverse('atualiza_pet',kwargs={'id_pet':self.pet.id_pet}),content_type='application/json',
+                                   data={'nome':'Mel','especie':'Canina','idade':8,'dono_do_pet':self.usuario.id_usuario})
+        self.assertEqual(list(response.json()),['nome','especie','idade','dono_do_pet'])
+        self.assertEqual(response['ETag'],'"2"')
+
+    def test_cadastros_sem_versao_no_corpo(self):
+        cadastros = [
+            (reverse('marca_consulta',kwargs={'id_usuario':self.usuario.id_usuario}),
+             {'veterinario':self.vet.id_veterinario,'pet':self.pet.id_pet},['data_consulta','veterinario','pet','realizada']),
+            (reverse('criar_pet'),{'nome':'Rex','especie':'Canina','idade':3,'dono_do_pet':self.usuario.id_usuario},
+             ['nome','especie','idade','dono_do_pet']),
+            (reverse('cadastra_veterinario'),{'nome':'Ana','especialidade':'Cardiologista','email':'ana123@gmail.com','senha':'@Ana123456'},
+             ['nome','especialidade','email','senha']),
+        ]
+        for urlconf in ('setup.urls','setup.urls_async'):
+            Veterinario.objects.filter(email='ana123@gmail.com').delete()
+            for url,dados,campos in cadastros:
+                with self.subTest(urlconf=urlconf,url=url),override_settings(ROOT_URLCONF=urlconf):
+                    response = self.client.post(url,data=json.dumps(dados),content_type='application/json')
+                    self.assertEqual(response.status_code,201,response.content)
+                    self.assertNotIn('versao',response.json()[0]['fields'])
+                    self.assertEqual(list(response.json()[0]['fields']),campos)
+
+    def test_atualizacao_muda_etag(self):
+        etag = self.client.get(self.url_pet)['ETag']
+        data = {'nome':'Mel','especie':'Canina','idade':8,'dono_do_pet':self.usuario.id_usuario}
+        self.client.put(reverse('atualiza_pet',kwargs={'id_pet':self.pet.id_pet}),data=data,content_type='application/json')
+
+        response = self.client.get(self.url_pet,HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code,200,"Versão antiga foi considerada atual.")
+        self.assertEqual(response.json()['nome'],'Mel')
+        self.assertNotEqual(response['ETag'],etag,"ETag não mudou com a atualização.")
+
+    def test_etag_da_consulta_muda_com_o_pet(self):
+        url = reverse('retorna_consulta',kwargs={'id_consulta':self.consulta.id_consulta})
+        etag = self.client.get(url)['ETag']
+        self.pet.nome = 'Mel'
+        self.pet.save()
+        cache.clear()
+
+        response = self.client.get(url,HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code,200,"Consulta com o nome antigo do pet foi considerada atual.")
+        self.assertEqual(response.json()['pet__nome'],'Mel')
+
+    def test_if_modified_since(self):
+        ultima_alteracao = self.client.get(self.url_pet)['Last-Modified']
+        self.assertEqual(self.client.get(self.url_pet,HTTP_IF_MODIFIED_SINCE=ultima_alteracao).status_code,304)
+        self.assertEqual(self.client.get(self.url_pet,HTTP_IF_MODIFIED_SINCE='Mon, 01 Jan 2001 00:00:00 GMT').status_code,200)
+
+    def test_304_le_so_a_versao(self):
+        etag = self.client.get(self.url_pet)['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url_pet,HTTP_IF_NONE_MATCH=etag).status_code,304)
+
+        cache.clear()
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.client.get(self.url_pet,HTTP_IF_NONE_MATCH=etag).status_code,304)
+        self.assertEqual(len(consultas),1)
+        self.assertNotIn('"nome"',consultas[0]['sql'],"Buscou o objeto inteiro para responder 304.")
+
+    def test_objeto_inexistente_responde_404(self):
+        url = reverse('retorna_pet',kwargs={'id_pet':9999})
+        self.assertEqual(self.client.get(url,HTTP_IF_NONE_MATCH='"1"').status_code,404)
+
+    @override_settings(ROOT_URLCONF='setup.urls_async')
+    async def test_views_assincronas(self):
+        client = AsyncClient()
+        for url in (self.url_pet,reverse('retorna_consulta',kwargs={'id_consulta':self.consulta.id_consulta})):
+            etag = (await client.get(url))['ETag']
+            await cache.aclear()
+            self.assertEqual((await client.get(url,headers={'If-None-Match':etag})).status_code,304,url)
+            self.assertEqual((await client.get(url,headers={'If-None-Match':etag})).status_code,304,url)
+            self.assertEqual((await client.get(url,headers={'If-None-Match':'"0"'})).status_code,200,url)
+
+class AtualizacaoCondicionalTest(TestCase):
+    """Com If-Match as rotas de atualização só gravam se o objeto ainda estiver na versão lida pelo cliente."""
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.usuario = Usuario.objects.create(nome="Luis Carlos",email='Luis123@gmail.com',senha='@Luis12345')
+        self.pet = Pet.objects.create(nome='Susie',especie='Canina',idade=7,dono_do_pet=self.usuario)
+        self.vet = Veterinario.objects.create(nome='Doutor Francisco',especialidade='Cardiologista',email='Francisco123@gmail.com',senha='@Francisco123')
+        self.consulta = Consulta.objects.create(data_consulta=timezone.now(),veterinario=self.vet,pet=self.pet)
+        self.url_pet = reverse('atualiza_pet',kwargs={'id_pet':self.pet.id_pet})
+
+    def atualizar_pet(self,nome,**cabecalhos):
+        data = {'nome':nome,'especie':'Canina','idade':8,'dono_do_pet':self.usuario.id_usuario}
+        return self.client.put(self.url_pet,data=data,content_type='application/json',**cabecalhos)
+
+    def test_segunda_edicao_com_a_mesma_versao_recebe_412(self):
+        etag = self.client.get(reverse('retorna_pet',kwargs={'id_pet':self.pet.id_pet}))['ETag']
+
+        response = self.atualizar_pet('Mel',HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code,200,"Edição com a versão atual foi recusada.")
+        self.assertNotEqual(response['ETag'],etag,"ETag não mudou com a atualização.")
+        self.assertEqual(response['ETag'],'"2"')
+
+        response = self.atualizar_pet('Bob',HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code,412,"Edição sobre uma versão antiga foi gravada.")
+        self.assertEqual(response['ETag'],'"2"',"412 sem o ETag atual.")
+        self.pet.refresh_from_db()
+        self.assertEqual(self.pet.nome,'Mel',"Edição sobre uma versão antiga foi gravada.")
+
+    def test_sem_if_match_grava_como_antes(self):
+        self.assertEqual(self.atualizar_pet('Mel').status_code,200)
+        self.assertEqual(self.atualizar_pet('Bob',HTTP_IF_MATCH='*').status_code,200)
+        self.assertEqual(self.atualizar_pet('Rex',HTTP_IF_MATCH='W/"3"').status_code,412,"ETag fraco passou no If-Match.")
+
+    def test_objeto_inexistente_responde_404(self):
+        url = reverse('atualiza_pet',kwargs={'id_pet':9999})
+        data = {'nome':'Mel','especie':'Canina','idade':8,'dono_do_pet':self.usuario.id_usuario}
+        self.assertEqual(self.client.put(url,data=data,content_type='application/json',HTTP_IF_MATCH='"1"').status_code,404)
+
+    def test_usuario_veterinario_e_consulta(self):
+        rotas = [
+            (reverse('atualiza_usuario',kwargs={'id_usuario':self.usuario.id_usuario}),{'nome':'Luis','email':'Luis123@gmail.com','senha':'@Luis12345'}),
+            (reverse('atualiza_vet',kwargs={'id_veterinario':self.vet.id_veterinario}),
+             {'nome':'Francisco','especialidade':'Cardiologista','email':'Francisco123@gmail.com','senha':'@Francisco123'}),
+            (reverse('realiza_consulta',kwargs={'id_consulta':self.consulta.id_consulta}),{'realizada':True}),
+        ]
+        for url,data in rotas:
+            response = self.client.put(url,data=data,content_type='application/json',HTTP_IF_MATCH='"1"')
+            self.assertEqual(response.status_code,200,url)
+            self.assertEqual(response['ETag'],'"2"',url)
+            response = self.client.put(url,data=data,content_type='application/json',HTTP_IF_MATCH='"1"')
+            self.assertEqual(response.status_code,412,url)
+
+    def test_etag_da_consulta_serve_para_realizar(self):
+        etag = self.client.get(reverse('retorna_consulta',kwargs={'id_consulta':self.consulta.id_consulta}))['ETag']
+        url = reverse('realiza_consulta',kwargs={'id_consulta':self.consulta.id_consulta})
+        response = self.client.put(url,data={'realizada':True},content_type='application/json',HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code,200,"ETag de retornaconsulta não foi aceito.")
+
+    @override_settings(ROOT_URLCONF='setup.urls_async')
+    async def test_views_assincronas(self):
+        client = AsyncClient()
+        data = {'nome':'Mel','especie':'Canina','idade':8,'dono_do_pet':self.usuario.id_usuario}
+        response = await client.put(self.url_pet,data=data,content_type='application/json',headers={'If-Match':'"1"'})
+        self.assertEqual(response.status_code,200)
+        self.assertEqual(response['ETag'],'"2"')
+        response = await client.put(self.url_pet,data=data,content_type='application/json',headers={'If-Match':'"1"'})
+        self.assertEqual(response.status_code,412)
+
+
+class BenchmarkConcorrenciaTest(TransactionTestCase):
+    def test_nenhuma_edicao_perdida(self):
+        saida = StringIO()
+        call_command('benchmark_concorrencia',threads=1,objetos=2,edicoes=5,pausa=0,stdout=saida)
+        resultado = saida.getvalue()
+        self.assertIn('otimista',resultado)
+        self.assertIn('pessimista',resultado)
+        self.assertIn('concluídas 5',resultado)
+        self.assertIn("Nenhuma edição foi perdida.",resultado)
+        self.assertFalse(Pet.objects.exists(),"Dados do benchmark não foram apagados.")
+
+
+@override_settings(LIMITES_ATIVOS=True,LIMITES_REQUISICOES={'criar_usuario':{'capacidade':2,'por_segundo':0.5}})
+class LimiteRequisicoesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        limites.limpar_local()
+        self.client = Client()
+
+    def cadastrar(self,i,**extra):
+        data = {'nome':'Maria','email':f'maria{i}@gmail.com','senha':'@Maria12345'}
+        return self.client.post(reverse('criar_usuario'),data=data,content_type='application/json',**extra)
+
+    def test_recusa_acima_da_capacidade(self):
+        self.assertEqual([self.cadastrar(i).status_code for i in range(2)],[201,201])
+        response = self.cadastrar(2)
+        self.assertEqual(response.status_code,429,"Requisição acima do limite foi aceita.")
+        self.assertEqual(response['Retry-After'],'2')
+        self.assertEqual(Usuario.objects.count(),2,"A view foi chamada para uma requisição recusada.")
+
+        self.assertEqual(self.cadastrar(3,REMOTE_ADDR='10.0.0.2').status_code,201,"O limite de um cliente afetou outro.")
+        self.assertEqual(self.client.get(reverse('lista_pets')).status_code,200,"Rota sem regra foi limitada.")
+
+    def test_fichas_sao_repostas(self):
+        with mock.patch('petstore.limites.time.time',return_value=1000.0):
+            self.cadastrar(0)
+            self.cadastrar(1)
+        limites.limpar_local()
+        with mock.patch('petstore.limites.time.time',return_value=1002.1):
+            self.assertEqual(self.cadastrar(2).status_code,201,"Ficha não foi reposta.")
+            self.assertEqual(self.cadastrar(3).status_code,429)
+
+    def test_recusa_local_nao_consulta_o_cache(self):
+        self.cadastrar(0)
+        self.cadastrar(1)
+        self.assertEqual(self.cadastrar(2).status_code,429)
+        with mock.patch('petstore.limites.consultar_cache') as consultar:
+            self.assertEqual(self.cadastrar(3).status_code,429)
+        consultar.assert_not_called()
+
+    @override_settings(LIMITES_REQUISICOES={'criar_usuario':{'capacidade':4,'por_segundo':0.5,'reserva':3}})
+    def test_reserva_gasta_fichas_localmente(self):
+        with mock.patch('petstore.limites.consultar_cache',wraps=limites.consultar_cache) as consultar:
+            status = [self.cadastrar(i).status_code for i in range(5)]
+        self.assertEqual(status,[201,201,201,201,429])
+        self.assertEqual(consultar.call_count,3,"Cada requisição foi ao cache.")
+
+    @override_settings(LIMITES_CABECALHO_IP='X-Forwarded-For')
+    def test_cliente_pelo_cabecalho_do_proxy(self):
+        for i in range(2):
+            self.cadastrar(i,HTTP_X_FORWARDED_FOR=f'1.1.1.{i}, 10.0.0.5')
+        self.assertEqual(self.cadastrar(2,HTTP_X_FORWARDED_FOR='1.1.1.9, 10.0.0.5').status_code,429)
+        self.assertEqual(self.cadastrar(3,HTTP_X_FORWARDED_FOR='10.0.0.6').status_code,201)
+
+    @override_settings(ROOT_URLCONF='setup.urls_async')
+    async def test_views_assincronas(self):
+        client = AsyncClient()
+        data = {'nome':'Maria','email':'maria@gmail.com','senha':'@Maria12345'}
+        status = [(await client.post(reverse('criar_usuario'),data=data,content_type='application/json')).status_code for _ in range(3)]
+        self.assertEqual(status,[201,400,429])
+
+    def test_regra_invalida_nas_configuracoes(self):
+        import importlib.util
+        from django.core.exceptions import ImproperlyConfigured
+        from setup import settings as modulo
+        for regra in ('criar_usuario','criar_usuario=5','criar_usuario=cinco/1','criar_usuario=5/0','=5/1','criar_usuario=5/1/2/3'):
+            with self.subTest(regra=regra),mock.patch.dict(os.environ,{'LIMITES_REQUISICOES':regra}):
+                especificacao = importlib.util.spec_from_file_location('configuracoes_teste',modulo.__file__)
+                with self.assertRaisesRegex(ImproperlyConfigured,f"LIMITES_REQUISICOES: {regra!r}"):
+                    especificacao.loader.exec_module(importlib.util.module_from_spec(especificacao))
+
+    @unittest.skipIf(redis is None,"O pacote redis não está instalado.")
+    def test_balde_no_redis(self):
+        with ServidorRedisFalso() as servidor, override_settings(REDIS_URL=servidor.url,CACHES=configuracao_redis(servidor.url)):
+            self.assertEqual([self.cadastrar(i).status_code for i in range(3)],[201,201,429])
+            self.assertEqual(servidor.scripts,1,"O script não foi reaproveitado.")
+            self.assertTrue(any(chave.endswith(b'limite:criar_usuario:127.0.0.1') for chave in servidor.dados))
+
+    def test_falha_do_redis_usa_o_balde_do_worker(self):
+        from redis.exceptions import ConnectionError as ErroRedis
+        from prometheus_client import REGISTRY
+        cliente = mock.Mock(**{'evalsha.side_effect':ErroRedis("Connection refused")})
+        falhas = REGISTRY.get_sample_value('petstore_limite_falhas_redis_total') or 0
+        with override_settings(REDIS_URL='redis://127.0.0.1:1/0'),mock.patch('petstore.limites.cliente_redis',return_value=cliente):
+            with self.assertLogs('petstore.limites','WARNING'):
+                self.assertEqual([self.cadastrar(i).status_code for i in range(3)],[201,201,429])
+        self.assertEqual(REGISTRY.get_sample_value('petstore_limite_falhas_redis_total'),falhas + 3)
+
+
+@override_settings(ROOT_URLCONF='setup.urls_async')
+class ViewsAssincronasTest(TestCase):
+    """As rotas de setup/urls_async.py respondem como as síncronas, mas pelas views de views_async.py."""
+    def setUp(self):
+        cache.clear()
+        self.client = AsyncClient()
+        self.usuario = Usuario.objects.create(nome="Luis Carlos",email='Luis123@gmail.com',senha='@Luis12345')
+        self.pet = Pet.objects.create(nome='Susie',especie='Canina',idade=7,dono_do_pet=self.usuario)
+        self.vet = Veterinario.objects.create(nome='Doutor Francisco',especialidade='Cardiologista',email='Francisco123@gmail.com',senha='2321')
+
+    def test_rotas_usam_views_assincronas(self):
+        from django.urls import resolve
+        from . import views_async
+        view = resolve(reverse('retorna_pet',kwargs={'id_pet':self.pet.id_pet})).func
+        self.assertIs(view.view_class,views_async.GetPetInfoView,"Rota não usa a view assíncrona.")
+        self.assertTrue(view.view_class.view_is_async,"View não é assíncrona.")
+
+    def test_urlconfs_e_swagger_tem_as_mesmas_rotas(self):
+        from setup import urls, urls_async
+        self.assertEqual([str(rota.pattern) for rota in urls_async.urlpatterns],[str(rota.pattern) for rota in urls.urlpatterns])
+        caminhos = {}
+        for urlconf in ('setup.urls','setup.urls_async'):
+            with override_settings(ROOT_URLCONF=urlconf):
+                caminhos[urlconf] = set(Client().get('/swagger/?format=openapi').json()['paths'])
+        self.assertGreater(len(caminhos['setup.urls']),20)
+        self.assertEqual(caminhos['setup.urls_async'],caminhos['setup.urls'],"O swagger sob ASGI perdeu rotas.")
+
+    async def test_cria_usuario(self):
+        data = {'nome':'Maria','email':'maria123@gmail.com','senha':'@Maria12345'}
+        response = await self.client.post(reverse('criar_usuario'),data=data,content_type='application/json')
+        self.assertEqual(response.status_code,201,"Usuário não foi criado.")
+        usuario = await Usuario.objects.aget(id_usuario=response.json()['id'])
+        self.assertTrue(check_password('@Maria12345',usuario.senha),"Hash da senha incorreto.")
+
+        response = await self.client.post(reverse('criar_usuario'),data=data,content_type='application/json')
+        self.assertEqual(response.status_code,400,"Usuário duplicado foi criado.")
+
+    async def test_busca_e_atualiza_pet(self):
+        url = reverse('retorna_pet',kwargs={'id_pet':self.pet.id_pet})
+        response = await self.client.get(url)
+        self.assertEqual(response.json()['nome'],'Susie',"Pet incorreto.")
+
+        data = {'nome':'Mel','especie':'Canina','idade':8,'dono_do_pet':self.usuario.id_usuario}
+        response = await self.client.put(reverse('atualiza_pet',kwargs={'id_pet':self.pet.id_pet}),data=data,content_type='application/json')
+        self.assertEqual(response.status_code,200,"Pet não foi atualizado.")
+
+        response = await self.client.get(url)
+        self.assertEqual(response.json()['nome'],'Mel',"Cache não foi invalidado pela atualização.")
+
+    async def test_marca_e_visualiza_consulta(self):
+        data = {'veterinario':self.vet.id_veterinario,'pet':self.pet.id_pet}
+        response = await self.client.post(reverse('marca_consulta',kwargs={'id_usuario':self.usuario.id_usuario}),data=data,content_type='application/json')
+        self.assertEqual(response.status_code,201,"Consulta não foi marcada.")
+
+        id_consulta = response.json()[0]['pk']
+        response = await self.client.get(reverse('retorna_consulta',kwargs={'id_consulta':id_consulta}))
+        self.assertEqual(response.json()['pet__nome'],'Susie',"Consulta incorreta.")
+
+        response = await self.client.delete(reverse('deletar_consulta',kwargs={'id_consulta':id_consulta}))
+        self.assertEqual(response.status_code,200,"Consulta não foi deletada.")
+        response = await self.client.delete(reverse('deletar_consulta',kwargs={'id_consulta':id_consulta}))
+        self.assertEqual(response.status_code,404,"Consulta deletada duas vezes.")
+
+    async def test_agenda(self):
+        url = reverse('marca_consulta',kwargs={'id_usuario':self.usuario.id_usuario})
+        data = {'veterinario':self.vet.id_veterinario,'pet':self.pet.id_pet,'data_consulta':'2030-01-10T09:30:00-03:00'}
+        response = await self.client.post(url,data=data,content_type='application/json')
+        self.assertEqual(response.status_code,201,"Consulta não foi marcada.")
+        response = await self.client.post(url,data=data,content_type='application/json')
+        self.assertEqual(response.status_code,409,"Veterinário foi reservado duas vezes no mesmo horário.")
+
+        response = await self.client.post(url,data={**data,'data_consulta':'2030-01-10T09:40:00-03:00'},content_type='application/json')
+        self.assertEqual(response.status_code,400,"Horário fora da agenda foi aceito.")
+        outra = await self.client.post(url,data={**data,'data_consulta':'2030-01-10T10:00:00-03:00'},content_type='application/json')
+        response = await self.client.put(reverse('define_data_consulta',kwargs={'id_consulta':outra.json()[0]['pk']}),
+                                         data={'data_consulta':'2030-01-10T09:30:00-03:00'},content_type='application/json')
+        self.assertEqual(response.status_code,409,"Consulta remarcada para um horário ocupado.")
+
+    async def test_proximo_horario(self):
+        response = await self.client.get(reverse('proximo_horario'),{'especialidade':'Cardiologista','a_partir_de':'2030-01-10T00:00:00-03:00'})
+        self.assertEqual(response.json()['data_consulta'],'2030-01-10T07:00:00-03:00',"Horário incorreto.")
+        response = await self.client.get(reverse('proximo_horario'))
+        self.assertEqual(response.status_code,400,"Especialidade não foi exigida.")
+
+    async def test_objetos_inexistentes(self):
+        response = await self.client.get(reverse('info_usuario',kwargs={'id_usuario':9999}))
+        self.assertEqual(response.status_code,404,"Usuário foi encontrado.")
+        response = await self.client.put(reverse('atualiza_vet',kwargs={'id_veterinario':9999}),
+                                         data={'nome':'A','especialidade':'B','email':'vet123@gmail.com','senha':'@Vet123456'},content_type='application/json')
+        self.assertEqual(response.status_code,404,"Veterinário foi encontrado.")
+
+
+class PercentilTest(TestCase):
+    def test_percentis(self):
+        valores = list(range(1,101))
+        self.assertEqual(percentil(valores,50),50)
+        self.assertEqual(percentil(valores,99),99)
+        self.assertEqual(percentil(valores,100),100)
+        self.assertIsNone(percentil([],50))
+
+
+class ComparacaoComBaseTest(TestCase):
+    """Comparação do resultado do benchmark_rotas com a linha de base (carga.comparar)."""
+    def resultado(self,p99,req_s=100.0,erros=0):
+        resumo = {'requisicoes':1000,'erros':erros,'req_s':req_s,'p50_ms':2.0,'p95_ms':5.0,'p99_ms':p99}
+        return {'total':resumo,'rotas':{'retorna_pet':resumo}}
+
+    def test_sem_regressao(self):
+        self.assertEqual(comparar(self.resultado(10.0),self.resultado(11.5)),[])
+
+    def test_latencia(self):
+        regressoes = comparar(self.resultado(10.0),self.resultado(13.0))
+        self.assertEqual(regressoes,['total: p99_ms 10.00 -> 13.00','retorna_pet: p99_ms 10.00 -> 13.00'])
+
+    def test_tolerancia_absoluta(self):
+        # 0.5 ms -> 0.9 ms é 80% pior, mas fica dentro da tolerância de 1 ms.
+        self.assertEqual(comparar(self.resultado(0.5),self.resultado(0.9)),[])
+        self.assertEqual(len(comparar(self.resultado(0.5),self.resultado(0.9),tolerancia_ms=0.1)),2)
+
+    def test_vazao_e_erros(self):
+        regressoes = comparar(self.resultado(10.0),self.resultado(10.0,req_s=70.0,erros=3))
+        self.assertIn('retorna_pet: req/s 100.0 -> 70.0',regressoes)
+        self.assertIn('retorna_pet: 3 erro(s), a base não tinha nenhum',regressoes)
+
+
+@override_settings(SENHA_PROCESSOS=0,PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],INSTRUMENTACAO_AMOSTRAGEM=0)
+class BenchmarkRotasTest(LiveServerTestCase):
+    """benchmark_rotas contra o servidor de teste: todas as rotas medidas, sem erros e sem deixar dados no banco."""
+    def test_mede_todas_as_rotas(self):
+        import tempfile
+        from .sementes import semear
+        from .management.commands.benchmark_rotas import rotas_nomeadas
+        cache.clear()
+        semear(usuarios=5,veterinarios=3,consultas=30)
+        contagem = lambda: [modelo.objects.count() for modelo in (Usuario,Pet,Veterinario,Consulta)]
+        antes = contagem()
+        with tempfile.TemporaryDirectory() as diretorio:
+            saida,arquivo = StringIO(),os.path.join(diretorio,'base.json')
+            call_command('benchmark_rotas',url=self.live_server_url,concorrencia=1,duracao=0.2,aquecimento=0,saida=arquivo,stdout=saida)
+            with open(arquivo,encoding='utf-8') as f:
+                resultado = json.load(f)
+            # Comparar com a própria execução não aponta regressões.
+            call_command('benchmark_rotas',url=self.live_server_url,concorrencia=1,duracao=0.2,aquecimento=0,
+                         rotas=['retorna_pet'],base=arquivo,limite=100,stdout=saida)
+
+        self.assertEqual(set(resultado['rotas']),rotas_nomeadas())
+        self.assertEqual(resultado['dados'],dict(zip(('usuario','pet','veterinario','consulta'),antes)))
+        for nome,resumo in resultado['rotas'].items():
+            self.assertGreater(resumo['requisicoes'],0,nome)
+            self.assertEqual(resumo['erros'],0,nome)
+            self.assertTrue(all(status.startswith('2') for status in resumo['status']),f"{nome}: {resumo['status']}")
+        self.assertEqual(contagem(),antes)
+
+
+class NumeroDeConsultasTest(TestCase):
+    """
+    Fixa o número de comandos SQL de cada rota, para que uma mudança que volte a fazer consultas
+    extras (ex.: exists() antes de um update ou um select depois dele) quebre o teste.
+    As leituras são medidas com o cache vazio.
+    """
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.usuario = Usuario.objects.create(nome="Luis Carlos",email='Luis123@gmail.com',senha='@Luis12345')
+        self.pet = Pet.objects.create(nome='Susie',especie='Canina',idade=7,dono_do_pet=self.usuario)
+        self.vet = Veterinario.objects.create(nome='Doutor Francisco',especialidade='Cardiologista',email='Francisco123@gmail.com',senha='@Vet123456')
+        self.consulta = Consulta.objects.create(veterinario=self.vet,pet=self.pet)
+
+    def assertConsultas(self,quantidade,metodo,url,dados=None,status=200):
+        with self.subTest(url=url,metodo=metodo):
+            with self.assertNumQueries(quantidade):
+                response = getattr(self.client,metodo)(url,data=json.dumps(dados) if dados is not None else None,content_type='application/json')
+            self.assertEqual(response.status_code,status,response.content)
+
+    def test_leituras(self):
+        self.assertConsultas(1,'get',reverse('info_usuario',kwargs={'id_usuario':self.usuario.id_usuario}))
+        self.assertConsultas(0,'get',reverse('info_usuario',kwargs={'id_usuario':self.usuario.id_usuario}))
+        self.assertConsultas(1,'get',reverse('retorna_pet',kwargs={'id_pet':self.pet.id_pet}))
+        self.assertConsultas(1,'get',reverse('retorna_veterinario',kwargs={'id_veterinario':self.vet.id_veterinario}))
+        self.assertConsultas(1,'get',reverse('retorna_consulta',kwargs={'id_consulta':self.consulta.id_consulta}))
+        self.assertConsultas(1,'get',reverse('lista_pets'))
+        self.assertConsultas(1,'get',reverse('lista_veterinarios'))
+        self.assertConsultas(1,'get',reverse('lista_consultas'))
+
+    def test_atualizacoes_em_um_unico_comando(self):
+        # Usuário e veterinário leem antes o hash atual (do cache, ou do banco se ele estiver frio) para saber se a senha mudou.
+        self.assertConsultas(2,'put',reverse('atualiza_usuario',kwargs={'id_usuario':self.usuario.id_usuario}),
+                             {'nome':'Luis','email':'Luis11@gmail.com','senha':'@Luis123456'})
+        self.assertConsultas(1,'put',reverse('atualiza_pet',kwargs={'id_pet':self.pet.id_pet}),
+                             {'nome':'Mel','especie':'Canina','idade':8,'dono_do_pet':self.usuario.id_usuario})
+        self.assertConsultas(2,'put',reverse('atualiza_vet',kwargs={'id_veterinario':self.vet.id_veterinario}),
+                             {'nome':'Francisco','especialidade':'Clínico geral','email':'Francisco11@gmail.com','senha':'@Vet1234567'})
+        # Remarcar passa pela agenda: trava o veterinário, procura conflito e atualiza, numa transação (SAVEPOINT nos testes).
+        self.assertConsultas(6,'put',reverse('define_data_consulta',kwargs={'id_consulta':self.consulta.id_consulta}),
+                             {'data_consulta':'2030-01-10T10:00:00Z'})
+        # Realizada trava a consulta e a grava com save(), também numa transação.
+        self.assertConsultas(4,'put',reverse('realiza_consulta',kwargs={'id_consulta':self.consulta.id_consulta}),
+                             {'realizada':True})
+
+    def test_atualizacoes_de_objetos_inexistentes(self):
+        self.assertConsultas(2,'put',reverse('atualiza_usuario',kwargs={'id_usuario':9999}),
+                             {'nome':'Luis','email':'Luis11@gmail.com','senha':'@Luis123456'},status=404)
+        # O motivo (pet ou dono inexistente) só é procurado depois do UPDATE que não alterou nada.
+        self.assertConsultas(2,'put',reverse('atualiza_pet',kwargs={'id_pet':9999}),
+                             {'nome':'Mel','especie':'Canina','idade':8,'dono_do_pet':self.usuario.id_usuario},status=404)
+        self.assertConsultas(2,'put',reverse('atualiza_pet',kwargs={'id_pet':self.pet.id_pet}),
+                             {'nome':'Mel','especie':'Canina','idade':8,'dono_do_pet':9999},status=404)
+        self.assertConsultas(3,'put',reverse('define_data_consulta',kwargs={'id_consulta':9999}),
+                             {'data_consulta':'2030-01-10T10:00:00Z'},status=404)
+
+    def test_cadastros(self):
+        self.assertConsultas(2,'post',reverse('criar_usuario'),{'nome':'Maria','email':'maria123@gmail.com','senha':'@Maria12345'},status=201)
+        self.assertConsultas(2,'post',reverse('cadastra_veterinario'),
+                             {'nome':'Ana','especialidade':'Cardiologista','email':'ana123@gmail.com','senha':'@Ana123456'},status=201)
+        self.assertConsultas(2,'post',reverse('criar_pet'),
+                             {'nome':'Rex','especie':'Canina','idade':3,'dono_do_pet':self.usuario.id_usuario},status=201)
+        self.assertConsultas(4,'post',reverse('marca_consulta',kwargs={'id_usuario':self.usuario.id_usuario}),
+                             {'veterinario':self.vet.id_veterinario,'pet':self.pet.id_pet},status=201)
+        self.assertConsultas(7,'post',reverse('marca_consulta',kwargs={'id_usuario':self.usuario.id_usuario}),
+                             {'veterinario':self.vet.id_veterinario,'pet':self.pet.id_pet,'data_consulta':'2030-01-10T10:00:00Z'},status=201)
+
+
+class RespostasJSONTest(TestCase):
+    def setUp(self):
+        self.usuario = Usuario.objects.create(nome="Luís Carlos",email='Luis123@gmail.com',senha='@Luis12345')
+        self.pet = Pet.objects.create(nome='Susie',especie='Canina',idade=7,dono_do_pet=self.usuario)
+        self.vet = Veterinario.objects.create(nome='Doutor Francisco',especialidade='Cardiologista',email='Francisco123@gmail.com',senha='2321')
+        self.consulta = Consulta.objects.create(veterinario=self.vet,pet=self.pet)
+
+    def test_projecao_igual_ao_serializador(self):
+        for modelo,objeto in ((Usuario,self.usuario),(Pet,self.pet),(Veterinario,self.vet),(Consulta,self.consulta)):
+            with self.subTest(modelo=modelo.__name__):
+                esperado = json.loads(serializers.serialize('json',[objeto]))
+                obtido = json.loads(RespostaJSON(Projecao(modelo).lista([objeto]),safe=False).content)
+                self.assertEqual(obtido,esperado,"Projeção diferente do serializador do Django.")
+
+    def test_renderizadores_geram_os_mesmos_valores(self):
+        dados = {'consulta':Projecao(Consulta).objeto(self.consulta),'nome':self.usuario.nome,'lista':[1,None,True]}
+        resultados = {nome: json.loads(renderizar(dados)) for nome,renderizar in RENDERIZADORES.items()}
+        self.assertEqual(resultados['orjson'],resultados['json'],"Renderizadores geram valores diferentes.")
+
+    def test_renderizador_configuravel(self):
+        with override_settings(RENDERIZADOR_JSON='json'):
+            resposta = RespostaJSON({'nome':'Luís'})
+        self.assertEqual(resposta.content,b'{"nome": "Lu\\u00eds"}',"Renderizador padrão não foi usado.")
+        self.assertEqual(resposta['Content-Type'],'application/json')
+
+    def test_safe(self):
+        with self.assertRaises(TypeError):
+            RespostaJSON([1,2])
+        self.assertEqual(json.loads(RespostaJSON([1,2],safe=False).content),[1,2])
+
+    def test_projecao_de_valores(self):
+        projecao = Projecao(Pet,('id_pet','nome'))
+        self.assertEqual(projecao.valores({'id_pet':1,'nome':'Susie','idade':7}),{'id_pet':1,'nome':'Susie'})
+        self.assertEqual(Projecao(Pet,('nome',)).valores({'nome':'Susie'}),{'nome':'Susie'})
+
+
+class AgendaTest(TestCase):
+    """Agenda do veterinário: horários alinhados ao expediente e sem sobreposição (agenda.py)."""
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.usuario = Usuario.objects.create(nome="Luis Carlos",email='Luis123@gmail.com',senha='@Luis12345')
+        self.pet = Pet.objects.create(nome='Susie',especie='Canina',idade=7,dono_do_pet=self.usuario)
+        self.vet = Veterinario.objects.create(nome='Doutor Francisco',especialidade='Cardiologista',email='Francisco123@gmail.com',senha='2321',
+                                              inicio_expediente=datetime.strptime('08:00','%H:%M').time(),
+                                              fim_expediente=datetime.strptime('12:00','%H:%M').time(),duracao_consulta=30)
+        self.url = reverse('marca_consulta',kwargs={'id_usuario':self.usuario.id_usuario})
+
+    def marcar(self,data,vet=None):
+        dados = {'veterinario':(vet or self.vet).id_veterinario,'pet':self.pet.id_pet,'data_consulta':data}
+        return self.client.post(self.url,data=dados,content_type='application/json')
+
+    def test_marca_consulta_num_horario_livre(self):
+        response = self.marcar('2030-01-10T09:30:00-03:00')
+        self.assertEqual(response.status_code,201,response.content)
+        consulta = Consulta.objects.get(pk=response.json()[0]['pk'])
+        self.assertEqual(consulta.data_consulta.isoformat(),'2030-01-10T12:30:00+00:00',"Horário gravado incorreto.")
+
+    def test_rejeita_horario_ocupado(self):
+        self.assertEqual(self.marcar('2030-01-10T09:30:00-03:00').status_code,201)
+        response = self.marcar('2030-01-10T12:30:00Z')
+        self.assertEqual(response.status_code,409,"Veterinário foi reservado duas vezes no mesmo horário.")
+        self.assertEqual(Consulta.objects.filter(veterinario=self.vet).count(),1)
+
+    def test_outro_veterinario_no_mesmo_horario(self):
+        outro = Veterinario.objects.create(nome='Doutora Ana',especialidade='Cardiologista',email='ana123@gmail.com',senha='2321')
+        self.assertEqual(self.marcar('2030-01-10T09:30:00-03:00').status_code,201)
+        self.assertEqual(self.marcar('2030-01-10T09:30:00-03:00',vet=outro).status_code,201)
+
+    def test_rejeita_horario_fora_da_agenda(self):
+        for data in ('2030-01-10T07:30:00-03:00','2030-01-10T11:45:00-03:00','2030-01-10T12:00:00-03:00','2030-01-10T09:10:00-03:00','amanhã'):
+            with self.subTest(data=data):
+                self.assertEqual(self.marcar(data).status_code,400,"Horário fora da agenda foi aceito.")
+        self.assertFalse(Consulta.objects.exists())
+
+    def test_rejeita_horario_passado(self):
+        self.assertEqual(self.marcar('2024-01-10T09:30:00-03:00').status_code,400,"Consulta marcada no passado.")
+        with self.assertRaises(HorarioInvalido):
+            marcar_consulta(self.vet.id_veterinario,self.pet,timezone.make_aware(datetime(2024,1,10,10,0)))
+        consulta = self.marcar('2030-01-10T09:30:00-03:00').json()[0]['pk']
+        url = reverse('define_data_consulta',kwargs={'id_consulta':consulta})
+        response = self.client.put(url,data={'data_consulta':'2024-01-10T09:30:00-03:00'},content_type='application/json')
+        self.assertEqual(response.status_code,400,"Consulta remarcada para o passado.")
+        self.assertEqual(Consulta.objects.get(pk=consulta).data_consulta.year,2030)
+
+    def test_detecta_consulta_antiga_sobreposta(self):
+        # Consulta fora do alinhamento atual, como se a duração tivesse mudado depois de marcada.
+        Consulta.objects.create(data_consulta='2030-01-10T12:45:00Z',veterinario=self.vet,pet=self.pet)
+        with self.assertRaises(HorarioOcupado):
+            marcar_consulta(self.vet.id_veterinario,self.pet,timezone.make_aware(datetime(2030,1,10,10,0)))
+        marcar_consulta(self.vet.id_veterinario,self.pet,timezone.make_aware(datetime(2030,1,10,10,30)))
+
+    def test_remarca_consulta(self):
+        primeira = self.marcar('2030-01-10T09:00:00-03:00').json()[0]['pk']
+        segunda = self.marcar('2030-01-10T10:00:00-03:00').json()[0]['pk']
+        url = reverse('define_data_consulta',kwargs={'id_consulta':segunda})
+
+        response = self.client.put(url,data={'data_consulta':'2030-01-10T09:00:00-03:00'},content_type='application/json')
+        self.assertEqual(response.status_code,409,"Consulta remarcada para um horário ocupado.")
+        response = self.client.put(url,data={'data_consulta':'2030-01-10T10:00:00-03:00'},content_type='application/json')
+        self.assertEqual(response.status_code,200,"Consulta não pôde ser remarcada para o próprio horário.")
+        response = self.client.put(reverse('define_data_consulta',kwargs={'id_consulta':primeira}),data={'data_consulta':'2030-01-10T11:30:00-03:00'},content_type='application/json')
+        self.assertEqual(response.status_code,200,response.content)
+
+    def test_restricao_unica_no_banco(self):
+        from django.db import IntegrityError, transaction
+        Consulta.objects.create(data_consulta='2030-01-10T12:00:00Z',veterinario=self.vet,pet=self.pet)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Consulta.objects.create(data_consulta='2030-01-10T12:00:00Z',veterinario=self.vet,pet=self.pet)
+
+    def test_valida_horario(self):
+        expediente = {'inicio_expediente':self.vet.inicio_expediente,'fim_expediente':self.vet.fim_expediente,'duracao_consulta':45}
+        validar_horario(expediente,timezone.make_aware(datetime(2030,1,10,8,45)))
+        validar_horario(expediente,timezone.make_aware(datetime(2030,1,10,11,0)))
+        with self.assertRaises(HorarioInvalido):
+            validar_horario(expediente,timezone.make_aware(datetime(2030,1,10,11,15)))
+
+
+class ProximoHorarioTest(TestCase):
+    """Busca do próximo horário livre por especialidade (disponibilidade.py)."""
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.usuario = Usuario.objects.create(nome="Luis Carlos",email='Luis123@gmail.com',senha='@Luis12345')
+        self.pet = Pet.objects.create(nome='Susie',especie='Canina',idade=7,dono_do_pet=self.usuario)
+        oito,nove,dez = (datetime.strptime(hora,'%H:%M').time() for hora in ('08:00','09:00','10:00'))
+        self.vet = Veterinario.objects.create(nome='Doutor Francisco',especialidade='Cardiologista',email='Francisco123@gmail.com',senha='2321',
+                                              inicio_expediente=oito,fim_expediente=dez,duracao_consulta=30)
+        self.outro = Veterinario.objects.create(nome='Doutora Ana',especialidade='Cardiologista',email='ana123@gmail.com',senha='2321',
+                                                inicio_expediente=nove,fim_expediente=dez,duracao_consulta=20)
+        Veterinario.objects.create(nome='Doutor Pedro',especialidade='Dermatologista',email='pedro123@gmail.com',senha='2321')
+        self.a_partir_de = '2030-01-10T00:00:00-03:00'
+
+    def buscar(self,especialidade='Cardiologista',a_partir_de=None):
+        return self.client.get(reverse('proximo_horario'),{'especialidade':especialidade,'a_partir_de':a_partir_de or self.a_partir_de})
+
+    def marcar(self,vet,horario):
+        return marcar_consulta(vet.id_veterinario,self.pet,datetime.fromisoformat(horario))
+
+    def test_primeiro_horario_livre(self):
+        response = self.buscar()
+        self.assertEqual(response.status_code,200,response.content)
+        self.assertEqual(response.json(),{'id_veterinario':self.vet.id_veterinario,'nome':'Doutor Francisco',
+                                          'especialidade':'Cardiologista','data_consulta':'2030-01-10T08:00:00-03:00'})
+
+    def test_veterinario_apagado_depois_da_leitura_do_diretorio(self):
+        self.assertEqual(self.buscar().json()['id_veterinario'],self.vet.id_veterinario)
+        # O diretório em cache ainda tem o veterinário apagado, como numa busca que o leu antes do delete.
+        with mock.patch('petstore.signals.invalidar_diretorio'):
+            self.vet.delete()
+        for urlconf in ('setup.urls','setup.urls_async'):
+            with self.subTest(urlconf=urlconf),override_settings(ROOT_URLCONF=urlconf):
+                response = self.buscar()
+                self.assertEqual(response.status_code,200,response.content)
+                self.assertEqual(response.json()['id_veterinario'],self.outro.id_veterinario,"Veterinário apagado foi retornado.")
+        # Se nem o diretório refeito achar o veterinário, a resposta é 404 e não um erro.
+        with mock.patch('petstore.signals.invalidar_diretorio'),mock.patch('petstore.disponibilidade.invalidar_diretorio'):
+            self.outro.delete()
+            self.assertEqual(self.buscar().status_code,404)
+
+    def test_acompanha_consultas_marcadas_remarcadas_e_deletadas(self):
+        self.assertEqual(self.buscar().json()['data_consulta'],'2030-01-10T08:00:00-03:00')
+        primeira = self.marcar(self.vet,'2030-01-10T08:00:00-03:00')
+        self.assertEqual(self.buscar().json()['data_consulta'],'2030-01-10T08:30:00-03:00',"Horário marcado continua livre.")
+
+        url = reverse('define_data_consulta',kwargs={'id_consulta':primeira.id_consulta})
+        self.client.put(url,data={'data_consulta':'2030-01-10T08:30:00-03:00'},content_type='application/json')
+        self.assertEqual(self.buscar().json()['data_consulta'],'2030-01-10T08:00:00-03:00',"Horário antigo não foi liberado.")
+
+        segunda = self.marcar(self.vet,'2030-01-10T08:00:00-03:00')
+        self.client.delete(reverse('deletar_consulta',kwargs={'id_consulta':segunda.id_consulta}))
+        self.assertEqual(self.buscar().json()['data_consulta'],'2030-01-10T08:00:00-03:00',"Consulta deletada continua ocupando o horário.")
+
+    def test_consulta_movida_de_dia_libera_o_dia_antigo(self):
+        consulta = self.marcar(self.vet,'2030-01-10T08:00:00-03:00')
+        self.assertEqual(self.buscar().json()['data_consulta'],'2030-01-10T08:30:00-03:00')
+        for movida in (consulta,Consulta.objects.get(pk=consulta.pk)):
+            movida.data_consulta = datetime.fromisoformat('2030-01-11T08:00:00-03:00')
+            movida.save()
+            self.assertEqual(self.buscar().json()['data_consulta'],'2030-01-10T08:00:00-03:00',"O dia antigo continua ocupado.")
+            Consulta.objects.filter(pk=consulta.pk).update(data_consulta='2030-01-10T11:00:00Z')
+
+    def test_ocupacao_lida_antes_do_commit_nao_fica_no_cache(self):
+        from . import disponibilidade
+        calcular = disponibilidade._calcular_ocupacao
+
+        def marca_durante_a_leitura(*args):
+            ocupacao = calcular(*args)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.marcar(self.vet,'2030-01-10T08:00:00-03:00')
+            return ocupacao
+
+        with mock.patch('petstore.disponibilidade._calcular_ocupacao',side_effect=marca_durante_a_leitura):
+            self.assertEqual(self.buscar().json()['data_consulta'],'2030-01-10T08:00:00-03:00')
+        self.assertEqual(self.buscar().json()['data_consulta'],'2030-01-10T08:30:00-03:00',"Ocupação antiga ficou no cache.")
+
+    def test_proximo_veterinario_e_proximo_dia(self):
+        for horario in ('08:00','08:30','09:00'):
+            self.marcar(self.vet,f'2030-01-10T{horario}:00-03:00')
+        response = self.buscar()
+        self.assertEqual((response.json()['id_veterinario'],response.json()['data_consulta']),
+                         (self.outro.id_veterinario,'2030-01-10T09:00:00-03:00'))
+
+        for horario in ('09:00','09:20','09:40'):
+            self.marcar(self.outro,f'2030-01-10T{horario}:00-03:00')
+        self.marcar(self.vet,'2030-01-10T09:30:00-03:00')
+        self.assertEqual(self.buscar().json()['data_consulta'],'2030-01-11T08:00:00-03:00',"Não procurou no dia seguinte.")
+
+    def test_ignora_horarios_que_ja_comecaram(self):
+        response = self.buscar(a_partir_de='2030-01-10T09:05:00-03:00')
+        self.assertEqual((response.json()['id_veterinario'],response.json()['data_consulta']),
+                         (self.outro.id_veterinario,'2030-01-10T09:20:00-03:00'))
+
+    def test_acompanha_alteracoes_dos_veterinarios(self):
+        self.client.put(reverse('atualiza_vet',kwargs={'id_veterinario':self.vet.id_veterinario}),
+                        data={'nome':'Doutor Francisco','especialidade':'Clínico geral','email':'Francisco123@gmail.com','senha':'@Francisco123'},
+                        content_type='application/json')
+        self.assertEqual(self.buscar().json()['id_veterinario'],self.outro.id_veterinario,"Diretório não foi atualizado.")
+        self.assertEqual(self.buscar('Clínico geral').json()['id_veterinario'],self.vet.id_veterinario)
+
+        Veterinario.objects.filter(pk=self.outro.pk).delete()
+        self.assertEqual(self.buscar().status_code,404,"Veterinário deletado continua no diretório.")
+
+    def test_especialidade_sem_horarios(self):
+        self.assertEqual(self.buscar('Ortopedista').status_code,404)
+        self.assertEqual(self.client.get(reverse('proximo_horario')).status_code,400)
+        self.assertEqual(self.buscar(a_partir_de='amanhã').status_code,400)
+
+    def test_busca_pelo_cache_nao_consulta_o_banco(self):
+        self.marcar(self.vet,'2030-01-10T08:00:00-03:00')
+        self.buscar()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.buscar().json()['data_consulta'],'2030-01-10T08:30:00-03:00')
+        self.marcar(self.vet,'2030-01-10T08:30:00-03:00')
+        # Só a ocupação do dia alterado é refeita, com uma consulta para os veterinários que faltam.
+        with self.assertNumQueries(1):
+            self.assertEqual(self.buscar().json()['data_consulta'],'2030-01-10T09:00:00-03:00')
+
+
+class ConcluirConsultasTest(TestCase):
+    """Consultas com horário passado são marcadas como realizadas em lotes (comando concluir_consultas)."""
+    def setUp(self):
+        cache.clear()
+        self.usuario = Usuario.objects.create(nome="Luis Carlos",email='Luis123@gmail.com',senha='@Luis12345')
+        self.pet = Pet.objects.create(nome='Susie',especie='Canina',idade=7,dono_do_pet=self.usuario)
+        self.vet = Veterinario.objects.create(nome='Doutor Francisco',especialidade='Cardiologista',email='Francisco123@gmail.com',senha='2321')
+        self.passadas = [Consulta.objects.create(data_consulta=f'2024-09-{dia:02d}T10:00:00Z',veterinario=self.vet,pet=self.pet) for dia in range(1,6)]
+        self.futura = Consulta.objects.create(data_consulta='2099-01-10T10:00:00Z',veterinario=self.vet,pet=self.pet)
+        self.sem_data = Consulta.objects.create(veterinario=self.vet,pet=self.pet)
+
+    def test_comando_conclui_em_lotes(self):
+        saida = StringIO()
+        call_command('concluir_consultas',lote=2,pausa=0,stdout=saida)
+        self.assertIn("5 consultas marcadas como realizadas em 3 lote(s)",saida.getvalue())
+        self.assertEqual(Consulta.objects.filter(realizada=True).count(),5)
+        self.assertFalse(Consulta.objects.get(pk=self.futura.pk).realizada,"Consulta futura foi concluída.")
+        self.assertFalse(Consulta.objects.get(pk=self.sem_data.pk).realizada,"Consulta sem data foi concluída.")
+
+    def test_lote_usa_um_update(self):
+        # UPDATE ... WHERE id_consulta IN (SELECT ... LIMIT) RETURNING: um comando por lote.
+        with self.assertNumQueries(1):
+            self.assertEqual(concluir_consultas_passadas(3),3)
+        self.assertEqual(concluir_consultas_passadas(3),2)
+        self.assertEqual(concluir_consultas_passadas(3),0)
+
+    def test_lote_conclui_as_mais_antigas(self):
+        for suporta in (True,False):
+            with self.subTest(returning=suporta),mock.patch('petstore.agenda.suporta_update_returning',return_value=suporta):
+                Consulta.objects.update(realizada=False)
+                self.assertEqual(concluir_consultas_passadas(2),2)
+                self.assertEqual(set(Consulta.objects.filter(realizada=True).values_list('pk',flat=True)),
+                                 {consulta.pk for consulta in self.passadas[:2]})
+
+    def test_atualiza_cache(self):
+        url = reverse('retorna_consulta',kwargs={'id_consulta':self.passadas[0].pk})
+        self.assertFalse(self.client.get(url).json()['realizada'])
+        concluir_consultas_passadas(10)
+        self.assertTrue(self.client.get(url).json()['realizada'],"Consulta em cache não foi atualizada.")
+
+    def test_tempo_maximo(self):
+        saida = StringIO()
+        call_command('concluir_consultas',lote=1,pausa=0,tempo_maximo=1e-9,stdout=saida)
+        self.assertIn("1 consultas marcadas como realizadas em 1 lote(s)",saida.getvalue())
+
+    def test_remarcar_mantem_realizada(self):
+        url = reverse('define_data_consulta',kwargs={'id_consulta':self.futura.pk})
+        self.client.put(reverse('realiza_consulta',kwargs={'id_consulta':self.futura.pk}),data={'realizada':True},content_type='application/json')
+        response = self.client.put(url,data={'data_consulta':'2099-01-12T10:00:00Z'},content_type='application/json')
+        self.assertEqual(response.status_code,200,response.content)
+        self.assertTrue(response.json()['realizada'],"Remarcar mudou realizada.")
+        self.assertTrue(Consulta.objects.get(pk=self.futura.pk).realizada,"Realizada definida à mão foi apagada.")
+        response = self.client.put(url,data={'data_consulta':'2024-09-30T10:00:00Z'},content_type='application/json')
+        self.assertEqual(response.status_code,400,"Consulta remarcada para um horário que já passou.")
+
+
+class GerarDadosTest(TestCase):
+    """Geração de dados em volume (sementes.gerar_em_volume e o comando gerar_dados)."""
+    def test_gera_dados_consistentes(self):
+        from datetime import date
+        saida = StringIO()
+        call_command('gerar_dados',usuarios=40,veterinarios=4,consultas=300,inicio=date(2030,1,7),stdout=saida)
+        self.assertIn('bulk_create',saida.getvalue())
+        self.assertEqual((Usuario.objects.count(),Veterinario.objects.count(),Consulta.objects.count()),(40,4,300))
+        self.assertFalse(Usuario.objects.filter(pet__isnull=True).exists(),"Todo usuário deve ter ao menos um pet.")
+
+        expedientes = {vet['id_veterinario']:vet for vet in Veterinario.objects.values()}
+        horarios = set()
+        for consulta in Consulta.objects.all():
+            validar_horario(expedientes[consulta.veterinario_id],consulta.data_consulta)
+            horarios.add((consulta.veterinario_id,consulta.data_consulta))
+            self.assertEqual(consulta.realizada,consulta.data_consulta < timezone.now())
+        self.assertEqual(len(horarios),300)
+        self.assertEqual(timezone.localtime(Consulta.objects.order_by('data_consulta').first().data_consulta).date(),date(2030,1,7))
+
+        # As sequências continuam depois dos ids gerados.
+        usuario = Usuario.objects.create(nome='Novo',email='novo@petstore.com',senha='!')
+        self.assertEqual(usuario.pk,Usuario.objects.exclude(pk=usuario.pk).order_by('-pk').first().pk + 1)
+
+    def test_deterministico(self):
+        from datetime import date
+        from .sementes import gerar_em_volume
+
+        def gerar():
+            primeiro_usuario = (Usuario.objects.order_by('-pk').values_list('pk',flat=True).first() or 0) + 1
+            primeiro_pet = (Pet.objects.order_by('-pk').values_list('pk',flat=True).first() or 0) + 1
+            gerar_em_volume(usuarios=20,veterinarios=3,consultas=100,semente=7,inicio=date(2030,1,7))
+            pets = list(Pet.objects.filter(pk__gte=primeiro_pet).order_by('pk').values_list('especie','idade','dono_do_pet'))
+            consultas = list(Consulta.objects.filter(pet__gte=primeiro_pet).order_by('pk').values_list('data_consulta','pet'))
+            return [(especie,idade,dono - primeiro_usuario) for especie,idade,dono in pets],[(data,pet - primeiro_pet) for data,pet in consultas]
+
+        self.assertEqual(gerar(),gerar())
+
+    def test_formato_copy(self):
+        from .sementes import _LeitorCopy
+        horario = datetime(2030,1,7,9,30,tzinfo=pytz.utc)
+        leitor = _LeitorCopy(iter([(1,'a\tb\\c\nd',None,True,horario),(2,'Réptil',7,False,None)]))
+        self.assertEqual(leitor.read(),'1\ta\\tb\\\\c\\nd\t\\N\tt\t2030-01-07 09:30:00+00:00\n2\tRéptil\t7\tf\t\\N\n'.encode())
+        self.assertEqual(leitor.read(),b'')
+
+
+
+@override_settings(SENHA_PROCESSOS=0,PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ImportacaoCSVTest(TestCase):
+    """Importação de CSV por tabelas de preparação validadas com SQL (importacao.py, comando importar_csv e rota importar)."""
+    def setUp(self):
+        cache.clear()
+        self.existente = Usuario.objects.create(nome='Luis Carlos',email='Luis123@gmail.com',senha='!')
+
+    def arquivo(self,texto):
+        return io.BytesIO(texto.encode())
+
+    def test_mesmas_regras_de_email_e_senha(self):
+        from .esquemas import validar_email,validar_senha
+        emails = ['ana@petstore.com','an@petstore.com','ana@petstore','ana..b@petstore.com','ana b@petstore.com','anapetstore.com',
+                  "an'a@petstore.com",'ana[1]@petstore.com','ana\\x@petstore.com','ana@pet_store.com','ana@petstore.c','a'*60+'@petstore.com',
+                  'ana@@petstore.com','ana@petstore.com.br','josé@petstore.com']
+        senhas = ['@Senha123','@Se1','senha123','@SENHA123','@senha123','Jj@jjjjj','Senha\\123','@'+'Aa'*100,'Aa(bcdefg','Çç=aaaaaa']
+        linhas = [f'Email,"{email}",@Senha123' for email in emails]+[f'Senha,senha{i}@petstore.com,"{senha}"' for i,senha in enumerate(senhas)]
+        resultado = importar({'usuarios':self.arquivo('nome,email,senha\n'+'\n'.join(linhas)+'\n')})
+        erros = {rejeitado['linha']:rejeitado['erro'] for rejeitado in resultado['rejeitados']}
+        esperados = [validar_email(email) for email in emails]+[validar_senha(senha) for senha in senhas]
+        self.assertEqual([erros.get(linha) for linha in range(2,len(esperados)+2)],esperados,"Validação diferente das views.")
+        self.assertEqual(resultado['importados']['usuarios'],esperados.count(None))
+
+    def test_importa_usuarios_e_pets_numa_transacao(self):
+        usuarios = ('nome,email,senha\n'
+                    'Maria,maria@petstore.com,@Maria12345\n'
+                    'Maria de novo,MARIA@petstore.com,@Maria12345\n'
+                    'Luis,luis123@gmail.com,@Luis12345\n'
+                    ',joao@petstore.com,@Joao12345\n')
+        pets = ('email_dono,nome,especie,idade,dono_do_pet\n'
+                f'maria@petstore.com,Rex,Canina,3,\n'
+                f',Mimi,Felina,0,{self.existente.pk}\n'
+                f'maria@petstore.com,Velho,Canina,-2,\n'
+                f'maria@petstore.com,Nove,Canina,nove,\n'
+                f'ninguem@petstore.com,Bob,Canina,1,\n'
+                f',Sem dono,Canina,1,999999\n'
+                f',Nenhum,Canina,1,\n')
+        resultado = importar({'pets':self.arquivo(pets),'usuarios':self.arquivo(usuarios)})
+        self.assertEqual(resultado['importados'],{'usuarios':1,'pets':2})
+        self.assertEqual([(rejeitado['arquivo'],rejeitado['linha'],rejeitado['erro']) for rejeitado in resultado['rejeitados']],[
+            ('usuarios',3,'E-mail repetido no arquivo.'),
+            ('usuarios',4,'Usuário já existe.'),
+            ('usuarios',5,'Os campos nome, email, senha devem ser preenchidos com texto.'),
+            ('pets',4,'O campo idade não pode ser preenchido com inteiros negativos.'),
+            ('pets',5,'Idade precisa ser um número inteiro.'),
+            ('pets',6,'Nenhum usuário com este e-mail foi encontrado.'),
+            ('pets',7,'Nenhum usuário com este id foi encontrado.'),
+            ('pets',8,'Informe o dono do pet em dono_do_pet (id) ou email_dono.'),
+        ])
+        maria = Usuario.objects.get(email='maria@petstore.com')
+        self.assertTrue(check_password('@Maria12345',maria.senha),"Senha não foi gravada com hash.")
+        self.assertEqual(list(Pet.objects.order_by('pk').values_list('nome','idade','dono_do_pet')),
+                         [('Rex',3,maria.pk),('Mimi',0,self.existente.pk)])
+
+    def test_veterinarios_recebem_expediente_padrao(self):
+        resultado = importar({'veterinarios':self.arquivo('nome,especialidade,email,senha\nAna,Cardiologista,ana@petstore.com,@Ana123456\n')})
+        self.assertEqual(resultado,{'importados':{'veterinarios':1},'rejeitados':[]})
+        vet = Veterinario.objects.get(email='ana@petstore.com')
+        self.assertEqual((vet.inicio_expediente.hour,vet.fim_expediente.hour,vet.duracao_consulta),(7,19,30))
+
+    def test_arquivo_invalido_nao_importa_nada(self):
+        from .importacao import ArquivoInvalido
+        usuarios = self.arquivo('nome,email,senha\nMaria,maria@petstore.com,@Maria12345\n')
+        with self.assertRaisesMessage(ArquivoInvalido,'Colunas desconhecidas no arquivo de pets: cor.'):
+            importar({'usuarios':usuarios,'pets':self.arquivo('nome,especie,idade,email_dono,cor\n')})
+        with self.assertRaisesMessage(ArquivoInvalido,'Faltam colunas no arquivo de pets: idade, dono_do_pet ou email_dono.'):
+            importar({'pets':self.arquivo('nome,especie\n')})
+        with self.assertRaisesMessage(ArquivoInvalido,'esperados 3 campos'):
+            importar({'usuarios':self.arquivo('nome,email,senha\nMaria,maria@petstore.com\n')})
+        self.assertFalse(Usuario.objects.filter(email='maria@petstore.com').exists(),"Parte da importação foi gravada.")
+
+    def test_rota_importa_corpo_csv(self):
+        corpo = f'nome,especie,idade,dono_do_pet\nRex,Canina,3,{self.existente.pk}\nBob,Canina,-1,{self.existente.pk}\n'
+        response = self.client.post(reverse('importa_csv',kwargs={'tipo':'pets'}),data=corpo,content_type='text/csv')
+        self.assertEqual(response.status_code,201,"Status diferentes.")
+        self.assertEqual(response.json(),{'importados':1,'rejeitados':[{'linha':3,'erro':'O campo idade não pode ser preenchido com inteiros negativos.'}]})
+        self.assertEqual(self.client.post(reverse('importa_csv',kwargs={'tipo':'consultas'}),data='a\n',content_type='text/csv').status_code,404)
+        self.assertEqual(self.client.post(reverse('importa_csv',kwargs={'tipo':'pets'}),data='',content_type='text/csv').status_code,400)
+
+    def test_comando(self):
+        import tempfile
+        with tempfile.TemporaryDirectory() as diretorio:
+            usuarios,rejeitados = os.path.join(diretorio,'usuarios.csv'),os.path.join(diretorio,'rejeitados.csv')
+            with open(usuarios,'w',encoding='utf-8') as arquivo:
+                arquivo.write('\ufeffemail,nome,senha\nmaria@petstore.com,Maria,@Maria12345\nana@petstore.com,Ana,fraca\n')
+            saida = StringIO()
+            call_command('importar_csv',usuarios=usuarios,rejeitados=rejeitados,lote=1,stdout=saida)
+            with open(rejeitados,encoding='utf-8') as arquivo:
+                self.assertEqual(list(csv.reader(arquivo)),[['arquivo','linha','erro'],['usuarios','3','Sua senha deve conter no mínimo 7 caracteres.']])
+        self.assertIn('usuarios               1 importados        1 recusados',saida.getvalue())
+        self.assertTrue(Usuario.objects.filter(nome='Maria').exists())
+
+class InstrumentacaoTest(TestCase):
+    """Cabeçalho Server-Timing e log das requisições medidas (instrumentacao.py)."""
+    def setUp(self):
+        cache.clear()
+        self.usuario = Usuario.objects.create(nome="Luis Carlos",email='Luis123@gmail.com',senha='@Luis12345')
+        self.pet = Pet.objects.create(nome='Susie',especie='Canina',idade=7,dono_do_pet=self.usuario)
+
+    def metricas(self,response):
+        return {metrica.split(';')[0]:metrica for metrica in response['Server-Timing'].split(', ')}
+
+    @override_settings(INSTRUMENTACAO_AMOSTRAGEM=1)
+    def test_mede_view_sql_e_cache(self):
+        url = reverse('retorna_pet',kwargs={'id_pet':self.pet.id_pet})
+        with self.assertLogs('petstore.instrumentacao','INFO') as logs:
+            falta = self.client.get(url)
+            acerto = self.client.get(url)
+        self.assertIn('desc="retorna_pet"',self.metricas(falta)['total'])
+        self.assertIn('desc="1 consultas"',self.metricas(falta)['sql'])
+        self.assertIn('desc="acertos=0 faltas=1"',self.metricas(falta)['cache'])
+        self.assertIn('desc="0 consultas"',self.metricas(acerto)['sql'])
+        self.assertIn('desc="acertos=1 faltas=0"',self.metricas(acerto)['cache'])
+
+        registro = json.loads(logs.records[0].getMessage())
+        self.assertEqual((registro['view'],registro['metodo'],registro['status'],registro['sql_consultas']),('retorna_pet','GET',200,1))
+        self.assertEqual(logs.records[1].instrumentacao['cache_acertos'],1)
+
+    @override_settings(INSTRUMENTACAO_AMOSTRAGEM=1)
+    def test_mede_hash_e_json(self):
+        response = self.client.post(reverse('criar_usuario'),data={'nome':'Maria','email':'maria123@gmail.com','senha':'@Maria12345'},content_type='application/json')
+        self.assertEqual(response.status_code,201)
+        tempo_hash = float(self.metricas(response)['hash'].split('dur=')[1])
+        self.assertGreater(tempo_hash,0,"Tempo do hash não foi medido.")
+        self.assertIn('json;dur=',response['Server-Timing'])
+
+    @override_settings(INSTRUMENTACAO_AMOSTRAGEM=0)
+    def test_fora_da_amostra(self):
+        response = self.client.get(reverse('retorna_pet',kwargs={'id_pet':self.pet.id_pet}))
+        self.assertNotIn('Server-Timing',response)
+
+    @override_settings(INSTRUMENTACAO_AMOSTRAGEM=1,ROOT_URLCONF='setup.urls_async')
+    async def test_views_assincronas(self):
+        response = await AsyncClient().get(reverse('retorna_pet',kwargs={'id_pet':self.pet.id_pet}))
+        self.assertIn('desc="retorna_pet"',response['Server-Timing'])
+        self.assertIn('desc="1 consultas"',response['Server-Timing'],"SQL feito em sync_to_async não foi medido.")
+
+
+class MetricasTest(TestCase):
+    """Métricas do Prometheus em /metrics (metricas.py)."""
+    def setUp(self):
+        cache.clear()
+        self.usuario = Usuario.objects.create(nome="Luis Carlos",email='Luis123@gmail.com',senha='@Luis12345')
+        self.pet = Pet.objects.create(nome='Susie',especie='Canina',idade=7,dono_do_pet=self.usuario)
+
+    def valor(self,nome,**rotulos):
+        from prometheus_client import REGISTRY
+        return REGISTRY.get_sample_value(nome,rotulos) or 0
+
+    def test_conta_requisicoes_por_rota_e_status(self):
+        rotulos = {'rota':'retorna_pet','metodo':'GET'}
+        antes = (self.valor('petstore_requisicao_duracao_segundos_count',**rotulos),
+                 self.valor('petstore_respostas_total',status='200',**rotulos),
+                 self.valor('petstore_respostas_total',status='404',**rotulos))
+        self.client.get(reverse('retorna_pet',kwargs={'id_pet':self.pet.id_pet}))
+        self.client.get(reverse('retorna_pet',kwargs={'id_pet':9999}))
+        depois = (self.valor('petstore_requisicao_duracao_segundos_count',**rotulos),
+                  self.valor('petstore_respostas_total',status='200',**rotulos),
+                  self.valor('petstore_respostas_total',status='404',**rotulos))
+        self.assertEqual([d - a for a,d in zip(antes,depois)],[2,1,1])
+
+    def test_conta_leituras_do_cache(self):
+        url = reverse('retorna_pet',kwargs={'id_pet':self.pet.id_pet})
+        acertos,faltas = self.valor('petstore_cache_leituras_total',resultado='acerto'),self.valor('petstore_cache_leituras_total',resultado='falta')
+        self.client.get(url)
+        self.client.get(url)
+        self.assertEqual(self.valor('petstore_cache_leituras_total',resultado='acerto') - acertos,1)
+        self.assertEqual(self.valor('petstore_cache_leituras_total',resultado='falta') - faltas,1)
+
+    def test_endpoint(self):
+        self.client.get(reverse('info_usuario',kwargs={'id_usuario':self.usuario.id_usuario}))
+        response = self.client.get(reverse('metricas'))
+        self.assertEqual(response.status_code,200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        conteudo = response.content.decode()
+        self.assertIn('petstore_requisicao_duracao_segundos_bucket{le="0.005",metodo="GET",rota="info_usuario"}',conteudo)
+        self.assertIn('petstore_requisicoes_em_andamento',conteudo)
+        self.assertIn('petstore_db_conexoes_abertas 1.0',conteudo)
+
+    def test_rota_desconhecida(self):
+        antes = self.valor('petstore_respostas_total',rota='desconhecida',metodo='GET',status='404')
+        self.client.get('/rota/inexistente')
+        self.assertEqual(self.valor('petstore_respostas_total',rota='desconhecida',metodo='GET',status='404') - antes,1)
+
+
+class MetricasMultiprocessoTest(TestCase):
+    """No modo multiprocesso /metrics soma as métricas gravadas por todos os workers."""
+    def test_soma_os_processos(self):
+        import subprocess,sys,tempfile
+        from django.conf import settings
+        with tempfile.TemporaryDirectory() as diretorio:
+            ambiente = {**os.environ,'PROMETHEUS_MULTIPROC_DIR':diretorio}
+            codigo = ("import django;django.setup();from petstore import metricas;"
+                      "metricas.RESPOSTAS.labels('retorna_pet','GET',200).inc(3)")
+            for _ in range(2):
+                subprocess.run([sys.executable,'-c',codigo],env=ambiente,cwd=settings.BASE_DIR,check=True)
+            saida = subprocess.run(
+                [sys.executable,'-c',"import django;django.setup();from prometheus_client import generate_latest;"
+                                     "from petstore.metricas import registro;print(generate_latest(registro()).decode())"],
+                env=ambiente,cwd=settings.BASE_DIR,check=True,capture_output=True,text=True,
+            ).stdout
+        self.assertIn('petstore_respostas_total{metodo="GET",rota="retorna_pet",status="200"} 6.0',saida)
+
+
+class EsquemasTest(TestCase):
+    """Validação declarativa dos corpos (esquemas.py)."""
+    def test_mesmos_resultados_das_funcoes_antigas(self):
+        from .esquemas import validar_email,validar_senha
+        from .management.commands.benchmark_validacao import validar_email_antigo,validar_senha_antiga
+        aleatorio = random.Random(7)
+        alfabeto = "abcAZÇç09_.+-@ !&'[]\\\n=()é"
+        emails = ['ana@petstore.com','an@petstore.com','ana@petstore.com\n','a.b.c@x.com.br','ana@petstore.c','a'*60+'@petstore.com']
+        emails += [''.join(aleatorio.choice(alfabeto) for _ in range(aleatorio.randint(0,70))) for _ in range(3000)]
+        emails += [f"{''.join(aleatorio.choice('ab._') for _ in range(aleatorio.randint(0,6)))}@{''.join(aleatorio.choice('ab.-') for _ in range(aleatorio.randint(0,8)))}"
+                   for _ in range(3000)]
+        senhas = [''.join(aleatorio.choice(alfabeto) for _ in range(aleatorio.randint(0,210))) for _ in range(3000)]
+        for email in emails:
+            self.assertEqual(validar_email(email),validar_email_antigo(email),repr(email))
+        for senha in senhas:
+            self.assertEqual(validar_senha(senha),validar_senha_antiga(senha),repr(senha))
+
+    def test_tipos_obrigatorios_e_limites(self):
+        from .esquemas import ESQUEMA_PET,ESQUEMA_MARCA_CONSULTA,ESQUEMA_USUARIO
+        pet = {'nome':'Rex','especie':'Canina','idade':3,'dono_do_pet':1}
+        self.assertIsNone(ESQUEMA_PET.validar(pet))
+        self.assertEqual(ESQUEMA_PET.validar({**pet,'idade':True}),"Idade precisa ser um número inteiro.")
+        self.assertEqual(ESQUEMA_PET.validar({**pet,'idade':-1}),"O campo idade não pode ser preenchido com inteiros negativos.")
+        self.assertEqual(ESQUEMA_PET.validar({**pet,'nome':'R'*501}),"O campo nome deve ter no máximo 500 caracteres.")
+        self.assertEqual(ESQUEMA_PET.validar({**pet,'dono_do_pet':None}),"O campo dono_do_pet deve ser o id de um usuário.")
+        self.assertEqual(ESQUEMA_PET.validar([pet]),"O corpo da requisição deve ser um objeto JSON.")
+        self.assertIsNone(ESQUEMA_MARCA_CONSULTA.validar({'pet':1,'veterinario':2}),"Campo opcional foi exigido.")
+        # Como na importação de CSV, o tipo de todos os campos é conferido antes das regras.
+        self.assertEqual(ESQUEMA_USUARIO.validar({'nome':1,'email':'invalido','senha':'@Senha123'}),
+                         "Os campos nome, email, senha devem ser preenchidos com texto.")
+
+    def test_validar_lote(self):
+        from .esquemas import ESQUEMA_PET
+        registros = [(0,{'nome':'Rex','especie':'Canina','idade':3,'dono_do_pet':1}),(1,{'nome':'Mel'}),(2,'texto')]
+        erros = []
+        self.assertEqual(ESQUEMA_PET.validar_lote(registros,erros),registros[:1])
+        self.assertEqual(erros,[{'indice':1,'erro':"O nome e especie precisam ser inseridos corretamente."},
+                                {'indice':2,'erro':"O corpo da requisição deve ser um objeto JSON."}])
+
+    def test_views_respondem_400_com_a_mensagem_do_esquema(self):
+        usuario = Usuario.objects.create(nome="Luis Carlos",email='Luis123@gmail.com',senha='!')
+        response = self.client.post(reverse('criar_pet'),data=json.dumps({'nome':'Rex','especie':'Canina','idade':'3','dono_do_pet':usuario.id_usuario}),
+                                    content_type='application/json')
+        self.assertEqual((response.status_code,response.json()),(400,"Idade precisa ser um número inteiro."))
+        response = self.client.post(reverse('cadastra_veterinario'),data='{',content_type='application/json')
+        self.assertEqual((response.status_code,response.json()),(400,{'ERROR':"O corpo da requisição não é um JSON válido."}))
+        response = self.client.post(reverse('criar_usuario'),data=json.dumps({'nome':'Ana','email':'an@petstore.com','senha':'@Senha123'}),
+                                    content_type='application/json')
+        self.assertEqual(response.json(),{'ERROR':"O numero de caracteres deve ser no minimo que 3 antes do @."})
+
+    def test_benchmark(self):
+        saida = StringIO()
+        call_command('benchmark_validacao',tamanhos=[50],minimo=0.01,stdout=saida)
+        self.assertIn('registro',saida.getvalue())
+        self.assertIn('lote',saida.getvalue())
+
+
+@override_settings(REPLICAS_BANCOS=['default'],REPLICAS_INTERVALO=60)
+class ReplicasTest(TestCase):
+    """
+    Leitura em réplicas (replicas.py). Nos testes o próprio "default" faz o papel da réplica: o banco escolhido
+    pelo middleware é lido de replicas.usar.
+    """
+    def setUp(self):
+        cache.clear()
+        replicas.limpar_saude()
+        self.usuario = Usuario.objects.create(nome="Luis Carlos",email='Luis123@gmail.com',senha='@Luis12345')
+        self.pet = Pet.objects.create(nome='Susie',especie='Canina',idade=7,dono_do_pet=self.usuario)
+        self.url = reverse('retorna_pet',kwargs={'id_pet':self.pet.id_pet})
+
+    def banco_da_leitura(self,client=None,**extra):
+        with mock.patch('petstore.replicas.usar',wraps=replicas.usar) as usar:
+            self.assertEqual((client or self.client).get(self.url,**extra).status_code,200)
+        return usar.call_args[0][0] if usar.called else 'primario'
+
+    def test_rotas_de_leitura_usam_a_replica(self):
+        self.assertEqual(self.banco_da_leitura(),'default')
+        self.assertEqual(self.client.get(reverse('lista_pets')).status_code,200)
+        self.assertIsNone(replicas.banco_de_leitura(),"Banco de leitura ficou fora da requisição.")
+        self.assertEqual(replicas.RoteadorReplicas().db_for_write(Pet),'default')
+
+    def test_quem_escreveu_le_do_primario(self):
+        response = self.client.put(reverse('atualiza_pet',kwargs={'id_pet':self.pet.id_pet}),content_type='application/json',
+                                   data={'nome':'Mel','especie':'Canina','idade':8,'dono_do_pet':self.usuario.id_usuario})
+        self.assertEqual(response.status_code,200)
+        ate = response['X-Primario-Ate']
+        self.assertEqual(response.cookies['petstore_primario'].value,ate)
+        self.assertEqual(self.banco_da_leitura(),'primario',"Leitura depois da escrita foi para a réplica.")
+        self.assertEqual(self.banco_da_leitura(Client(),HTTP_X_PRIMARIO_ATE=ate),'primario',"Cabeçalho foi ignorado.")
+        self.assertEqual(self.banco_da_leitura(Client(),HTTP_X_PRIMARIO_ATE=str(time.time()+3600)),'default',"Prazo longo foi aceito.")
+        with mock.patch('petstore.replicas.time.time',return_value=float(ate)+1):
+            self.assertEqual(self.banco_da_leitura(),'default',"A janela não terminou.")
+
+    def test_replica_atrasada_ou_fora_do_ar_sai_do_rodizio(self):
+        with mock.patch('petstore.replicas.medir_atraso',return_value=10.0) as medir:
+            self.assertIsNone(self.banco_da_leitura(),"Réplica atrasada foi usada.")
+            self.assertIsNone(self.banco_da_leitura())
+        self.assertEqual(medir.call_count,1,"A réplica foi verificada antes do intervalo.")
+        replicas.limpar_saude()
+        from django.db import OperationalError
+        with mock.patch.object(connection,'ensure_connection',side_effect=OperationalError):
+            self.assertIsNone(replicas.escolher_replica(),"Réplica sem conexão foi escolhida.")
+        self.assertIsNone(replicas.proxima_replica(),"Réplica sem conexão continuou no rodízio.")
+
+    def test_escolha_entre_verificacoes_nao_usa_a_conexao(self):
+        self.assertEqual(replicas.escolher_replica(),'default')
+        with mock.patch.object(connection,'ensure_connection') as conectar:
+            self.assertEqual(replicas.escolher_replica(),'default')
+        conectar.assert_not_called()
+
+    @override_settings(REPLICAS_BANCOS=['replica_inexistente'])
+    def test_objeto_escrito_ha_pouco_e_lido_do_primario(self):
+        from .cache import buscar_objeto
+        with self.captureOnCommitCallbacks(execute=True):
+            atualizar_retornando(Pet,self.pet.pk,{'idade':9},())
+        leitura = replicas.Leitura()
+        leitura.banco = 'replica_inexistente'
+        token = replicas._leitura_atual.set(leitura)
+        try:
+            self.assertEqual(buscar_objeto(Pet,self.pet.pk)['idade'],9)
+        finally:
+            replicas._leitura_atual.reset(token)
+
+    async def test_middleware_assincrono(self):
+        with mock.patch('petstore.replicas.usar',wraps=replicas.usar) as usar:
+            response = await AsyncClient().get(self.url)
+        self.assertEqual(response.status_code,200)
+        usar.assert_called_once_with('default')
+
+
+class ParticoesTest(TransactionTestCase):
+    """
+    Partições mensais de consultas (particoes.py). O SQL das partições só roda no PostgreSQL (no CI); nos outros
+    bancos são testados os meses escolhidos pela rotação, a limpeza do cache de um mês removido e a repetição do
+    UPDATE de uma linha movida de partição.
+    """
+    def test_meses_das_particoes(self):
+        from datetime import date
+        self.assertEqual(particoes.somar_meses(date(2024,11,1),3),date(2025,2,1))
+        self.assertEqual(particoes.somar_meses(date(2024,1,1),-1),date(2023,12,1))
+        self.assertEqual(particoes.nome_particao(date(2024,3,1)),'petstore_consulta_p2024_03')
+        self.assertEqual(particoes.mes_da_particao('petstore_consulta_p2024_03'),date(2024,3,1))
+        self.assertIsNone(particoes.mes_da_particao(particoes.nome_padrao()))
+        inicio,fim = particoes.limites(date(2024,12,1))
+        self.assertEqual(inicio.isoformat(),'2024-12-01T00:00:00-03:00')
+        self.assertEqual(fim.isoformat(),'2025-01-01T00:00:00-03:00')
+
+    def test_rotacao_cria_os_proximos_meses_e_remove_os_antigos(self):
+        from datetime import date
+        existentes = ['petstore_consulta_padrao','petstore_consulta_p2024_01','petstore_consulta_p2024_05','petstore_consulta_p2024_06']
+        hoje = date(2024,6,15)
+        self.assertEqual(particoes.meses_a_criar(existentes,set(),hoje,2),[date(2024,7,1),date(2024,8,1)])
+        # Consultas na partição padrão ganham a partição do seu mês, a não ser que ele já tenha saído da retenção.
+        com_consultas = {date(2023,12,1),date(2024,3,1),date(2025,6,1)}
+        self.assertEqual(particoes.meses_a_criar(existentes,com_consultas,hoje,1),[date(2023,12,1),date(2024,3,1),date(2024,7,1),date(2025,6,1)])
+        self.assertEqual(particoes.meses_a_criar(existentes,com_consultas,hoje,1,reter=4),[date(2024,3,1),date(2024,7,1),date(2025,6,1)])
+        self.assertEqual(particoes.meses_a_remover(existentes,hoje,4),[date(2024,1,1)])
+        self.assertEqual(particoes.meses_a_remover(existentes,hoje,0),[])
+
+    def test_comandos_exigem_postgresql(self):
+        from django.core.management.base import CommandError
+        if connection.vendor == 'postgresql':
+            self.skipTest("Teste para os outros bancos.")
+        for comando in ('rotacionar_particoes','benchmark_particoes'):
+            with self.assertRaises(CommandError):
+                call_command(comando,stdout=StringIO())
+
+    def test_gravacao_de_linha_movida_e_repetida_fora_de_transacao(self):
+        from django.db import OperationalError, transaction
+        from .models import CacheQuerySet,gravar_campos
+        usuario = Usuario.objects.create(nome="Luis Carlos",email='Luis123@gmail.com',senha='@Luis12345')
+        pet = Pet.objects.create(nome='Susie',especie='Canina',idade=7,dono_do_pet=usuario)
+        vet = Veterinario.objects.create(nome='Ana',especialidade='Cardiologista',email='ana123@gmail.com',senha='@Ana12345')
+        consulta = Consulta.objects.create(veterinario=vet,pet=pet)
+
+        causa = Exception("tuple to be locked was already moved to another partition due to concurrent update")
+        causa.pgcode = '40001'
+        first = CacheQuerySet.first
+
+        def moveu_uma_vez(queryset):
+            if moveu_uma_vez.erros:
+                moveu_uma_vez.erros -= 1
+                raise OperationalError(str(causa)) from causa
+            return first(queryset)
+
+        with mock.patch.object(CacheQuerySet,'first',autospec=True,side_effect=moveu_uma_vez):
+            moveu_uma_vez.erros = 1
+            self.assertTrue(gravar_campos(Consulta.objects.filter(pk=consulta.pk),{'realizada':True}).realizada)
+            moveu_uma_vez.erros = 1
+            with self.assertRaises(OperationalError), transaction.atomic():
+                gravar_campos(Consulta.objects.filter(pk=consulta.pk),{'realizada':False})
+        self.assertTrue(Consulta.objects.get(pk=consulta.pk).realizada)
+
+    def criar_consulta(self,data_consulta):
+        cache.clear()
+        usuario = Usuario.objects.create(nome="Luis Carlos",email='Luis123@gmail.com',senha='@Luis12345')
+        pet = Pet.objects.create(nome='Susie',especie='Canina',idade=7,dono_do_pet=usuario)
+        vet = Veterinario.objects.create(nome='Ana',especialidade='Cardiologista',email='ana123@gmail.com',senha='@Ana12345')
+        return Consulta.objects.create(veterinario=vet,pet=pet,data_consulta=data_consulta)
+
+    def test_consultas_do_mes_removido_saem_do_cache(self):
+        from datetime import date
+        from .cache import LAPIDE
+        consulta = self.criar_consulta(datetime(2020,1,15,13,tzinfo=pytz.UTC))
+        self.client.get(reverse('retorna_consulta',kwargs={'id_consulta':consulta.pk}))
+        self.assertNotIn(cache.get(chave_objeto(Consulta,consulta.pk)),(None,LAPIDE))
+        with mock.patch('petstore.particoes.invalidar_ocupacao') as invalidar_ocupacao:
+            particoes.esquecer_consultas(date(2020,1,1))
+        self.assertEqual(cache.get(chave_objeto(Consulta,consulta.pk)),LAPIDE,"Consulta do mês removido continua no cache.")
+        invalidar_ocupacao.assert_called_once_with(consulta.veterinario_id,mock.ANY)
+        self.assertEqual(list(invalidar_ocupacao.call_args[0][1]),[consulta.data_consulta])
+
+    def test_consulta_fora_da_retencao_responde_404(self):
+        from datetime import date
+        if connection.vendor != 'postgresql':
+            self.skipTest("As partições só existem no PostgreSQL.")
+        consulta = self.criar_consulta(datetime(2020,1,15,13,tzinfo=pytz.UTC))
+        url = reverse('retorna_consulta',kwargs={'id_consulta':consulta.pk})
+        self.assertEqual(self.client.get(url).status_code,200)
+        with connection.cursor() as cursor:
+            particoes.criar_particao(cursor,date(2020,1,1))
+        call_command('rotacionar_particoes',meses_a_frente=0,reter=1,stdout=StringIO())
+        self.assertEqual(self.client.get(url).status_code,404,"Consulta apagada pela retenção continua no cache.")
+
+    def test_chave_primaria_so_nas_particoes(self):
+        # O modelo declara id_consulta como chave primária, mas no banco ela só existe em cada partição.
+        if connection.vendor != 'postgresql':
+            self.skipTest("As partições só existem no PostgreSQL.")
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'p'",[particoes.TABELA])
+            self.assertEqual(cursor.fetchone()[0],0)
+            for nome in particoes.particoes(cursor):
+                cursor.execute(
+                    "SELECT pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'p'",[nome],
+                )
+                self.assertEqual(cursor.fetchone()[0],'PRIMARY KEY (id_consulta)',nome)
+            cursor.execute("SELECT pg_get_serial_sequence(%s, 'id_consulta')",[particoes.TABELA])
+            self.assertEqual(cursor.fetchone()[0],'public.petstore_consulta_id_consulta_seq')
+
+    def test_migracao_desfeita_e_refeita_mantem_as_consultas(self):
+        # Nos outros bancos a migração 0011 não faz nada; no PostgreSQL (CI) a tabela é trocada nos dois sentidos.
+        usuario = Usuario.objects.create(nome="Luis Carlos",email='Luis123@gmail.com',senha='@Luis12345')
+        pet = Pet.objects.create(nome='Susie',especie='Canina',idade=7,dono_do_pet=usuario)
+        vet = Veterinario.objects.create(nome='Ana',especialidade='Cardiologista',email='ana123@gmail.com',senha='@Ana12345')
+        marcada = Consulta.objects.create(veterinario=vet,pet=pet,data_consulta=datetime(2030,2,4,10,tzinfo=pytz.UTC))
+        sem_data = Consulta.objects.create(veterinario=vet,pet=pet)
+
+        call_command('migrate','petstore','0010',verbosity=0)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                self.assertFalse(particoes.particionada(cursor))
+        call_command('migrate','petstore',verbosity=0)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                self.assertTrue(particoes.particionada(cursor))
+                self.assertIn('petstore_consulta_p2030_02',particoes.particoes(cursor))
+
+        self.assertEqual(Consulta.objects.get(pk=marcada.pk).data_consulta,marcada.data_consulta)
+        self.assertIsNone(Consulta.objects.get(pk=sem_data.pk).data_consulta)
+        # A sequência continua depois dos ids copiados.
+        self.assertGreater(Consulta.objects.create(veterinario=vet,pet=pet).pk,sem_data.pk)
 
@@ -1,96 +1,26 @@
 from django.views import View
-import json
 from django.views.decorators.csrf import csrf_exempt
-from .models import Usuario,Pet,Veterinario,Consulta
-from django.core import serializers
-from django.http import JsonResponse
+from .models import Usuario,Pet,Veterinario,Consulta,atualizar_retornando,gravar_campos
 from django.utils.decorators import method_decorator
-from datetime import datetime
-import pytz
 from django.views.decorators.cache import cache_page
 from django.views.decorators.vary import vary_on_cookie,vary_on_headers
 from decouple import config
-from django.contrib.auth.hashers import make_password
-import re
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework.views import APIView
 from drf_yasg import openapi
-def validar_senha(senha):
-    """
-    Valida a senha fornecida de acordo com os seguintes critérios:
-    - Deve ter pelo menos 7 caracteres e no máximo 200.
-    - Deve conter pelo menos um caractere especial, uma letra maiúscula e uma letra minúscula.
-
-    Args:
-        senha (str): A senha a ser validada.
-
-    Returns:
-        str: Mensagem de erro se a senha não for válida, caso contrário, retorna None.
-    """
-    especiais = '!@#$%&*-+()<>|\=-'
-    minusculas = 'ABCDEFGHIKLMNOPQRSTUVWXYZÇ'.lower()
-    maiusculas = 'ABCDEFGHIKLMNOPQRSTUVWXYZÇ'
-
-    flag_especial = any(caracter in especiais for caracter in senha)
-    flag_maiuscula = any(caracter in maiusculas for caracter in senha)
-    flag_minuscula = any(caracter in minusculas for caracter in senha)
-
-    if len(senha) <= 6:
-        return "Sua senha deve conter no mínimo 7 caracteres."
-    elif len(senha) > 200:
-        return "Sua senha deve conter no máximo 200 caracteres."
-
-    if not flag_especial or not flag_maiuscula or not flag_minuscula:
-        return "Sua senha deve conter caracteres especiais, maiúsculas e minúsculas."
-
-    return None
-
-       
-def validar_email(email:str):
-    """
-    Valida o formato de um endereço de e-mail de acordo com regras específicas:
-    - Não pode conter caracteres especiais não permitidos.
-    - Não pode conter espaços ou dois pontos consecutivos.
-    - O domínio deve conter pelo menos um ponto.
-    - O comprimento máximo é de 64 caracteres.
-    - A parte local antes do "@" deve ter pelo menos 3 caracteres.
-
-    Args:
-        email (str): O endereço de e-mail a ser validado.
-
-    Returns:
-        str: Mensagem de erro se o e-mail não for válido, caso contrário, retorna None.
-    """
-    caracteres_na0_permitidos = set("&='-+,<>~!$%^*}{?¨|/'\\][;")
-
-    if any(caractere in caracteres_na0_permitidos for caractere in email):
-        return f"Caractere nao permitido na composicao do email."
-    
-    elif ".." in email:
-        return "Um email nao pode ter dois pontos consecutivos em sua composicao."
-    
-    elif " " in email:
-        return "Espacos vazios nao sao permitidos na composicao do email."
-    
-    elif "@" not in email:
-        return "@ é obrigatorio no email."
-    
-    local,_,dominio = email.partition("@")
-    if len(local)<3:
-        return "O numero de caracteres deve ser no minimo que 3 antes do @."
-     
-    if len(email)>64:
-        return "O email deve ter no maximo 64 caracteres."
-    
-    if "." not in dominio:
-        return "Domínio inválido na composicao do email. Ele deve conter pelo menos 1 ponto."
-    
-    regex_email = r'^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z-.]{3,}$'
-    if not re.match(regex_email,email):
-        return "Padrão de email incorreto."
-    
-    return None
-
+from .cache import buscar_objeto
+from .paginacao import paginar,ler_inteiro,ler_data,ler_booleano,ParametroInvalido
+from .lotes import ler_registros,inserir_em_lotes,resposta_lote,CorpoInvalido
+from django.db.models.functions import Upper
+from .senhas import gerar_hash,gerar_hashes,senha_inalterada
+from .agenda import marcar_consulta,remarcar_consulta,ler_horario,HorarioInvalido,HorarioOcupado
+from .disponibilidade import proximo_veterinario_livre,invalidar_diretorio
+from .importacao import COLUNAS as COLUNAS_IMPORTACAO,ArquivoInvalido,importar
+from .exportacao import FORMATOS,consultas_para_exportar,resposta_exportacao
+from .condicional import CAMPOS_VERSAO,nao_modificado,consulta_nao_modificada,com_validadores,versao,sem_versao,exigir_versao,versoes_esperadas,conflito
+from .respostas import JsonResponse,PROJECAO_USUARIO,PROJECAO_PET,PROJECAO_VETERINARIO,PROJECAO_CONSULTA
+from .esquemas import (DadosInvalidos,ESQUEMA_USUARIO,ESQUEMA_VETERINARIO,ESQUEMA_PET,ESQUEMA_MARCA_CONSULTA,
+                       ESQUEMA_DATA_CONSULTA,ESQUEMA_REALIZADA)
 @method_decorator(csrf_exempt, name="dispatch")
 class CreateUsuarioView(APIView):
     """
@@ -128,33 +58,19 @@ class CreateUsuarioView(APIView):
         """
 
         try:
-            data = json.loads(request.body)
-            nome = data.get('nome')
-            email = data.get('email')
-            senha = data.get('senha')
-
-            usuario = Usuario.objects.filter(email__iexact=email)
+            data = ESQUEMA_USUARIO.ler(request)
+        except DadosInvalidos as e:
+            return JsonResponse({"ERROR": str(e)},status=400)
+        nome,email,senha = data['nome'],data['email'],data['senha']
 
-            email_error = validar_email(email=email)
-            senha_error = validar_senha(senha=senha)
-            
-            if email_error:
-                return JsonResponse({"ERROR": f"{email_error}"},status=400)
-            elif senha_error:
-                return JsonResponse({"ERROR": f"{senha_error}"}, status=400)
-                 
-            elif usuario.exists():
-                return JsonResponse({'error': 'Usuário já existe.'}, status=400)
+        if Usuario.objects.filter(email__iexact=email).exists():
+            return JsonResponse({'error': 'Usuário já existe.'}, status=400)
 
-            hashed_senha = make_password(senha)
+        hashed_senha = gerar_hash(senha)
 
-            usuario = Usuario.objects.create(nome=nome, email=email, senha=hashed_senha)
-            
-            return JsonResponse({'id': usuario.id_usuario}, status=201)
-        except TypeError as error:
-            return JsonResponse({
-                "Error": "Tentativa de cadastro com credenciais inválidas. Verifique o campo de email e senha e insira valores válidos, caracteres númericos e alfabéticos por exemplo."
-            }, status=400)
+        usuario = Usuario.objects.create(nome=nome, email=email, senha=hashed_senha)
+        
+        return JsonResponse({'id': usuario.id_usuario}, status=201)
         
 class GetUsuarioInfoView(APIView):
     """
@@ -163,7 +79,6 @@ class GetUsuarioInfoView(APIView):
     Métodos:
         get(*args, **kwargs): Retorna os detalhes do usuário baseado no ID fornecido.
     """
-    @method_decorator(cache_page(60 * 60 * 2))
     @method_decorator(vary_on_headers("Authorization"))
     @swagger_auto_schema(manual_parameters=[
         openapi.Parameter(
@@ -198,9 +113,11 @@ class GetUsuarioInfoView(APIView):
 
         id_usuario = kwargs.get('id_usuario')
         try:
-            usuario = Usuario.objects.filter(id_usuario=id_usuario).values('id_usuario', 'nome', 'email', 'senha').first()
+            if (response := nao_modificado(self.request,Usuario,id_usuario)) is not None:
+                return response
+            usuario = buscar_objeto(Usuario,id_usuario)
             if usuario:
-                return JsonResponse(usuario, status=200)  # safe=True is the default
+                return com_validadores(JsonResponse(PROJECAO_USUARIO.valores(usuario), status=200),[versao(usuario)])
             else:
                 return JsonResponse({'status': 'erro', 'mensagem': 'Nenhum usuário com este id foi encontrado.'}, status=404)
         except Exception as e:
@@ -274,39 +191,28 @@ class UpdateUsuarioView(APIView):
 
         id_usuario = kwargs.get('id_usuario')
         try:
-            data = json.loads(request.body)
-            nome = data.get('nome')
-            email = data.get('email')
-            senha = data.get('senha')
-
-            email_error = validar_email(email=email)
-            senha_error = validar_senha(senha=senha)
-            if email_error:
-                return JsonResponse({"ERROR": f"{email_error}"},status=400)
-            elif senha_error:
-                return JsonResponse({"ERROR":f"{senha_error}"},status=400)
-            elif not isinstance(senha,str):
-                return JsonResponse({'error':"A senha deve ser em caracteres não contendo apenas números."},status=400)
-            elif not isinstance(email, str) or not isinstance(senha, str):
-                return JsonResponse({'error': 'Email e senha devem ser strings.'}, status=400)
-            
-            elif not Usuario.objects.filter(id_usuario=id_usuario).exists():
-                return JsonResponse({'error': 'Usuário não existe.'}, status=404)
-            
-             
-            hashed_senha = make_password(senha)
+            data = ESQUEMA_USUARIO.ler(request)
+        except DadosInvalidos as e:
+            return JsonResponse({"ERROR": str(e)},status=400)
+        nome,email,senha = data['nome'],data['email'],data['senha']
+        try:
 
-            usuario = Usuario.objects.filter(id_usuario=id_usuario).update(nome=nome,email=email,senha=hashed_senha)
+            # Uma senha reenviada sem alteração não tem o hash recalculado.
+            campos = {'nome':nome,'email':email}
+            if not senha_inalterada(Usuario,id_usuario,senha):
+                campos['senha'] = gerar_hash(senha)
 
-            if not usuario:
-                return JsonResponse({'status': 'erro', 'mensagem': f'Nenhum usuário com este id foi encontrado.'}, status=404)
-            
-            usuario_atualizado = Usuario.objects.filter(id_usuario=id_usuario).values('id_usuario','nome','email','senha').first()
-            return JsonResponse(usuario_atualizado,status=200,safe=False)
+            # Um único UPDATE ... RETURNING grava e devolve o usuário; nenhuma linha alterada significa que ele não existe
+            # ou, com If-Match, que está em outra versão.
+            usuario_atualizado = atualizar_retornando(
+                Usuario,id_usuario,campos,('id_usuario','nome','email','senha',*CAMPOS_VERSAO),versoes=versoes_esperadas(request),
+            )
+            if not usuario_atualizado:
+                return conflito(request,Usuario,id_usuario) or JsonResponse({'error': 'Usuário não existe.'}, status=404)
+
+            return com_validadores(JsonResponse(sem_versao(usuario_atualizado),status=200,safe=False),[versao(usuario_atualizado)])
         except Exception as e:
             return JsonResponse({'status': 'erro', 'mensagem': str(e)}, status=400)
-        except TypeError as error:
-            return JsonResponse({"Error: tentativa de cadastro com credenciais diferentes de caracteres alfabéticos, use letras e simbolos na sua senha se estiver tentando cadastrar apenas com números.":error},status=400)
 
 @method_decorator(csrf_exempt,'dispatch')
 class DeleteUsuarioView(APIView):
@@ -350,13 +256,15 @@ class UsuarioMarcaConsultaView(APIView):
     @method_decorator(cache_page(60*60*2))
     @swagger_auto_schema(request_body=openapi.Schema(type=openapi.TYPE_OBJECT,properties={
         'veterinario': openapi.Schema(type=openapi.TYPE_INTEGER,description="id do veterinário"),
-        'pet':openapi.Schema(type=openapi.TYPE_INTEGER,description="id do pet pertencente ao dono")
+        'pet':openapi.Schema(type=openapi.TYPE_INTEGER,description="id do pet pertencente ao dono"),
+        'data_consulta':openapi.Schema(type=openapi.TYPE_STRING,format=openapi.FORMAT_DATETIME,description="Horário da consulta (opcional), um dos horários da agenda do veterinário.")
     },
     required=['veterinario','pet']
     ),
     responses={
         201:openapi.Response("ID da consulta gerada",openapi.Schema(type=openapi.TYPE_INTEGER)),
         404: "Nenhum Veterinário ou pet foram encontrados com o(s) id provido.",
+        409: "O veterinário já tem uma consulta neste horário.",
         400:"Ocorreu um erro ao fazer a requisição."
     })
     def post(self,request,*args,**kwargs):
@@ -378,18 +286,25 @@ class UsuarioMarcaConsultaView(APIView):
             if not usuario:
                 return JsonResponse(f"Usuário não encontrado.",status=404,safe=False)
             
-            body = json.loads(request.body.decode('utf-8'))
+            body = ESQUEMA_MARCA_CONSULTA.ler(request)
 
             pet = Pet.objects.get(id_pet=body['pet'])
-            vet = Veterinario.objects.get(id_veterinario=body['veterinario'])
 
-            consulta = Consulta.objects.create(veterinario=vet,pet=pet)
-            data = json.loads(serializers.serialize('json',[consulta]))
+            if body.get('data_consulta') is None:
+                vet = Veterinario.objects.get(id_veterinario=body['veterinario'])
+                consulta = Consulta.objects.create(veterinario=vet,pet=pet)
+            else:
+                consulta = marcar_consulta(body['veterinario'],pet,ler_horario(body['data_consulta']))
+            data = PROJECAO_CONSULTA.lista([consulta])
             return JsonResponse(data=data,status=201,safe=False)    
         except Pet.DoesNotExist:
             return JsonResponse(f"Este pet não pôde ser encontrado.",status=404,safe=False)
         except Veterinario.DoesNotExist:
             return JsonResponse(f"O veterinário não pôde ser encontrado.",status=404,safe=False)
+        except (DadosInvalidos,HorarioInvalido) as e:
+            return JsonResponse(str(e),status=400,safe=False)
+        except HorarioOcupado as e:
+            return JsonResponse(str(e),status=409,safe=False)
         except Exception as e:
             return JsonResponse(f"Ocorreu um erro: {e}",status=400,safe=False)
         
@@ -400,7 +315,6 @@ class UsuarioVizualizaConsultaView(APIView):
     Métodos:
         get(*args, **kwargs): Retorna os detalhes da consulta com base no ID.
     """
-    @method_decorator(cache_page(60*60*2))
     @method_decorator(vary_on_headers("Authorization"))
     def get(self,*args,**kwargs):
         """
@@ -415,11 +329,25 @@ class UsuarioVizualizaConsultaView(APIView):
         """
         id_consulta = kwargs.get('id_consulta')
         try:
-            consulta = Consulta.objects.filter(id_consulta=id_consulta).select_related('veterinario','pet').values('id_consulta','data_consulta','realizada','veterinario__nome','pet__nome').first()
+            if (response := consulta_nao_modificada(self.request,id_consulta)) is not None:
+                return response
+            consulta = buscar_objeto(Consulta,id_consulta)
             if not consulta:
                 return JsonResponse("Não foi possível encontrar a consulta com esse identificador.",status=404,safe=False)
-            
-            return JsonResponse(consulta,status=200,safe=False)
+
+            # Os nomes do veterinário e do pet vêm dos próprios objetos em cache, assim uma
+            # alteração no pet ou no veterinário aparece na consulta sem invalidar a consulta.
+            vet = buscar_objeto(Veterinario,consulta['veterinario'])
+            pet = buscar_objeto(Pet,consulta['pet'])
+            versoes = [versao(consulta),versao(vet),versao(pet)]
+            consulta = {
+                'id_consulta':consulta['id_consulta'],
+                'data_consulta':consulta['data_consulta'],
+                'realizada':consulta['realizada'],
+                'veterinario__nome':vet['nome'],
+                'pet__nome':pet['nome'],
+            }
+            return com_validadores(JsonResponse(consulta,status=200,safe=False),versoes)
         except Exception as e:
             return JsonResponse(f"Uma exceção foi lançada: {e}",status=400,safe=False)
 
@@ -463,27 +391,16 @@ class CreatePetVIew(APIView):
         - JsonResponse: Contém o pet criado em formato JSON ou mensagem de erro.
         """
         try:
-            body = json.loads(request.body)
-
-            nome = body['nome']
-            especie = body['especie']
-            idade = body['idade']
-            dono = body['dono_do_pet']
-
-            if not isinstance(nome,str) or not isinstance(especie,str):
-                return JsonResponse({'erro: o nome e especie precisam ser inseridos corretamente.'},status=400,safe=False)
-            if not isinstance(idade,int):
-                return JsonResponse({"erro: idade precisa ser um número inteiro."},status=400,safe=False)
-            if not Usuario.objects.filter(id_usuario=dono).exists():
-                return JsonResponse({'status': 'erro', 'mensagem': f'Nenhum usuário com este id foi encontrado.'}, status=404,safe=False)
-            elif idade<0:
-                return JsonResponse({"ERROR":"O campo idade não pode ser preenchido com inteiros negativos."},status=400)
-            dono_do_pet = Usuario.objects.get(id_usuario=dono)
-            novo_pet = Pet.objects.create(nome=body['nome'],especie=body['especie'],idade=body['idade'],dono_do_pet=dono_do_pet)
-            data = json.loads(serializers.serialize('json',[novo_pet]))
-            return JsonResponse(data=data,status=201,safe=False)
-        except TypeError as e:
-           return JsonResponse(f'Insira valores válidos nos campos de nome, especie, idade e dono do pet.',status=400,safe=False)
+            body = ESQUEMA_PET.ler(request)
+        except DadosInvalidos as e:
+            return JsonResponse(str(e),status=400,safe=False)
+
+        dono_do_pet = Usuario.objects.filter(id_usuario=body['dono_do_pet']).first()
+        if dono_do_pet is None:
+            return JsonResponse({'status': 'erro', 'mensagem': f'Nenhum usuário com este id foi encontrado.'}, status=404,safe=False)
+        novo_pet = Pet.objects.create(nome=body['nome'],especie=body['especie'],idade=body['idade'],dono_do_pet=dono_do_pet)
+        data = PROJECAO_PET.lista([novo_pet])
+        return JsonResponse(data=data,status=201,safe=False)
     
 
 class GetPetInfoView(APIView):
@@ -497,7 +414,6 @@ class GetPetInfoView(APIView):
     - Retorna erro 404 caso o pet não seja encontrado.
     - Retorna erro 400 em caso de exceções gerais.
     """
-    @method_decorator(cache_page(60*60*2))
     @method_decorator(vary_on_headers("Authorization"))
     def get(self,*args, **kwargs):
         """
@@ -511,11 +427,13 @@ class GetPetInfoView(APIView):
         """
         id_pet = kwargs.get('id_pet')
         try:
-            pet = Pet.objects.filter(id_pet=id_pet).values('id_pet','nome','especie','idade','dono_do_pet').first()
+            if (response := nao_modificado(self.request,Pet,id_pet)) is not None:
+                return response
+            pet = buscar_objeto(Pet,id_pet)
             if not pet:
                 return JsonResponse({'status': 'erro', 'mensagem': f'Nenhum pet com este id foi encontrado.'}, status=404)
-            
-            return JsonResponse(pet,status=200,safe=False)
+
+            return com_validadores(JsonResponse(PROJECAO_PET.valores(pet),status=200,safe=False),[versao(pet)])
         except Exception as e:
             return JsonResponse({'status': 'erro', 'mensagem': str(e)}, status=400)
         
@@ -587,31 +505,23 @@ class UpdatePetInfoView(APIView):
         """
         id_pet = kwargs.get('id_pet')
         try:
-            request_body = json.loads(request.body)
-            nome = request_body['nome']
-            especie = request_body['especie']
-            idade = request_body['idade']
-            dono = request_body['dono_do_pet']
+            request_body = ESQUEMA_PET.ler(request)
+        except DadosInvalidos as e:
+            return JsonResponse(str(e),status=400,safe=False)
+        nome,especie,idade,dono = request_body['nome'],request_body['especie'],request_body['idade'],request_body['dono_do_pet']
+        try:
 
-            
-            if idade<0:
-                return JsonResponse({"ERROR":"O campo idade não pode ser preenchido com inteiros negativos."},status=400)
-            
-            elif not Usuario.objects.filter(id_usuario=dono).exists():
-                    return JsonResponse({'status': 'erro', 'mensagem': f'Nenhum usuário com este id foi encontrado.'}, status=404)
-           
-            pet = Pet.objects.filter(id_pet=id_pet).update(
-                nome=nome, 
-                especie=especie, 
-                idade=idade, 
-                dono_do_pet=dono
+            # A existência do dono é condição do próprio UPDATE. O motivo só é procurado quando nada foi alterado.
+            pet_atualizado = atualizar_retornando(
+                Pet,id_pet,{'nome':nome,'especie':especie,'idade':idade,'dono_do_pet':dono},
+                ('nome','especie','idade','dono_do_pet',*CAMPOS_VERSAO),versoes=versoes_esperadas(request),exigir=(Usuario,dono),
             )
+            if not pet_atualizado:
+                if not Usuario.objects.filter(id_usuario=dono).exists():
+                    return JsonResponse({'status': 'erro', 'mensagem': f'Nenhum usuário com este id foi encontrado.'}, status=404)
+                return conflito(request,Pet,id_pet) or JsonResponse("O pet não foi encontrado.", status=404, safe=False)
 
-            if not pet:
-                return JsonResponse("O pet não foi encontrado.", status=404, safe=False)
-
-            pet_atualizado = Pet.objects.filter(id_pet=id_pet).values('nome', 'especie', 'idade', 'dono_do_pet').first()
-            return JsonResponse(pet_atualizado, status=200, safe=False)
+            return com_validadores(JsonResponse(sem_versao(pet_atualizado), status=200, safe=False),[versao(pet_atualizado)])
         
         except Exception as e:
             return JsonResponse(f"O seguinte erro aconteceu: {str(e)}",status=400,safe=False)
@@ -695,39 +605,18 @@ class CreateVetView(APIView):
         - JsonResponse: Dados do veterinário criado ou mensagem de erro.
         """
         try:
-            request_body = json.loads(request.body)
-            nome = request_body['nome']
-            especialidade = request_body['especialidade']
-            email = request_body['email']
-            senha = request_body['senha']
-        
-            vet = Veterinario.objects.filter(email__iexact=email)
-
-            try:
-                email_error = validar_email(email=email)
-                senha_error = validar_senha(senha=senha)
-                if senha_error:
-                    return JsonResponse({"ERROR":f"{senha_error}"},status=400,safe=False)
-                elif email_error:
-                    return JsonResponse({"ERROR":f"{senha_error}"},status=400,safe=False)
-            except TypeError as e:
-                return JsonResponse({"error":f"Só serão aceitos caracteres especiais, maiúsculos e minúsculos na criação da senha."},status=400)
-            
-            if not isinstance(senha,str):
-                return JsonResponse({'error':"A senha deve ser em caracteres não contendo apenas números."},status=400,safe=False)
-            
-            if not isinstance(nome,str) or not isinstance(especialidade,str) or not isinstance(email,str) or not isinstance(senha,str):
-                return JsonResponse("É necessário que os campos nome, especialidade, email e senha estejam preenchidos corretamente.",status=400,safe=False)
-            
-            if vet.exists():
+            request_body = ESQUEMA_VETERINARIO.ler(request)
+        except DadosInvalidos as e:
+            return JsonResponse({"ERROR":str(e)},status=400,safe=False)
+        email,senha = request_body['email'],request_body['senha']
+        try:
+            if Veterinario.objects.filter(email__iexact=email).exists():
                 return JsonResponse("Este veterinário já existe.",status=400,safe=False)
             
-            hashed_senha = make_password(senha)
+            hashed_senha = gerar_hash(senha)
             new_vet = Veterinario.objects.create(nome=request_body['nome'],especialidade=request_body['especialidade'],email=email,senha=hashed_senha)
-            data = json.loads(serializers.serialize('json',[new_vet]))
+            data = PROJECAO_VETERINARIO.lista([new_vet])
             return JsonResponse(data=data,status=201,safe=False)
-        except TypeError as error:
-            return JsonResponse({"Error: tentativa de cadastro com credenciais diferentes de caracteres alfabéticos, use letras e simbolos na sua senha se estiver tentando cadastrar apenas com números.":error},status=400)
         except Exception as e:
             return JsonResponse(f"Exceção lançada: {e}",status=400,safe=False)
 
@@ -741,7 +630,6 @@ class GetVetInfoView(APIView):
     Exceções:
     - Retorna erro 404 caso o veterinário não seja encontrado.
     """
-    @method_decorator(cache_page(60*60*2))
     @method_decorator(vary_on_headers("Authorization"))
     def get(self,*args,**kwargs):
         """
@@ -756,10 +644,12 @@ class GetVetInfoView(APIView):
        
         id_veterinario = kwargs.get('id_veterinario')
         try:
-            vet = Veterinario.objects.filter(id_veterinario=id_veterinario).values('id_veterinario','nome','especialidade','email','senha').first()
+            if (response := nao_modificado(self.request,Veterinario,id_veterinario)) is not None:
+                return response
+            vet = buscar_objeto(Veterinario,id_veterinario)
             if not vet:
                 return JsonResponse("Nenhum médico veterinário com este id foi encontrado.",status=404,safe=False)
-            return JsonResponse(vet,status=200,safe=False)
+            return com_validadores(JsonResponse(PROJECAO_VETERINARIO.valores(vet),status=200,safe=False),[versao(vet)])
         except Exception as e:
             return JsonResponse(f"Exceção lançada: {e}",status=400,safe=False)
         
@@ -835,35 +725,27 @@ class UpdateVetInfoView(APIView):
         """
         id_veterinario = kwargs.get('id_veterinario')
         try:
-            data = json.loads(request.body)
-            nome = data.get('nome')
-            especialidade = data.get('especialidade')
-            email = data.get('email')
-            senha = data.get('senha')
-
-            vet = Veterinario.objects.filter(id_veterinario=id_veterinario)
-
-            email_error = validar_email(email=email)
-            senha_error = validar_senha(senha=senha)
-            if email_error:
-                return JsonResponse({"ERROR":f"{senha_error}"},status=400)
-            if senha_error:
-                return JsonResponse({"ERROR":f"{senha_error}"},status=400)
+            data = ESQUEMA_VETERINARIO.ler(request)
+        except DadosInvalidos as e:
+            return JsonResponse({"ERROR":str(e)},status=400)
+        nome,especialidade,email,senha = data['nome'],data['especialidade'],data['email'],data['senha']
+        try:
 
-            if not isinstance(senha,str):
-                return JsonResponse({'error':"A senha deve ser em caracteres não contendo apenas números."},status=400)
-            if not vet.exists():
-                return JsonResponse("Nenhum médico veterinário com este id foi encontrado.",status=404,safe=False)
-            
-            hashed_senha = make_password(senha)
-            Veterinario.objects.filter(id_veterinario=id_veterinario).update(nome=nome,especialidade=especialidade,email=email,senha=hashed_senha)
-            veterinario_atualizado = Veterinario.objects.filter(id_veterinario=id_veterinario).values('id_veterinario','nome','especialidade','email','senha').first()
-            return JsonResponse(veterinario_atualizado,status=200,safe=False)
+            # Uma senha reenviada sem alteração não tem o hash recalculado.
+            campos = {'nome':nome,'especialidade':especialidade,'email':email}
+            if not senha_inalterada(Veterinario,id_veterinario,senha):
+                campos['senha'] = gerar_hash(senha)
+            veterinario_atualizado = atualizar_retornando(
+                Veterinario,id_veterinario,campos,('id_veterinario','nome','especialidade','email','senha',*CAMPOS_VERSAO),
+                versoes=versoes_esperadas(request),
+            )
+            if not veterinario_atualizado:
+                return conflito(request,Veterinario,id_veterinario) or JsonResponse("Nenhum médico veterinário com este id foi encontrado.",status=404,safe=False)
+            invalidar_diretorio()
+            return com_validadores(JsonResponse(sem_versao(veterinario_atualizado),status=200,safe=False),[versao(veterinario_atualizado)])
         
         except Exception as e:
             return JsonResponse(f"Exceção lançada: {e}",status=400,safe=False)
-        except TypeError as error:
-            return JsonResponse({"Error: tentativa de cadastro com credenciais diferentes de caracteres alfabéticos, use letras e simbolos na sua senha se estiver tentando cadastrar apenas com números.":error},status=400)
 
 @method_decorator(csrf_exempt,'dispatch')
 class DeleteVetInfoView(APIView):
@@ -911,6 +793,7 @@ class DefineDataConsultaView(APIView):
 
     Exceções:
     - Retorna erro 404 caso a consulta não seja encontrada.
+    - Retorna erro 409 caso o veterinário já tenha uma consulta no novo horário.
     - Retorna erro 400 em caso de dados inválidos.
     """
     @method_decorator(cache_page(60*60*2))
@@ -947,7 +830,8 @@ class DefineDataConsultaView(APIView):
                     'error': openapi.Schema(type=openapi.TYPE_STRING, description="Mensagem de erro")
                 }
             )
-        )
+        ),
+        409: "O veterinário já tem uma consulta neste horário."
     }
 )
     def put(self,request,*args,**kwargs):
@@ -964,30 +848,18 @@ class DefineDataConsultaView(APIView):
        
         id_consulta = kwargs.get('id_consulta')
         try:
-            body = json.loads(request.body)
-            data_consulta = body['data_consulta']
-            consulta = Consulta.objects.get(id_consulta=id_consulta)
+            data_consulta = ler_horario(ESQUEMA_DATA_CONSULTA.ler(request)['data_consulta'])
 
-            if not consulta:
-                return JsonResponse("Essa consulta não existe.",status=404)
-            else:
-                Consulta.objects.filter(id_consulta=id_consulta).update(data_consulta=data_consulta)
-                consulta_atualizada = Consulta.objects.filter(id_consulta=id_consulta).values('data_consulta','realizada').first()
-
-                data_consulta_atualizada = consulta_atualizada['data_consulta']
-
-                timezone = pytz.timezone('America/Fortaleza')
-                data_consulta_aware = data_consulta_atualizada.astimezone(timezone)
-                now_aware = datetime.now().astimezone(timezone)
-
-                if data_consulta_aware < now_aware:
-                    consulta_atualizada['realizada'] = True
-                    return JsonResponse(consulta_atualizada,status=200,safe=False)
-                else:
-                    consulta_atualizada['realizada'] = False
-                    return JsonResponse(consulta_atualizada,status=200,safe=False)
-        except TypeError:
-            return JsonResponse("Será aceito apenas datas: Ano, mês, dia, com horas e minutos.",status=400,safe=False)
+            # O novo horário precisa estar livre na agenda do veterinário (ver agenda.py).
+            consulta_atualizada = remarcar_consulta(id_consulta,data_consulta)
+            if consulta_atualizada is None:
+                return JsonResponse("Essa consulta não existe.",status=404,safe=False)
+
+            return JsonResponse(consulta_atualizada,status=200,safe=False)
+        except (DadosInvalidos,HorarioInvalido) as e:
+            return JsonResponse(str(e),status=400,safe=False)
+        except HorarioOcupado as e:
+            return JsonResponse(str(e),status=409,safe=False)
         except Consulta.DoesNotExist:
             return JsonResponse("Essa consulta não existe.",status=404,safe=False)
         except Exception as e:
@@ -1009,7 +881,7 @@ class DefineConsultaComoRealizadaView(APIView):
     @method_decorator(cache_page(60*60*2))
     @method_decorator(vary_on_headers("Authorization"))
     @swagger_auto_schema(request_body=openapi.Schema(type=openapi.TYPE_OBJECT,properties={
-        'realizada':openapi.Schema(type=openapi.TYPE_STRING,description="Consulta a ser definida como realizada.")
+        'realizada':openapi.Schema(type=openapi.TYPE_BOOLEAN,description="Consulta a ser definida como realizada.")
     },
     required=['realizada']
     ),
@@ -1056,18 +928,15 @@ class DefineConsultaComoRealizadaView(APIView):
         """
         id_consulta = kwargs.get('id_consulta')
         try:
-            body = json.loads(request.body)
-            consulta = Consulta.objects.filter(id_consulta=id_consulta)
-            realizada = body['realizada']
-            
-            if not consulta.exists():
-                return JsonResponse("Essa consulta não existe.",status=404,safe=False)
-            else:
-                consulta.update(realizada=realizada)
-                consulta_realizada = consulta.values('data_consulta','realizada').first()
-                return JsonResponse(consulta_realizada,status=200,safe=False)
-        except TypeError:
-            return JsonResponse("Esse tipo não é aceito no campo: realizada.",status=400)
+            realizada = ESQUEMA_REALIZADA.ler(request)['realizada']
+
+            consulta = gravar_campos(exigir_versao(request,Consulta.objects.filter(id_consulta=id_consulta)),{'realizada':realizada})
+            if consulta is None:
+                return conflito(request,Consulta,id_consulta) or JsonResponse("Essa consulta não existe.",status=404,safe=False)
+            consulta_realizada = {campo:getattr(consulta,campo) for campo in ('data_consulta','realizada',*CAMPOS_VERSAO)}
+            return com_validadores(JsonResponse(sem_versao(consulta_realizada),status=200,safe=False),[versao(consulta_realizada)])
+        except DadosInvalidos as e:
+            return JsonResponse(str(e),status=400,safe=False)
         except Consulta.DoesNotExist:
             return JsonResponse("Essa consulta não existe.",status=404,safe=False)
         except Exception as e:
@@ -1108,4 +977,458 @@ class DeleteConsultaView(APIView):
         except Consulta.DoesNotExist:
             return JsonResponse("Essa consulta não existe.",status=404,safe=False)
         except Exception as e:
-            return JsonResponse({'status': 'erro', 'mensagem': str(e)}, status=400)
\ No newline at end of file
+            return JsonResponse({'status': 'erro', 'mensagem': str(e)}, status=400)
+
+class ProximoHorarioView(APIView):
+    """
+    View responsável por encontrar o próximo horário livre entre os veterinários de uma especialidade.
+
+    Métodos:
+    - get(request): Retorna o veterinário e o horário livre mais cedo.
+    """
+    @swagger_auto_schema(manual_parameters=[
+        openapi.Parameter('especialidade',openapi.IN_QUERY,description="Especialidade dos veterinários",type=openapi.TYPE_STRING,required=True),
+        openapi.Parameter('a_partir_de',openapi.IN_QUERY,description="Procura horários a partir desta data (ISO 8601). Padrão: agora.",type=openapi.TYPE_STRING),
+    ],
+    responses={
+        200: openapi.Response(
+            description="Primeiro horário livre.",
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    'id_veterinario': openapi.Schema(type=openapi.TYPE_INTEGER),
+                    'nome': openapi.Schema(type=openapi.TYPE_STRING),
+                    'especialidade': openapi.Schema(type=openapi.TYPE_STRING),
+                    'data_consulta': openapi.Schema(type=openapi.TYPE_STRING,format=openapi.FORMAT_DATETIME),
+                }
+            )
+        ),
+        404: "Nenhum horário livre foi encontrado no período.",
+        400: "Parâmetros inválidos."
+    })
+    def get(self,request,*args,**kwargs):
+        """
+        Procura o primeiro horário livre no índice de horários livres (ver disponibilidade.py),
+        nos próximos AGENDA_DIAS_BUSCA dias.
+
+        Parâmetros:
+        - request (HttpRequest): Requisição com a especialidade e a data inicial na query string.
+
+        Retornos:
+        - JsonResponse: Veterinário e horário encontrados ou mensagem de erro.
+        """
+        try:
+            especialidade = request.GET.get('especialidade')
+            if not especialidade:
+                raise ParametroInvalido("O parâmetro especialidade é obrigatório.")
+            encontrado = proximo_veterinario_livre(especialidade,ler_data(request,'a_partir_de'))
+            if encontrado is None:
+                return JsonResponse("Nenhum horário livre foi encontrado para esta especialidade.",status=404,safe=False)
+
+            vet,horario = encontrado
+            return JsonResponse({
+                'id_veterinario':vet['id_veterinario'],
+                'nome':vet['nome'],
+                'especialidade':vet['especialidade'],
+                'data_consulta':horario,
+            },status=200)
+        except ParametroInvalido as e:
+            return JsonResponse({'status': 'erro', 'mensagem': str(e)}, status=400)
+
+
+PARAMETROS_PAGINACAO = [
+    openapi.Parameter('apos',openapi.IN_QUERY,description="Valor de 'proximo' retornado pela página anterior.",type=openapi.TYPE_INTEGER),
+    openapi.Parameter('limite',openapi.IN_QUERY,description="Quantidade de itens por página (padrão 50, máximo 500).",type=openapi.TYPE_INTEGER),
+]
+
+def resposta_paginada(descricao):
+    return {
+        200:openapi.Response(descricao,openapi.Schema(type=openapi.TYPE_OBJECT,properties={
+            'resultados':openapi.Schema(type=openapi.TYPE_ARRAY,items=openapi.Schema(type=openapi.TYPE_OBJECT)),
+            'proximo':openapi.Schema(type=openapi.TYPE_INTEGER,description="Cursor da próxima página, nulo na última."),
+        })),
+        400:'Parâmetro inválido.'
+    }
+
+class ListPetsView(APIView):
+    """
+    View responsável por listar pets, com filtro opcional pelo dono.
+
+    Métodos:
+    - get(request): Retorna uma página de pets ordenados pelo id.
+    """
+    @swagger_auto_schema(manual_parameters=[
+        openapi.Parameter('dono',openapi.IN_QUERY,description="ID do usuário dono dos pets",type=openapi.TYPE_INTEGER),
+        *PARAMETROS_PAGINACAO
+    ],
+    responses=resposta_paginada('Página de pets'))
+    def get(self,request,*args,**kwargs):
+        """
+        Lista os pets usando paginação por cursor (parâmetros "apos" e "limite").
+
+        Parâmetros:
+        - request (HttpRequest): Requisição com os filtros na query string.
+
+        Retornos:
+        - JsonResponse: Página de pets e o cursor da próxima página.
+        """
+        try:
+            pets = Pet.objects.all()
+            dono = ler_inteiro(request,'dono')
+            if dono is not None:
+                pets = pets.filter(dono_do_pet=dono)
+
+            pagina = paginar(pets,request,('id_pet','nome','especie','idade','dono_do_pet'))
+            return JsonResponse(pagina,status=200)
+        except ParametroInvalido as e:
+            return JsonResponse({'status': 'erro', 'mensagem': str(e)}, status=400)
+
+class ListVetsView(APIView):
+    """
+    View responsável por listar veterinários, com filtro opcional pela especialidade.
+
+    Métodos:
+    - get(request): Retorna uma página de veterinários ordenados pelo id.
+    """
+    @swagger_auto_schema(manual_parameters=[
+        openapi.Parameter('especialidade',openapi.IN_QUERY,description="Especialidade dos veterinários",type=openapi.TYPE_STRING),
+        *PARAMETROS_PAGINACAO
+    ],
+    responses=resposta_paginada('Página de veterinários'))
+    def get(self,request,*args,**kwargs):
+        """
+        Lista os veterinários usando paginação por cursor (parâmetros "apos" e "limite").
+
+        Parâmetros:
+        - request (HttpRequest): Requisição com os filtros na query string.
+
+        Retornos:
+        - JsonResponse: Página de veterinários e o cursor da próxima página.
+        """
+        try:
+            vets = Veterinario.objects.all()
+            especialidade = request.GET.get('especialidade')
+            if especialidade:
+                vets = vets.filter(especialidade=especialidade)
+
+            pagina = paginar(vets,request,('id_veterinario','nome','especialidade','email'))
+            return JsonResponse(pagina,status=200)
+        except ParametroInvalido as e:
+            return JsonResponse({'status': 'erro', 'mensagem': str(e)}, status=400)
+
+class ListConsultasView(APIView):
+    """
+    View responsável por listar consultas, com filtros por veterinário, pet, dono, período e realizada.
+
+    Métodos:
+    - get(request): Retorna uma página de consultas ordenadas pelo id.
+    """
+    @swagger_auto_schema(manual_parameters=[
+        openapi.Parameter('veterinario',openapi.IN_QUERY,description="ID do veterinário",type=openapi.TYPE_INTEGER),
+        openapi.Parameter('pet',openapi.IN_QUERY,description="ID do pet",type=openapi.TYPE_INTEGER),
+        openapi.Parameter('dono',openapi.IN_QUERY,description="ID do usuário dono do pet",type=openapi.TYPE_INTEGER),
+        openapi.Parameter('data_inicio',openapi.IN_QUERY,description="Consultas a partir desta data (ISO 8601)",type=openapi.TYPE_STRING),
+        openapi.Parameter('data_fim',openapi.IN_QUERY,description="Consultas antes desta data (ISO 8601)",type=openapi.TYPE_STRING),
+        openapi.Parameter('realizada',openapi.IN_QUERY,description="true ou false",type=openapi.TYPE_BOOLEAN),
+        *PARAMETROS_PAGINACAO
+    ],
+    responses=resposta_paginada('Página de consultas'))
+    def get(self,request,*args,**kwargs):
+        """
+        Lista as consultas usando paginação por cursor (parâmetros "apos" e "limite").
+
+        Parâmetros:
+        - request (HttpRequest): Requisição com os filtros na query string.
+
+        Retornos:
+        - JsonResponse: Página de consultas e o cursor da próxima página.
+        """
+        try:
+            consultas = Consulta.objects.all()
+            filtros = {
+                'veterinario':ler_inteiro(request,'veterinario'),
+                'pet':ler_inteiro(request,'pet'),
+                'pet__dono_do_pet':ler_inteiro(request,'dono'),
+                'data_consulta__gte':ler_data(request,'data_inicio'),
+                'data_consulta__lt':ler_data(request,'data_fim'),
+                'realizada':ler_booleano(request,'realizada'),
+            }
+            consultas = consultas.filter(**{campo: valor for campo,valor in filtros.items() if valor is not None})
+
+            pagina = paginar(consultas,request,('id_consulta','data_consulta','realizada','veterinario','pet'))
+            return JsonResponse(pagina,status=200)
+        except ParametroInvalido as e:
+            return JsonResponse({'status': 'erro', 'mensagem': str(e)}, status=400)
+
+def ler_filtros_exportacao(request):
+    """
+    Lê o formato e os filtros da exportação de consultas.
+
+    Returns:
+        tuple: (formato, veterinario, data_inicio, data_fim).
+
+    Raises:
+        ParametroInvalido: Se o formato não for csv ou ndjson ou algum filtro for inválido.
+    """
+    formato = request.GET.get('formato','csv')
+    if formato not in FORMATOS:
+        raise ParametroInvalido(f"O parâmetro formato deve ser {' ou '.join(FORMATOS)}.")
+    return formato,ler_inteiro(request,'veterinario'),ler_data(request,'data_inicio'),ler_data(request,'data_fim')
+
+PARAMETROS_EXPORTACAO = [
+    openapi.Parameter('formato',openapi.IN_QUERY,description="csv (padrão) ou ndjson",type=openapi.TYPE_STRING,enum=list(FORMATOS)),
+    openapi.Parameter('veterinario',openapi.IN_QUERY,description="ID do veterinário",type=openapi.TYPE_INTEGER),
+    openapi.Parameter('data_inicio',openapi.IN_QUERY,description="Consultas a partir desta data (ISO 8601)",type=openapi.TYPE_STRING),
+    openapi.Parameter('data_fim',openapi.IN_QUERY,description="Consultas antes desta data (ISO 8601)",type=openapi.TYPE_STRING),
+]
+
+class ExportaConsultasView(APIView):
+    """
+    View responsável por exportar consultas em CSV ou NDJSON, com os nomes do veterinário, do pet e do dono.
+
+    Métodos:
+    - get(request): Envia em streaming todas as consultas que atendem aos filtros, comprimidas com gzip se o cliente aceitar.
+    """
+    @swagger_auto_schema(manual_parameters=PARAMETROS_EXPORTACAO,
+    responses={200:'Arquivo CSV ou NDJSON com as consultas',400:'Formato ou filtro inválido'})
+    def get(self,request,*args,**kwargs):
+        """
+        Exporta as consultas filtradas por veterinário e período, em ordem de id. A memória usada
+        não depende da quantidade de consultas: as linhas são lidas e enviadas em blocos.
+
+        Parâmetros:
+        - request (HttpRequest): Requisição com o formato e os filtros na query string.
+
+        Retornos:
+        - StreamingHttpResponse: Arquivo com as consultas.
+        - JsonResponse: Mensagem de erro se o formato ou algum filtro for inválido.
+        """
+        try:
+            formato,veterinario,data_inicio,data_fim = ler_filtros_exportacao(request)
+        except ParametroInvalido as e:
+            return JsonResponse({'status': 'erro', 'mensagem': str(e)}, status=400)
+        return resposta_exportacao(request,consultas_para_exportar(veterinario,data_inicio,data_fim),formato)
+
+
+def validar_cadastros_em_lote(registros,erros,esquema):
+    """
+    Valida os registros de um lote de usuários ou veterinários com o esquema do cadastro individual.
+
+    Args:
+        registros (list): Lista de (indice, dict) lida do corpo da requisição.
+        erros (list): Lista onde os erros dos registros inválidos são acrescentados.
+        esquema (Esquema): ESQUEMA_USUARIO ou ESQUEMA_VETERINARIO.
+
+    Returns:
+        list: Registros válidos, sem e-mails repetidos dentro do próprio lote.
+    """
+    emails_no_lote = set()
+    validos = []
+    for indice,registro in esquema.validar_lote(registros,erros):
+        email = registro['email'].upper()
+        if email in emails_no_lote:
+            erros.append({'indice':indice,'erro':"E-mail repetido no lote."})
+        else:
+            emails_no_lote.add(email)
+            validos.append((indice,registro))
+    return validos
+
+def emails_cadastrados(modelo,emails):
+    """
+    Retorna, em maiúsculas, quais dos e-mails já estão cadastrados, com uma única consulta.
+    A comparação por UPPER(email) usa o índice funcional do modelo.
+    """
+    emails = [email.upper() for email in emails]
+    if not emails:
+        return set()
+    return set(modelo.objects.annotate(email_upper=Upper('email')).filter(email_upper__in=emails).values_list('email_upper',flat=True))
+
+def schema_lote(propriedades,descricao):
+    return {
+        'request_body':openapi.Schema(type=openapi.TYPE_ARRAY,description="Array JSON ou NDJSON (Content-Type: application/x-ndjson), um objeto por linha.",
+            items=openapi.Schema(type=openapi.TYPE_OBJECT,properties=propriedades)),
+        'responses':{
+            201:openapi.Response(descricao,openapi.Schema(type=openapi.TYPE_OBJECT,properties={
+                'criados':openapi.Schema(type=openapi.TYPE_ARRAY,items=openapi.Schema(type=openapi.TYPE_OBJECT,properties={
+                    'indice':openapi.Schema(type=openapi.TYPE_INTEGER),'id':openapi.Schema(type=openapi.TYPE_INTEGER)})),
+                'erros':openapi.Schema(type=openapi.TYPE_ARRAY,items=openapi.Schema(type=openapi.TYPE_OBJECT,properties={
+                    'indice':openapi.Schema(type=openapi.TYPE_INTEGER),'erro':openapi.Schema(type=openapi.TYPE_STRING)})),
+            })),
+            400:'Nenhum registro do lote foi criado.'
+        }
+    }
+
+@method_decorator(csrf_exempt,name="dispatch")
+class CreateUsuariosEmLoteView(APIView):
+    """
+    View responsável por criar vários usuários numa única requisição.
+
+    Métodos:
+        post(request): Cria os usuários válidos do lote e informa o erro de cada registro recusado.
+    """
+    @swagger_auto_schema(**schema_lote({
+        'nome': openapi.Schema(type=openapi.TYPE_STRING, description='Nome do usuário'),
+        'email': openapi.Schema(type=openapi.TYPE_STRING, description='E-mail do usuário'),
+        'senha': openapi.Schema(type=openapi.TYPE_STRING, description='Senha do usuário'),
+    },'IDs dos usuários criados e erros dos registros recusados'))
+    def post(self,request):
+        """
+        Valida todo o lote, verifica os e-mails já cadastrados com uma consulta e insere com bulk_create.
+
+        Args:
+            request (HttpRequest): Requisição com o lote de usuários no corpo.
+
+        Returns:
+            JsonResponse: Usuários criados (posição no lote e id) e erros por registro.
+        """
+        try:
+            registros,erros = ler_registros(request)
+        except CorpoInvalido as e:
+            return JsonResponse({'status': 'erro', 'mensagem': str(e)}, status=400)
+
+        validos = validar_cadastros_em_lote(registros,erros,ESQUEMA_USUARIO)
+        existentes = emails_cadastrados(Usuario,[registro['email'] for _,registro in validos])
+
+        novos = []
+        for indice,registro in validos:
+            if registro['email'].upper() in existentes:
+                erros.append({'indice':indice,'erro':'Usuário já existe.'})
+                continue
+            novos.append((indice,registro))
+
+        hashes = gerar_hashes(registro['senha'] for _,registro in novos)
+        usuarios = [(indice,Usuario(nome=registro['nome'],email=registro['email'],senha=hashed_senha)) for (indice,registro),hashed_senha in zip(novos,hashes)]
+
+        criados = inserir_em_lotes(Usuario,usuarios,erros)
+        return resposta_lote(criados,erros)
+
+@method_decorator(csrf_exempt,name="dispatch")
+class CreatePetsEmLoteView(APIView):
+    """
+    View responsável por criar vários pets numa única requisição.
+
+    Métodos:
+    - post(request): Cria os pets válidos do lote e informa o erro de cada registro recusado.
+    """
+    @swagger_auto_schema(**schema_lote({
+        'nome':openapi.Schema(type=openapi.TYPE_STRING,description="Nome do pet"),
+        'especie':openapi.Schema(type=openapi.TYPE_STRING,description="Especie do pet"),
+        'idade':openapi.Schema(type=openapi.TYPE_INTEGER,description="Idade do pet"),
+        'dono_do_pet':openapi.Schema(type=openapi.TYPE_INTEGER,description="id do dono do pet")
+    },'IDs dos pets criados e erros dos registros recusados'))
+    def post(self,request):
+        """
+        Valida todo o lote, busca todos os donos com uma única consulta id__in e insere com bulk_create.
+
+        Parâmetros:
+        - request (HttpRequest): Requisição com o lote de pets no corpo.
+
+        Retornos:
+        - JsonResponse: Pets criados (posição no lote e id) e erros por registro.
+        """
+        try:
+            registros,erros = ler_registros(request)
+        except CorpoInvalido as e:
+            return JsonResponse({'status': 'erro', 'mensagem': str(e)}, status=400)
+
+        validos = ESQUEMA_PET.validar_lote(registros,erros)
+
+        donos = set(Usuario.objects.filter(id_usuario__in={registro['dono_do_pet'] for _,registro in validos}).values_list('id_usuario',flat=True))
+
+        pets = []
+        for indice,registro in validos:
+            if registro['dono_do_pet'] not in donos:
+                erros.append({'indice':indice,'erro':'Nenhum usuário com este id foi encontrado.'})
+                continue
+            pets.append((indice,Pet(nome=registro['nome'],especie=registro['especie'],idade=registro['idade'],dono_do_pet_id=registro['dono_do_pet'])))
+
+        criados = inserir_em_lotes(Pet,pets,erros)
+        return resposta_lote(criados,erros)
+
+@method_decorator(csrf_exempt,name="dispatch")
+class CreateVetsEmLoteView(APIView):
+    """
+    View responsável por criar vários veterinários numa única requisição.
+
+    Métodos:
+    - post(request): Cria os veterinários válidos do lote e informa o erro de cada registro recusado.
+    """
+    @swagger_auto_schema(**schema_lote({
+        'nome': openapi.Schema(type=openapi.TYPE_STRING, description='Nome do veterinário'),
+        'especialidade': openapi.Schema(type=openapi.TYPE_STRING, description='especialidade do profissional'),
+        'email': openapi.Schema(type=openapi.TYPE_STRING, description='E-mail do veterinário'),
+        'senha': openapi.Schema(type=openapi.TYPE_STRING, description='Senha do veterinário'),
+    },'IDs dos veterinários criados e erros dos registros recusados'))
+    def post(self,request):
+        """
+        Valida todo o lote, verifica os e-mails já cadastrados com uma consulta e insere com bulk_create.
+
+        Parâmetros:
+        - request (HttpRequest): Requisição com o lote de veterinários no corpo.
+
+        Retornos:
+        - JsonResponse: Veterinários criados (posição no lote e id) e erros por registro.
+        """
+        try:
+            registros,erros = ler_registros(request)
+        except CorpoInvalido as e:
+            return JsonResponse({'status': 'erro', 'mensagem': str(e)}, status=400)
+
+        validos = validar_cadastros_em_lote(registros,erros,ESQUEMA_VETERINARIO)
+        existentes = emails_cadastrados(Veterinario,[registro['email'] for _,registro in validos])
+
+        novos = []
+        for indice,registro in validos:
+            if registro['email'].upper() in existentes:
+                erros.append({'indice':indice,'erro':'Este veterinário já existe.'})
+                continue
+            novos.append((indice,registro))
+
+        hashes = gerar_hashes(registro['senha'] for _,registro in novos)
+        vets = [(indice,Veterinario(nome=registro['nome'],especialidade=registro['especialidade'],email=registro['email'],senha=hashed_senha)) for (indice,registro),hashed_senha in zip(novos,hashes)]
+
+        criados = inserir_em_lotes(Veterinario,vets,erros)
+        invalidar_diretorio()
+        return resposta_lote(criados,erros)
+
+@method_decorator(csrf_exempt,name="dispatch")
+class ImportaCSVView(APIView):
+    """
+    View responsável por importar usuários, veterinários ou pets de um arquivo CSV enviado no corpo da requisição.
+
+    Métodos:
+    - post(request, tipo): Importa as linhas válidas do arquivo e informa o erro de cada linha recusada.
+    """
+    @swagger_auto_schema(
+    operation_description="Corpo: arquivo CSV (Content-Type: text/csv) com cabeçalho. Colunas: "+"; ".join(f"{tipo}: {', '.join(colunas)}" for tipo,colunas in COLUNAS_IMPORTACAO.items())+". O dono do pet pode ser informado pelo id (dono_do_pet) ou pelo e-mail (email_dono).",
+    manual_parameters=[openapi.Parameter('tipo',openapi.IN_PATH,description="Tipo dos registros do arquivo",type=openapi.TYPE_STRING,enum=list(COLUNAS_IMPORTACAO))],
+    responses={
+        201:openapi.Response('Quantidade de registros importados e linhas recusadas',openapi.Schema(type=openapi.TYPE_OBJECT,properties={
+            'importados':openapi.Schema(type=openapi.TYPE_INTEGER),
+            'rejeitados':openapi.Schema(type=openapi.TYPE_ARRAY,items=openapi.Schema(type=openapi.TYPE_OBJECT,properties={
+                'linha':openapi.Schema(type=openapi.TYPE_INTEGER),'erro':openapi.Schema(type=openapi.TYPE_STRING)})),
+        })),
+        400:'O arquivo é inválido ou nenhuma linha foi importada.',
+        404:'Tipo de importação desconhecido.'
+    })
+    def post(self,request,tipo):
+        """
+        Lê o arquivo direto do corpo da requisição, sem carregá-lo inteiro na memória, e importa numa única transação.
+
+        Parâmetros:
+        - request (HttpRequest): Requisição com o CSV no corpo.
+        - tipo (str): usuarios, veterinarios ou pets.
+
+        Retornos:
+        - JsonResponse: Registros importados e linhas recusadas (a linha 1 é o cabeçalho).
+        """
+        if tipo not in COLUNAS_IMPORTACAO:
+            return JsonResponse({'status': 'erro', 'mensagem': 'Tipo de importação desconhecido.'}, status=404)
+        try:
+            resultado = importar({tipo:request})
+        except ArquivoInvalido as e:
+            return JsonResponse({'status': 'erro', 'mensagem': str(e)}, status=400)
+
+        importados = resultado['importados'][tipo]
+        rejeitados = [{'linha':rejeitado['linha'],'erro':rejeitado['erro']} for rejeitado in resultado['rejeitados']]
+        return JsonResponse({'importados':importados,'rejeitados':rejeitados},status=201 if importados else 400)
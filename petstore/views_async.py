@@ -0,0 +1,484 @@
+"""
+Versões assíncronas das views de views.py, usadas quando a aplicação roda sob ASGI (setup/asgi.py).
+
+Cada view responde nas mesmas rotas, com os mesmos códigos de status e mensagens da versão síncrona,
+mas usa o ORM assíncrono do Django (aget, acreate, aupdate, adelete) em vez de ocupar uma thread
+por requisição. As rotas são trocadas em setup/urls_async.py.
+"""
+from asgiref.sync import sync_to_async
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from .agenda import marcar_consulta, remarcar_consulta, ler_horario, HorarioInvalido, HorarioOcupado
+from .cache import abuscar_objeto
+from .condicional import CAMPOS_VERSAO, anao_modificado, aconsulta_nao_modificada, com_validadores, versao, sem_versao, exigir_versao, versoes_esperadas, aconflito
+from .disponibilidade import proximo_veterinario_livre, invalidar_diretorio
+from .esquemas import (
+    DadosInvalidos, ESQUEMA_USUARIO, ESQUEMA_VETERINARIO, ESQUEMA_PET, ESQUEMA_MARCA_CONSULTA, ESQUEMA_DATA_CONSULTA,
+    ESQUEMA_REALIZADA,
+)
+from .exportacao import consultas_para_exportar, resposta_exportacao
+from .models import Usuario, Pet, Veterinario, Consulta, aatualizar_retornando, gravar_campos
+from .respostas import JsonResponse, PROJECAO_USUARIO, PROJECAO_PET, PROJECAO_VETERINARIO, PROJECAO_CONSULTA
+from .senhas import agerar_hash, asenha_inalterada
+from .paginacao import ler_data, ParametroInvalido
+from .views import ler_filtros_exportacao
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class CreateUsuarioView(View):
+    """
+    View assíncrona responsável por criar um novo usuário na aplicação.
+
+    Métodos:
+        post(request): Cria um novo usuário baseado nos dados fornecidos no corpo da requisição.
+    """
+    async def post(self, request):
+        try:
+            data = ESQUEMA_USUARIO.ler(request)
+        except DadosInvalidos as e:
+            return JsonResponse({"ERROR": str(e)}, status=400)
+        nome, email, senha = data['nome'], data['email'], data['senha']
+
+        if await Usuario.objects.filter(email__iexact=email).aexists():
+            return JsonResponse({'error': 'Usuário já existe.'}, status=400)
+
+        hashed_senha = await agerar_hash(senha)
+        usuario = await Usuario.objects.acreate(nome=nome, email=email, senha=hashed_senha)
+
+        return JsonResponse({'id': usuario.id_usuario}, status=201)
+
+
+class GetUsuarioInfoView(View):
+    """
+    View assíncrona para buscar as informações de um usuário pelo seu ID.
+
+    Métodos:
+        get(*args, **kwargs): Retorna os detalhes do usuário baseado no ID fornecido.
+    """
+    async def get(self, request, *args, **kwargs):
+        try:
+            if (response := await anao_modificado(request, Usuario, kwargs.get('id_usuario'))) is not None:
+                return response
+            usuario = await abuscar_objeto(Usuario, kwargs.get('id_usuario'))
+            if usuario:
+                return com_validadores(JsonResponse(PROJECAO_USUARIO.valores(usuario), status=200), [versao(usuario)])
+            return JsonResponse({'status': 'erro', 'mensagem': 'Nenhum usuário com este id foi encontrado.'}, status=404)
+        except Exception as e:
+            return JsonResponse({'status': 'erro', 'mensagem': str(e)}, status=400)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class UpdateUsuarioView(View):
+    """
+    View assíncrona responsável por atualizar as informações de um usuário existente.
+
+    Métodos:
+        put(request, *args, **kwargs): Atualiza os dados do usuário com base no ID fornecido.
+    """
+    async def put(self, request, *args, **kwargs):
+        id_usuario = kwargs.get('id_usuario')
+        try:
+            data = ESQUEMA_USUARIO.ler(request)
+        except DadosInvalidos as e:
+            return JsonResponse({"ERROR": str(e)}, status=400)
+        nome, email, senha = data['nome'], data['email'], data['senha']
+        try:
+            campos = {'nome': nome, 'email': email}
+            if not await asenha_inalterada(Usuario, id_usuario, senha):
+                campos['senha'] = await agerar_hash(senha)
+
+            usuario_atualizado = await aatualizar_retornando(
+                Usuario, id_usuario, campos, (*PROJECAO_USUARIO.campos, *CAMPOS_VERSAO), versoes=versoes_esperadas(request),
+            )
+            if not usuario_atualizado:
+                return await aconflito(request, Usuario, id_usuario) or JsonResponse({'error': 'Usuário não existe.'}, status=404)
+
+            return com_validadores(JsonResponse(sem_versao(usuario_atualizado), status=200, safe=False), [versao(usuario_atualizado)])
+        except Exception as e:
+            return JsonResponse({'status': 'erro', 'mensagem': str(e)}, status=400)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class DeleteUsuarioView(View):
+    """
+    View assíncrona responsável por deletar um usuário da base de dados.
+
+    Métodos:
+        delete(*args, **kwargs): Deleta o usuário com base no ID fornecido.
+    """
+    async def delete(self, request, *args, **kwargs):
+        try:
+            usuario = await Usuario.objects.aget(id_usuario=kwargs.get('id_usuario'))
+            await usuario.adelete()
+            return JsonResponse("Usuário deletado com sucesso.", status=200, safe=False)
+        except Usuario.DoesNotExist:
+            return JsonResponse({'status': 'erro', 'mensagem': 'Nenhum usuário com este id foi encontrado.'}, status=404)
+        except Exception as e:
+            return JsonResponse({'status': 'erro', 'mensagem': str(e)}, status=400)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class UsuarioMarcaConsultaView(View):
+    """
+    View assíncrona para marcar uma consulta entre um veterinário e um pet para um usuário específico.
+
+    Métodos:
+        post(request, *args, **kwargs): Marca a consulta com base no ID do usuário.
+    """
+    async def post(self, request, *args, **kwargs):
+        try:
+            if not await Usuario.objects.filter(id_usuario=kwargs.get('id_usuario')).aexists():
+                return JsonResponse("Usuário não encontrado.", status=404, safe=False)
+
+            body = ESQUEMA_MARCA_CONSULTA.ler(request)
+            pet = await Pet.objects.aget(id_pet=body['pet'])
+
+            if body.get('data_consulta') is None:
+                vet = await Veterinario.objects.aget(id_veterinario=body['veterinario'])
+                consulta = await Consulta.objects.acreate(veterinario=vet, pet=pet)
+            else:
+                consulta = await sync_to_async(marcar_consulta)(body['veterinario'], pet, ler_horario(body['data_consulta']))
+            data = PROJECAO_CONSULTA.lista([consulta])
+            return JsonResponse(data=data, status=201, safe=False)
+        except Pet.DoesNotExist:
+            return JsonResponse("Este pet não pôde ser encontrado.", status=404, safe=False)
+        except Veterinario.DoesNotExist:
+            return JsonResponse("O veterinário não pôde ser encontrado.", status=404, safe=False)
+        except (DadosInvalidos, HorarioInvalido) as e:
+            return JsonResponse(str(e), status=400, safe=False)
+        except HorarioOcupado as e:
+            return JsonResponse(str(e), status=409, safe=False)
+        except Exception as e:
+            return JsonResponse(f"Ocorreu um erro: {e}", status=400, safe=False)
+
+
+class UsuarioVizualizaConsultaView(View):
+    """
+    View assíncrona para visualizar os detalhes de uma consulta marcada.
+
+    Métodos:
+        get(*args, **kwargs): Retorna os detalhes da consulta com base no ID.
+    """
+    async def get(self, request, *args, **kwargs):
+        try:
+            if (response := await aconsulta_nao_modificada(request, kwargs.get('id_consulta'))) is not None:
+                return response
+            consulta = await abuscar_objeto(Consulta, kwargs.get('id_consulta'))
+            if not consulta:
+                return JsonResponse("Não foi possível encontrar a consulta com esse identificador.", status=404, safe=False)
+
+            vet = await abuscar_objeto(Veterinario, consulta['veterinario'])
+            pet = await abuscar_objeto(Pet, consulta['pet'])
+            return com_validadores(JsonResponse({
+                'id_consulta': consulta['id_consulta'],
+                'data_consulta': consulta['data_consulta'],
+                'realizada': consulta['realizada'],
+                'veterinario__nome': vet['nome'],
+                'pet__nome': pet['nome'],
+            }, status=200, safe=False), [versao(consulta), versao(vet), versao(pet)])
+        except Exception as e:
+            return JsonResponse(f"Uma exceção foi lançada: {e}", status=400, safe=False)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class CreatePetVIew(View):
+    """
+    View assíncrona responsável por criar um novo pet.
+
+    Métodos:
+    - post(request): Cria um novo pet a partir dos dados fornecidos no corpo da requisição.
+    """
+    async def post(self, request):
+        try:
+            body = ESQUEMA_PET.ler(request)
+        except DadosInvalidos as e:
+            return JsonResponse(str(e), status=400, safe=False)
+
+        dono_do_pet = await Usuario.objects.filter(id_usuario=body['dono_do_pet']).afirst()
+        if dono_do_pet is None:
+            return JsonResponse({'status': 'erro', 'mensagem': 'Nenhum usuário com este id foi encontrado.'}, status=404, safe=False)
+        novo_pet = await Pet.objects.acreate(nome=body['nome'], especie=body['especie'], idade=body['idade'], dono_do_pet=dono_do_pet)
+        data = PROJECAO_PET.lista([novo_pet])
+        return JsonResponse(data=data, status=201, safe=False)
+
+
+class GetPetInfoView(View):
+    """
+    View assíncrona responsável por obter informações de um pet com base no seu ID.
+
+    Métodos:
+    - get(*args, **kwargs): Retorna os dados do pet a partir do ID fornecido.
+    """
+    async def get(self, request, *args, **kwargs):
+        try:
+            if (response := await anao_modificado(request, Pet, kwargs.get('id_pet'))) is not None:
+                return response
+            pet = await abuscar_objeto(Pet, kwargs.get('id_pet'))
+            if not pet:
+                return JsonResponse({'status': 'erro', 'mensagem': 'Nenhum pet com este id foi encontrado.'}, status=404)
+            return com_validadores(JsonResponse(PROJECAO_PET.valores(pet), status=200, safe=False), [versao(pet)])
+        except Exception as e:
+            return JsonResponse({'status': 'erro', 'mensagem': str(e)}, status=400)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class UpdatePetInfoView(View):
+    """
+    View assíncrona responsável por atualizar as informações de um pet existente.
+
+    Métodos:
+    - put(request, *args, **kwargs): Atualiza o pet com base nos dados fornecidos na requisição.
+    """
+    async def put(self, request, *args, **kwargs):
+        id_pet = kwargs.get('id_pet')
+        try:
+            request_body = ESQUEMA_PET.ler(request)
+        except DadosInvalidos as e:
+            return JsonResponse(str(e), status=400, safe=False)
+        nome, especie, idade, dono = request_body['nome'], request_body['especie'], request_body['idade'], request_body['dono_do_pet']
+        try:
+            pet_atualizado = await aatualizar_retornando(
+                Pet, id_pet, {'nome': nome, 'especie': especie, 'idade': idade, 'dono_do_pet': dono},
+                ('nome', 'especie', 'idade', 'dono_do_pet', *CAMPOS_VERSAO), versoes=versoes_esperadas(request), exigir=(Usuario, dono),
+            )
+            if not pet_atualizado:
+                if not await Usuario.objects.filter(id_usuario=dono).aexists():
+                    return JsonResponse({'status': 'erro', 'mensagem': 'Nenhum usuário com este id foi encontrado.'}, status=404)
+                return await aconflito(request, Pet, id_pet) or JsonResponse("O pet não foi encontrado.", status=404, safe=False)
+
+            return com_validadores(JsonResponse(sem_versao(pet_atualizado), status=200, safe=False), [versao(pet_atualizado)])
+        except Exception as e:
+            return JsonResponse(f"O seguinte erro aconteceu: {str(e)}", status=400, safe=False)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class DeletePetView(View):
+    """
+    View assíncrona responsável por deletar um pet existente.
+
+    Métodos:
+    - delete(*args, **kwargs): Remove um pet com base no ID fornecido.
+    """
+    async def delete(self, request, *args, **kwargs):
+        try:
+            pet = await Pet.objects.aget(id_pet=kwargs.get('id_pet'))
+            await pet.adelete()
+            return JsonResponse("Pet deletado com sucesso.", status=200, safe=False)
+        except Pet.DoesNotExist:
+            return JsonResponse({'status': 'erro', 'mensagem': 'Nenhum pet com este id foi encontrado.'}, status=404)
+        except Exception as e:
+            return JsonResponse({'status': 'erro', 'mensagem': str(e)}, status=400)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class CreateVetView(View):
+    """
+    View assíncrona responsável por criar um novo veterinário.
+
+    Métodos:
+    - post(request, *args, **kwargs): Cria um novo veterinário a partir dos dados fornecidos.
+    """
+    async def post(self, request, *args, **kwargs):
+        try:
+            request_body = ESQUEMA_VETERINARIO.ler(request)
+        except DadosInvalidos as e:
+            return JsonResponse({"ERROR": str(e)}, status=400, safe=False)
+        nome, especialidade, email, senha = request_body['nome'], request_body['especialidade'], request_body['email'], request_body['senha']
+        try:
+            if await Veterinario.objects.filter(email__iexact=email).aexists():
+                return JsonResponse("Este veterinário já existe.", status=400, safe=False)
+
+            hashed_senha = await agerar_hash(senha)
+            new_vet = await Veterinario.objects.acreate(nome=nome, especialidade=especialidade, email=email, senha=hashed_senha)
+            data = PROJECAO_VETERINARIO.lista([new_vet])
+            return JsonResponse(data=data, status=201, safe=False)
+        except Exception as e:
+            return JsonResponse(f"Exceção lançada: {e}", status=400, safe=False)
+
+
+class GetVetInfoView(View):
+    """
+    View assíncrona responsável por obter informações de um veterinário pelo ID.
+
+    Métodos:
+    - get(*args, **kwargs): Retorna os dados do veterinário com base no ID fornecido.
+    """
+    async def get(self, request, *args, **kwargs):
+        try:
+            if (response := await anao_modificado(request, Veterinario, kwargs.get('id_veterinario'))) is not None:
+                return response
+            vet = await abuscar_objeto(Veterinario, kwargs.get('id_veterinario'))
+            if not vet:
+                return JsonResponse("Nenhum médico veterinário com este id foi encontrado.", status=404, safe=False)
+            return com_validadores(JsonResponse(PROJECAO_VETERINARIO.valores(vet), status=200, safe=False), [versao(vet)])
+        except Exception as e:
+            return JsonResponse(f"Exceção lançada: {e}", status=400, safe=False)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class UpdateVetInfoView(View):
+    """
+    View assíncrona responsável por atualizar as informações de um veterinário existente.
+
+    Métodos:
+    - put(request, *args, **kwargs): Atualiza os dados de um veterinário a partir das informações fornecidas.
+    """
+    async def put(self, request, *args, **kwargs):
+        id_veterinario = kwargs.get('id_veterinario')
+        try:
+            data = ESQUEMA_VETERINARIO.ler(request)
+        except DadosInvalidos as e:
+            return JsonResponse({"ERROR": str(e)}, status=400)
+        nome, especialidade, email, senha = data['nome'], data['especialidade'], data['email'], data['senha']
+        try:
+            campos = {'nome': nome, 'especialidade': especialidade, 'email': email}
+            if not await asenha_inalterada(Veterinario, id_veterinario, senha):
+                campos['senha'] = await agerar_hash(senha)
+            veterinario_atualizado = await aatualizar_retornando(
+                Veterinario, id_veterinario, campos, (*PROJECAO_VETERINARIO.campos, *CAMPOS_VERSAO), versoes=versoes_esperadas(request),
+            )
+            if not veterinario_atualizado:
+                return (
+                    await aconflito(request, Veterinario, id_veterinario)
+                    or JsonResponse("Nenhum médico veterinário com este id foi encontrado.", status=404, safe=False)
+                )
+            await sync_to_async(invalidar_diretorio)()
+
+            return com_validadores(JsonResponse(sem_versao(veterinario_atualizado), status=200, safe=False), [versao(veterinario_atualizado)])
+        except Exception as e:
+            return JsonResponse(f"Exceção lançada: {e}", status=400, safe=False)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class DeleteVetInfoView(View):
+    """
+    View assíncrona responsável por deletar um veterinário.
+
+    Métodos:
+    - delete(*args, **kwargs): Remove um veterinário com base no ID fornecido.
+    """
+    async def delete(self, request, *args, **kwargs):
+        try:
+            vet = await Veterinario.objects.aget(id_veterinario=kwargs.get('id_veterinario'))
+            await vet.adelete()
+            return JsonResponse("Veterinário deletado com sucesso.", status=200, safe=False)
+        except Veterinario.DoesNotExist:
+            return JsonResponse({'status': 'erro', 'mensagem': 'Nenhum veterinário com este id foi encontrado.'}, status=404)
+        except Exception as e:
+            return JsonResponse({'status': 'erro', 'mensagem': str(e)}, status=400)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class DefineDataConsultaView(View):
+    """
+    View assíncrona responsável por definir a data de uma consulta.
+
+    Métodos:
+    - put(request, *args, **kwargs): Atualiza a data de uma consulta com base nos dados fornecidos.
+    """
+    async def put(self, request, *args, **kwargs):
+        id_consulta = kwargs.get('id_consulta')
+        try:
+            data_consulta = ler_horario(ESQUEMA_DATA_CONSULTA.ler(request)['data_consulta'])
+
+            consulta_atualizada = await sync_to_async(remarcar_consulta)(id_consulta, data_consulta)
+            if consulta_atualizada is None:
+                return JsonResponse("Essa consulta não existe.", status=404, safe=False)
+            return JsonResponse(consulta_atualizada, status=200, safe=False)
+        except (DadosInvalidos, HorarioInvalido) as e:
+            return JsonResponse(str(e), status=400, safe=False)
+        except HorarioOcupado as e:
+            return JsonResponse(str(e), status=409, safe=False)
+        except Exception as e:
+            return JsonResponse({'status': 'erro', 'mensagem': str(e)}, status=400, safe=False)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class DefineConsultaComoRealizadaView(View):
+    """
+    View assíncrona responsável por definir uma consulta como realizada.
+
+    Métodos:
+    - put(request, *args, **kwargs): Marca a consulta como realizada.
+    """
+    async def put(self, request, *args, **kwargs):
+        id_consulta = kwargs.get('id_consulta')
+        try:
+            realizada = ESQUEMA_REALIZADA.ler(request)['realizada']
+
+            consulta = await sync_to_async(gravar_campos)(
+                exigir_versao(request, Consulta.objects.filter(id_consulta=id_consulta)), {'realizada': realizada},
+            )
+            if consulta is None:
+                return await aconflito(request, Consulta, id_consulta) or JsonResponse("Essa consulta não existe.", status=404, safe=False)
+            consulta_realizada = {campo: getattr(consulta, campo) for campo in ('data_consulta', 'realizada', *CAMPOS_VERSAO)}
+            return com_validadores(JsonResponse(sem_versao(consulta_realizada), status=200, safe=False), [versao(consulta_realizada)])
+        except DadosInvalidos as e:
+            return JsonResponse(str(e), status=400, safe=False)
+        except Exception as e:
+            return JsonResponse({'status': 'erro', 'mensagem': str(e)}, status=400, safe=False)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class DeleteConsultaView(View):
+    """
+    View assíncrona responsável por deletar uma consulta.
+
+    Métodos:
+    - delete(*args, **kwargs): Remove uma consulta com base no ID fornecido.
+    """
+    async def delete(self, request, *args, **kwargs):
+        try:
+            consulta = await Consulta.objects.aget(id_consulta=kwargs.get('id_consulta'))
+            await consulta.adelete()
+            return JsonResponse("Consulta deletada com sucesso!", status=200, safe=False)
+        except Consulta.DoesNotExist:
+            return JsonResponse("Essa consulta não existe.", status=404, safe=False)
+        except Exception as e:
+            return JsonResponse({'status': 'erro', 'mensagem': str(e)}, status=400)
+
+
+class ProximoHorarioView(View):
+    """
+    View assíncrona responsável por encontrar o próximo horário livre entre os veterinários de uma especialidade.
+
+    Métodos:
+    - get(request): Retorna o veterinário e o horário livre mais cedo.
+    """
+    async def get(self, request, *args, **kwargs):
+        try:
+            especialidade = request.GET.get('especialidade')
+            if not especialidade:
+                raise ParametroInvalido("O parâmetro especialidade é obrigatório.")
+            encontrado = await sync_to_async(proximo_veterinario_livre)(especialidade, ler_data(request, 'a_partir_de'))
+            if encontrado is None:
+                return JsonResponse("Nenhum horário livre foi encontrado para esta especialidade.", status=404, safe=False)
+
+            vet, horario = encontrado
+            return JsonResponse({
+                'id_veterinario': vet['id_veterinario'],
+                'nome': vet['nome'],
+                'especialidade': vet['especialidade'],
+                'data_consulta': horario,
+            }, status=200)
+        except ParametroInvalido as e:
+            return JsonResponse({'status': 'erro', 'mensagem': str(e)}, status=400)
+
+
+class ExportaConsultasView(View):
+    """
+    View assíncrona responsável por exportar consultas em CSV ou NDJSON.
+
+    Métodos:
+    - get(request): Envia as consultas filtradas com um iterador assíncrono, que o Django
+      envia em pedaços sob ASGI (um iterador síncrono seria lido inteiro para a memória antes).
+    """
+    async def get(self, request, *args, **kwargs):
+        try:
+            formato, veterinario, data_inicio, data_fim = ler_filtros_exportacao(request)
+        except ParametroInvalido as e:
+            return JsonResponse({'status': 'erro', 'mensagem': str(e)}, status=400)
+        consultas = consultas_para_exportar(veterinario, data_inicio, data_fim)
+        return resposta_exportacao(request, consultas, formato, assincrona=True)
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'setup.settings')
+# Usa as views assíncronas de petstore/views_async.py (ver setup/urls_async.py).
+os.environ.setdefault('VIEWS_ASSINCRONAS', 'True')
 
 application = get_asgi_application()
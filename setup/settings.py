@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 from decouple import config,Csv
+from django.core.exceptions import ImproperlyConfigured
 import environ
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -44,6 +45,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'petstore.metricas.MetricasMiddleware',
+    'petstore.instrumentacao.InstrumentacaoMiddleware',
+    'petstore.limites.LimiteMiddleware',
+    'petstore.replicas.ReplicasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,7 +58,9 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'setup.urls'
+# Sob ASGI (setup/asgi.py) as views de CRUD e de consultas são servidas pelas versões assíncronas.
+VIEWS_ASSINCRONAS = config('VIEWS_ASSINCRONAS',cast=bool,default=False)
+ROOT_URLCONF = 'setup.urls_async' if VIEWS_ASSINCRONAS else 'setup.urls'
 
 TEMPLATES = [
     {
@@ -72,6 +79,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'setup.wsgi.application'
+ASGI_APPLICATION = 'setup.asgi.application'
 
 env = environ.Env()
 environ.Env.read_env(env_file='./.env')
@@ -86,7 +94,218 @@ DATABASES = {
         'PASSWORD': env('DB_PASSWORD'),  # Senha do banco de dados
         'HOST': env('DB_HOST'),  # Endereço do servidor do banco de dados
         'PORT': env('DB_PORT'),  # Porta do servidor do banco de dados
+        # Cada worker mantém a conexão aberta entre requisições por até DB_CONN_MAX_AGE segundos
+        # (0 fecha a cada requisição, None nunca fecha). Antes de reaproveitá-la numa nova
+        # requisição o Django verifica se ela ainda funciona e, se não, abre outra.
+        # Sob ASGI cada thread do sync_to_async teria a sua conexão persistente, e elas se acumulariam:
+        # por isso o padrão é 0 com VIEWS_ASSINCRONAS, como recomenda a documentação do Django.
+        'CONN_MAX_AGE': env.int('DB_CONN_MAX_AGE',default=0 if VIEWS_ASSINCRONAS else 60),
+        'CONN_HEALTH_CHECKS': env.bool('DB_CONN_HEALTH_CHECKS',default=True),
+        'OPTIONS': {
+            'connect_timeout': env.int('DB_CONNECT_TIMEOUT',default=5),
+        },
+    }
+}
+
+# Réplicas de leitura (opcional), em DB_REPLICAS=host[:porta],... com o mesmo banco, usuário e senha do
+# primário. As rotas de REPLICAS_ROTAS leem delas (ver petstore/replicas.py); o resto usa o "default".
+REPLICAS_BANCOS = []
+for i,endereco in enumerate(env.list('DB_REPLICAS',default=[])):
+    host,_,porta = endereco.partition(':')
+    DATABASES[f'replica_{i}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': porta or DATABASES['default']['PORT'],
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICAS_BANCOS.append(f'replica_{i}')
+DATABASE_ROUTERS = ['petstore.replicas.RoteadorReplicas']
+
+# Com um pooler como o PgBouncer em modo transaction (ver pgbouncer/pgbouncer.ini) a conexão
+# do servidor muda a cada transação, então cursores do lado do servidor não podem ser usados.
+DB_POOLER = env.bool('DB_POOLER',default=False)
+if DB_POOLER:
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Com REDIS_URL definido (ex.: redis://redis:6379/0) o cache é compartilhado por todos os
+# workers e containers. Sem ele, cada processo usa o seu próprio cache em memória.
+
+REDIS_URL = env('REDIS_URL',default='')
+# Opções das conexões com o Redis, usadas pelo cache e pelo cliente do limite de requisições (petstore/limites.py).
+REDIS_OPCOES = {
+    'socket_connect_timeout': env.float('REDIS_CONNECT_TIMEOUT',default=0.5),
+    'socket_timeout': env.float('REDIS_TIMEOUT',default=0.5),
+}
+
+CACHE_OPCOES = {
+    'KEY_PREFIX': env('CACHE_KEY_PREFIX',default='petstore'),  # Separa as chaves de outras aplicações no mesmo servidor
+    'VERSION': env.int('CACHE_VERSION',default=1),  # Incrementar invalida todo o cache de uma vez (ex.: num deploy)
+    'TIMEOUT': env.int('CACHE_TIMEOUT',default=60*60*2),
+}
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'OPTIONS': REDIS_OPCOES,
+            **CACHE_OPCOES,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'petstore',
+            **CACHE_OPCOES,
+        }
     }
+
+# Tempo (em segundos) que os objetos lidos pelas views de consulta ficam no cache.
+# As entradas são removidas sempre que o objeto é alterado, então o tempo pode ser longo.
+
+CACHE_OBJETOS_TIMEOUT = config('CACHE_OBJETOS_TIMEOUT',cast=int,default=60*60*24)
+
+# Tempo (em segundos) em que um objeto alterado não volta para o cache, para que uma leitura feita antes do
+# commit não guarde a versão antiga (ver petstore/cache.py). Deve passar da duração de uma leitura lenta.
+
+CACHE_LAPIDE_TIMEOUT = config('CACHE_LAPIDE_TIMEOUT',cast=int,default=10)
+
+
+# Cadastro em lote (novousuario/lote, novopet/lote, novovet/lote)
+
+LOTE_MAXIMO_REGISTROS = config('LOTE_MAXIMO_REGISTROS',cast=int,default=10000)  # Registros aceitos por requisição
+LOTE_TAMANHO_BULK_CREATE = config('LOTE_TAMANHO_BULK_CREATE',cast=int,default=1000)  # Linhas por INSERT
+
+
+# Hash de senhas
+# https://docs.djangoproject.com/en/4.2/topics/auth/passwords/
+# SENHA_HASHER escolhe o algoritmo dos novos hashes (argon2, scrypt ou pbkdf2). Os outros continuam
+# na lista para verificar senhas antigas, que são refeitas com o algoritmo escolhido no próximo login.
+
+SENHA_HASHER = config('SENHA_HASHER',default='scrypt')
+
+SENHA_ARGON2_TEMPO = config('SENHA_ARGON2_TEMPO',cast=int,default=2)  # Iterações
+SENHA_ARGON2_MEMORIA = config('SENHA_ARGON2_MEMORIA',cast=int,default=19456)  # KiB
+SENHA_ARGON2_PARALELISMO = config('SENHA_ARGON2_PARALELISMO',cast=int,default=1)
+
+SENHA_SCRYPT_N = config('SENHA_SCRYPT_N',cast=int,default=2**14)  # Usa 128 * N * R bytes de memória
+SENHA_SCRYPT_R = config('SENHA_SCRYPT_R',cast=int,default=8)
+SENHA_SCRYPT_P = config('SENHA_SCRYPT_P',cast=int,default=1)
+
+SENHA_PBKDF2_ITERACOES = config('SENHA_PBKDF2_ITERACOES',cast=int,default=600000)
+
+HASHERS_DISPONIVEIS = {
+    'argon2': 'petstore.hashers.Argon2Configuravel',
+    'scrypt': 'petstore.hashers.ScryptConfiguravel',
+    'pbkdf2': 'petstore.hashers.PBKDF2Configuravel',
+}
+
+PASSWORD_HASHERS = [HASHERS_DISPONIVEIS[SENHA_HASHER]]+[hasher for algoritmo,hasher in HASHERS_DISPONIVEIS.items() if algoritmo != SENHA_HASHER]
+
+# Processos dedicados ao cálculo dos hashes, para que o custo de CPU não fique na thread
+# (ou no event loop, no ASGI) que atende a requisição. Com 0 o hash é calculado na própria thread.
+SENHA_PROCESSOS = config('SENHA_PROCESSOS',cast=int,default=2)
+
+
+# Respostas JSON
+# Biblioteca usada para gerar o JSON das respostas (ver petstore/respostas.py): 'orjson' ou 'json'
+# (biblioteca padrão). Sem o orjson instalado, 'orjson' usa a biblioteca padrão.
+
+RENDERIZADOR_JSON = config('RENDERIZADOR_JSON',default='orjson')
+
+
+# Agenda dos veterinários: quantos dias à frente a busca do próximo horário livre (proximohorario) procura.
+
+AGENDA_DIAS_BUSCA = config('AGENDA_DIAS_BUSCA',cast=int,default=60)
+
+# Comando concluir_consultas: consultas marcadas como realizadas por UPDATE e pausa (em segundos)
+# entre os lotes, para não disputar o banco com as requisições.
+
+CONCLUSAO_LOTE = config('CONCLUSAO_LOTE',cast=int,default=1000)
+CONCLUSAO_PAUSA = config('CONCLUSAO_PAUSA',cast=float,default=0.05)
+
+# Partições mensais da tabela de consultas no PostgreSQL (petstore/particoes.py): meses criados à frente do atual
+# pela migração 0011 e pelo comando rotacionar_particoes, e meses anteriores ao atual mantidos pelo comando
+# (0 mantém todos; com N, as partições mais antigas são apagadas com as suas consultas).
+
+PARTICOES_MESES_A_FRENTE = config('PARTICOES_MESES_A_FRENTE',cast=int,default=3)
+PARTICOES_RETENCAO_MESES = config('PARTICOES_RETENCAO_MESES',cast=int,default=0)
+
+# Exportação de consultas (exportarconsultas): linhas lidas do banco por vez, a cada pedaço da resposta.
+
+EXPORTACAO_LOTE = config('EXPORTACAO_LOTE',cast=int,default=2000)
+
+# Importação de CSV (petstore/importacao.py): senhas enviadas por vez ao pool de hash e linhas por INSERT
+# quando o banco não é o PostgreSQL (que recebe os arquivos com COPY).
+
+IMPORTACAO_LOTE = config('IMPORTACAO_LOTE',cast=int,default=5000)
+
+
+# Limite de requisições por cliente e por rota (petstore/limites.py). Cada rota (name de setup/urls.py) tem um
+# balde com "capacidade" fichas, a rajada aceita, repostas a "por_segundo" fichas por segundo; "reserva" fichas
+# são tiradas do cache de uma vez e gastas no próprio worker. Regras podem ser trocadas ou acrescentadas com
+# LIMITES_REQUISICOES=rota=capacidade/por_segundo[/reserva],... (ex.: criar_usuario=5/0.1,lista_pets=100/50/10).
+# Atrás de um proxy, LIMITES_CABECALHO_IP indica o cabeçalho com o endereço do cliente (ex.: X-Forwarded-For).
+
+LIMITES_ATIVOS = config('LIMITES_ATIVOS',cast=bool,default=True)
+LIMITES_CABECALHO_IP = config('LIMITES_CABECALHO_IP',default='')
+LIMITES_REQUISICOES = {
+    'criar_usuario': {'capacidade': 10, 'por_segundo': 0.2},
+    'cadastra_veterinario': {'capacidade': 10, 'por_segundo': 0.2},
+    'criar_usuarios_lote': {'capacidade': 2, 'por_segundo': 0.05},
+    'cadastra_veterinarios_lote': {'capacidade': 2, 'por_segundo': 0.05},
+    'importa_csv': {'capacidade': 2, 'por_segundo': 0.02},
+}
+for regra in config('LIMITES_REQUISICOES',cast=Csv(),default=''):
+    try:
+        rota,valores = regra.split('=')
+        capacidade,por_segundo,*reserva = valores.split('/')
+        limite = {'capacidade': int(capacidade), 'por_segundo': float(por_segundo), 'reserva': int(reserva[0]) if reserva else 1}
+        if not rota.strip() or len(reserva) > 1 or min(limite.values()) <= 0:
+            raise ValueError
+    except ValueError:
+        raise ImproperlyConfigured(
+            f"Regra inválida em LIMITES_REQUISICOES: {regra!r}. Use rota=capacidade/por_segundo[/reserva], com números positivos."
+        )
+    LIMITES_REQUISICOES[rota.strip()] = limite
+
+# Leitura em réplicas (petstore/replicas.py). Quem escreve lê do primário por REPLICAS_JANELA segundos, pelo
+# cookie REPLICAS_COOKIE ou pelo cabeçalho REPLICAS_CABECALHO devolvido pelo cliente. Cada réplica é verificada a
+# cada REPLICAS_INTERVALO segundos e sai do rodízio com atraso de replicação acima de REPLICAS_ATRASO_MAXIMO segundos.
+
+REPLICAS_ROTAS = config('REPLICAS_ROTAS',cast=Csv(),default='info_usuario,retorna_pet,retorna_veterinario,retorna_consulta')
+REPLICAS_JANELA = config('REPLICAS_JANELA',cast=float,default=5.0)
+REPLICAS_COOKIE = config('REPLICAS_COOKIE',default='petstore_primario')
+REPLICAS_CABECALHO = config('REPLICAS_CABECALHO',default='X-Primario-Ate')
+REPLICAS_INTERVALO = config('REPLICAS_INTERVALO',cast=float,default=5.0)
+REPLICAS_ATRASO_MAXIMO = config('REPLICAS_ATRASO_MAXIMO',cast=float,default=2.0)
+
+# Instrumentação das requisições (petstore/instrumentacao.py): fração das requisições medidas, de 0 a 1.
+# As medidas vão no cabeçalho Server-Timing e no logger petstore.instrumentacao (nível INSTRUMENTACAO_LOG).
+
+INSTRUMENTACAO_AMOSTRAGEM = config('INSTRUMENTACAO_AMOSTRAGEM',cast=float,default=0.1)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'mensagem': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'mensagem'},
+    },
+    'loggers': {
+        'petstore.instrumentacao': {
+            'handlers': ['console'],
+            'level': config('INSTRUMENTACAO_LOG',default='INFO'),
+            'propagate': False,
+        },
+    },
 }
 
 
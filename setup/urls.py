@@ -16,26 +16,37 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path
-from petstore.views import CreateUsuarioView,GetUsuarioInfoView,UpdateUsuarioView,DeleteUsuarioView,CreatePetVIew,GetPetInfoView,DeletePetView,UpdatePetInfoView,CreateVetView,GetVetInfoView,UpdateVetInfoView,DeleteVetInfoView,UsuarioMarcaConsultaView,UsuarioVizualizaConsultaView,DefineDataConsultaView,DeleteConsultaView,DefineConsultaComoRealizadaView
+from petstore.views import CreateUsuarioView,GetUsuarioInfoView,UpdateUsuarioView,DeleteUsuarioView,CreatePetVIew,GetPetInfoView,DeletePetView,UpdatePetInfoView,CreateVetView,GetVetInfoView,UpdateVetInfoView,DeleteVetInfoView,UsuarioMarcaConsultaView,UsuarioVizualizaConsultaView,DefineDataConsultaView,DeleteConsultaView,DefineConsultaComoRealizadaView,ListPetsView,ListVetsView,ListConsultasView,ProximoHorarioView,CreateUsuariosEmLoteView,CreatePetsEmLoteView,CreateVetsEmLoteView,ExportaConsultasView,ImportaCSVView
 from petstore.swagger import schema_view
+from petstore.metricas import metricas
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('novousuario',CreateUsuarioView.as_view(),name="criar_usuario"),
+    path('novousuario/lote',CreateUsuariosEmLoteView.as_view(),name="criar_usuarios_lote"),
     path('info/<int:id_usuario>',GetUsuarioInfoView.as_view(),name="info_usuario"),
     path('atualizar/<int:id_usuario>',UpdateUsuarioView.as_view(),name="atualiza_usuario"),
     path('deletar/<int:id_usuario>',DeleteUsuarioView.as_view(),name="deleta_usuario"),
     path('criarconsulta/<int:id_usuario>',UsuarioMarcaConsultaView.as_view(),name="marca_consulta"),
     path('retornaconsulta/<int:id_consulta>',UsuarioVizualizaConsultaView.as_view(),name="retorna_consulta"),
     path('novopet',CreatePetVIew.as_view(),name="criar_pet"),
+    path('novopet/lote',CreatePetsEmLoteView.as_view(),name="criar_pets_lote"),
     path('infopet/<int:id_pet>',GetPetInfoView.as_view(),name="retorna_pet"),
     path('deletarpet/<int:id_pet>',DeletePetView.as_view(),name="deleta_pet"),
     path('atualizarpet/<int:id_pet>',UpdatePetInfoView.as_view(),name="atualiza_pet"),
     path('novovet',CreateVetView.as_view(),name="cadastra_veterinario"),
+    path('novovet/lote',CreateVetsEmLoteView.as_view(),name="cadastra_veterinarios_lote"),
     path('buscarvet/<int:id_veterinario>',GetVetInfoView.as_view(),name="retorna_veterinario"),
     path('atualizarvet/<int:id_veterinario>',UpdateVetInfoView.as_view(),name="atualiza_vet"),
     path('deletarvet/<int:id_veterinario>',DeleteVetInfoView.as_view(),name="deleta_vet"),
     path('definirdataconsulta/<int:id_consulta>',DefineDataConsultaView.as_view(),name="define_data_consulta"),
     path('realizadaconsulta/<int:id_consulta>',DefineConsultaComoRealizadaView.as_view(),name="realiza_consulta"),
     path('deletarconsulta/<int:id_consulta>',DeleteConsultaView.as_view(),name="deletar_consulta"),
+    path('listarpets',ListPetsView.as_view(),name="lista_pets"),
+    path('listarvets',ListVetsView.as_view(),name="lista_veterinarios"),
+    path('listarconsultas',ListConsultasView.as_view(),name="lista_consultas"),
+    path('importar/<str:tipo>',ImportaCSVView.as_view(),name="importa_csv"),
+    path('exportarconsultas',ExportaConsultasView.as_view(),name="exporta_consultas"),
+    path('proximohorario',ProximoHorarioView.as_view(),name="proximo_horario"),
     path('swagger/',schema_view.with_ui('swagger',cache_timeout=0),name='schema-swagger-ui'),
+    path('metrics',metricas,name='metricas'),
 ]
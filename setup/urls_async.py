@@ -0,0 +1,24 @@
+"""
+Rotas usadas quando a aplicação roda sob ASGI (setup/asgi.py).
+
+São as mesmas rotas de setup/urls.py, mas as views de CRUD e de consultas são trocadas pelas
+versões assíncronas de petstore/views_async.py, que têm o mesmo nome das views síncronas.
+As demais (listagens, lotes, admin e swagger) continuam síncronas.
+"""
+from django.urls import URLPattern, path
+
+from petstore import views_async
+from setup.urls import urlpatterns as urlpatterns_sincronas
+
+
+def trocar_view(rota):
+    """Retorna a rota com a view assíncrona de mesmo nome, ou a própria rota se não houver uma."""
+    if not isinstance(rota, URLPattern) or not hasattr(rota.callback, 'view_class'):
+        return rota
+    view_async = getattr(views_async, rota.callback.view_class.__name__, None)
+    if view_async is None:
+        return rota
+    return path(str(rota.pattern), view_async.as_view(), name=rota.name)
+
+
+urlpatterns = [trocar_view(rota) for rota in urlpatterns_sincronas]